@@ -5,6 +5,7 @@
 
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from datetime import datetime
@@ -45,13 +46,13 @@ async def sync_market_data(db: Session, task_id: int):
         db.commit()
         
         # 获取股票列表
-        stock_list = ak.stock_info_a_code_name()
+        stock_list = await run_in_threadpool(ak.stock_info_a_code_name)
         
         # 同步实时行情
         for _, row in stock_list.iterrows():
             try:
                 # 获取实时行情
-                quote = ak.stock_zh_a_spot_em()
+                quote = await run_in_threadpool(ak.stock_zh_a_spot_em)
                 quote = quote[quote['代码'] == row['code']]
                 
                 if not quote.empty:
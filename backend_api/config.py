@@ -46,4 +46,44 @@ CORS_CONFIG = {
     "allow_credentials": True,
     "allow_methods": ["*"],
     "allow_headers": ["*"]
-} 
\ No newline at end of file
+}
+
+# 选股配置
+SCREENING_CONFIG = {
+    "panel_lookback_days": 400,     # 行情面板加载的历史自然日数（回踩年线策略需要约250个交易日）
+    "panel_refresh_interval": 300,  # 行情面板检查新交易日的最小间隔（秒）
+    "panel_recheck_dates": 20,      # 刷新时核对最近多少个交易日的行数和收盘价、成交量合计（发现晚到或修正的记录后重新读取）
+    "panel_full_reload_interval": 6 * 3600,  # 行情面板定期全量重新加载的间隔（秒），覆盖更早日期的回补和修正
+    "executor_workers": None,       # 并行选股进程数（None为按CPU核数自动设置，<=1为单进程顺序执行）
+    "executor_chunk_size": 500,     # 每个并行分块的股票数
+    "executor_chunk_timeout": 120,  # 每个分块的超时时间（秒）
+    "incremental": True,            # 增量选股：同一日期区间内只重新计算行情窗口有变化的股票
+    "incremental_max_entries": 32,  # 增量选股保留的 (策略, 参数, 日期区间) 状态数
+    "progress_chunk_size": 100,     # 异步选股任务的分块股票数（每完成一块推送一次进度和命中结果）
+    "max_running_jobs": 2,          # 同时运行的异步选股任务数上限
+    "job_ttl": 3600,                # 已结束的异步选股任务保留时间（秒）
+    "job_stream_interval": 0.5,     # SSE 推送轮询间隔（秒）
+    "backtest_max_days": 400,       # 策略回测区间的最大自然日数
+    "backtest_horizons": [5, 10, 20],  # 策略回测统计的远期交易日数
+    "expression_max_length": 1000,  # 选股表达式最大长度（字符）
+    "expression_max_period": 500,   # 选股表达式中窗口函数的最大周期（交易日）
+    "expression_cache_size": 64     # 选股表达式结果缓存条数（按表达式与面板快照）
+}
+
+# 智能分析配置
+ANALYSIS_CONFIG = {
+    "cache_enabled": True,          # 是否缓存分析结果（按 股票代码 + 最新K线日期 + 价格档位）
+    "cache_size": 512,              # 进程内缓存的股票数
+    "cache_db": True,               # 是否使用 stock_analysis_cache 表作为二级缓存（多进程共享）
+    "cache_price_step": 0.002,      # 价格档位宽度（相对比例），当前价格在同一档位内复用分析结果
+    "price_ttl": 30,                # 当前价格的进程内缓存时间（秒），避免每次查看都调用实时行情接口
+    "batch_max_codes": 300,         # 批量分析单次请求的最大股票数
+    "indicator_state_bootstrap_days": 400,  # 首次建立增量指标状态时读取的历史自然日数
+    "price_timeout": 3,             # 异步分析时实时行情接口取价的超时（秒），超时使用实时行情表价格
+    "history_timeout": 10,          # 异步分析时从akshare获取港股历史数据的超时（秒）；批量分析时为全部港股补取的总超时
+    "history_workers": 4,           # 批量分析从akshare补取港股历史数据的并发线程数
+    "compute_workers": 4,           # 分析计算线程数（指标、预测、关键价位）
+    "snapshot_enabled": True,       # 是否优先返回收盘后预计算的自选股分析快照（stock_analysis_snapshot 表）
+    "snapshot_workers": 4,          # 快照预计算的并行线程数
+    "snapshot_chunk_size": 200      # 快照预计算每个线程一次处理的股票数
+}
@@ -48,6 +48,8 @@ from multi_period_quotes_routes import router as multi_period_quotes_router
 from trading_notes_routes import router as trading_notes_router
 from trading_routes import router as simtrade_router
 from news_channel_routes import router as news_channel_router
+from stock.screening_executor import get_screening_executor
+from backend_core.data_collectors.upstream import install_upstream_client
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -129,6 +131,8 @@ async def root():
 @app.on_event("startup")
 async def startup_event():
     """应用启动时执行"""
+    # 路由中的 akshare 请求与采集器一样经过上游限速和共享连接池（路由在线程池中调用 akshare，限速等待不阻塞事件循环）
+    install_upstream_client()
     try:
         logger.info("正在初始化数据库...")
         #init_db()
@@ -137,5 +141,11 @@ async def startup_event():
         logger.error(f"数据库初始化失败: {str(e)}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时执行"""
+    # 关闭选股进程池
+    get_screening_executor().shutdown()
+
 if __name__ == "__main__":
     uvicorn.run("backend_api.main:app", host="0.0.0.0", port=5000, reload=True) 
\ No newline at end of file
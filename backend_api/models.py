@@ -3,7 +3,7 @@
 """
 
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from pydantic import BaseModel, EmailStr
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Float, Date, Text, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
@@ -593,6 +593,34 @@ class DataCollectionStatus(BaseModel):
     error_message: Optional[str] = None
     failed_details: List[str] = []
 
+class ScreeningJobRequest(BaseModel):
+    """异步选股任务请求模型"""
+    strategy: str  # 策略标识，如 backtrace_ma250、low_nine
+    params: Dict[str, Any] = {}  # 策略参数，未指定的使用默认值
+
+class CompositeScreeningRequest(BaseModel):
+    """组合选股请求模型"""
+    strategies: List[str]  # 策略标识列表
+    mode: str = "and"  # 组合方式：and 为全部命中，or 为任一命中
+    params: Dict[str, Dict[str, Any]] = {}  # 策略标识 -> 策略参数，未指定的使用默认值
+
+class ExpressionScreeningRequest(BaseModel):
+    """表达式选股请求模型"""
+    expression: str  # 选股表达式，如 close > ma(close, 250) and count(change_percent >= 9.5, 20) >= 2
+    market: str = "A"  # 市场：A 或 HK
+
+class ScreeningBacktestRequest(BaseModel):
+    """选股策略回测请求模型"""
+    strategy: str  # 策略标识
+    start_date: str  # 回测开始日期 YYYY-MM-DD
+    end_date: str  # 回测结束日期 YYYY-MM-DD
+    params: Dict[str, Any] = {}  # 策略参数，未指定的使用默认值
+    horizons: Optional[List[int]] = None  # 远期交易日数，默认 5/10/20
+
+class BatchAnalysisRequest(BaseModel):
+    """批量智能分析请求模型"""
+    codes: List[str]  # 股票代码列表（A股6位，港股5位）
+
 class TushareHistoricalCollectionRequest(BaseModel):
     """TuShare历史数据采集请求模型"""
     start_date: str
@@ -9,6 +9,7 @@ from backend_api.models import (
     HistoricalQuotes, StockRealtimeQuoteHK, HKIndexRealtimeQuotes,
     HKIndexHistoricalQuotes, HistoricalQuotesHK
 )
+from stock.intraday_snapshots import IntradaySnapshots
 
 router = APIRouter(prefix="/api/quotes", tags=["quotes"])
 
@@ -320,3 +321,26 @@ def get_hk_index_historical_quotes(
         "page": page,
         "size": size
     }
+
+# 9. 单只股票盘中快照（A股/港股）
+@router.get("/intraday/{code}")
+def get_intraday_snapshots(
+    code: str,
+    trade_date: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    if trade_date:
+        try:
+            datetime.strptime(trade_date, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="trade_date 格式应为 YYYY-MM-DD")
+    return {"success": True, "data": IntradaySnapshots.code_day(db, code, trade_date)}
+
+# 10. 某个时间点的全市场盘中快照
+@router.get("/intraday-market")
+def get_intraday_market_snapshot(
+    ts: datetime = Query(..., description="查询时间，返回当天不晚于该时间的最近一次采集"),
+    market: str = Query("A", pattern="^(A|HK)$"),
+    db: Session = Depends(get_db)
+):
+    return {"success": True, "data": IntradaySnapshots.market_at(db, ts, market)}
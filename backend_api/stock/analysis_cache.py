@@ -0,0 +1,247 @@
+"""
+智能分析结果缓存
+按 (股票代码, 最新K线日期, 当前价格档位) 缓存 StockAnalysisService.get_stock_analysis 的完整结果，
+热门股票被反复查看时不再重复读取历史数据和计算指标、价格预测、关键价位
+
+两级缓存:
+1. 进程内 LRU（保存序列化后的结果，命中时反序列化返回副本）
+2. 数据库表 stock_analysis_cache（可关闭；每只股票保留最近一次结果，多个接口进程共享、重启后仍可命中）
+
+失效:
+- 缓存键由采集程序写入的数据决定：写入新K线后最新K线日期变化，实时价格进入新档位后价格档位变化，旧结果不再命中
+- backend_core 的历史行情采集写入新K线后删除对应市场的数据库缓存行（backend_core/data_collectors/analysis_cache.py）；
+  实时行情采集不删除，只依靠缓存键中的价格档位
+- invalidate() 手动清除
+
+使用方式:
+    cache = get_analysis_cache()
+    key = cache.make_key(code, last_bar_date, current_price)
+    result = cache.get(db, key)
+    if result is None:
+        result = compute(...)
+        cache.put(db, key, result)
+"""
+
+import json
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from config import ANALYSIS_CONFIG
+from stock.json_utils import json_default
+
+logger = logging.getLogger(__name__)
+
+# (股票代码, 最新K线日期, 价格档位)
+AnalysisKey = Tuple[str, str, int]
+
+
+class AnalysisCache:
+    """智能分析结果两级缓存"""
+
+    def __init__(self, max_entries: int = 512, price_step: float = 0.002, use_db: bool = True):
+        self.max_entries = max(1, max_entries)
+        self.price_step = price_step
+        self.use_db = use_db
+        self._entries: "OrderedDict[str, Tuple[AnalysisKey, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def price_bucket(self, price: Optional[float]) -> int:
+        """价格档位：按 price_step 的相对宽度划分（对数刻度），价格无效时为 -1"""
+        if not price or price <= 0:
+            return -1
+        return int(math.floor(math.log(price) / math.log1p(self.price_step)))
+
+    def make_key(self, code: str, last_bar_date: str, current_price: Optional[float]) -> AnalysisKey:
+        return (code, last_bar_date, self.price_bucket(current_price))
+
+    def ensure_table(self, db: Session):
+        """创建 stock_analysis_cache 表（每个进程只执行一次）"""
+        if self._table_ready:
+            return
+        db.execute(text("""
+            CREATE TABLE IF NOT EXISTS stock_analysis_cache (
+                code TEXT PRIMARY KEY,
+                last_bar_date TEXT NOT NULL,
+                price_bucket INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                created_at TIMESTAMP
+            )
+        """))
+        db.commit()
+        self._table_ready = True
+
+    def _remember(self, key: AnalysisKey, payload: str):
+        with self._lock:
+            self._entries[key[0]] = (key, payload)
+            self._entries.move_to_end(key[0])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, db: Optional[Session], key: AnalysisKey) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存
+
+        Args:
+            db: 数据库会话（None 时只查进程内缓存）
+            key: make_key 生成的缓存键
+
+        Returns:
+            分析结果（副本），未命中返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key[0])
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(key[0])
+                self.hits += 1
+                return json.loads(entry[1])
+
+        if self.use_db and db is not None:
+            try:
+                self.ensure_table(db)
+                row = db.execute(text("""
+                    SELECT result FROM stock_analysis_cache
+                    WHERE code = :code AND last_bar_date = :last_bar_date AND price_bucket = :price_bucket
+                """), {'code': key[0], 'last_bar_date': key[1], 'price_bucket': key[2]}).fetchone()
+                if row is not None:
+                    self._remember(key, row[0])
+                    with self._lock:
+                        self.db_hits += 1
+                    return json.loads(row[0])
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"读取分析缓存失败 [{key[0]}]: {str(e)}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def get_many(self, db: Optional[Session], keys: List[AnalysisKey]) -> Dict[str, Dict[str, Any]]:
+        """
+        批量读取缓存（进程内未命中的股票用一条SQL查询数据库表）
+
+        Returns:
+            股票代码 -> 分析结果（副本），只包含命中的股票
+        """
+        found: Dict[str, Dict[str, Any]] = {}
+        pending: Dict[str, AnalysisKey] = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key[0])
+                if entry is not None and entry[0] == key:
+                    self._entries.move_to_end(key[0])
+                    self.hits += 1
+                    found[key[0]] = json.loads(entry[1])
+                else:
+                    pending[key[0]] = key
+
+        if pending and self.use_db and db is not None:
+            try:
+                self.ensure_table(db)
+                rows = db.execute(text("""
+                    SELECT code, last_bar_date, price_bucket, result FROM stock_analysis_cache WHERE code IN :codes
+                """).bindparams(bindparam('codes', expanding=True)), {'codes': list(pending)}).fetchall()
+                for code, last_bar_date, price_bucket, payload in rows:
+                    key = pending.get(code)
+                    if key is not None and key == (code, last_bar_date, price_bucket):
+                        self._remember(key, payload)
+                        found[code] = json.loads(payload)
+                        with self._lock:
+                            self.db_hits += 1
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"批量读取分析缓存失败: {str(e)}")
+
+        with self._lock:
+            self.misses += len(pending) - sum(1 for code in pending if code in found)
+        return found
+
+    def put(self, db: Optional[Session], key: AnalysisKey, result: Dict[str, Any]):
+        """写入缓存（同一股票只保留最新键的结果）"""
+        self.put_many(db, [(key, result)])
+
+    def put_many(self, db: Optional[Session], items: List[Tuple[AnalysisKey, Dict[str, Any]]]):
+        """批量写入缓存（数据库表一次提交）"""
+        rows = []
+        for key, result in items:
+            payload = json.dumps(result, ensure_ascii=False, default=json_default)
+            self._remember(key, payload)
+            rows.append({'code': key[0], 'last_bar_date': key[1], 'price_bucket': key[2],
+                         'result': payload, 'created_at': datetime.now()})
+        if not rows or not self.use_db or db is None:
+            return
+        try:
+            self.ensure_table(db)
+            db.execute(text("""
+                INSERT INTO stock_analysis_cache (code, last_bar_date, price_bucket, result, created_at)
+                VALUES (:code, :last_bar_date, :price_bucket, :result, :created_at)
+                ON CONFLICT (code) DO UPDATE SET
+                    last_bar_date = EXCLUDED.last_bar_date,
+                    price_bucket = EXCLUDED.price_bucket,
+                    result = EXCLUDED.result,
+                    created_at = EXCLUDED.created_at
+            """), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"写入分析缓存失败: {str(e)}")
+
+    def invalidate(self, db: Optional[Session] = None, codes: Optional[Iterable[str]] = None):
+        """
+        清除缓存
+
+        Args:
+            db: 数据库会话（传入时同时删除数据库缓存行）
+            codes: 股票代码列表，None 为全部
+        """
+        codes = None if codes is None else [str(code) for code in codes]
+        with self._lock:
+            if codes is None:
+                self._entries.clear()
+            else:
+                for code in codes:
+                    self._entries.pop(code, None)
+        if not self.use_db or db is None:
+            return
+        try:
+            self.ensure_table(db)
+            if codes is None:
+                db.execute(text("DELETE FROM stock_analysis_cache"))
+            else:
+                db.execute(text("DELETE FROM stock_analysis_cache WHERE code IN :codes")
+                           .bindparams(bindparam('codes', expanding=True)), {'codes': codes})
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"清除分析缓存失败: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'db_hits': self.db_hits, 'misses': self.misses}
+
+
+_cache: Optional[AnalysisCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """获取进程级分析结果缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnalysisCache(
+                max_entries=ANALYSIS_CONFIG.get('cache_size', 512),
+                price_step=ANALYSIS_CONFIG.get('cache_price_step', 0.002),
+                use_db=ANALYSIS_CONFIG.get('cache_db', True),
+            )
+        return _cache
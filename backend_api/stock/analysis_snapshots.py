@@ -0,0 +1,193 @@
+"""
+自选股智能分析快照
+收盘采集完成后，为全部用户自选股的并集预先计算完整的智能分析结果（技术指标、价格预测、交易建议、关键价位），
+以最新收盘价为当前价格，压缩为紧凑 JSON 保存在 stock_analysis_snapshot 表（每只股票一行）。
+
+单只股票分析和批量分析优先返回快照，直到下一根K线写入：
+- backend_core 的历史行情采集写入新K线后删除对应市场的快照行（backend_core/data_collectors/analysis_cache.py），
+  随后的预计算任务重新生成
+- 快照存在期间查看分析不调用实时行情接口，也不读取历史行情表
+
+使用方式:
+    build_watchlist_snapshots(SessionLocal)        # 收盘后预计算
+    AnalysisSnapshots.get(db, '600000')            # 读取快照，无快照返回None
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from config import ANALYSIS_CONFIG
+from stock.json_utils import json_default
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisSnapshots:
+    """stock_analysis_snapshot 表读写"""
+
+    # 已确认建表的数据库引擎
+    _ready_binds = set()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def ensure_table(db: Session):
+        """创建 stock_analysis_snapshot 表（每个进程、每个数据库只执行一次）"""
+        bind = db.get_bind()
+        if bind in AnalysisSnapshots._ready_binds:
+            return
+        with AnalysisSnapshots._lock:
+            db.execute(text("""
+                CREATE TABLE IF NOT EXISTS stock_analysis_snapshot (
+                    code TEXT PRIMARY KEY,
+                    last_bar_date TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at TIMESTAMP
+                )
+            """))
+            db.commit()
+            AnalysisSnapshots._ready_binds.add(bind)
+
+    @staticmethod
+    def _to_result(last_bar_date: str, payload: str) -> Dict[str, Any]:
+        return {"success": True, "data": json.loads(payload), "snapshot_date": last_bar_date}
+
+    @staticmethod
+    def get(db: Session, code: str) -> Optional[Dict[str, Any]]:
+        """
+        读取单只股票的快照
+
+        Returns:
+            {"success": True, "data": 分析结果, "snapshot_date": 快照对应的K线日期}，无快照返回None
+        """
+        return AnalysisSnapshots.get_many(db, [code]).get(code)
+
+    @staticmethod
+    def get_many(db: Session, codes: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """批量读取快照（一条查询），返回 股票代码 -> 快照结果，只包含有快照的股票"""
+        if not codes:
+            return {}
+        try:
+            AnalysisSnapshots.ensure_table(db)
+            rows = db.execute(text("""
+                SELECT code, last_bar_date, result FROM stock_analysis_snapshot WHERE code IN :codes
+            """).bindparams(bindparam('codes', expanding=True)), {'codes': [str(code) for code in codes]}).fetchall()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"读取智能分析快照失败: {str(e)}")
+            return {}
+        return {str(code): AnalysisSnapshots._to_result(str(last_bar_date), payload)
+                for code, last_bar_date, payload in rows}
+
+    @staticmethod
+    def save_many(db: Session, items: List[tuple]):
+        """
+        写入快照（同一股票覆盖旧快照，一次提交）
+
+        Args:
+            items: [(股票代码, 最新K线日期, 分析结果 data 部分)]
+        """
+        if not items:
+            return
+        now = datetime.now()
+        rows = [{'code': code, 'last_bar_date': last_bar_date, 'created_at': now,
+                 'result': json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=json_default)}
+                for code, last_bar_date, data in items]
+        AnalysisSnapshots.ensure_table(db)
+        db.execute(text("""
+            INSERT INTO stock_analysis_snapshot (code, last_bar_date, result, created_at)
+            VALUES (:code, :last_bar_date, :result, :created_at)
+            ON CONFLICT (code) DO UPDATE SET
+                last_bar_date = EXCLUDED.last_bar_date,
+                result = EXCLUDED.result,
+                created_at = EXCLUDED.created_at
+        """), rows)
+        db.commit()
+
+    @staticmethod
+    def invalidate(db: Session, codes: Optional[Sequence[str]] = None):
+        """删除快照（codes 为 None 时删除全部）"""
+        try:
+            AnalysisSnapshots.ensure_table(db)
+            if codes is None:
+                db.execute(text("DELETE FROM stock_analysis_snapshot"))
+            else:
+                db.execute(text("DELETE FROM stock_analysis_snapshot WHERE code IN :codes")
+                           .bindparams(bindparam('codes', expanding=True)), {'codes': [str(code) for code in codes]})
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"删除智能分析快照失败: {str(e)}")
+
+
+def get_watchlist_codes(db: Session) -> List[str]:
+    """全部用户自选股代码的并集（A股6位，港股5位）"""
+    rows = db.execute(text("SELECT DISTINCT stock_code FROM watchlist WHERE stock_code IS NOT NULL")).fetchall()
+    codes = {str(row[0]).strip() for row in rows}
+    return sorted(code for code in codes if len(code) in (5, 6))
+
+
+def build_watchlist_snapshots(session_factory, codes: Optional[Sequence[str]] = None,
+                              workers: Optional[int] = None, chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    为自选股并集预计算分析快照
+
+    股票按 chunk_size 分块，由 workers 个线程并行计算：每块使用独立的数据库会话，
+    历史数据一条窗口查询读取、技术指标一次向量化计算（StockAnalysisService.compute_analyses），以最新收盘价为当前价格
+
+    Args:
+        session_factory: 创建数据库会话的工厂（如 SessionLocal）
+        codes: 股票代码列表，默认为全部自选股
+        workers: 并行线程数，默认 ANALYSIS_CONFIG['snapshot_workers']
+        chunk_size: 每块股票数，默认 ANALYSIS_CONFIG['snapshot_chunk_size']
+
+    Returns:
+        {"total", "success", "failed", "elapsed"}
+    """
+    from stock.stock_analysis import StockAnalysisService
+
+    start = time.perf_counter()
+    if codes is None:
+        db = session_factory()
+        try:
+            codes = get_watchlist_codes(db)
+        finally:
+            db.close()
+    codes = list(dict.fromkeys(str(code) for code in codes))
+    workers = max(1, workers or ANALYSIS_CONFIG.get('snapshot_workers', 4))
+    chunk_size = max(1, chunk_size or ANALYSIS_CONFIG.get('snapshot_chunk_size', 200))
+    chunks = [codes[i:i + chunk_size] for i in range(0, len(codes), chunk_size)]
+
+    def build_chunk(chunk: List[str]) -> int:
+        db = session_factory()
+        try:
+            results, last_dates = StockAnalysisService(db).compute_analyses(chunk)
+            items = [(code, last_dates[code], result["data"]) for code, result in results.items()
+                     if result.get("success")]
+            AnalysisSnapshots.save_many(db, items)
+            return len(items)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"生成智能分析快照失败（{chunk[0]} 等 {len(chunk)} 只）: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return 0
+        finally:
+            db.close()
+
+    success = 0
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(workers, len(chunks)), thread_name_prefix='analysis-snapshot') as pool:
+            success = sum(pool.map(build_chunk, chunks))
+
+    result = {"total": len(codes), "success": success, "failed": len(codes) - success,
+              "elapsed": round(time.perf_counter() - start, 2)}
+    logger.info(f"智能分析快照生成完成: {result}")
+    return result
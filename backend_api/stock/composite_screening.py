@@ -0,0 +1,196 @@
+"""
+组合选股
+一次请求执行多个选股策略，按 AND / OR 组合得到最终结果
+
+设计要点:
+1. 单次遍历：所有策略的股票池合并为一个股票池交给选股执行器，每只股票的历史数据只构建一次（HistoryCache），
+   各策略按自身的回看日期区间切片后执行逐只判断
+2. 一条SQL：各策略的股票池条件在同一条 stock_basic_info 查询中计算，得到每只股票所属的策略
+3. 复用预计算：默认参数且已有最新交易日预计算结果的策略直接读取存储结果，只计算其余策略
+
+使用方式:
+    result = run_composite_screening(db, ['low_nine', 'long_lower_shadow'], mode='and')
+    for item in result['data']:
+        item['flags']     # {'low_nine': True, 'long_lower_shadow': False}
+        item['matched']   # 组合结果
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from stock.price_panel import HistoryCache, PricePanel, get_panel_store, get_price_panel
+from stock.screening_executor import ProgressCallback, failed_stocks, get_screening_executor
+from stock.screening_registry import get_strategy, resolve_params
+from stock.screening_results import load_precomputed
+
+logger = logging.getLogger(__name__)
+
+COMBINE_MODES = ('and', 'or')
+
+
+def screen_composite_stocks(panel: PricePanel, stocks: List[Tuple[str, str]],
+                            start_date_str: str, end_date_str: str,
+                            specs: Sequence[Dict[str, Any]] = (),
+                            memberships: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    """
+    对一组股票依次执行多个策略的逐只判断（可由并行执行器在子进程中按块调用）
+
+    Args:
+        panel: 行情面板
+        stocks: (code, name) 列表
+        start_date_str: 数据开始日期（各策略中最早的开始日期）
+        end_date_str: 数据结束日期
+        specs: 策略列表 [{'strategy', 'screen', 'start_date', 'params'}]
+        memberships: code -> 该股票所属股票池的策略标识列表
+
+    Returns:
+        至少命中一个策略的股票 [{'code', 'name', 'hits': {策略标识: 该策略的结果}}]，按股票池原顺序排列
+    """
+    cache = HistoryCache(panel)
+    memberships = memberships or {}
+    hits: Dict[str, Dict[str, Dict]] = {}
+    for spec in specs:
+        strategy = spec['strategy']
+        pool = [(code, name) for code, name in stocks if strategy in memberships.get(code, ())]
+        if not pool:
+            continue
+        for item in spec['screen'](cache, pool, spec['start_date'], end_date_str, **spec['params']):
+            hits.setdefault(str(item.get('code')), {})[strategy] = item
+    return [{'code': code, 'name': name, 'hits': hits[code]} for code, name in stocks if code in hits]
+
+
+def _load_memberships(db: Session, strategies: Sequence[str]) -> Tuple[List[Tuple[str, str]], Dict[str, List[str]]]:
+    """一条SQL计算各策略的股票池，返回 (合并后的股票池, code -> 所属策略列表)"""
+    conditions = [f"({get_strategy(strategy)['backtest']['stock_pool']})" for strategy in strategies]
+    columns = ', '.join(f"{condition} AS in_pool_{i}" for i, condition in enumerate(conditions))
+    rows = db.execute(text(f"""
+        SELECT DISTINCT code, name, {columns}
+        FROM stock_basic_info
+        WHERE {' OR '.join(conditions)}
+        ORDER BY code
+    """)).fetchall()
+
+    stocks: List[Tuple[str, str]] = []
+    memberships: Dict[str, List[str]] = {}
+    for row in rows:
+        code = str(row[0])
+        if code in memberships:
+            continue
+        stocks.append((code, row[1]))
+        memberships[code] = [strategy for i, strategy in enumerate(strategies) if row[2 + i]]
+    return stocks, memberships
+
+
+def run_composite_screening(db: Session, strategies: Sequence[str],
+                            params: Optional[Dict[str, Dict[str, Any]]] = None, mode: str = 'and',
+                            progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+    """
+    组合选股
+
+    Args:
+        db: 数据库会话
+        strategies: 策略标识列表
+        params: 策略标识 -> 策略参数（未指定的使用默认值）
+        mode: 组合方式，and 为全部命中，or 为任一命中
+        progress: 进度回调（见 ScreeningExecutor.run）
+
+    Returns:
+        {'data': [{'code', 'name', 'flags', 'matched', 'details'}], 'strategies', 'mode',
+         'matched_count', 'trade_date', 'precomputed': 使用预计算结果的策略,
+         'failed_count': 超时或执行失败而未计算的股票数, 'incomplete': 结果是否不完整}
+
+    Raises:
+        ValueError: 策略列表为空、包含未知策略或组合方式无效
+    """
+    strategies = list(dict.fromkeys(strategies or []))
+    if not strategies:
+        raise ValueError("至少需要选择一个选股策略")
+    mode = (mode or 'and').lower()
+    if mode not in COMBINE_MODES:
+        raise ValueError(f"组合方式无效: {mode}，可选 and / or")
+    resolved = {strategy: resolve_params(strategy, (params or {}).get(strategy)) for strategy in strategies}
+
+    # 默认参数且已有最新预计算结果的策略直接读取
+    hits: Dict[str, Dict[str, Dict]] = {}
+    names: Dict[str, str] = {}
+    precomputed: List[str] = []
+    pending: List[str] = []
+    for strategy in strategies:
+        stored = load_precomputed(db, strategy, resolved[strategy])
+        if stored is None:
+            pending.append(strategy)
+            continue
+        precomputed.append(strategy)
+        for item in stored['data']:
+            code = str(item.get('code'))
+            hits.setdefault(code, {})[strategy] = item
+            names.setdefault(code, item.get('name'))
+
+    order: List[str] = []
+    failed: List[Tuple[str, str]] = []
+    if pending:
+        stocks, memberships = _load_memberships(db, pending)
+        end_date = datetime.now().date()
+        specs = []
+        for strategy in pending:
+            backtest = get_strategy(strategy)['backtest']
+            lookback = backtest['lookback_days']
+            lookback_days = lookback(resolved[strategy]) if callable(lookback) else lookback
+            specs.append({
+                'strategy': strategy,
+                'screen': backtest['screen'],
+                'start_date': (end_date - timedelta(days=lookback_days)).strftime('%Y-%m-%d'),
+                'params': {key: resolved[strategy][key] for key in backtest['screen_params']
+                           if key in resolved[strategy]},
+            })
+        start_date_str = min(spec['start_date'] for spec in specs)
+        end_date_str = end_date.strftime('%Y-%m-%d')
+        logger.info(f"组合选股: 计算策略 {pending}, 股票 {len(stocks)} 只, 日期范围 {start_date_str} 至 {end_date_str}")
+
+        panel = get_price_panel(db)
+        results = get_screening_executor().run(
+            screen_composite_stocks, panel, stocks, start_date_str, end_date_str,
+            progress=progress, specs=specs, memberships=memberships
+        )
+        failed = failed_stocks(results)
+        order = [code for code, _ in stocks]
+        for item in results:
+            names[item['code']] = item['name']
+            for strategy, detail in item['hits'].items():
+                hits.setdefault(item['code'], {})[strategy] = detail
+
+    # 计算出的股票按股票池顺序，其余（只来自预计算结果）按代码排序
+    seen = set(order)
+    order.extend(sorted(code for code in hits if code not in seen))
+
+    data = []
+    for code in order:
+        if code not in hits:
+            continue
+        flags = {strategy: strategy in hits[code] for strategy in strategies}
+        matched = all(flags.values()) if mode == 'and' else any(flags.values())
+        data.append({
+            'code': code,
+            'name': names.get(code),
+            'flags': flags,
+            'matched': matched,
+            'details': {strategy: {k: v for k, v in detail.items() if k not in ('code', 'name')}
+                        for strategy, detail in hits[code].items()},
+        })
+
+    matched_count = sum(1 for item in data if item['matched'])
+    logger.info(f"组合选股完成 [{mode}] {strategies}: 命中任一策略 {len(data)} 只, 组合命中 {matched_count} 只")
+    return {
+        'data': data,
+        'strategies': [{'strategy': s, 'name': get_strategy(s)['name'], 'params': resolved[s]} for s in strategies],
+        'mode': mode,
+        'matched_count': matched_count,
+        'trade_date': get_panel_store().latest_date(db),
+        'precomputed': precomputed,
+        'failed_count': len(failed),
+        'incomplete': bool(failed),
+    }
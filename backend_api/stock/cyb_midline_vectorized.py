@@ -0,0 +1,234 @@
+"""
+创业板中线选股策略（向量化版本）
+基于共享行情面板，对全部创业板股票一次性计算五个条件，结果格式与 StockScreeningStrategy.screening_cyb_midline_strategy 一致
+
+条件与逐只计算版本相同：
+1. 第一个涨停（涨幅>=9.8%，且之前约N个月内没有涨停）
+2. 涨停后第一次回调不跌穿涨停底部
+3. 之后突破涨停高点
+4. 涨停与突破之间有向上跳空和揉搓线
+5. 当前均线多头排列（MA5>MA10>MA20）
+"""
+
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import logging
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+
+from stock.price_panel import PanelWindow, PricePanel, get_price_panel
+from stock.screening_executor import ProgressCallback
+
+logger = logging.getLogger(__name__)
+
+# 涨停阈值（涨跌幅%）
+LIMIT_UP_THRESHOLD = 9.8
+
+# 策略用到的行情字段
+WINDOW_FIELDS = ('open', 'close', 'high', 'low', 'change_percent')
+
+
+def _first_true(mask: np.ndarray) -> np.ndarray:
+    """每行第一个True的列下标，不存在时为-1"""
+    idx = np.argmax(mask, axis=1)
+    return np.where(mask.any(axis=1), idx, -1)
+
+
+def _last_true(mask: np.ndarray) -> np.ndarray:
+    """每行最后一个True的列下标，不存在时为-1"""
+    width = mask.shape[1]
+    idx = width - 1 - np.argmax(mask[:, ::-1], axis=1)
+    return np.where(mask.any(axis=1), idx, -1)
+
+
+def _gather(arr: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """按每行的列下标取值（下标为-1时取第0列，调用方需自行屏蔽）"""
+    return np.take_along_axis(arr, np.maximum(cols, 0)[:, None], axis=1)[:, 0]
+
+
+class CybMidlineVectorizedStrategy:
+    """创业板中线选股策略（向量化）"""
+
+    @staticmethod
+    def evaluate(window: PanelWindow, months: int = 4) -> List[Dict]:
+        """
+        对窗口内的全部股票计算策略条件
+
+        Args:
+            window: 行情窗口（每行右对齐，最后一列为最新交易日）
+            months: 涨停前检查无涨停的月数（与逐只版本的 months_before 一致）
+
+        Returns:
+            符合条件的股票列表（按窗口中的股票顺序）
+        """
+        n_stocks, width = window.valid.shape
+        if n_stocks == 0 or width == 0:
+            return []
+
+        valid = window.valid
+        open_ = window.fields['open']
+        close = window.fields['close']
+        high = window.fields['high']
+        low = window.fields['low']
+        change_percent = window.fields['change_percent']
+        cols = np.arange(width)
+
+        # 至少需要20个交易日的数据
+        eligible = window.lengths >= 20
+
+        # 条件1：涨停且之前 days_to_check-1 个交易日内没有涨停，取最新的一个
+        days_to_check = months * 30
+        limit_up = valid & (change_percent >= LIMIT_UP_THRESHOLD)
+        cum = np.cumsum(limit_up, axis=1)
+        padded = np.concatenate([np.zeros((n_stocks, days_to_check), dtype=cum.dtype), cum], axis=1)
+        # 区间 [t-days_to_check+1, t-1] 内的涨停次数 = cum[t-1] - cum[t-days_to_check]
+        prev_count = padded[:, days_to_check - 1:days_to_check - 1 + width] - padded[:, :width]
+        first_limit_up = limit_up & (prev_count == 0)
+        limit_idx = _last_true(first_limit_up)
+        eligible &= limit_idx >= 0
+
+        limit_close = _gather(close, limit_idx)
+        limit_low = _gather(low, limit_idx)
+        limit_high = _gather(high, limit_idx)
+        after_limit = cols[None, :] > limit_idx[:, None]
+
+        # 条件2：涨停后第一个“跌破底部或回调”的交易日必须是回调而不是跌破
+        pullback_event = after_limit & ((low < limit_low[:, None]) | (close < limit_close[:, None]))
+        pullback_idx = _first_true(pullback_event)
+        eligible &= (pullback_idx >= 0) & (_gather(low, pullback_idx) >= limit_low)
+
+        # 条件3：涨停后第一个最高价突破涨停高点的交易日
+        breakthrough_idx = _first_true(after_limit & (high > limit_high[:, None]))
+        eligible &= breakthrough_idx >= 0
+
+        # 条件4：涨停与突破之间的向上跳空与揉搓线（与前一日比较）
+        prev_high = np.concatenate([np.zeros((n_stocks, 1)), high[:, :-1]], axis=1)
+        prev_close = np.concatenate([np.zeros((n_stocks, 1)), close[:, :-1]], axis=1)
+        between = after_limit & (cols[None, :] < breakthrough_idx[:, None])
+
+        gap = between & (low > prev_high) & (prev_high > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            body_size = np.abs(close - open_) / prev_close
+            upper_shadow = (high - np.maximum(open_, close)) / prev_close
+            lower_shadow = (np.minimum(open_, close) - low) / prev_close
+        doji = between & (prev_close > 0) & (body_size < 0.02) & (upper_shadow > 0.01) & (lower_shadow > 0.01)
+        eligible &= gap.any(axis=1) & doji.any(axis=1)
+
+        # 条件5：最新20个交易日的均线多头排列
+        recent = np.ascontiguousarray(close[:, width - 20:][:, ::-1]) if width >= 20 else np.zeros((n_stocks, 20))
+        ma5 = np.mean(recent[:, :5], axis=1)
+        ma10 = np.mean(recent[:, :10], axis=1)
+        ma20 = np.mean(recent[:, :20], axis=1)
+        eligible &= (ma5 > ma10) & (ma10 > ma20)
+
+        results = []
+        for row in np.nonzero(eligible)[0]:
+            li = limit_idx[row]
+            bi = breakthrough_idx[row]
+            current_price = float(close[row, width - 1])
+            current_change_percent = float(change_percent[row, width - 1])
+            # 与逐只版本一致：日期从突破附近向涨停方向排列（新到旧）
+            gap_cols = np.nonzero(gap[row])[0][::-1]
+            doji_cols = np.nonzero(doji[row])[0][::-1]
+
+            results.append({
+                'code': str(window.codes[row]),
+                'name': window.names[row],
+                'limit_up_date': str(window.date(row, li)),
+                'limit_up_price': round(float(close[row, li]), 2),
+                'limit_up_low': round(float(low[row, li]), 2),
+                'limit_up_high': round(float(high[row, li]), 2),
+                'breakthrough_date': str(window.date(row, bi)),
+                'breakthrough_price': round(float(close[row, bi]), 2),
+                'current_price': round(current_price, 2),
+                'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0,
+                'ma5': round(ma5[row], 2),
+                'ma10': round(ma10[row], 2),
+                'ma20': round(ma20[row], 2),
+                'gap_dates': [str(window.date(row, c)) for c in gap_cols],
+                'doji_dates': [str(window.date(row, c)) for c in doji_cols]
+            })
+
+        return results
+
+    @staticmethod
+    def replay_signals(panel: PricePanel, stocks: List[Tuple[str, str]], as_of_dates: List[str],
+                       lookback_days: int, months: int = 4) -> List[Dict]:
+        """
+        回测用：逐个回放日对全部股票一次计算策略条件，与逐日执行逐只版本的结果一致
+
+        Args:
+            panel: 行情面板
+            stocks: (code, name) 列表
+            as_of_dates: 回放日列表（升序）
+            lookback_days: 每个回放日的回看自然日数
+            months: 涨停前检查无涨停的月数
+
+        Returns:
+            信号列表 [{'date': 回放日, 'code', 'name'}]，按回放日、股票池顺序排列
+        """
+        names = {str(code): name for code, name in stocks}
+        signals = []
+        for as_of in as_of_dates:
+            window_start = (datetime.strptime(as_of, '%Y-%m-%d') - timedelta(days=lookback_days)).strftime('%Y-%m-%d')
+            window = panel.window(list(names), window_start, as_of, fields=WINDOW_FIELDS)
+            window.names = [names[code] for code in window.codes]
+            for item in CybMidlineVectorizedStrategy.evaluate(window, months=months):
+                signals.append({'date': as_of, 'code': item['code'], 'name': item['name']})
+        return signals
+
+    @staticmethod
+    def screening_cyb_midline_strategy(db: Session, months: int = 4,
+                                       progress: Optional[ProgressCallback] = None) -> List[Dict]:
+        """
+        创业板中线选股策略主函数（向量化版本）
+
+        Args:
+            db: 数据库会话
+            months: 查询月数（默认4个月）
+            progress: 进度回调（一次性计算全部股票，完成后回调一次）
+
+        Returns:
+            符合条件的股票列表
+        """
+        results = []
+
+        try:
+            # 1. 获取创业板股票列表（代码以3开头，排除ST股票）
+            cyb_stocks = db.execute(text("""
+                SELECT DISTINCT code, name
+                FROM stock_basic_info
+                WHERE code LIKE '3%' AND LENGTH(code) = 6
+                AND name NOT LIKE '%ST%'
+                ORDER BY code
+            """)).fetchall()
+            logger.info(f"找到 {len(cyb_stocks)} 只创业板股票")
+
+            # 2. 计算查询日期范围
+            end_date = datetime.now().date()
+            start_date = end_date - timedelta(days=months * 30)
+            start_date_str = start_date.strftime('%Y-%m-%d')
+            end_date_str = end_date.strftime('%Y-%m-%d')
+            logger.info(f"查询日期范围: {start_date_str} 至 {end_date_str}")
+
+            # 3. 一次性截取全部创业板股票的行情窗口并计算
+            panel = get_price_panel(db)
+            names = {str(code): name for code, name in cyb_stocks}
+            window = panel.window(list(names.keys()), start_date_str, end_date_str)
+            window.names = [names[code] for code in window.codes]
+
+            results = CybMidlineVectorizedStrategy.evaluate(window, months=months)
+            for item in results:
+                logger.info(f"找到符合条件的股票: {item['code']} {item['name']}")
+            if progress is not None:
+                progress(len(cyb_stocks), len(cyb_stocks), results)
+
+            logger.info(f"选股策略执行完成，找到 {len(results)} 只符合条件的股票")
+
+        except Exception as e:
+            logger.error(f"选股策略执行失败: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+
+        return results
@@ -16,11 +16,17 @@ import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from stock.price_panel import BarSequence, PricePanel, get_price_panel
+from stock.screening_executor import ProgressCallback, get_screening_executor
+
 logger = logging.getLogger(__name__)
 
 
 class HighTightFlagStrategy:
     """高而窄的旗形选股策略类"""
+
+    # 策略依赖的最近交易日数（增量选股据此判断数据是否变化）
+    WINDOW_BARS = 60
     
     @staticmethod
     def check_high_tight_flag_conditions(historical_data: List[Dict], threshold: int = 60) -> Tuple[bool, Optional[Dict]]:
@@ -108,7 +114,104 @@ class HighTightFlagStrategy:
         }
     
     @staticmethod
-    def screening_high_tight_flag_strategy(db: Session) -> List[Dict]:
+    def screen_high_tight_flag_stocks(panel: PricePanel, stocks: List[Tuple[str, str]],
+                                      start_date_str: str, end_date_str: str) -> List[Dict]:
+        """
+        对一组股票逐只检查高而窄的旗形策略条件（可由并行执行器在子进程中按块调用）
+        
+        Args:
+            panel: 行情面板
+            stocks: (股票代码, 名称) 列表
+            start_date_str: 数据开始日期（YYYY-MM-DD）
+            end_date_str: 数据结束日期（YYYY-MM-DD）
+        
+        Returns:
+            符合条件的股票列表
+        """
+        results = []
+        
+        for idx, (code, name) in enumerate(stocks):
+            if idx % 100 == 0:
+                logger.info(f"处理进度: {idx}/{len(stocks)}")
+            
+            try:
+                # 从共享行情面板获取该股票的历史数据（倒序，最新在前）
+                historical_data = panel.get_history(code, start_date_str, end_date_str, name=name)
+                
+                if len(historical_data) < 60:  # 至少需要60个交易日的数据
+                    continue
+                
+                # 检查高而窄的旗形策略条件
+                is_valid, strategy_info = HighTightFlagStrategy.check_high_tight_flag_conditions(
+                    historical_data, threshold=60
+                )
+                
+                if not is_valid or not strategy_info:
+                    continue
+                
+                # 获取当前价格信息
+                current_data = historical_data[0] if historical_data else {}
+                current_price = float(current_data.get('close', 0))
+                current_change_percent = current_data.get('change_percent', 0)
+                
+                # 所有条件满足，加入结果列表
+                result_item = {
+                    'code': str(code),
+                    'name': name,
+                    'current_price': round(current_price, 2),
+                    'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0,
+                    'period_low': round(strategy_info['period_low'], 2),
+                    'price_ratio': round(strategy_info['price_ratio'], 2)
+                }
+                
+                results.append(result_item)
+                logger.info(f"找到符合条件的股票: {code} {name}")
+                
+            except Exception as e:
+                logger.error(f"处理股票 {code} 时出错: {str(e)}")
+                continue
+        
+        return results
+
+    @staticmethod
+    def replay_signals(panel: PricePanel, stocks: List[Tuple[str, str]], as_of_dates: List[str],
+                       lookback_days: int = 100) -> List[Dict]:
+        """
+        回测用：在全部股票的K线序列上一次计算全部回放日的信号，与逐日执行 screen_high_tight_flag_stocks 的结果一致
+
+        Args:
+            panel: 行情面板
+            stocks: (code, name) 列表
+            as_of_dates: 回放日列表（升序）
+            lookback_days: 每个回放日的回看自然日数
+
+        Returns:
+            信号列表 [{'date': 回放日, 'code', 'name'}]，按回放日、股票池顺序排列
+        """
+        bars = BarSequence(panel, stocks, fields=('close', 'low', 'change_percent'))
+        if len(bars) == 0 or not as_of_dates:
+            return []
+        closes, lows, change = bars.fields['close'], bars.fields['low'], bars.fields['change_percent']
+        entry, length = bars.windows(as_of_dates, lookback_days)
+        ok = length >= HighTightFlagStrategy.WINDOW_BARS
+
+        # 24~10日（倒序第10~23根K线）的最低价（只取正值）与连续两天涨幅 >= 9.5%
+        period_low = np.full(entry.shape, np.inf)
+        consecutive = np.zeros(entry.shape, dtype=bool)
+        for k in range(10, 24):
+            low = bars.take(lows, entry - k)
+            period_low = np.where(low > 0, np.minimum(period_low, low), period_low)
+            if k > 10:
+                consecutive |= (bars.take(change, entry - k + 1) >= 9.5) & (bars.take(change, entry - k) >= 9.5)
+
+        current_close = bars.take(closes, entry)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ok &= ~(current_close <= 0) & np.isfinite(period_low) & ~(current_close / period_low < 1.9)
+        ok &= consecutive
+        return bars.signals(ok, as_of_dates)
+
+    @staticmethod
+    def screening_high_tight_flag_strategy(db: Session, progress: Optional[ProgressCallback] = None) -> List[Dict]:
         """
         高而窄的旗形选股策略主函数
         
@@ -119,6 +222,7 @@ class HighTightFlagStrategy:
         
         Args:
             db: 数据库会话
+            progress: 进度回调（异步选股任务使用，每完成一个分块调用一次）
         
         Returns:
             符合条件的股票列表
@@ -146,87 +250,16 @@ class HighTightFlagStrategy:
             
             logger.info(f"查询日期范围: {start_date_str} 至 {end_date_str}")
             
-            # 3. 对每只股票执行选股策略
-            for idx, (code, name) in enumerate(stocks):
-                if idx % 100 == 0:
-                    logger.info(f"处理进度: {idx}/{len(stocks)}")
-                
-                try:
-                    # 获取该股票的历史数据（倒序，最新在前）
-                    history_query = db.execute(text("""
-                        SELECT code, name, date, open, close, high, low, 
-                               change_percent, volume, amount
-                        FROM historical_quotes 
-                        WHERE code = :code 
-                        AND date >= :start_date 
-                        AND date <= :end_date
-                        ORDER BY date DESC
-                    """), {
-                        'code': str(code),
-                        'start_date': start_date_str,
-                        'end_date': end_date_str
-                    })
-                    
-                    history_rows = history_query.fetchall()
-                    
-                    if len(history_rows) < 60:  # 至少需要60个交易日的数据
-                        continue
-                    
-                    # 转换为字典列表
-                    historical_data = []
-                    for row in history_rows:
-                        date_val = row[2]
-                        if hasattr(date_val, 'strftime'):
-                            date_str = date_val.strftime('%Y-%m-%d')
-                        else:
-                            date_str = str(date_val)
-                        
-                        historical_data.append({
-                            'code': row[0],
-                            'name': row[1],
-                            'date': date_str,
-                            'open': float(row[3]) if row[3] else 0.0,
-                            'close': float(row[4]) if row[4] else 0.0,
-                            'high': float(row[5]) if row[5] else 0.0,
-                            'low': float(row[6]) if row[6] else 0.0,
-                            'change_percent': float(row[7]) if row[7] else 0.0,
-                            'volume': float(row[8]) if row[8] else 0.0,
-                            'amount': float(row[9]) if row[9] else 0.0
-                        })
-                    
-                    # 检查高而窄的旗形策略条件
-                    is_valid, strategy_info = HighTightFlagStrategy.check_high_tight_flag_conditions(
-                        historical_data, threshold=60
-                    )
-                    
-                    if not is_valid or not strategy_info:
-                        continue
-                    
-                    # 获取当前价格信息
-                    current_data = historical_data[0] if historical_data else {}
-                    current_price = float(current_data.get('close', 0))
-                    current_change_percent = current_data.get('change_percent', 0)
-                    
-                    # 所有条件满足，加入结果列表
-                    result_item = {
-                        'code': str(code),
-                        'name': name,
-                        'current_price': round(current_price, 2),
-                        'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0,
-                        'period_low': round(strategy_info['period_low'], 2),
-                        'price_ratio': round(strategy_info['price_ratio'], 2)
-                    }
-                    
-                    results.append(result_item)
-                    logger.info(f"找到符合条件的股票: {code} {name}")
-                    
-                except Exception as e:
-                    logger.error(f"处理股票 {code} 时出错: {str(e)}")
-                    try:
-                        db.rollback()
-                    except Exception as rollback_error:
-                        logger.warning(f"回滚事务时出错: {str(rollback_error)}")
-                    continue
+            # 从共享行情面板读取历史数据，避免逐只股票查询数据库
+            panel = get_price_panel(db)
+            
+            # 3. 对每只股票执行选股策略（股票较多时分块并行执行）
+            results = get_screening_executor().run(
+                HighTightFlagStrategy.screen_high_tight_flag_stocks,
+                panel, stocks, start_date_str, end_date_str,
+                progress=progress,
+                window_bars=HighTightFlagStrategy.WINDOW_BARS
+            )
             
             logger.info(f"高而窄的旗形选股策略执行完成，找到 {len(results)} 只符合条件的股票")
             
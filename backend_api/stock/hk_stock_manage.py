@@ -5,6 +5,7 @@
 
 from fastapi import APIRouter, Query, Depends
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from database import get_db
 from sqlalchemy.orm import Session
 import traceback
@@ -349,7 +350,7 @@ async def get_hk_realtime_quote_by_code(code: str = Query(None, description="股
             # 从财务指标接口获取市盈率
             try:
                 import akshare as ak
-                financial_df = ak.stock_hk_financial_indicator_em(symbol=code)
+                financial_df = await run_in_threadpool(ak.stock_hk_financial_indicator_em, symbol=code)
                 if financial_df is not None and not financial_df.empty and '市盈率' in financial_df.columns:
                     pe_value = financial_df.iloc[0]['市盈率']
                     if pd.notna(pe_value):
@@ -363,7 +364,7 @@ async def get_hk_realtime_quote_by_code(code: str = Query(None, description="股
         
         # 数据库没有数据，尝试从akshare实时获取
         try:
-            df_hk_spot = ak.stock_hk_spot_em()
+            df_hk_spot = await run_in_threadpool(ak.stock_hk_spot_em)
             stock_data = df_hk_spot[df_hk_spot['代码'] == code]
             
             if stock_data.empty:
@@ -419,7 +420,7 @@ async def get_hk_realtime_quote_by_code(code: str = Query(None, description="股
             
             # 从财务指标接口获取市盈率
             try:
-                financial_df = ak.stock_hk_financial_indicator_em(symbol=code)
+                financial_df = await run_in_threadpool(ak.stock_hk_financial_indicator_em, symbol=code)
                 if financial_df is not None and not financial_df.empty and '市盈率' in financial_df.columns:
                     pe_value = financial_df.iloc[0]['市盈率']
                     if pd.notna(pe_value):
@@ -465,7 +466,7 @@ async def get_hk_minute_data_by_code(code: str = Query(None, description="股票
         # 获取最近几天的分钟数据（确保能获取到当日数据）
         # 使用1分钟周期
         try:
-            df = ak.stock_hk_hist_min_em(symbol=code, period="1", start_date=today_str, end_date=today_str, adjust="")
+            df = await run_in_threadpool(ak.stock_hk_hist_min_em, symbol=code, period="1", start_date=today_str, end_date=today_str, adjust="")
             
             if df is None or df.empty:
                 # 如果当日没有数据，尝试获取最近一个交易日的数据
@@ -473,7 +474,7 @@ async def get_hk_minute_data_by_code(code: str = Query(None, description="股票
                 for i in range(1, 6):
                     prev_date = (today - datetime.timedelta(days=i)).strftime('%Y%m%d')
                     try:
-                        df = ak.stock_hk_hist_min_em(symbol=code, period="1", start_date=prev_date, end_date=prev_date, adjust="")
+                        df = await run_in_threadpool(ak.stock_hk_hist_min_em, symbol=code, period="1", start_date=prev_date, end_date=prev_date, adjust="")
                         if df is not None and not df.empty:
                             print(f"[hk_minute_data_by_code] 使用日期 {prev_date} 的数据")
                             break
@@ -605,13 +606,13 @@ async def get_hk_kline_hist(
                 
                 # 根据周期选择接口
                 if period == "daily":
-                    df = ak.stock_hk_hist(symbol=code, period='daily', start_date=start_date_str, end_date=end_date_str, adjust='')
+                    df = await run_in_threadpool(ak.stock_hk_hist, symbol=code, period='daily', start_date=start_date_str, end_date=end_date_str, adjust='')
                 elif period == "weekly":
-                    df = ak.stock_hk_hist(symbol=code, period='weekly', start_date=start_date_str, end_date=end_date_str, adjust='')
+                    df = await run_in_threadpool(ak.stock_hk_hist, symbol=code, period='weekly', start_date=start_date_str, end_date=end_date_str, adjust='')
                 elif period == "monthly":
-                    df = ak.stock_hk_hist(symbol=code, period='monthly', start_date=start_date_str, end_date=end_date_str, adjust='')
+                    df = await run_in_threadpool(ak.stock_hk_hist, symbol=code, period='monthly', start_date=start_date_str, end_date=end_date_str, adjust='')
                 else:
-                    df = ak.stock_hk_hist(symbol=code, period='daily', start_date=start_date_str, end_date=end_date_str, adjust='')
+                    df = await run_in_threadpool(ak.stock_hk_hist, symbol=code, period='daily', start_date=start_date_str, end_date=end_date_str, adjust='')
                 
                 if df is None or df.empty:
                     return JSONResponse({"success": False, "message": f"未找到股票代码: {code} 的历史数据"}, status_code=404)
@@ -719,7 +720,7 @@ async def get_hk_kline_min_hist(
         print(f"[hk_kline_min_hist] 调用akshare: symbol={code}, period={period}, start_date={start_date}, end_date={end_date}")
         
         # 调用akshare接口
-        df = ak.stock_hk_hist_min_em(symbol=code, period=period, start_date=start_date, end_date=end_date, adjust=adjust)
+        df = await run_in_threadpool(ak.stock_hk_hist_min_em, symbol=code, period=period, start_date=start_date, end_date=end_date, adjust=adjust)
         
         if df is None or df.empty:
             print(f"[hk_kline_min_hist] 未找到股票代码: {code}")
@@ -0,0 +1,374 @@
+"""
+增量技术指标状态
+每只股票在 stock_indicator_state 表中保存一行递推指标状态（EMA12/EMA26/DEA、RSI 平均涨跌幅、K/D 值、最近9日最高/最低价），
+历史行情采集写入新K线后，只读取各股票状态日期之后的K线，按交易日对全部股票做一次数组运算推进（stock.indicators.advance_state），
+不必每次从完整收盘价序列重新计算。
+
+盘中查询时把实时行情表中比状态更新的价格作为一根临时K线推进，得到包含当日价格的指标值，临时K线不写回状态表。
+
+指标口径见 stock.indicators：MACD/KDJ 从第一根K线递推（首次建立状态读取最近 bootstrap_days 个自然日的K线，
+EMA 初值的影响已衰减到可忽略），RSI 为 Wilder 平滑。
+
+回补的K线（日期不晚于股票的状态日期）无法增量推进：推进时发现目标日期的K线早于（或等于）状态日期的股票
+清除状态后重新计算；整段回补历史数据的采集（自选股历史、按区间批量采集）结束后调用 rebuild。
+
+使用方式:
+    store = IndicatorStateStore(db, market='A')
+    store.advance_for_date('2024-06-28')           # 收盘采集后推进
+    store.get_indicators(['600000'], live=True)    # 盘中查询（含实时价格）
+"""
+
+import json
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+from sqlalchemy import bindparam, text
+
+from config import ANALYSIS_CONFIG
+from stock import indicators
+
+logger = logging.getLogger(__name__)
+
+# 市场 -> (历史行情表, 实时行情表)
+MARKET_TABLES = {
+    'A': ('historical_quotes', 'stock_realtime_quote'),
+    'HK': ('historical_quotes_hk', 'stock_realtime_quote_hk'),
+}
+
+# 状态字段 -> 表字段
+_STATE_COLUMNS = (
+    ('bars', 'bar_count'), ('close', 'last_close'), ('ema_fast', 'ema_fast'), ('ema_slow', 'ema_slow'),
+    ('dea', 'dea'), ('avg_gain', 'avg_gain'), ('avg_loss', 'avg_loss'), ('k', 'k_value'), ('d', 'd_value'),
+)
+_WINDOW_COLUMNS = (('highs', 'recent_highs'), ('lows', 'recent_lows'))
+_SELECT_STATE = ', '.join(f"s.{column}" for _, column in _STATE_COLUMNS + _WINDOW_COLUMNS)
+
+
+def _to_db(value: float) -> Optional[float]:
+    return None if value is None or math.isnan(value) else float(value)
+
+
+def _from_db(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+class IndicatorStateStore:
+    """增量技术指标状态（stock_indicator_state 表）"""
+
+    def __init__(self, session, market: str = 'A', bootstrap_days: Optional[int] = None):
+        if market not in MARKET_TABLES:
+            raise ValueError(f"不支持的市场: {market}")
+        self.session = session
+        self.market = market
+        self.quotes_table, self.realtime_table = MARKET_TABLES[market]
+        self.bootstrap_days = bootstrap_days or ANALYSIS_CONFIG.get('indicator_state_bootstrap_days', 400)
+        self._init_table()
+
+    def _init_table(self):
+        try:
+            self.session.execute(text('''
+                CREATE TABLE IF NOT EXISTS stock_indicator_state (
+                    code TEXT PRIMARY KEY,
+                    trade_date TEXT NOT NULL,
+                    bar_count INTEGER NOT NULL DEFAULT 0,
+                    last_close REAL, ema_fast REAL, ema_slow REAL, dea REAL,
+                    avg_gain REAL, avg_loss REAL, k_value REAL, d_value REAL,
+                    recent_highs TEXT, recent_lows TEXT,
+                    updated_at TIMESTAMP
+                )
+            '''))
+            self.session.commit()
+        except Exception as e:
+            logger.error(f"初始化 stock_indicator_state 表失败: {e}")
+            self.session.rollback()
+
+    def _execute(self, sql: str, params: Dict, codes: Optional[Sequence[str]] = None):
+        statement = text(sql)
+        if codes is not None:
+            statement = statement.bindparams(bindparam('codes', expanding=True))
+            params = dict(params, codes=list(codes))
+        return self.session.execute(statement, params).fetchall()
+
+    @staticmethod
+    def _build_state(rows: Sequence) -> Dict[str, np.ndarray]:
+        """
+        表中的状态行转换为数组状态
+
+        Args:
+            rows: 每只股票一行（bar_count ... recent_lows，顺序同 _STATE_COLUMNS + _WINDOW_COLUMNS），None 表示无状态
+        """
+        state = indicators.init_state(len(rows))
+        for i, row in enumerate(rows):
+            if row is None or row[0] is None:
+                continue
+            for j, (field, _) in enumerate(_STATE_COLUMNS):
+                state[field][i] = _from_db(row[j])
+            offset = len(_STATE_COLUMNS)
+            for j, (field, _) in enumerate(_WINDOW_COLUMNS):
+                values = json.loads(row[offset + j] or '[]')
+                window = state[field].shape[1]
+                values = [_from_db(v) for v in values][-window:]
+                if values:
+                    state[field][i, window - len(values):] = values
+        return state
+
+    def _code_filter(self, alias: str, codes: Optional[Sequence[str]]) -> str:
+        return f"AND {alias}.code IN :codes" if codes else ""
+
+    def _load_new_bars(self, target_date: str, codes: Optional[Sequence[str]] = None) -> List:
+        """读取每只股票状态日期之后（无状态时为最近 bootstrap_days 天）到目标日期的K线"""
+        bootstrap_start = (datetime.strptime(target_date, '%Y-%m-%d') -
+                           timedelta(days=self.bootstrap_days)).strftime('%Y-%m-%d')
+        min_date = self._min_load_date(target_date, bootstrap_start, codes)
+        # h.date > :min_date 为常量下界，可以使用日期索引；逐只股票的下界在 COALESCE 中判断
+        return self._execute(f'''
+            SELECT h.code, h.date, h.high, h.low, h.close, s.trade_date, {_SELECT_STATE}
+            FROM {self.quotes_table} h
+            LEFT JOIN stock_indicator_state s ON s.code = h.code
+            WHERE h.date > :min_date
+              AND h.date > COALESCE(s.trade_date, :bootstrap_start)
+              AND h.date <= :target_date
+              {self._code_filter('h', codes)}
+            ORDER BY h.code, h.date
+        ''', {'target_date': target_date, 'bootstrap_start': bootstrap_start, 'min_date': min_date},
+            list(codes) if codes else None)
+
+    def _min_load_date(self, target_date: str, bootstrap_start: str, codes: Optional[Sequence[str]] = None) -> str:
+        """
+        读取新K线的日期下界：目标日期有K线的股票中最早的状态日期，其中有尚无状态的股票时不晚于 bootstrap_start
+
+        只统计目标日期有K线的股票，长期停牌或已退市股票的旧状态不会把下界拉回到很早的日期；
+        目标日期没有任何K线时取全部状态日期的最小值
+        """
+        codes = list(codes) if codes else None
+        min_state = self._execute(f'''
+            SELECT MIN(s.trade_date) FROM stock_indicator_state s
+            JOIN {self.quotes_table} h ON h.code = s.code AND h.date = :target_date
+            WHERE 1 = 1 {self._code_filter('s', codes)}
+        ''', {'target_date': target_date}, codes)[0][0]
+        stateless = self._execute(f'''
+            SELECT h.code FROM {self.quotes_table} h
+            WHERE h.date = :target_date {self._code_filter('h', codes)}
+              AND NOT EXISTS (SELECT 1 FROM stock_indicator_state s WHERE s.code = h.code)
+            LIMIT 1
+        ''', {'target_date': target_date}, codes)
+        if stateless:
+            return bootstrap_start if min_state is None else min(str(min_state), bootstrap_start)
+        if min_state is None:
+            min_state = self._execute(f'''
+                SELECT MIN(s.trade_date) FROM stock_indicator_state s WHERE 1 = 1 {self._code_filter('s', codes)}
+            ''', {}, codes)[0][0]
+        return bootstrap_start if min_state is None else str(min_state)
+
+    def _late_codes(self, target_date: str, codes: Optional[Sequence[str]] = None) -> Dict[str, str]:
+        """目标日期有K线、但指标状态已推进到该日期或之后的股票（回补的K线） -> 状态日期"""
+        codes = list(codes) if codes else None
+        rows = self._execute(f'''
+            SELECT s.code, s.trade_date FROM stock_indicator_state s
+            JOIN {self.quotes_table} h ON h.code = s.code AND h.date = :target_date
+            WHERE s.trade_date >= :target_date {self._code_filter('s', codes)}
+        ''', {'target_date': target_date}, codes)
+        return {str(row[0]): str(row[1]) for row in rows}
+
+    def _delete_states(self, codes: Optional[Sequence[str]] = None):
+        if codes:
+            self.session.execute(text("DELETE FROM stock_indicator_state WHERE code IN :codes")
+                                 .bindparams(bindparam('codes', expanding=True)), {'codes': list(codes)})
+        else:
+            self.session.execute(text(f'''
+                DELETE FROM stock_indicator_state
+                WHERE code IN (SELECT DISTINCT code FROM {self.quotes_table})
+            '''))
+        self.session.commit()
+
+    def advance_for_date(self, target_date: str, codes: Optional[Sequence[str]] = None) -> Dict[str, any]:
+        """
+        将全部（或指定）股票的指标状态推进到目标日期
+
+        缺失的交易日按顺序补齐：第 j 轮推进每只股票的第 j 根新K线，每轮一次数组运算。
+        目标日期的K线是回补的（不晚于状态日期）的股票清除状态后重新计算到原状态日期
+
+        Args:
+            target_date: 目标日期 (YYYY-MM-DD)
+            codes: 股票代码列表，默认全部股票
+
+        Returns:
+            Dict: 计算结果统计
+        """
+        try:
+            late = self._late_codes(target_date, codes)
+            if late:
+                logger.info(f"{len(late)} 只股票有 {target_date} 的回补K线，重新计算技术指标状态")
+                self._delete_states(list(late))
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"检查技术指标状态回补K线失败: {e}")
+            return {"total": 0, "success": 0, "failed": 1, "details": [str(e)], "bars": 0, "date": target_date}
+        result = self._advance(target_date, codes)
+        latest = max(late.values(), default=target_date)
+        if latest > target_date and not result['failed']:
+            replayed = self._advance(latest, list(late))
+            result['bars'] += replayed['bars']
+            result['failed'] += replayed['failed']
+            result['details'] += replayed['details']
+        return result
+
+    def _advance(self, target_date: str, codes: Optional[Sequence[str]] = None) -> Dict[str, any]:
+        """从各股票的状态日期推进到目标日期"""
+        try:
+            logger.info(f"开始推进{self.market}股技术指标状态至 {target_date}")
+            rows = self._load_new_bars(target_date, codes)
+
+            order: Dict[str, int] = {}
+            state_rows: List[Tuple] = []
+            bars: List[List[Tuple]] = []
+            last_dates: List[str] = []
+            for row in rows:
+                code = str(row[0])
+                index = order.get(code)
+                if index is None:
+                    index = order[code] = len(state_rows)
+                    state_rows.append(tuple(row[6:]) if row[5] is not None else None)
+                    bars.append([])
+                    last_dates.append('')
+                bars[index].append((row[2], row[3], row[4]))
+                last_dates[index] = str(row[1])
+
+            if order:
+                state = self._build_state(state_rows)
+                depth = max(len(items) for items in bars)
+                prices = np.full((3, len(bars), depth), np.nan)
+                for i, items in enumerate(bars):
+                    prices[:, i, :len(items)] = np.array(items, dtype=float).T
+                for j in range(depth):
+                    state = indicators.advance_state(state, prices[0, :, j], prices[1, :, j], prices[2, :, j])
+                self._save(list(order), last_dates, state)
+
+            result = {"total": len(order), "success": len(order), "failed": 0, "details": [],
+                      "bars": len(rows), "date": target_date}
+            logger.info(f"技术指标状态推进完成: 股票 {len(order)} 只, K线 {len(rows)} 根")
+            return result
+
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"推进技术指标状态至 {target_date} 时发生异常: {e}")
+            return {"total": 0, "success": 0, "failed": 1, "details": [str(e)], "bars": 0, "date": target_date}
+
+    def _save(self, codes: List[str], trade_dates: List[str], state: Dict[str, np.ndarray]):
+        now = datetime.now()
+        params = []
+        for i, code in enumerate(codes):
+            item = {'code': code, 'trade_date': trade_dates[i], 'updated_at': now}
+            for field, column in _STATE_COLUMNS:
+                item[column] = _to_db(state[field][i])
+            item['bar_count'] = int(state['bars'][i])
+            for field, column in _WINDOW_COLUMNS:
+                item[column] = json.dumps([_to_db(v) for v in state[field][i]])
+            params.append(item)
+        columns = ['code', 'trade_date'] + [column for _, column in _STATE_COLUMNS + _WINDOW_COLUMNS] + ['updated_at']
+        self.session.execute(text(f'''
+            INSERT INTO stock_indicator_state ({', '.join(columns)})
+            VALUES ({', '.join(':' + column for column in columns)})
+            ON CONFLICT (code) DO UPDATE SET
+                {', '.join(f"{column} = EXCLUDED.{column}" for column in columns[1:])}
+        '''), params)
+        self.session.commit()
+
+    def rebuild(self, target_date: str, codes: Optional[Sequence[str]] = None) -> Dict[str, any]:
+        """
+        清除状态后重新计算（历史数据被整段回补或修正时使用）
+
+        Args:
+            target_date: 目标日期 (YYYY-MM-DD)，一般为最新交易日
+            codes: 股票代码列表，默认为本市场全部股票
+        """
+        try:
+            self._delete_states(codes)
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"清除技术指标状态失败: {e}")
+            return {"total": 0, "success": 0, "failed": 1, "details": [str(e)], "bars": 0, "date": target_date}
+        return self._advance(target_date, codes)
+
+    def _latest_quotes(self, codes: List[str]) -> Dict[str, Tuple[str, float, float, float]]:
+        """实时行情表中最新交易日的 (交易日, 当前价, 最高价, 最低价)"""
+        try:
+            rows = self._execute(f'''
+                SELECT code, trade_date, current_price, high, low FROM {self.realtime_table}
+                WHERE code IN :codes AND trade_date = (
+                    SELECT MAX(trade_date) FROM {self.realtime_table} WHERE change_percent IS NOT NULL
+                )
+            ''', {}, codes)
+        except Exception as e:
+            self.session.rollback()
+            logger.warning(f"读取实时行情失败: {e}")
+            return {}
+        return {str(row[0]): (str(row[1]), row[2], row[3], row[4]) for row in rows}
+
+    def get_indicators(self, codes: Sequence[str], live: bool = True) -> Dict[str, Dict]:
+        """
+        读取指标值
+
+        Args:
+            codes: 股票代码列表
+            live: 是否把比状态日期更新的实时价格作为临时K线计入（不修改状态表）
+
+        Returns:
+            股票代码 -> {trade_date, bars, provisional, price, macd, rsi, kdj}，无状态的股票不包含在内
+        """
+        codes = [str(code) for code in codes]
+        if not codes:
+            return {}
+        rows = self._execute(f'''
+            SELECT s.code, s.trade_date, {_SELECT_STATE} FROM stock_indicator_state s WHERE s.code IN :codes
+        ''', {}, codes)
+        if not rows:
+            return {}
+
+        found = [str(row[0]) for row in rows]
+        trade_dates = [str(row[1]) for row in rows]
+        state = self._build_state([tuple(row[2:]) for row in rows])
+
+        # 临时K线：收盘价为 NaN 的股票在 advance_state 中保持不变
+        provisional = np.full((3, len(found)), np.nan)
+        if live:
+            quotes = self._latest_quotes(found)
+            for i, code in enumerate(found):
+                quote = quotes.get(code)
+                if quote is None or not quote[1] or quote[1] <= 0 or quote[0] <= trade_dates[i]:
+                    continue
+                price = float(quote[1])
+                provisional[:, i] = (max(float(quote[2] or price), price), min(float(quote[3] or price), price), price)
+        is_provisional = ~np.isnan(provisional[2])
+        if is_provisional.any():
+            state = indicators.advance_state(state, provisional[0], provisional[1], provisional[2])
+
+        values = indicators.state_values(state)
+
+        def number(value: float, digits: int) -> Optional[float]:
+            return None if np.isnan(value) else round(float(value), digits)
+
+        result = {}
+        for i, code in enumerate(found):
+            result[code] = {
+                'code': code,
+                'trade_date': trade_dates[i],
+                'bars': int(state['bars'][i]),
+                'provisional': bool(is_provisional[i]),
+                'price': number(state['close'][i], 4),
+                'macd': {
+                    'macd': number(values['macd'][i], 4),
+                    'signal': number(values['signal'][i], 4),
+                    'histogram': number(values['histogram'][i], 4),
+                },
+                'rsi': number(values['rsi'][i], 2),
+                'kdj': {
+                    'k': number(values['k'][i], 2),
+                    'd': number(values['d'][i], 2),
+                    'j': number(values['j'][i], 2),
+                },
+            }
+        return result
@@ -0,0 +1,310 @@
+"""
+技术指标库（向量化）
+一次计算多只股票的完整指标序列，供智能分析（TechnicalIndicators）、选股策略和选股表达式共用
+
+数据约定:
+- 输入为二维数组（股票 × 交易日，时间升序，最新在最后一列）；一维数组按单只股票处理
+- 长度不同的股票用 align_series 右对齐、左侧补 NaN，各指标从每只股票的第一个有效值开始计算
+- 序列中间不应有缺失值（停牌日不在行情序列中）；窗口内有缺失或不足周期的位置结果为 NaN
+
+计算方式与 TechnicalIndicators 原有的单只股票实现一致:
+- EMA 以第一个价格为初值递推；MACD 的信号线为 MACD 线的 EMA
+- RSI 为最近 period 个涨跌幅的简单平均（非 Wilder 平滑），平均跌幅为0时为100
+- KDJ 的 RSV 为 period 日最高/最低价区间内的位置，K、D 以50为初值按 2/3、1/3 平滑，RSV 无效的交易日保持不变
+- 布林带为 period 日均值 ± std_dev 倍总体标准差
+- ATR 为真实波幅的 Wilder 平滑（前 period 个真实波幅的均值为初值）
+
+滑动窗口均值/标准差与对每个窗口逐一调用 np.mean/np.std 的结果逐位相同；
+递推类指标（EMA、KDJ、ATR）按交易日循环、每步对全部股票做数组运算
+
+增量指标状态（advance_state）:
+- 保存每只股票的 EMA12/EMA26/DEA、RSI 平均涨跌幅（Wilder 平滑）、K/D 值及最近 period 日最高/最低价，
+  新增一根K线时 O(1) 推进，对全部股票一次数组运算
+- MACD、KDJ 与对全部历史调用 macd/kdj 的最后一个值逐位相同；RSI 为 Wilder 平滑（前 period 个涨跌幅的均值为初值），
+  与 rsi() 的简单平均不同
+- advance_state 返回新状态、不修改输入，盘中可将实时价格作为临时K线推进而不影响保存的状态
+"""
+
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def as_matrix(values) -> np.ndarray:
+    """转换为二维 float 数组（一维视为单只股票）"""
+    array = np.asarray(values, dtype=float)
+    if array.ndim == 1:
+        return array.reshape(1, -1)
+    if array.ndim != 2:
+        raise ValueError(f"指标输入应为一维或二维数组，实际为 {array.ndim} 维")
+    return array
+
+
+def align_series(series: Sequence[Sequence[float]]) -> np.ndarray:
+    """多只股票的序列（时间升序）右对齐为二维数组，左侧补 NaN"""
+    width = max((len(values) for values in series), default=0)
+    out = np.full((len(series), width), np.nan)
+    for row, values in enumerate(series):
+        if len(values):
+            out[row, width - len(values):] = values
+    return out
+
+
+def shift(x: np.ndarray, n: int) -> np.ndarray:
+    """序列右移 n 个交易日（取 n 日前的值）"""
+    out = np.full_like(x, np.nan)
+    if n < x.shape[1]:
+        out[:, n:] = x[:, :x.shape[1] - n]
+    return out
+
+
+def rolling_sum(x: np.ndarray, n: int) -> np.ndarray:
+    """n 日求和（累加和相减，O(交易日数)），窗口内有缺失或不足 n 日时为 NaN"""
+    width = x.shape[1]
+    missing = np.isnan(x)
+    zeros = np.zeros((x.shape[0], 1))
+    total = np.concatenate([zeros, np.cumsum(np.where(missing, 0.0, x), axis=1)], axis=1)
+    gaps = np.concatenate([zeros, np.cumsum(missing, axis=1)], axis=1)
+    out = np.full_like(x, np.nan)
+    if n <= width:
+        window_sum = total[:, n:] - total[:, :width + 1 - n]
+        window_gaps = gaps[:, n:] - gaps[:, :width + 1 - n]
+        out[:, n - 1:] = np.where(window_gaps > 0, np.nan, window_sum)
+    return out
+
+
+def rolling_extreme(x: np.ndarray, n: int, func) -> np.ndarray:
+    """n 日最高/最低值（倍增合并，O(log n) 次数组运算），缺失传播为 NaN"""
+    result = x
+    span = 1
+    while span * 2 <= n:
+        result = func(result, shift(result, span))
+        span *= 2
+    if span < n:
+        result = func(result, shift(result, n - span))
+    return result
+
+
+def rolling_max(values, n: int) -> np.ndarray:
+    """n 日最高值"""
+    return rolling_extreme(as_matrix(values), n, np.maximum)
+
+
+def rolling_min(values, n: int) -> np.ndarray:
+    """n 日最低值"""
+    return rolling_extreme(as_matrix(values), n, np.minimum)
+
+
+def _rolling_window(x: np.ndarray, n: int, reduce) -> np.ndarray:
+    out = np.full_like(x, np.nan)
+    if 0 < n <= x.shape[1]:
+        out[:, n - 1:] = reduce(sliding_window_view(x, n, axis=1), axis=-1)
+    return out
+
+
+def rolling_mean(values, n: int) -> np.ndarray:
+    """n 日简单移动平均（与逐窗口 np.mean 结果相同）"""
+    return _rolling_window(as_matrix(values), n, np.mean)
+
+
+def rolling_std(values, n: int) -> np.ndarray:
+    """n 日总体标准差（与逐窗口 np.std 结果相同）"""
+    return _rolling_window(as_matrix(values), n, np.std)
+
+
+def ema(values, period: int) -> np.ndarray:
+    """指数移动平均，以每只股票的第一个有效值为初值"""
+    x = as_matrix(values)
+    alpha = 2 / (period + 1)
+    out = np.empty_like(x)
+    if x.shape[1] == 0:
+        return out
+    prev = x[:, 0].copy()
+    out[:, 0] = prev
+    for i in range(1, x.shape[1]):
+        cur = x[:, i]
+        with np.errstate(invalid='ignore'):
+            prev = np.where(np.isnan(prev), cur, alpha * cur + (1 - alpha) * prev)
+        out[:, i] = prev
+    return out
+
+
+def macd(values, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD，返回 (MACD线, 信号线, 柱)"""
+    x = as_matrix(values)
+    macd_line = ema(x, fast) - ema(x, slow)
+    signal_line = ema(macd_line, signal)
+    return macd_line, signal_line, macd_line - signal_line
+
+
+def rsi(values, period: int = 14) -> np.ndarray:
+    """RSI（最近 period 个涨跌幅的简单平均）"""
+    x = as_matrix(values)
+    deltas = np.full_like(x, np.nan)
+    deltas[:, 1:] = np.diff(x, axis=1)
+    avg_gain = rolling_mean(np.maximum(deltas, 0), period)
+    avg_loss = rolling_mean(np.maximum(-deltas, 0), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        return np.where(avg_loss == 0, 100.0, 100 - (100 / (1 + rs)))
+
+
+def kdj(highs, lows, closes, period: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """KDJ，返回 (K, D, J)；首个有效 RSV 之前为初值50"""
+    closes = as_matrix(closes)
+    highest_high = rolling_max(highs, period)
+    lowest_low = rolling_min(lows, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsv = 100 * (closes - lowest_low) / (highest_high - lowest_low)
+
+    k_out = np.empty_like(closes)
+    d_out = np.empty_like(closes)
+    k = np.full(closes.shape[0], 50.0)
+    d = np.full(closes.shape[0], 50.0)
+    for i in range(closes.shape[1]):
+        value = rsv[:, i]
+        valid = ~np.isnan(value)
+        with np.errstate(invalid='ignore'):
+            k = np.where(valid, (2 / 3) * k + (1 / 3) * value, k)
+            d = np.where(valid, (2 / 3) * d + (1 / 3) * k, d)
+        k_out[:, i] = k
+        d_out[:, i] = d
+    with np.errstate(invalid='ignore'):
+        return k_out, d_out, 3 * k_out - 2 * d_out
+
+
+def bollinger(values, period: int = 20, std_dev: float = 2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """布林带，返回 (上轨, 中轨, 下轨)"""
+    x = as_matrix(values)
+    middle = rolling_mean(x, period)
+    std = rolling_std(x, period)
+    return middle + (std_dev * std), middle, middle - (std_dev * std)
+
+
+def true_range(highs, lows, closes) -> np.ndarray:
+    """真实波幅（首个交易日为当日最高价 - 最低价）"""
+    highs, lows = as_matrix(highs), as_matrix(lows)
+    prev_close = shift(as_matrix(closes), 1)
+    return np.fmax(np.fmax(highs - lows, np.abs(highs - prev_close)), np.abs(lows - prev_close))
+
+
+def atr(highs, lows, closes, period: int = 14) -> np.ndarray:
+    """平均真实波幅（Wilder 平滑），有效交易日不足 period 时为 NaN"""
+    tr = true_range(highs, lows, closes)
+    out = np.full_like(tr, np.nan)
+    count = np.zeros(tr.shape[0], dtype=int)
+    total = np.zeros(tr.shape[0])
+    value = np.full(tr.shape[0], np.nan)
+    for i in range(tr.shape[1]):
+        cur = tr[:, i]
+        valid = ~np.isnan(cur)
+        count += valid
+        with np.errstate(invalid='ignore'):
+            total = np.where(valid & (count <= period), total + cur, total)
+            value = np.where(valid & (count == period), total / period,
+                             np.where(valid & (count > period), (value * (period - 1) + cur) / period, value))
+        out[:, i] = np.where(count >= period, value, np.nan)
+    return out
+
+
+# 增量指标状态的字段（一维：每只股票一个值；二维：最近 kdj_period 日的最高/最低价，最新在最后一列）
+STATE_FIELDS = ('bars', 'close', 'ema_fast', 'ema_slow', 'dea', 'avg_gain', 'avg_loss', 'k', 'd')
+STATE_WINDOW_FIELDS = ('highs', 'lows')
+
+
+def init_state(n: int, kdj_period: int = 9) -> Dict[str, np.ndarray]:
+    """n 只股票的空指标状态（尚未推进任何K线）"""
+    state = {field: np.full(n, np.nan) for field in STATE_FIELDS}
+    state['bars'] = np.zeros(n)
+    state['k'] = np.full(n, 50.0)
+    state['d'] = np.full(n, 50.0)
+    for field in STATE_WINDOW_FIELDS:
+        state[field] = np.full((n, kdj_period), np.nan)
+    return state
+
+
+def advance_state(state: Dict[str, np.ndarray], highs, lows, closes, fast: int = 12, slow: int = 26,
+                  signal: int = 9, rsi_period: int = 14) -> Dict[str, np.ndarray]:
+    """
+    全部股票推进一根K线
+
+    Args:
+        state: init_state / advance_state 返回的状态
+        highs/lows/closes: 每只股票新K线的最高/最低/收盘价（一维），收盘价为 NaN 的股票保持不变
+        fast/slow/signal: MACD 周期
+        rsi_period: RSI 周期（平均涨跌幅在累计 rsi_period 个涨跌幅前保存累加和）
+
+    Returns:
+        新状态
+    """
+    closes = np.asarray(closes, dtype=float)
+    highs = np.asarray(highs, dtype=float)
+    lows = np.asarray(lows, dtype=float)
+    valid = ~np.isnan(closes)
+    first = state['bars'] == 0
+    new = {}
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for field, period in (('ema_fast', fast), ('ema_slow', slow)):
+            alpha = 2 / (period + 1)
+            new[field] = np.where(first, closes, alpha * closes + (1 - alpha) * state[field])
+        macd_line = new['ema_fast'] - new['ema_slow']
+        alpha = 2 / (signal + 1)
+        new['dea'] = np.where(first, macd_line, alpha * macd_line + (1 - alpha) * state['dea'])
+
+        # 第 bars 个涨跌幅：前 rsi_period 个累加后取均值，之后按 Wilder 平滑
+        delta = closes - state['close']
+        deltas = state['bars']
+        for field, move in (('avg_gain', np.maximum(delta, 0)), ('avg_loss', np.maximum(-delta, 0))):
+            total = np.where(deltas == 1, move, state[field] + move)
+            new[field] = np.where(first, np.nan,
+                                  np.where(deltas < rsi_period, total,
+                                           np.where(deltas == rsi_period, total / rsi_period,
+                                                    (state[field] * (rsi_period - 1) + move) / rsi_period)))
+
+        new['highs'] = np.concatenate([state['highs'][:, 1:], highs[:, None]], axis=1)
+        new['lows'] = np.concatenate([state['lows'][:, 1:], lows[:, None]], axis=1)
+        highest_high = new['highs'].max(axis=1)
+        lowest_low = new['lows'].min(axis=1)
+        rsv = 100 * (closes - lowest_low) / (highest_high - lowest_low)
+        has_rsv = ~np.isnan(rsv)
+        new['k'] = np.where(has_rsv, (2 / 3) * state['k'] + (1 / 3) * rsv, state['k'])
+        new['d'] = np.where(has_rsv, (2 / 3) * state['d'] + (1 / 3) * new['k'], state['d'])
+
+    new['close'] = closes
+    new['bars'] = state['bars'] + 1
+
+    result = {}
+    for field, value in new.items():
+        mask = valid[:, None] if value.ndim == 2 else valid
+        result[field] = np.where(mask, value, state[field])
+    return result
+
+
+def state_values(state: Dict[str, np.ndarray], rsi_period: int = 14) -> Dict[str, np.ndarray]:
+    """
+    由状态计算当前指标值
+
+    Returns:
+        macd/signal/histogram、rsi（涨跌幅不足 rsi_period 个时为 NaN）、k/d/j
+    """
+    macd_line = state['ema_fast'] - state['ema_slow']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ready = state['bars'] > rsi_period
+        rsi_value = np.where(state['avg_loss'] == 0, 100.0,
+                             100 - (100 / (1 + state['avg_gain'] / state['avg_loss'])))
+    return {
+        'macd': macd_line,
+        'signal': state['dea'],
+        'histogram': macd_line - state['dea'],
+        'rsi': np.where(ready, rsi_value, np.nan),
+        'k': state['k'],
+        'd': state['d'],
+        'j': 3 * state['k'] - 2 * state['d'],
+    }
+
+
+def select_state(state: Dict[str, np.ndarray], rows) -> Dict[str, np.ndarray]:
+    """按行选取部分股票的状态（rows 为下标或布尔数组）"""
+    return {field: value[rows] for field, value in state.items()}
@@ -0,0 +1,100 @@
+"""
+盘中行情快照查询
+backend_core 的实时行情采集每次把整张行情表追加到 stock_intraday_snapshot
+（见 backend_core/data_collectors/intraday_snapshots.py，PostgreSQL 按交易日分区，主键 (trade_date, ts, code)）。
+
+- 单只股票某个交易日的全部快照：按 (code, trade_date, ts) 索引读取，用于盘中走势
+- 某个时间点的全市场快照：取该交易日不晚于该时间的最近一次采集，按主键 (trade_date, ts, code) 读取，
+  用于全市场涨跌分布
+
+表尚未创建（采集未运行）或查询失败时返回空结果。
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# 返回的行情列
+SNAPSHOT_FIELDS = ('code', 'ts', 'current_price', 'change_percent', 'open', 'high', 'low', 'pre_close',
+                   'volume', 'amount', 'turnover_rate')
+
+# 市场 -> 股票代码条件（A股6位，港股5位）
+MARKET_CONDITIONS = {
+    'A': "LENGTH(code) = 6",
+    'HK': "LENGTH(code) = 5",
+}
+
+
+class IntradaySnapshots:
+    """stock_intraday_snapshot 表查询"""
+
+    @staticmethod
+    def _rows(db: Session, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        try:
+            rows = db.execute(text(sql), params).mappings().all()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"读取盘中快照失败: {str(e)}")
+            return []
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def code_day(db: Session, code: str, trade_date: Optional[str] = None) -> Dict[str, Any]:
+        """
+        单只股票某个交易日的全部快照（按时间升序）
+
+        Args:
+            code: 股票代码
+            trade_date: 交易日 YYYY-MM-DD，默认该股票有快照的最近交易日
+
+        Returns:
+            {"code": 代码, "trade_date": 交易日, "items": [快照]}
+        """
+        if trade_date is None:
+            latest = IntradaySnapshots._rows(
+                db, "SELECT MAX(trade_date) AS trade_date FROM stock_intraday_snapshot WHERE code = :code",
+                {'code': code})
+            trade_date = latest[0]['trade_date'] if latest else None
+            if trade_date is None:
+                return {"code": code, "trade_date": None, "items": []}
+            trade_date = str(trade_date)[:10]
+        items = IntradaySnapshots._rows(db, f"""
+            SELECT {', '.join(SNAPSHOT_FIELDS)} FROM stock_intraday_snapshot
+            WHERE code = :code AND trade_date = :trade_date
+            ORDER BY ts
+        """, {'code': code, 'trade_date': trade_date})
+        return {"code": code, "trade_date": trade_date, "items": items}
+
+    @staticmethod
+    def market_at(db: Session, ts: datetime, market: str = 'A') -> Dict[str, Any]:
+        """
+        某个时间点的全市场快照（该交易日不晚于 ts 的最近一次采集）
+
+        Args:
+            ts: 查询时间
+            market: 'A' 或 'HK'
+
+        Returns:
+            {"trade_date": 交易日, "ts": 实际快照时间, "items": [快照]}，当天 ts 之前没有快照时 ts 为 None
+        """
+        trade_date = ts.strftime('%Y-%m-%d')
+        params = {'trade_date': trade_date, 'ts': ts.strftime('%Y-%m-%d %H:%M:%S')}
+        condition = MARKET_CONDITIONS[market]
+        latest = IntradaySnapshots._rows(db, f"""
+            SELECT MAX(ts) AS ts FROM stock_intraday_snapshot
+            WHERE trade_date = :trade_date AND ts <= :ts AND {condition}
+        """, params)
+        snapshot_ts = latest[0]['ts'] if latest else None
+        if snapshot_ts is None:
+            return {"trade_date": trade_date, "ts": None, "items": []}
+        items = IntradaySnapshots._rows(db, f"""
+            SELECT {', '.join(SNAPSHOT_FIELDS)} FROM stock_intraday_snapshot
+            WHERE trade_date = :trade_date AND ts = :ts AND {condition}
+            ORDER BY code
+        """, {'trade_date': trade_date, 'ts': snapshot_ts})
+        return {"trade_date": trade_date, "ts": snapshot_ts, "items": items}
@@ -0,0 +1,17 @@
+"""
+JSON 序列化工具
+选股结果、智能分析缓存和分析快照写入数据库或返回接口前用 json.dumps 序列化，
+结果中混有 numpy 标量、日期等标准库不能直接序列化的值。
+
+使用方式:
+    json.dumps(result, ensure_ascii=False, default=json_default)
+"""
+
+import numpy as np
+
+
+def json_default(value):
+    """结果中的 numpy 标量转换为 Python 原生类型，其他值转换为字符串"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
@@ -14,6 +14,10 @@ import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from stock.indicators import rolling_mean
+from stock.price_panel import BarSequence, PricePanel, get_price_panel
+from stock.screening_executor import ProgressCallback, get_screening_executor
+
 logger = logging.getLogger(__name__)
 
 
@@ -35,17 +39,8 @@ class KeepIncreasingStrategy:
             return []
         
         closes = [float(data.get('close', 0)) for data in historical_data]
-        ma30_list = []
-        
-        for i in range(len(closes)):
-            if i < 29:
-                ma30_list.append(0.0)  # 前29个数据点无法计算MA30
-            else:
-                # 计算最近30个交易日的平均收盘价
-                ma30 = np.mean(closes[i-29:i+1])
-                ma30_list.append(ma30)
-        
-        return ma30_list
+        # 前29个数据点无法计算MA30，记为0
+        return np.nan_to_num(rolling_mean(closes, 30)[0], nan=0.0).tolist()
     
     @staticmethod
     def check_keep_increasing_conditions(historical_data: List[Dict], threshold: int = 30) -> Tuple[bool, Optional[Dict]]:
@@ -136,7 +131,109 @@ class KeepIncreasingStrategy:
         }
     
     @staticmethod
-    def screening_keep_increasing_strategy(db: Session) -> List[Dict]:
+    def screen_keep_increasing_stocks(panel: PricePanel, stocks: List[Tuple[str, str]],
+                                      start_date_str: str, end_date_str: str) -> List[Dict]:
+        """
+        对一组股票逐只检查持续上涨（MA30向上）策略条件（可由并行执行器在子进程中按块调用）
+        
+        Args:
+            panel: 行情面板
+            stocks: (股票代码, 名称) 列表
+            start_date_str: 数据开始日期（YYYY-MM-DD）
+            end_date_str: 数据结束日期（YYYY-MM-DD）
+        
+        Returns:
+            符合条件的股票列表
+        """
+        results = []
+        
+        for idx, (code, name) in enumerate(stocks):
+            if idx % 100 == 0:
+                logger.info(f"处理进度: {idx}/{len(stocks)}")
+            
+            try:
+                # 从共享行情面板获取该股票的历史数据（倒序，最新在前）
+                historical_data = panel.get_history(code, start_date_str, end_date_str, name=name)
+                
+                if len(historical_data) < 30:  # 至少需要30个交易日的数据
+                    continue
+                
+                # 检查持续上涨策略条件
+                is_valid, strategy_info = KeepIncreasingStrategy.check_keep_increasing_conditions(
+                    historical_data, threshold=30
+                )
+                
+                if not is_valid or not strategy_info:
+                    continue
+                
+                # 获取当前价格信息
+                current_data = historical_data[0] if historical_data else {}
+                current_price = float(current_data.get('close', 0))
+                current_change_percent = current_data.get('change_percent', 0)
+                
+                # 所有条件满足，加入结果列表
+                result_item = {
+                    'code': str(code),
+                    'name': name,
+                    'current_price': round(current_price, 2),
+                    'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0,
+                    'current_ma30': round(strategy_info['current_ma30'], 2),
+                    'ma30_before_30': round(strategy_info['ma30_before_30'], 2),
+                    'ma30_increase_ratio': round(strategy_info['ma30_increase_ratio'], 4)
+                }
+                
+                results.append(result_item)
+                logger.info(f"找到符合条件的股票: {code} {name}")
+                
+            except Exception as e:
+                logger.error(f"处理股票 {code} 时出错: {str(e)}")
+                continue
+        
+        return results
+
+    @staticmethod
+    def replay_signals(panel: PricePanel, stocks: List[Tuple[str, str]], as_of_dates: List[str],
+                       lookback_days: int = 60, threshold: int = 30) -> List[Dict]:
+        """
+        回测用：在全部股票的K线序列上一次计算全部回放日的信号，与逐日执行 screen_keep_increasing_stocks 的结果一致
+
+        与 check_keep_increasing_conditions 相同，MA30 由最近 threshold 根K线计算，
+        倒序第 k 根K线的 MA30 只在 k + 30 <= threshold 时有值，否则记为0。
+
+        Args:
+            panel: 行情面板
+            stocks: (code, name) 列表
+            as_of_dates: 回放日列表（升序）
+            lookback_days: 每个回放日的回看自然日数
+            threshold: 计算 MA30 的最近K线数
+
+        Returns:
+            信号列表 [{'date': 回放日, 'code', 'name'}]，按回放日、股票池顺序排列
+        """
+        bars = BarSequence(panel, stocks, fields=('close',))
+        if len(bars) < 30 or not as_of_dates:
+            return []
+        ma30 = np.nan_to_num(rolling_mean(bars.fields['close'], 30)[0], nan=0.0)
+        entry, length = bars.windows(as_of_dates, lookback_days)
+
+        def ma30_at(offset):
+            return bars.take(ma30, entry - offset) if offset + 30 <= threshold else np.zeros(entry.shape)
+
+        ma30_current = ma30_at(0)
+        ma30_step1 = ma30_at(round(threshold / 3))
+        ma30_step2 = ma30_at(round(threshold * 2 / 3))
+        ma30_before_30 = ma30_at(threshold - 1)
+
+        ok = length >= max(30, threshold)
+        ok &= ~((ma30_current <= 0) | (ma30_step1 <= 0) | (ma30_step2 <= 0) | (ma30_before_30 <= 0))
+        # 均线多头，且当日 MA30 / 30日前 MA30 > 1.2
+        ok &= (ma30_before_30 < ma30_step1) & (ma30_step1 < ma30_step2) & (ma30_step2 < ma30_current)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ok &= ~(np.where(ma30_before_30 > 0, ma30_current / ma30_before_30, 0.0) <= 1.2)
+        return bars.signals(ok, as_of_dates)
+
+    @staticmethod
+    def screening_keep_increasing_strategy(db: Session, progress: Optional[ProgressCallback] = None) -> List[Dict]:
         """
         持续上涨（MA30向上）选股策略主函数
         
@@ -146,6 +243,7 @@ class KeepIncreasingStrategy:
         
         Args:
             db: 数据库会话
+            progress: 进度回调（异步选股任务使用，每完成一个分块调用一次）
         
         Returns:
             符合条件的股票列表
@@ -173,88 +271,15 @@ class KeepIncreasingStrategy:
             
             logger.info(f"查询日期范围: {start_date_str} 至 {end_date_str}")
             
-            # 3. 对每只股票执行选股策略
-            for idx, (code, name) in enumerate(stocks):
-                if idx % 100 == 0:
-                    logger.info(f"处理进度: {idx}/{len(stocks)}")
-                
-                try:
-                    # 获取该股票的历史数据（倒序，最新在前）
-                    history_query = db.execute(text("""
-                        SELECT code, name, date, open, close, high, low, 
-                               change_percent, volume, amount
-                        FROM historical_quotes 
-                        WHERE code = :code 
-                        AND date >= :start_date 
-                        AND date <= :end_date
-                        ORDER BY date DESC
-                    """), {
-                        'code': str(code),
-                        'start_date': start_date_str,
-                        'end_date': end_date_str
-                    })
-                    
-                    history_rows = history_query.fetchall()
-                    
-                    if len(history_rows) < 30:  # 至少需要30个交易日的数据
-                        continue
-                    
-                    # 转换为字典列表
-                    historical_data = []
-                    for row in history_rows:
-                        date_val = row[2]
-                        if hasattr(date_val, 'strftime'):
-                            date_str = date_val.strftime('%Y-%m-%d')
-                        else:
-                            date_str = str(date_val)
-                        
-                        historical_data.append({
-                            'code': row[0],
-                            'name': row[1],
-                            'date': date_str,
-                            'open': float(row[3]) if row[3] else 0.0,
-                            'close': float(row[4]) if row[4] else 0.0,
-                            'high': float(row[5]) if row[5] else 0.0,
-                            'low': float(row[6]) if row[6] else 0.0,
-                            'change_percent': float(row[7]) if row[7] else 0.0,
-                            'volume': float(row[8]) if row[8] else 0.0,
-                            'amount': float(row[9]) if row[9] else 0.0
-                        })
-                    
-                    # 检查持续上涨策略条件
-                    is_valid, strategy_info = KeepIncreasingStrategy.check_keep_increasing_conditions(
-                        historical_data, threshold=30
-                    )
-                    
-                    if not is_valid or not strategy_info:
-                        continue
-                    
-                    # 获取当前价格信息
-                    current_data = historical_data[0] if historical_data else {}
-                    current_price = float(current_data.get('close', 0))
-                    current_change_percent = current_data.get('change_percent', 0)
-                    
-                    # 所有条件满足，加入结果列表
-                    result_item = {
-                        'code': str(code),
-                        'name': name,
-                        'current_price': round(current_price, 2),
-                        'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0,
-                        'current_ma30': round(strategy_info['current_ma30'], 2),
-                        'ma30_before_30': round(strategy_info['ma30_before_30'], 2),
-                        'ma30_increase_ratio': round(strategy_info['ma30_increase_ratio'], 4)
-                    }
-                    
-                    results.append(result_item)
-                    logger.info(f"找到符合条件的股票: {code} {name}")
-                    
-                except Exception as e:
-                    logger.error(f"处理股票 {code} 时出错: {str(e)}")
-                    try:
-                        db.rollback()
-                    except Exception as rollback_error:
-                        logger.warning(f"回滚事务时出错: {str(rollback_error)}")
-                    continue
+            # 从共享行情面板读取历史数据，避免逐只股票查询数据库
+            panel = get_price_panel(db)
+            
+            # 3. 对每只股票执行选股策略（股票较多时分块并行执行）
+            results = get_screening_executor().run(
+                KeepIncreasingStrategy.screen_keep_increasing_stocks,
+                panel, stocks, start_date_str, end_date_str,
+                progress=progress
+            )
             
             logger.info(f"持续上涨（MA30向上）选股策略执行完成，找到 {len(results)} 只符合条件的股票")
             
@@ -18,6 +18,9 @@ import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from stock.price_panel import BarSequence, PricePanel, get_price_panel
+from stock.screening_executor import ProgressCallback, get_screening_executor
+
 logger = logging.getLogger(__name__)
 
 
@@ -230,12 +233,148 @@ class LongLowerShadowStrategy:
             'deviation_from_ma20': deviation_from_ma20
         }
     
+    @staticmethod
+    def screen_long_lower_shadow_stocks(panel: PricePanel, stocks: List[Tuple[str, str]],
+                                        start_date_str: str, end_date_str: str,
+                                        lower_shadow_ratio: float = 1.0,
+                                        upper_shadow_ratio: float = 0.3,
+                                        min_amplitude: float = 0.02,
+                                        recent_days: int = 2) -> List[Dict]:
+        """
+        对一组股票逐只检查长下影线策略条件（可由并行执行器在子进程中按块调用）
+        
+        Args:
+            panel: 行情面板
+            stocks: (股票代码, 名称) 列表
+            start_date_str: 数据开始日期（YYYY-MM-DD）
+            end_date_str: 数据结束日期（YYYY-MM-DD）
+            lower_shadow_ratio: 下影线长度 >= 实体长度的倍数（默认1.0）
+            upper_shadow_ratio: 上影线 <= 实体长度的比例（默认0.3）
+            min_amplitude: 最小振幅要求（默认0.02）
+            recent_days: 检查最近N个交易日（默认2天）
+        
+        Returns:
+            符合条件的股票列表
+        """
+        results = []
+        
+        for idx, (code, name) in enumerate(stocks):
+            if idx % 100 == 0:
+                logger.info(f"处理进度: {idx}/{len(stocks)}")
+            
+            try:
+                # 从共享行情面板获取该股票的历史数据（倒序，最新在前）
+                historical_data = panel.get_history(code, start_date_str, end_date_str, name=name)
+                
+                if len(historical_data) < 20:  # 至少需要20个交易日的数据
+                    continue
+                
+                # 检查长下影线策略条件（传入参数）
+                is_valid, strategy_info = LongLowerShadowStrategy.check_long_lower_shadow_conditions(
+                    historical_data,
+                    downtrend_days=20,
+                    recent_days=recent_days,
+                    lower_shadow_ratio=lower_shadow_ratio,
+                    upper_shadow_ratio=upper_shadow_ratio,
+                    min_amplitude=min_amplitude
+                )
+                
+                if not is_valid or not strategy_info:
+                    continue
+                
+                # 获取当前价格信息
+                current_data = historical_data[0] if historical_data else {}
+                current_price = float(current_data.get('close', 0))
+                current_change_percent = current_data.get('change_percent', 0)
+                
+                # 所有条件满足，加入结果列表
+                result_item = {
+                    'code': str(code),
+                    'name': name,
+                    'current_price': round(current_price, 2),
+                    'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0,
+                    'pattern_date': strategy_info['pattern_date'],
+                    'pattern_close': round(strategy_info['pattern_close'], 2),
+                    'lower_shadow': round(strategy_info['lower_shadow'], 2),
+                    'body_length': round(strategy_info['body_length'], 2),
+                    'shadow_body_ratio': round(strategy_info['shadow_body_ratio'], 2),
+                    'amplitude': round(strategy_info.get('amplitude', 0), 4),
+                    'ma20': round(strategy_info.get('ma20', 0), 2),
+                    'deviation_from_ma20': round(strategy_info.get('deviation_from_ma20', 0), 4)
+                }
+                
+                results.append(result_item)
+                logger.info(f"找到符合条件的股票: {code} {name}")
+                
+            except Exception as e:
+                logger.error(f"处理股票 {code} 时出错: {str(e)}")
+                continue
+        
+        return results
+
+    @staticmethod
+    def replay_signals(panel: PricePanel, stocks: List[Tuple[str, str]], as_of_dates: List[str],
+                       lookback_days: int = 30, lower_shadow_ratio: float = 1.0, upper_shadow_ratio: float = 0.3,
+                       min_amplitude: float = 0.02, recent_days: int = 2, downtrend_days: int = 20) -> List[Dict]:
+        """
+        回测用：在全部股票的K线序列上一次计算全部回放日的信号，与逐日执行 screen_long_lower_shadow_stocks 的结果一致
+
+        Args:
+            panel: 行情面板
+            stocks: (code, name) 列表
+            as_of_dates: 回放日列表（升序）
+            lookback_days: 每个回放日的回看自然日数
+            lower_shadow_ratio: 下影线长度 >= 实体长度的倍数
+            upper_shadow_ratio: 上影线 <= 实体长度的比例
+            min_amplitude: 最小振幅要求
+            recent_days: 检查最近N个交易日
+            downtrend_days: 下跌趋势判断天数
+
+        Returns:
+            信号列表 [{'date': 回放日, 'code', 'name'}]，按回放日、股票池顺序排列
+        """
+        bars = BarSequence(panel, stocks, fields=('open', 'close', 'high', 'low'))
+        if len(bars) == 0 or not as_of_dates:
+            return []
+        opens, closes = bars.fields['open'], bars.fields['close']
+        highs, lows = bars.fields['high'], bars.fields['low']
+        index = np.arange(len(bars))
+
+        # 逐根K线的长下影线形态（与 check_long_lower_shadow 相同）
+        body = np.abs(closes - opens)
+        with np.errstate(invalid='ignore'):
+            pattern = ~((opens <= 0) | (closes <= 0) | (highs <= 0) | (lows <= 0))
+            pattern &= np.minimum(opens, closes) - lows >= body * lower_shadow_ratio
+            pattern &= highs - np.maximum(opens, closes) <= body * upper_shadow_ratio
+        # 振幅 (最高价 - 最低价) / 昨收 达到 min_amplitude（昨收无效时跳过该日）
+        pre_close = bars.take(closes, index - 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pattern &= ~(pre_close <= 0) & ~((highs - lows) / pre_close < min_amplitude)
+
+        entry, length = bars.windows(as_of_dates, lookback_days)
+        ok = length >= downtrend_days
+        # 下跌趋势：当日最低价 < 最近 downtrend_days 根K线收盘价均值（收盘价需全部为正，按相同顺序累加）
+        current_low = bars.take(lows, entry)
+        close_sum = np.zeros(entry.shape)
+        for k in range(downtrend_days):
+            close = bars.take(closes, entry - k)
+            ok &= close > 0
+            close_sum += close
+        ok &= ~(current_low <= 0) & (current_low < close_sum / downtrend_days)
+
+        found = np.zeros(entry.shape, dtype=bool)
+        for k in range(recent_days):
+            found |= (k < length - 1) & bars.take(pattern, entry - k)
+        ok &= found
+        return bars.signals(ok, as_of_dates)
+
     @staticmethod
     def screening_long_lower_shadow_strategy(db: Session,
                                             lower_shadow_ratio: float = 1.0,
                                             upper_shadow_ratio: float = 0.3,
                                             min_amplitude: float = 0.02,
-                                            recent_days: int = 2) -> List[Dict]:
+                                            recent_days: int = 2,
+                                            progress: Optional[ProgressCallback] = None) -> List[Dict]:
         """
         长下影线选股策略主函数(支持阳线和阴线，参数化版本)
         
@@ -252,6 +391,7 @@ class LongLowerShadowStrategy:
             upper_shadow_ratio: 上影线 <= 实体长度的比例（默认0.3）
             min_amplitude: 最小振幅要求（默认0.02）
             recent_days: 检查最近N个交易日（默认2天）
+            progress: 进度回调（异步选股任务使用，每完成一个分块调用一次）
         
         Returns:
             符合条件的股票列表
@@ -285,98 +425,19 @@ class LongLowerShadowStrategy:
             
             logger.info(f"查询日期范围: {start_date_str} 至 {end_date_str}")
             
-            # 3. 对每只股票执行选股策略
-            for idx, (code, name) in enumerate(stocks):
-                if idx % 100 == 0:
-                    logger.info(f"处理进度: {idx}/{len(stocks)}")
-                
-                try:
-                    # 获取该股票的历史数据（倒序，最新在前）
-                    history_query = db.execute(text("""
-                        SELECT code, name, date, open, close, high, low, 
-                               change_percent, volume, amount
-                        FROM historical_quotes 
-                        WHERE code = :code 
-                        AND date >= :start_date 
-                        AND date <= :end_date
-                        ORDER BY date DESC
-                    """), {
-                        'code': str(code),
-                        'start_date': start_date_str,
-                        'end_date': end_date_str
-                    })
-                    
-                    history_rows = history_query.fetchall()
-                    
-                    if len(history_rows) < 20:  # 至少需要20个交易日的数据
-                        continue
-                    
-                    # 转换为字典列表
-                    historical_data = []
-                    for row in history_rows:
-                        date_val = row[2]
-                        if hasattr(date_val, 'strftime'):
-                            date_str = date_val.strftime('%Y-%m-%d')
-                        else:
-                            date_str = str(date_val)
-                        
-                        historical_data.append({
-                            'code': row[0],
-                            'name': row[1],
-                            'date': date_str,
-                            'open': float(row[3]) if row[3] else 0.0,
-                            'close': float(row[4]) if row[4] else 0.0,
-                            'high': float(row[5]) if row[5] else 0.0,
-                            'low': float(row[6]) if row[6] else 0.0,
-                            'change_percent': float(row[7]) if row[7] else 0.0,
-                            'volume': float(row[8]) if row[8] else 0.0,
-                            'amount': float(row[9]) if row[9] else 0.0
-                        })
-                    
-                    # 检查长下影线策略条件（传入参数）
-                    is_valid, strategy_info = LongLowerShadowStrategy.check_long_lower_shadow_conditions(
-                        historical_data,
-                        downtrend_days=20,
-                        recent_days=recent_days,
-                        lower_shadow_ratio=lower_shadow_ratio,
-                        upper_shadow_ratio=upper_shadow_ratio,
-                        min_amplitude=min_amplitude
-                    )
-                    
-                    if not is_valid or not strategy_info:
-                        continue
-                    
-                    # 获取当前价格信息
-                    current_data = historical_data[0] if historical_data else {}
-                    current_price = float(current_data.get('close', 0))
-                    current_change_percent = current_data.get('change_percent', 0)
-                    
-                    # 所有条件满足，加入结果列表
-                    result_item = {
-                        'code': str(code),
-                        'name': name,
-                        'current_price': round(current_price, 2),
-                        'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0,
-                        'pattern_date': strategy_info['pattern_date'],
-                        'pattern_close': round(strategy_info['pattern_close'], 2),
-                        'lower_shadow': round(strategy_info['lower_shadow'], 2),
-                        'body_length': round(strategy_info['body_length'], 2),
-                        'shadow_body_ratio': round(strategy_info['shadow_body_ratio'], 2),
-                        'amplitude': round(strategy_info.get('amplitude', 0), 4),
-                        'ma20': round(strategy_info.get('ma20', 0), 2),
-                        'deviation_from_ma20': round(strategy_info.get('deviation_from_ma20', 0), 4)
-                    }
-                    
-                    results.append(result_item)
-                    logger.info(f"找到符合条件的股票: {code} {name}")
-                    
-                except Exception as e:
-                    logger.error(f"处理股票 {code} 时出错: {str(e)}")
-                    try:
-                        db.rollback()
-                    except Exception as rollback_error:
-                        logger.warning(f"回滚事务时出错: {str(rollback_error)}")
-                    continue
+            # 从共享行情面板读取历史数据，避免逐只股票查询数据库
+            panel = get_price_panel(db)
+            
+            # 3. 对每只股票执行选股策略（股票较多时分块并行执行）
+            results = get_screening_executor().run(
+                LongLowerShadowStrategy.screen_long_lower_shadow_stocks,
+                panel, stocks, start_date_str, end_date_str,
+                progress=progress,
+                lower_shadow_ratio=lower_shadow_ratio,
+                upper_shadow_ratio=upper_shadow_ratio,
+                min_amplitude=min_amplitude,
+                recent_days=recent_days
+            )
             
             logger.info(f"长下影线选股策略执行完成,找到 {len(results)} 只符合条件的股票")
             
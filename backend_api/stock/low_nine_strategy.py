@@ -18,11 +18,17 @@ import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from stock.price_panel import PricePanel, get_price_panel
+from stock.screening_executor import ProgressCallback, get_screening_executor
+
 logger = logging.getLogger(__name__)
 
 
 class LowNineStrategy:
     """低九策略选股类"""
+
+    # 策略依赖的最近交易日数（9天 + 4天前置数据，增量选股据此判断数据是否变化）
+    WINDOW_BARS = 13
     
     @staticmethod
     def check_low_nine_pattern(historical_data: List[Dict]) -> Tuple[bool, Optional[Dict]]:
@@ -100,7 +106,136 @@ class LowNineStrategy:
         }
     
     @staticmethod
-    def screening_low_nine_strategy(db: Session, limit: int = None) -> List[Dict]:
+    def screen_low_nine_stocks(panel: PricePanel, stocks: List[Tuple[str, str]],
+                               start_date_str: str, end_date_str: str) -> List[Dict]:
+        """
+        对一组股票逐只检查低九策略条件（可由并行执行器在子进程中按块调用）
+        
+        Args:
+            panel: 行情面板
+            stocks: (股票代码, 名称) 列表
+            start_date_str: 数据开始日期（YYYY-MM-DD）
+            end_date_str: 数据结束日期（YYYY-MM-DD）
+        
+        Returns:
+            符合条件的股票列表
+        """
+        results = []
+        
+        error_count = 0
+        
+        for idx, (code, name) in enumerate(stocks):
+            # 每处理100只股票输出一次进度
+            if idx % 100 == 0:
+                progress = (idx / len(stocks)) * 100
+                logger.info(f"处理进度: {idx}/{len(stocks)} ({progress:.1f}%) - "
+                          f"找到: {len(results)} 只, 错误: {error_count} 只")
+            
+            try:
+                # 从共享行情面板获取该股票的历史数据（倒序，最新在前）
+                historical_data = panel.get_history(code, start_date_str, end_date_str, name=name)
+                
+                if len(historical_data) < 13:  # 至少需要13个交易日的数据
+                    continue
+                
+                # 检查低九策略条件
+                is_valid, strategy_info = LowNineStrategy.check_low_nine_pattern(historical_data)
+                
+                if not is_valid or not strategy_info:
+                    continue
+                
+                # 获取当前价格信息
+                current_data = historical_data[0] if historical_data else {}
+                current_price = float(current_data.get('close', 0))
+                current_change_percent = current_data.get('change_percent', 0)
+                
+                # 所有条件满足，加入结果列表
+                result_item = {
+                    'code': str(code),
+                    'name': name,
+                    'current_price': round(current_price, 2),
+                    'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0,
+                    'pattern_start_date': strategy_info['pattern_start_date'],
+                    'pattern_end_date': strategy_info['pattern_end_date'],
+                    'pattern_start_price': round(strategy_info['pattern_start_price'], 2),
+                    'decline_ratio': round(strategy_info['decline_ratio'], 4),
+                    'max_price_in_9days': round(strategy_info['max_price_in_9days'], 2),
+                    'min_price_in_9days': round(strategy_info['min_price_in_9days'], 2)
+                }
+                
+                results.append(result_item)
+                logger.info(f"✓ 找到符合条件的股票: {code} {name} (跌幅: {strategy_info['decline_ratio']*100:.2f}%)")
+                
+            except Exception as e:
+                error_count += 1
+                logger.error(f"✗ 处理股票 {code} 时出错: {str(e)}")
+                continue
+        
+        if error_count:
+            logger.warning(f"处理错误: {error_count} 只")
+        
+        return results
+    
+    @staticmethod
+    def replay_signals(panel: PricePanel, stocks: List[Tuple[str, str]], as_of_dates: List[str],
+                       lookback_days: int = 30) -> List[Dict]:
+        """
+        回测用：在 (股票 × 交易日) 矩阵上一次计算全部回放日的低九信号，与逐日执行 screen_low_nine_stocks 的结果一致
+
+        回放日 D 的输入为 [D - lookback_days, D] 内的K线：D 及之前最后一根K线往前共13根K线都在区间内，
+        且最后9根K线的收盘价都低于各自前面第4根K线的收盘价。
+
+        Args:
+            panel: 行情面板
+            stocks: (code, name) 列表
+            as_of_dates: 回放日列表（升序，均为面板中的交易日）
+            lookback_days: 每个回放日的回看自然日数
+
+        Returns:
+            信号列表 [{'date': 回放日, 'code', 'name'}]，按回放日、股票池顺序排列
+        """
+        found = [(str(code), name, panel.code_index(code)) for code, name in stocks]
+        found = [item for item in found if item[2] is not None]
+        if not found or not as_of_dates:
+            return []
+        rows = np.array([row for _, _, row in found], dtype=np.int64)
+        mask = panel.mask[rows]
+        # 每只股票的有效K线压缩为连续序列（行内按日期升序）
+        flat = panel.fields['close'][rows][mask]
+        if len(flat) == 0:
+            return []
+        bar_rows, bar_cols = np.nonzero(mask)
+        offsets = np.concatenate([[0], np.cumsum(mask.sum(axis=1))])
+        index = np.arange(len(flat))
+        pos = index - offsets[bar_rows]
+
+        # 与逐只版本的比较方式一致（收盘价无效或不低于前面第4根时中断）
+        before = flat[np.maximum(index - 4, 0)]
+        with np.errstate(invalid='ignore'):
+            down = (pos >= 4) & ~((flat <= 0) | (before <= 0) | (flat >= before))
+        # 截至每根K线的连续满足天数（每只股票前4根K线不满足，行间自然断开）
+        last_break = np.maximum.accumulate(np.where(down, -1, index))
+        streak = index - last_break
+
+        cols = np.searchsorted(panel.dates, as_of_dates)
+        window_cols = np.searchsorted(panel.dates, [
+            (datetime.strptime(as_of, '%Y-%m-%d') - timedelta(days=lookback_days)).strftime('%Y-%m-%d')
+            for as_of in as_of_dates
+        ])
+        rank = (np.cumsum(mask, axis=1) - 1)[:, cols]
+        # 回放日 D 及之前最后一根K线，往前第12根K线也需在回看区间内
+        ok = rank >= LowNineStrategy.WINDOW_BARS - 1
+        entry = np.where(ok, offsets[:-1, None] + rank, 0)
+        first = np.where(ok, entry - (LowNineStrategy.WINDOW_BARS - 1), 0)
+        ok &= bar_cols[first] >= window_cols[None, :]
+        ok &= streak[entry] >= 9
+
+        signal_cols, signal_rows = np.nonzero(ok.T)
+        return [{'date': as_of_dates[col], 'code': found[row][0], 'name': found[row][1]}
+                for col, row in zip(signal_cols.tolist(), signal_rows.tolist())]
+
+    @staticmethod
+    def screening_low_nine_strategy(db: Session, limit: int = None, progress: Optional[ProgressCallback] = None) -> List[Dict]:
         """
         低九策略选股主函数
         
@@ -110,6 +245,7 @@ class LowNineStrategy:
         Args:
             db: 数据库会话
             limit: 限制处理的股票数量（用于测试，None表示处理所有）
+            progress: 进度回调（异步选股任务使用，每完成一个分块调用一次）
         
         Returns:
             符合条件的股票列表
@@ -148,106 +284,24 @@ class LowNineStrategy:
             end_date_str = end_date.strftime('%Y-%m-%d')
             
             logger.info(f"查询日期范围: {start_date_str} 至 {end_date_str}")
-            logger.info("-" * 60)
             
-            # 3. 对每只股票执行选股策略
-            processed_count = 0
-            error_count = 0
+            # 从共享行情面板读取历史数据，避免逐只股票查询数据库
+            panel = get_price_panel(db)
             
-            for idx, (code, name) in enumerate(stocks):
-                # 每处理100只股票输出一次进度
-                if idx % 100 == 0:
-                    progress = (idx / len(stocks)) * 100
-                    logger.info(f"处理进度: {idx}/{len(stocks)} ({progress:.1f}%) - "
-                              f"找到: {len(results)} 只, 错误: {error_count} 只")
-                
-                try:
-                    # 获取该股票的历史数据（倒序，最新在前）
-                    history_query = db.execute(text("""
-                        SELECT code, name, date, open, close, high, low, 
-                               change_percent, volume, amount
-                        FROM historical_quotes 
-                        WHERE code = :code 
-                        AND date >= :start_date 
-                        AND date <= :end_date
-                        ORDER BY date DESC
-                    """), {
-                        'code': str(code),
-                        'start_date': start_date_str,
-                        'end_date': end_date_str
-                    })
-                    
-                    history_rows = history_query.fetchall()
-                    
-                    if len(history_rows) < 13:  # 至少需要13个交易日的数据
-                        continue
-                    
-                    # 转换为字典列表
-                    historical_data = []
-                    for row in history_rows:
-                        date_val = row[2]
-                        if hasattr(date_val, 'strftime'):
-                            date_str = date_val.strftime('%Y-%m-%d')
-                        else:
-                            date_str = str(date_val)
-                        
-                        historical_data.append({
-                            'code': row[0],
-                            'name': row[1],
-                            'date': date_str,
-                            'open': float(row[3]) if row[3] else 0.0,
-                            'close': float(row[4]) if row[4] else 0.0,
-                            'high': float(row[5]) if row[5] else 0.0,
-                            'low': float(row[6]) if row[6] else 0.0,
-                            'change_percent': float(row[7]) if row[7] else 0.0,
-                            'volume': float(row[8]) if row[8] else 0.0,
-                            'amount': float(row[9]) if row[9] else 0.0
-                        })
-                    
-                    # 检查低九策略条件
-                    is_valid, strategy_info = LowNineStrategy.check_low_nine_pattern(historical_data)
-                    
-                    if not is_valid or not strategy_info:
-                        continue
-                    
-                    # 获取当前价格信息
-                    current_data = historical_data[0] if historical_data else {}
-                    current_price = float(current_data.get('close', 0))
-                    current_change_percent = current_data.get('change_percent', 0)
-                    
-                    # 所有条件满足，加入结果列表
-                    result_item = {
-                        'code': str(code),
-                        'name': name,
-                        'current_price': round(current_price, 2),
-                        'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0,
-                        'pattern_start_date': strategy_info['pattern_start_date'],
-                        'pattern_end_date': strategy_info['pattern_end_date'],
-                        'pattern_start_price': round(strategy_info['pattern_start_price'], 2),
-                        'decline_ratio': round(strategy_info['decline_ratio'], 4),
-                        'max_price_in_9days': round(strategy_info['max_price_in_9days'], 2),
-                        'min_price_in_9days': round(strategy_info['min_price_in_9days'], 2)
-                    }
-                    
-                    results.append(result_item)
-                    logger.info(f"✓ 找到符合条件的股票: {code} {name} (跌幅: {strategy_info['decline_ratio']*100:.2f}%)")
-                    
-                    processed_count += 1
-                    
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"✗ 处理股票 {code} 时出错: {str(e)}")
-                    try:
-                        db.rollback()
-                    except Exception as rollback_error:
-                        logger.warning(f"回滚事务时出错: {str(rollback_error)}")
-                    continue
+            logger.info("-" * 60)
+            
+            # 3. 对每只股票执行选股策略（股票较多时分块并行执行）
+            results = get_screening_executor().run(
+                LowNineStrategy.screen_low_nine_stocks,
+                panel, stocks, start_date_str, end_date_str,
+                progress=progress,
+                window_bars=LowNineStrategy.WINDOW_BARS
+            )
             
             logger.info("=" * 60)
             logger.info(f"低九策略选股执行完成!")
-            logger.info(f"处理股票数: {processed_count}/{len(stocks)}")
+            logger.info(f"处理股票数: {len(stocks)}")
             logger.info(f"找到符合条件: {len(results)} 只")
-            logger.info(f"处理错误: {error_count} 只")
             logger.info("=" * 60)
             
         except Exception as e:
@@ -256,3 +310,41 @@ class LowNineStrategy:
             logger.error(traceback.format_exc())
         
         return results
+
+    @staticmethod
+    def query_setup_count_stocks(db: Session, count: int) -> List[Dict]:
+        """
+        按九转序列计数查询股票（读取采集任务每日推进的 td_setup_counts 表）
+
+        计数规则与 check_low_nine_pattern 一致：收盘价低于4个交易日前的收盘价则计数+1，否则清零；
+        count=9 返回计数 >= 9 的股票（即满足低九），1~8 返回计数恰好为 count 的股票（低九预警）。
+
+        Args:
+            db: 数据库会话
+            count: 计数（1-9）
+
+        Returns:
+            股票列表（只包含最新交易日有数据的股票，排除ST股票）
+        """
+        count_condition = "t.setup_count >= :count" if count >= 9 else "t.setup_count = :count"
+        rows = db.execute(text(f"""
+            SELECT t.code, b.name, t.trade_date, t.setup_count, t.close0
+            FROM td_setup_counts t
+            JOIN stock_basic_info b ON b.code = t.code
+            WHERE t.trade_date = (SELECT MAX(trade_date) FROM td_setup_counts)
+            AND {count_condition}
+            AND LENGTH(t.code) = 6
+            AND b.name NOT LIKE '%ST%'
+            ORDER BY t.setup_count DESC, t.code
+        """), {'count': count}).fetchall()
+
+        return [
+            {
+                'code': str(row[0]),
+                'name': row[1],
+                'trade_date': row[2],
+                'setup_count': int(row[3]),
+                'current_price': round(float(row[4]), 2) if row[4] is not None else None
+            }
+            for row in rows
+        ]
@@ -0,0 +1,623 @@
+"""
+选股行情面板
+将 historical_quotes 一次性批量加载为 (股票 × 交易日) 的 NumPy 列式数组，供所有选股策略共享
+
+设计要点:
+1. 进程级缓存：每个市场只保留一份面板，所有请求共享同一份只读数据
+2. 批量加载：首次使用时一条SQL读取整个回看窗口，替代逐只股票查询
+3. 增量刷新：定期按交易日核对最近 recheck_dates 个交易日的行数和收盘价、成交量合计，
+   出现新交易日、采集过程中晚写入的股票或原地修正的记录时，只重新读取第一个不一致的交易日及之后的数据；
+   更早日期的回补和修正由定期全量重新加载（full_reload_interval）覆盖
+4. 只读视图：所有数组均设置为不可写，刷新时整体替换面板对象（写时复制），读者拿到的始终是一致快照
+"""
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+
+from config import SCREENING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 面板中保存的数值字段
+PANEL_FIELDS = ('open', 'close', 'high', 'low', 'change_percent', 'volume', 'amount', 'turnover_rate')
+
+# 各市场对应的历史行情表
+MARKET_TABLES = {
+    'A': 'historical_quotes',
+    'HK': 'historical_quotes_hk',
+}
+
+
+def _normalize_date(date_val) -> str:
+    """将数据库返回的日期统一转换为 YYYY-MM-DD 字符串"""
+    if hasattr(date_val, 'strftime'):
+        return date_val.strftime('%Y-%m-%d')
+    return str(date_val)
+
+
+class PricePanel:
+    """
+    列式行情面板（只读）
+
+    - codes: 股票代码数组（升序）
+    - dates: 交易日数组（升序，YYYY-MM-DD 字符串）
+    - fields: 字段名 -> (len(codes), len(dates)) 的 float64 数组，缺失或NULL记为0.0
+    - mask: (len(codes), len(dates)) 的布尔数组，表示该股票在该交易日是否有行情记录
+    """
+
+    def __init__(self, codes: np.ndarray, names: np.ndarray, dates: np.ndarray,
+                 fields: Dict[str, np.ndarray], mask: np.ndarray):
+        self.codes = codes
+        self.names = names
+        self.dates = dates
+        self.fields = fields
+        self.mask = mask
+        self._code_index = {code: i for i, code in enumerate(codes.tolist())}
+
+        for arr in [self.codes, self.names, self.dates, self.mask, *self.fields.values()]:
+            arr.flags.writeable = False
+
+    @classmethod
+    def empty(cls) -> 'PricePanel':
+        """创建空面板"""
+        return cls(
+            codes=np.array([], dtype=object),
+            names=np.array([], dtype=object),
+            dates=np.array([], dtype=object),
+            fields={f: np.zeros((0, 0), dtype=np.float64) for f in PANEL_FIELDS},
+            mask=np.zeros((0, 0), dtype=bool),
+        )
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence]) -> 'PricePanel':
+        """
+        从查询结果行构建面板
+
+        Args:
+            rows: 每行依次为 code, name, date, 以及 PANEL_FIELDS 中的各字段
+
+        Returns:
+            PricePanel
+        """
+        if not rows:
+            return cls.empty()
+
+        df = pd.DataFrame(list(rows), columns=['code', 'name', 'date', *PANEL_FIELDS])
+        df['code'] = df['code'].astype(str)
+        df['date'] = df['date'].map(_normalize_date)
+
+        codes = np.array(sorted(df['code'].unique()), dtype=object)
+        dates = np.array(sorted(df['date'].unique()), dtype=object)
+        code_idx = np.searchsorted(codes, df['code'].to_numpy(dtype=object))
+        date_idx = np.searchsorted(dates, df['date'].to_numpy(dtype=object))
+
+        shape = (len(codes), len(dates))
+        fields = {}
+        for field in PANEL_FIELDS:
+            arr = np.zeros(shape, dtype=np.float64)
+            # 与逐行转换保持一致：NULL 记为 0.0
+            values = pd.to_numeric(df[field], errors='coerce').fillna(0.0).to_numpy(dtype=np.float64)
+            arr[code_idx, date_idx] = values
+            fields[field] = arr
+
+        mask = np.zeros(shape, dtype=bool)
+        mask[code_idx, date_idx] = True
+
+        # 名称取每只股票最新一条记录
+        latest = df.sort_values('date').drop_duplicates('code', keep='last').set_index('code')['name']
+        names = np.array([latest.get(code) for code in codes], dtype=object)
+
+        return cls(codes, names, dates, fields, mask)
+
+    @property
+    def last_date(self) -> Optional[str]:
+        """面板中最新的交易日"""
+        return self.dates[-1] if len(self.dates) else None
+
+    @property
+    def first_date(self) -> Optional[str]:
+        """面板中最早的交易日"""
+        return self.dates[0] if len(self.dates) else None
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def code_index(self, code: str) -> Optional[int]:
+        """返回股票代码所在行号，不存在时返回None"""
+        return self._code_index.get(str(code))
+
+    def date_slice(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> slice:
+        """返回 [start_date, end_date] 对应的列切片（闭区间）"""
+        start = 0 if start_date is None else int(np.searchsorted(self.dates, start_date, side='left'))
+        end = len(self.dates) if end_date is None else int(np.searchsorted(self.dates, end_date, side='right'))
+        return slice(start, end)
+
+    def merge(self, other: 'PricePanel', min_date: Optional[str] = None) -> 'PricePanel':
+        """
+        合并增量数据，返回新的面板（原面板不变）
+
+        Args:
+            other: 增量面板，重叠的 (股票, 交易日) 以增量数据为准
+            min_date: 丢弃早于该日期的交易日，用于维持固定的回看窗口
+
+        Returns:
+            PricePanel
+        """
+        codes = np.array(sorted(set(self.codes.tolist()) | set(other.codes.tolist())), dtype=object)
+        dates = np.array(sorted(set(self.dates.tolist()) | set(other.dates.tolist())), dtype=object)
+        if min_date is not None:
+            dates = dates[dates >= min_date] if len(dates) else dates
+
+        shape = (len(codes), len(dates))
+        fields = {f: np.zeros(shape, dtype=np.float64) for f in PANEL_FIELDS}
+        mask = np.zeros(shape, dtype=bool)
+        names = np.empty(len(codes), dtype=object)
+
+        for source in (self, other):
+            if len(source.codes) == 0 or len(source.dates) == 0:
+                continue
+            rows = np.searchsorted(codes, source.codes)
+            names[rows] = source.names
+            # 只复制仍在窗口内的交易日
+            keep = np.isin(source.dates, dates)
+            if not keep.any():
+                continue
+            cols = np.searchsorted(dates, source.dates[keep])
+            grid = np.ix_(rows, cols)
+            src_mask = source.mask[:, keep]
+            for f in PANEL_FIELDS:
+                target = fields[f][grid]
+                fields[f][grid] = np.where(src_mask, source.fields[f][:, keep], target)
+            mask[grid] |= src_mask
+
+        return PricePanel(codes, names, dates, fields, mask)
+
+    def subset(self, codes: Sequence[str], start_date: Optional[str] = None,
+               end_date: Optional[str] = None) -> 'PricePanel':
+        """
+        截取部分股票和日期区间，返回新的（较小的）面板，用于分块并行计算时传给子进程
+
+        Args:
+            codes: 股票代码列表，面板中不存在的代码会被忽略
+            start_date: 开始日期（YYYY-MM-DD，含）
+            end_date: 结束日期（YYYY-MM-DD，含）
+
+        Returns:
+            PricePanel
+        """
+        rows = sorted({row for row in (self.code_index(code) for code in codes) if row is not None})
+        rows = np.array(rows, dtype=np.int64)
+        cols = self.date_slice(start_date, end_date)
+        return PricePanel(
+            codes=self.codes[rows].copy(),
+            names=self.names[rows].copy(),
+            dates=self.dates[cols].copy(),
+            fields={f: self.fields[f][rows, cols].copy() for f in PANEL_FIELDS},
+            mask=self.mask[rows, cols].copy(),
+        )
+
+    def window(self, codes: Sequence[str], start_date: Optional[str] = None,
+               end_date: Optional[str] = None, fields: Optional[Sequence[str]] = None) -> 'PanelWindow':
+        """
+        截取一组股票在日期区间内的数据，供向量化策略使用
+
+        每只股票的有效交易日被压缩并右对齐（最新交易日位于最后一列），
+        因此列下标与逐只查询得到的行序号一一对应，停牌缺失的交易日不会在序列中留下空洞。
+
+        Args:
+            codes: 股票代码列表，面板中不存在的代码会被忽略
+            start_date: 开始日期（YYYY-MM-DD，含）
+            end_date: 结束日期（YYYY-MM-DD，含）
+            fields: 需要的字段（默认 PANEL_FIELDS 全部字段），只截取用到的字段可减少大窗口的复制开销
+
+        Returns:
+            PanelWindow
+        """
+        found = [(str(code), self.code_index(code)) for code in codes]
+        found = [(code, row) for code, row in found if row is not None]
+        rows = np.array([row for _, row in found], dtype=np.int64)
+        cols = self.date_slice(start_date, end_date)
+
+        sub_mask = self.mask[rows, cols] if len(rows) else np.zeros((0, cols.stop - cols.start), dtype=bool)
+        # 稳定排序将无数据的列移到左侧，有效交易日保持时间顺序右对齐
+        order = np.argsort(sub_mask, axis=1, kind='stable')
+        valid = np.take_along_axis(sub_mask, order, axis=1)
+        fields = {
+            f: np.take_along_axis(self.fields[f][rows, cols], order, axis=1) if len(rows) else
+            np.zeros(sub_mask.shape, dtype=np.float64)
+            for f in (PANEL_FIELDS if fields is None else fields)
+        }
+
+        return PanelWindow(
+            codes=[code for code, _ in found],
+            names=[self.names[row] for _, row in found],
+            fields=fields,
+            valid=valid,
+            date_index=order + cols.start,
+            dates=self.dates,
+        )
+
+    def get_history(self, code: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                    name: Optional[str] = None) -> List[Dict]:
+        """
+        获取单只股票的历史数据，格式与策略中逐只查询 historical_quotes 得到的字典列表一致
+
+        Args:
+            code: 股票代码
+            start_date: 开始日期（YYYY-MM-DD，含）
+            end_date: 结束日期（YYYY-MM-DD，含）
+            name: 股票名称（为空时使用面板中的名称）
+
+        Returns:
+            历史数据列表（倒序，最新在前）
+        """
+        row = self.code_index(code)
+        if row is None:
+            return []
+
+        cols = self.date_slice(start_date, end_date)
+        present = np.nonzero(self.mask[row, cols])[0] + (cols.start or 0)
+        if len(present) == 0:
+            return []
+
+        present = present[::-1]
+        stock_name = name if name is not None else self.names[row]
+        columns = {f: self.fields[f][row, present].tolist() for f in PANEL_FIELDS}
+        dates = self.dates[present].tolist()
+
+        return [
+            {
+                'code': str(code),
+                'name': stock_name,
+                'date': dates[i],
+                'open': columns['open'][i],
+                'close': columns['close'][i],
+                'high': columns['high'][i],
+                'low': columns['low'][i],
+                'change_percent': columns['change_percent'][i],
+                'volume': columns['volume'][i],
+                'amount': columns['amount'][i],
+                'turnover_rate': columns['turnover_rate'][i],
+            }
+            for i in range(len(present))
+        ]
+
+
+class PanelWindow:
+    """
+    向量化策略的输入窗口
+
+    - fields: 字段名 -> (股票数, 窗口列数) 数组，每行右对齐，最后一列为最新交易日
+    - valid: 有效数据掩码，左侧填充部分为False
+    - lengths: 每只股票的有效交易日数量
+    - date_index: 每个位置对应的面板日期下标
+    """
+
+    def __init__(self, codes: List[str], names: List[str], fields: Dict[str, np.ndarray],
+                 valid: np.ndarray, date_index: np.ndarray, dates: np.ndarray):
+        self.codes = codes
+        self.names = names
+        self.fields = fields
+        self.valid = valid
+        self.date_index = date_index
+        self.dates = dates
+        self.lengths = valid.sum(axis=1)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def width(self) -> int:
+        return self.valid.shape[1]
+
+    def date(self, row: int, col: int) -> str:
+        """返回窗口中某个位置对应的交易日"""
+        return self.dates[self.date_index[row, col]]
+
+
+class HistoryCache:
+    """
+    逐只股票的历史数据缓存（提供与 PricePanel.get_history 相同的接口）
+
+    每只股票首次访问时从面板构建完整的字典列表，之后按日期区间二分切片返回，
+    用于同一只股票按不同日期区间多次读取的场景（策略回测逐日回放、组合选股的多个策略）。
+    返回的是浅拷贝，策略在字典上写入的中间结果（如 ma250）不会影响其他调用。
+    """
+
+    def __init__(self, panel: PricePanel):
+        self.panel = panel
+        self._records: Dict[Tuple[str, Optional[str]], Tuple[List[Dict], List[str]]] = {}
+
+    def get_history(self, code: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                    name: Optional[str] = None) -> List[Dict]:
+        key = (str(code), name)
+        entry = self._records.get(key)
+        if entry is None:
+            # 面板返回倒序数据，缓存为正序便于按日期二分
+            records = self.panel.get_history(code, name=name)[::-1]
+            entry = (records, [item['date'] for item in records])
+            self._records[key] = entry
+        records, dates = entry
+        lo = bisect_left(dates, start_date) if start_date else 0
+        hi = bisect_right(dates, end_date) if end_date else len(dates)
+        return [dict(item) for item in reversed(records[lo:hi])]
+
+
+class BarSequence:
+    """
+    回测向量化信号的输入：一组股票的有效K线按行压缩为连续序列（行内按日期升序）
+
+    逐只检查函数中倒序历史数据的第 i 根K线，对应序列位置 entry - i（entry 为回放日窗口的最后一根K线），
+    各策略在整个序列上一次计算逐根K线的条件，再按全部回放日的 entry 取值。
+
+    - codes/names: 面板中存在的股票（保持股票池顺序）
+    - fields: 字段名 -> 一维数组（全部股票的有效K线首尾相接）
+    """
+
+    def __init__(self, panel: PricePanel, stocks: Sequence[Tuple[str, str]], fields: Sequence[str] = PANEL_FIELDS):
+        found = [(str(code), name, panel.code_index(code)) for code, name in stocks]
+        found = [item for item in found if item[2] is not None]
+        self.codes = [code for code, _, _ in found]
+        self.names = [name for _, name, _ in found]
+        self.dates = panel.dates
+        rows = np.array([row for _, _, row in found], dtype=np.int64)
+        self.mask = panel.mask[rows] if len(rows) else np.zeros((0, len(panel.dates)), dtype=bool)
+        self.fields = {field: panel.fields[field][rows][self.mask] for field in fields}
+        self.offsets = np.concatenate([[0], np.cumsum(self.mask.sum(axis=1))]).astype(np.int64)
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def take(self, values: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """按序列位置取值（越界位置截断到序列两端，调用方需用窗口长度排除）"""
+        return values[np.clip(positions, 0, len(self) - 1)]
+
+    def windows(self, as_of_dates: Sequence[str], lookback_days: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        每只股票在各回放日 D 的输入窗口 [D - lookback_days, D]（与逐日回放 get_history 的日期区间一致）
+
+        Returns:
+            (entry, length)，形状均为 (股票数, 回放日数)：窗口最后一根K线的序列位置、窗口内K线数量（为0时 entry 无意义）
+        """
+        before = np.concatenate([np.zeros((len(self.mask), 1), dtype=np.int64),
+                                 np.cumsum(self.mask, axis=1)], axis=1)
+        end_cols = np.searchsorted(self.dates, as_of_dates, side='right')
+        start_cols = np.searchsorted(self.dates, [
+            (datetime.strptime(as_of, '%Y-%m-%d') - timedelta(days=lookback_days)).strftime('%Y-%m-%d')
+            for as_of in as_of_dates
+        ], side='left')
+        upto = before[:, end_cols]
+        length = upto - before[:, start_cols]
+        entry = self.offsets[:-1, None] + upto - 1
+        return entry, length
+
+    def signals(self, ok: np.ndarray, as_of_dates: Sequence[str]) -> List[Dict]:
+        """(股票数, 回放日数) 的信号矩阵转换为信号列表，按回放日、股票池顺序排列"""
+        signal_cols, signal_rows = np.nonzero(ok.T)
+        return [{'date': as_of_dates[col], 'code': self.codes[row], 'name': self.names[row]}
+                for col, row in zip(signal_cols.tolist(), signal_rows.tolist())]
+
+
+class PricePanelStore:
+    """进程级行情面板缓存，负责批量加载与增量刷新"""
+
+    def __init__(self, table: str, lookback_days: int, refresh_interval: float, recheck_dates: int = 20,
+                 full_reload_interval: Optional[float] = None):
+        self.table = table
+        self.lookback_days = lookback_days
+        self.refresh_interval = refresh_interval
+        self.recheck_dates = max(1, recheck_dates)
+        self.full_reload_interval = full_reload_interval
+        self._panel: Optional[PricePanel] = None
+        self._loaded_at = 0.0
+        self._last_check = 0.0
+        self._latest: Optional[str] = None
+        self._latest_check = 0.0
+        self._lock = threading.Lock()
+
+    def _window_start(self) -> str:
+        return (datetime.now().date() - timedelta(days=self.lookback_days)).strftime('%Y-%m-%d')
+
+    def _load(self, db: Session, start_date: str, end_date: Optional[str] = None) -> PricePanel:
+        fields_sql = ', '.join(PANEL_FIELDS)
+        end_filter = "AND date <= :end_date" if end_date else ""
+        params = {'start_date': start_date}
+        if end_date:
+            params['end_date'] = end_date
+        rows = db.execute(text(f"""
+            SELECT code, name, date, {fields_sql}
+            FROM {self.table}
+            WHERE date >= :start_date {end_filter}
+        """), params).fetchall()
+        return PricePanel.from_rows(rows)
+
+    def load_range(self, db: Session, start_date: str, end_date: Optional[str] = None) -> PricePanel:
+        """
+        加载指定日期区间的独立面板（不进入缓存），用于超出共享面板回看窗口的计算（如策略回测）
+
+        Args:
+            db: 数据库会话
+            start_date: 开始日期（YYYY-MM-DD，含）
+            end_date: 结束日期（YYYY-MM-DD，含），None 为最新
+
+        Returns:
+            PricePanel（只读）
+        """
+        started = time.time()
+        panel = self._load(db, start_date, end_date)
+        logger.info(f"行情面板区间加载完成 [{self.table}]: {start_date} 至 {end_date or panel.last_date}, "
+                    f"{len(panel.codes)} 只股票 × {len(panel.dates)} 个交易日, 耗时 {time.time() - started:.2f}s")
+        return panel
+
+    def _latest_date(self, db: Session) -> Optional[str]:
+        row = db.execute(text(f"SELECT MAX(date) FROM {self.table}")).fetchone()
+        return _normalize_date(row[0]) if row and row[0] is not None else None
+
+    def _changed_since(self, db: Session, panel: PricePanel) -> Optional[str]:
+        """
+        核对面板最近 recheck_dates 个交易日与数据库是否一致
+
+        按交易日比较行数、收盘价合计、成交量合计（NULL 与面板一样按0计），
+        返回第一个不一致（或面板中没有）的交易日，全部一致时返回 None
+        """
+        since = panel.dates[max(0, len(panel.dates) - self.recheck_dates)]
+        rows = db.execute(text(f"""
+            SELECT date, COUNT(*), SUM(close), SUM(volume)
+            FROM {self.table}
+            WHERE date >= :since
+            GROUP BY date
+        """), {'since': since}).fetchall()
+        start = bisect_left(panel.dates.tolist(), since)
+        counts = panel.mask[:, start:].sum(axis=0)
+        closes = panel.fields['close'][:, start:].sum(axis=0)
+        volumes = panel.fields['volume'][:, start:].sum(axis=0)
+        recent = {date: i for i, date in enumerate(panel.dates[start:].tolist())}
+        changed = []
+        for row in rows:
+            date = _normalize_date(row[0])
+            i = recent.get(date)
+            if (i is None or int(row[1]) != int(counts[i])
+                    or not np.isclose(float(row[2] or 0.0), closes[i], rtol=1e-9, atol=1e-6)
+                    or not np.isclose(float(row[3] or 0.0), volumes[i], rtol=1e-9, atol=1e-6)):
+                changed.append(date)
+        return min(changed) if changed else None
+
+    def latest_date(self, db: Session) -> Optional[str]:
+        """
+        数据库中最新的交易日（按 refresh_interval 缓存，不触发面板加载）
+
+        Args:
+            db: 数据库会话
+
+        Returns:
+            最新交易日（YYYY-MM-DD），无数据时返回None
+        """
+        now = time.monotonic()
+        panel = self._panel
+        if panel is not None and now - self._last_check < self.refresh_interval:
+            return panel.last_date
+        if self._latest is not None and now - self._latest_check < self.refresh_interval:
+            return self._latest
+        self._latest = self._latest_date(db)
+        self._latest_check = now
+        return self._latest
+
+    def get(self, db: Session) -> PricePanel:
+        """
+        获取面板，必要时完成首次加载或增量刷新
+
+        Args:
+            db: 数据库会话
+
+        Returns:
+            PricePanel（只读）
+        """
+        panel = self._panel
+        if panel is not None and time.monotonic() - self._last_check < self.refresh_interval:
+            return panel
+        return self.refresh(db)
+
+    def refresh(self, db: Session, force: bool = False) -> PricePanel:
+        """
+        刷新面板
+
+        首次调用时全量加载；之后核对最近 recheck_dates 个交易日（见 _changed_since），出现新交易日、
+        采集过程中晚写入的股票或原地修正的记录时，重新读取第一个不一致的交易日及之后的数据并合并到新面板中。
+        距上次全量加载超过 full_reload_interval 时全量重新加载（覆盖更早日期的回补和修正）。
+
+        Args:
+            db: 数据库会话
+            force: 是否强制全量重新加载
+
+        Returns:
+            PricePanel（只读）
+        """
+        with self._lock:
+            window_start = self._window_start()
+            panel = self._panel
+
+            expired = (self.full_reload_interval is not None
+                       and time.monotonic() - self._loaded_at >= self.full_reload_interval)
+            if force or expired or panel is None or panel.last_date is None:
+                started = time.time()
+                panel = self._load(db, window_start)
+                self._loaded_at = time.monotonic()
+                logger.info(f"行情面板全量加载完成 [{self.table}]: {len(panel.codes)} 只股票 × {len(panel.dates)} 个交易日, "
+                            f"耗时 {time.time() - started:.2f}s")
+            else:
+                changed = self._changed_since(db, panel)
+                if changed is not None:
+                    started = time.time()
+                    delta = self._load(db, changed)
+                    panel = panel.merge(delta, min_date=window_start)
+                    logger.info(f"行情面板增量刷新完成 [{self.table}]: 重新读取 {changed} 至 {panel.last_date}, "
+                                f"读取 {int(delta.mask.sum())} 条记录, 耗时 {time.time() - started:.2f}s")
+
+            self._panel = panel
+            self._last_check = time.monotonic()
+            return panel
+
+    def preload(self, panel: PricePanel):
+        """
+        直接设置面板（不访问数据库），用于离线基准测试等使用内存数据源的场景
+
+        Args:
+            panel: 行情面板
+        """
+        with self._lock:
+            self._panel = panel
+            self._last_check = time.monotonic()
+            self._loaded_at = self._last_check
+            self._latest = panel.last_date
+            self._latest_check = self._last_check
+
+    def invalidate(self):
+        """使缓存失效，下次访问时重新全量加载"""
+        with self._lock:
+            self._panel = None
+            self._last_check = 0.0
+            self._latest = None
+            self._latest_check = 0.0
+
+
+_stores: Dict[str, PricePanelStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_panel_store(market: str = 'A') -> PricePanelStore:
+    """获取指定市场的进程级面板缓存"""
+    with _stores_lock:
+        store = _stores.get(market)
+        if store is None:
+            store = PricePanelStore(
+                table=MARKET_TABLES[market],
+                lookback_days=SCREENING_CONFIG.get('panel_lookback_days', 400),
+                refresh_interval=SCREENING_CONFIG.get('panel_refresh_interval', 300),
+                recheck_dates=SCREENING_CONFIG.get('panel_recheck_dates', 20),
+                full_reload_interval=SCREENING_CONFIG.get('panel_full_reload_interval'),
+            )
+            _stores[market] = store
+        return store
+
+
+def get_price_panel(db: Session, market: str = 'A') -> PricePanel:
+    """
+    获取共享的只读行情面板
+
+    Args:
+        db: 数据库会话
+        market: 市场（'A' 或 'HK'）
+
+    Returns:
+        PricePanel
+    """
+    return get_panel_store(market).get(db)
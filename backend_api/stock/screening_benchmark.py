@@ -0,0 +1,515 @@
+"""
+选股基准测试
+在合成的全市场行情数据上离线运行全部选股策略，输出吞吐量（股票数/秒）、峰值内存和各判断条件的耗时，
+并可与基准结果比较，性能下降超过阈值时以非零状态退出（可用于提交前或CI检查）
+
+合成数据:
+- A股约5500只（主板/创业板/科创板按比例分布，含ST股票）、港股约2600只，默认5年日线
+- 个股与市场的阶段性趋势、按板块的涨跌停（涨停日放量）、跳空高开/低开、停牌以及上市较晚的股票
+
+数据源替身:
+- stock_basic_info 使用内存 SQLite，策略原有的股票池SQL原样执行
+- 行情面板直接预置到面板缓存（与生产环境相同，只保留 panel_lookback_days 的回看窗口）
+- 策略通过注册表的主函数执行，与接口调用路径一致（不使用增量选股状态）
+
+使用方式（在 backend_api 目录下）:
+    python -m stock.screening_benchmark                                  # 全量规模
+    python -m stock.screening_benchmark --a-shares 500 --hk 200 --years 1 --strategies low_nine,high_tight_flag
+    python -m stock.screening_benchmark --output baseline.json           # 保存结果作为基准
+    python -m stock.screening_benchmark --baseline baseline.json --threshold 0.2
+    python -m stock.screening_benchmark --a-shares 2000 --hk 0 --backtest low_nine   # 回测向量化信号与逐日回放对比
+
+说明:
+- 基准结果与机器相关，应在同一台机器上生成和比较
+- 各条件耗时在单进程插桩运行中统计，为包含嵌套调用的累计时间；吞吐量取未插桩运行中最快的一次
+"""
+
+import argparse
+import functools
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from config import SCREENING_CONFIG
+from stock.price_panel import PricePanel, get_panel_store
+from stock.screening_executor import ScreeningExecutor, _default_workers, set_screening_executor
+from stock.screening_expression import compile_expression, evaluate_panel
+from stock.screening_registry import SCREENING_STRATEGIES, get_strategy, run_strategy
+from stock.strategy_backtest import run_backtest
+
+logger = logging.getLogger(__name__)
+
+# A股代码前缀及占比（每个前缀最多1000只）
+A_SHARE_PREFIXES = (
+    ('000', 0.10), ('001', 0.04), ('002', 0.17), ('003', 0.02), ('300', 0.18), ('301', 0.07),
+    ('600', 0.18), ('601', 0.05), ('603', 0.12), ('605', 0.02), ('688', 0.05),
+)
+
+# 插桩统计耗时的方法名前缀
+CONDITION_PREFIXES = ('check_', 'find_', 'calculate_', 'evaluate')
+
+# 表达式选股的基准表达式
+BENCHMARK_EXPRESSION = 'close > ma(close, 250) and ref(change_percent, 1) >= 9.5 and count(change_percent >= 9.5, 20) >= 2'
+
+
+def _make_codes(market: str, n_stocks: int, rng: np.random.Generator) -> Tuple[List[str], List[str]]:
+    if market == 'HK':
+        codes = [f'{i + 1:05d}' for i in range(n_stocks)]
+        return codes, [f'港股{code}' for code in codes]
+
+    prefixes = [prefix for prefix, _ in A_SHARE_PREFIXES]
+    weights = np.array([weight for _, weight in A_SHARE_PREFIXES])
+    counters = {prefix: 0 for prefix in prefixes}
+    codes = []
+    for choice in rng.choice(len(prefixes), size=n_stocks, p=weights / weights.sum()):
+        # 前缀已满时顺延到下一个前缀
+        for step in range(len(prefixes)):
+            prefix = prefixes[(choice + step) % len(prefixes)]
+            if counters[prefix] < 1000:
+                break
+        else:
+            raise ValueError(f"A股数量超出合成代码容量: {n_stocks}")
+        codes.append(f'{prefix}{counters[prefix]:03d}')
+        counters[prefix] += 1
+    codes.sort()
+    names = [('*ST' if rng.random() < 0.03 else '') + f'股票{code}' for code in codes]
+    return codes, names
+
+
+def generate_market(market: str = 'A', n_stocks: int = 5500, n_days: int = 1250, seed: int = 42,
+                    end_date: Optional[date] = None) -> Tuple[PricePanel, List[Tuple[str, str]]]:
+    """
+    生成合成行情
+
+    Args:
+        market: 'A' 或 'HK'
+        n_stocks: 股票数
+        n_days: 交易日数（工作日，截止到 end_date）
+        seed: 随机种子
+        end_date: 最后一个交易日，默认今天
+
+    Returns:
+        (PricePanel, [(code, name)])
+    """
+    rng = np.random.default_rng(seed)
+    dates = np.array([d.strftime('%Y-%m-%d') for d in pd.bdate_range(end=end_date or datetime.now().date(),
+                                                                    periods=n_days)], dtype=object)
+    codes, names = _make_codes(market, n_stocks, rng)
+    shape = (n_stocks, n_days)
+
+    # 涨跌幅限制：创业板/科创板20%，ST 5%，其余10%；港股无限制
+    if market == 'HK':
+        limit = np.full((n_stocks, 1), np.inf)
+    else:
+        limit = np.array([0.05 if 'ST' in name else 0.2 if code[:3] in ('300', '301', '688') else 0.1
+                          for code, name in zip(codes, names)])[:, None]
+
+    # 日收益 = 个股阶段性趋势 + 市场波动 + 个股波动
+    regime_len = 60
+    regimes = rng.normal(0.0, 0.003, (n_stocks, n_days // regime_len + 1))
+    drift = np.repeat(regimes, regime_len, axis=1)[:, :n_days]
+    sigma = rng.uniform(0.012, 0.035, (n_stocks, 1))
+    returns = drift + 0.6 * rng.normal(0.0, 0.01, n_days)[None, :] + rng.standard_normal(shape) * sigma
+    del drift
+
+    if market == 'HK':
+        jumps = rng.random(shape) < 0.003
+        returns = np.where(jumps, rng.choice([-1.0, 1.0], shape) * rng.uniform(0.1, 0.3, shape), returns)
+        limit_up = np.zeros(shape, dtype=bool)
+        returns = np.maximum(returns, -0.6)
+    else:
+        draw = rng.random(shape)
+        limit_up = draw < 0.012
+        limit_down = draw > 1 - 0.006
+        returns = np.where(limit_up, limit, np.where(limit_down, -limit, np.clip(returns, -limit, limit)))
+        del draw, limit_down
+
+    base = rng.uniform(3.0, 80.0, (n_stocks, 1))
+    close = np.round(base * np.exp(np.cumsum(np.log1p(returns), axis=1)), 2)
+    close = np.maximum(close, 0.01)
+    del returns
+    prev_close = np.concatenate([np.round(base, 2), close[:, :-1]], axis=1)
+    change_percent = np.round((close / prev_close - 1) * 100, 2)
+
+    # 跳空：多数小幅高开/低开，少量大幅跳空
+    gap = rng.normal(0.0, 0.004, shape)
+    big_gap = rng.random(shape) < 0.02
+    gap = np.where(big_gap, np.sign(gap) * rng.uniform(0.02, 0.06, shape), gap)
+    del big_gap
+    upper = prev_close * (1 + limit)
+    lower = prev_close * (1 - np.minimum(limit, 0.9))
+    open_ = np.round(np.clip(prev_close * (1 + gap), lower, upper), 2)
+    del gap
+    high = np.round(np.minimum(np.maximum(open_, close) * (1 + np.abs(rng.normal(0.0, 0.01, shape))), upper), 2)
+    low = np.round(np.maximum(np.minimum(open_, close) * (1 - np.abs(rng.normal(0.0, 0.01, shape))), lower), 2)
+    high = np.maximum(high, np.maximum(open_, close))
+    low = np.minimum(low, np.minimum(open_, close))
+    del upper, lower, prev_close
+
+    volume = np.round(rng.uniform(2e4, 5e5, (n_stocks, 1)) * rng.lognormal(0.0, 0.4, shape)
+                      * (1 + np.abs(change_percent) / 5) * np.where(limit_up, 3.0, 1.0))
+    amount = volume * close * 100
+    turnover_rate = np.round(volume / rng.uniform(5e6, 5e7, (n_stocks, 1)) * 100, 4)
+
+    # 上市较晚的股票与停牌
+    mask = np.ones(shape, dtype=bool)
+    late = np.nonzero(rng.random(n_stocks) < 0.1)[0]
+    for row, start in zip(late, rng.integers(0, n_days, len(late))):
+        mask[row, :start] = False
+    suspended = np.nonzero(rng.random(n_stocks) < 0.2)[0]
+    for row, start, length in zip(suspended, rng.integers(0, n_days, len(suspended)),
+                                  rng.integers(1, 21, len(suspended))):
+        mask[row, start:start + length] = False
+
+    fields = {'open': open_, 'close': close, 'high': high, 'low': low, 'change_percent': change_percent,
+              'volume': volume, 'amount': amount, 'turnover_rate': turnover_rate}
+    fields = {name: np.where(mask, values, 0.0) for name, values in fields.items()}
+    panel = PricePanel(np.array(codes, dtype=object), np.array(names, dtype=object), dates, fields, mask)
+    return panel, list(zip(codes, names))
+
+
+class StandInDatabase:
+    """内存 SQLite 数据源替身（stock_basic_info）"""
+
+    def __init__(self, stocks: Sequence[Tuple[str, str]]):
+        self.engine = create_engine('sqlite://', poolclass=StaticPool,
+                                    connect_args={'check_same_thread': False})
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE stock_basic_info (code TEXT PRIMARY KEY, name TEXT)"))
+            conn.execute(text("INSERT INTO stock_basic_info (code, name) VALUES (:code, :name)"),
+                         [{'code': code, 'name': name} for code, name in stocks])
+        self.Session = sessionmaker(bind=self.engine)
+
+    def stock_pool(self, condition: str) -> List[Tuple[str, str]]:
+        with self.Session() as db:
+            rows = db.execute(text(f"SELECT DISTINCT code, name FROM stock_basic_info WHERE {condition} "
+                                   f"ORDER BY code")).fetchall()
+        return [(str(code), name) for code, name in rows]
+
+
+@contextmanager
+def benchmark_environment(panel: PricePanel, executor: ScreeningExecutor):
+    """预置行情面板并替换选股执行器，结束后恢复"""
+    store = get_panel_store('A')
+    previous_executor = set_screening_executor(executor)
+    refresh_interval = store.refresh_interval
+    store.refresh_interval = float('inf')
+    store.preload(panel)
+    try:
+        yield
+    finally:
+        store.refresh_interval = refresh_interval
+        store.invalidate()
+        set_screening_executor(previous_executor)
+        executor.shutdown()
+
+
+@contextmanager
+def condition_timer(classes: Sequence[type]):
+    """
+    统计策略类中各判断条件方法以及面板数据读取的累计耗时
+
+    Yields:
+        {方法名: [调用次数, 累计秒数]}
+    """
+    stats: Dict[str, List[float]] = {}
+    patched = []
+
+    def wrap(owner, attr, label, func, is_static):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                entry = stats.setdefault(label, [0, 0.0])
+                entry[0] += 1
+                entry[1] += time.perf_counter() - started
+        patched.append((owner, attr, owner.__dict__[attr]))
+        setattr(owner, attr, staticmethod(timed) if is_static else timed)
+
+    for cls in classes:
+        for attr, raw in list(cls.__dict__.items()):
+            if isinstance(raw, staticmethod) and attr.startswith(CONDITION_PREFIXES):
+                wrap(cls, attr, f"{cls.__name__}.{attr}", raw.__func__, True)
+    for attr in ('get_history', 'window'):
+        wrap(PricePanel, attr, f"PricePanel.{attr}", PricePanel.__dict__[attr], False)
+    try:
+        yield stats
+    finally:
+        for owner, attr, original in reversed(patched):
+            setattr(owner, attr, original)
+
+
+def _owner_class(func) -> Optional[type]:
+    """静态方法所属的类"""
+    module = sys.modules.get(func.__module__)
+    owner = getattr(module, func.__qualname__.split('.')[0], None) if '.' in func.__qualname__ else None
+    return owner if isinstance(owner, type) else None
+
+
+def _measure(run, repeat: int) -> Tuple[Any, List[float]]:
+    timings = []
+    result = None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - started)
+    return result, timings
+
+
+def _profile(run, classes: Sequence[type]) -> Tuple[float, List[Dict[str, Any]]]:
+    """单进程插桩运行一次，返回 (峰值内存MB, 各条件耗时)"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        with condition_timer(classes) as stats:
+            run()
+        peak = (tracemalloc.get_traced_memory()[1] - base) / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+    conditions = [
+        {'name': name, 'calls': int(calls), 'seconds': round(seconds, 4),
+         'us_per_call': round(seconds / calls * 1e6, 2) if calls else None}
+        for name, (calls, seconds) in sorted(stats.items(), key=lambda item: -item[1][1])
+    ]
+    return round(peak, 2), conditions
+
+
+def _entry(name: str, stocks: int, hits: int, timings: List[float], peak_mb: Optional[float],
+           conditions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    best = min(timings)
+    return {
+        'name': name,
+        'stocks': stocks,
+        'hits': hits,
+        'seconds': round(best, 4),
+        'mean_seconds': round(sum(timings) / len(timings), 4),
+        'stocks_per_sec': round(stocks / best, 1) if best > 0 else None,
+        'peak_memory_mb': peak_mb,
+        'conditions': conditions,
+    }
+
+
+def run_benchmark(a_shares: int = 5500, hk: int = 2600, years: int = 5, seed: int = 42,
+                  strategies: Optional[Sequence[str]] = None, workers: Optional[int] = None, repeat: int = 1,
+                  profile: bool = True, expression: bool = True, backtest: Optional[str] = None,
+                  backtest_days: int = 250) -> Dict[str, Any]:
+    """
+    运行基准测试
+
+    Args:
+        a_shares: A股数量
+        hk: 港股数量（0 为不测试港股）
+        years: 行情年数（每年按250个交易日）
+        seed: 随机种子
+        strategies: 策略标识列表，默认全部已登记策略
+        workers: 并行进程数，默认按配置
+        repeat: 每个策略计时运行的次数（取最快一次）
+        profile: 是否插桩统计峰值内存与各条件耗时
+        expression: 是否测试表达式选股
+        backtest: 额外回测的策略标识
+        backtest_days: 回测的交易日数
+
+    Returns:
+        基准报告 {'environment', 'results': {名称: 结果}}
+    """
+    strategies = list(strategies or SCREENING_STRATEGIES.keys())
+    for strategy in strategies:
+        get_strategy(strategy)
+    if workers is None:
+        workers = SCREENING_CONFIG.get('executor_workers') or _default_workers()
+    n_days = years * 250
+
+    started = time.perf_counter()
+    full_panel, a_stocks = generate_market('A', a_shares, n_days, seed)
+    generate_seconds = time.perf_counter() - started
+    # 与生产环境的共享面板一致，只保留回看窗口
+    window_start = (datetime.now().date() - timedelta(days=SCREENING_CONFIG.get('panel_lookback_days', 400)))
+    panel = full_panel.subset(full_panel.codes.tolist(), window_start.strftime('%Y-%m-%d'))
+    database = StandInDatabase(a_stocks)
+
+    report: Dict[str, Any] = {
+        'environment': {
+            'a_shares': a_shares, 'hk': hk, 'years': years, 'trade_days': n_days, 'seed': seed,
+            'panel_days': len(panel.dates), 'workers': workers, 'repeat': repeat,
+            'generate_seconds': round(generate_seconds, 2),
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        },
+        'results': {},
+    }
+
+    for strategy in strategies:
+        spec = get_strategy(strategy)
+        pool = database.stock_pool(spec['backtest']['stock_pool']) if 'backtest' in spec else a_stocks
+        classes = [cls for cls in {_owner_class(spec['func']), _owner_class(spec.get('backtest', {}).get('screen', spec['func']))}
+                   if cls is not None]
+
+        def run(strategy=strategy):
+            with database.Session() as db:
+                return run_strategy(strategy, db)
+
+        with benchmark_environment(panel, ScreeningExecutor(max_workers=workers, chunk_timeout=3600)):
+            results, timings = _measure(run, repeat)
+        peak, conditions = None, []
+        if profile:
+            with benchmark_environment(panel, ScreeningExecutor(max_workers=1)):
+                peak, conditions = _profile(run, classes)
+        entry = _entry(strategy, len(pool), len(results), timings, peak, conditions)
+        report['results'][strategy] = entry
+        logger.info(f"基准测试 [{strategy}]: {entry['stocks']} 只, {entry['seconds']}s, {entry['stocks_per_sec']} 只/秒")
+
+    if expression:
+        compiled = compile_expression(BENCHMARK_EXPRESSION)
+        markets = [('A', panel)]
+        if hk:
+            hk_full, _ = generate_market('HK', hk, n_days, seed + 1)
+            markets.append(('HK', hk_full.subset(hk_full.codes.tolist(), window_start.strftime('%Y-%m-%d'))))
+            del hk_full
+        for market, market_panel in markets:
+            results, timings = _measure(lambda: evaluate_panel(compiled, market_panel), repeat)
+            peak, conditions = (None, [])
+            if profile:
+                peak, conditions = _profile(lambda: evaluate_panel(compiled, market_panel), [])
+            report['results'][f'expression_{market}'] = _entry(f'expression_{market}', len(market_panel),
+                                                               len(results), timings, peak, conditions)
+
+    if backtest:
+        spec = get_strategy(backtest)
+        pool = database.stock_pool(spec['backtest']['stock_pool'])
+        dates = full_panel.dates.tolist()
+        start_date, end_date = dates[-backtest_days], dates[-1]
+
+        # 登记了向量化信号函数的策略同时测试逐日回放，对比两种信号计算方式
+        modes = [('', True)] + ([('_replay', False)] if spec['backtest'].get('signals') is not None else [])
+        for suffix, vectorized in modes:
+            def run_bt(vectorized=vectorized):
+                return run_backtest(None, backtest, start_date, end_date, panel=full_panel, stocks=pool,
+                                    vectorized=vectorized)['signals']
+
+            with benchmark_environment(panel, ScreeningExecutor(max_workers=workers, chunk_timeout=3600)):
+                results, timings = _measure(run_bt, 1)
+            entry = _entry(f'backtest_{backtest}{suffix}', len(pool) * backtest_days, len(results), timings, None, [])
+            entry['trade_days'] = backtest_days
+            report['results'][entry['name']] = entry
+        replay = report['results'].get(f'backtest_{backtest}_replay')
+        if replay is not None:
+            vectorized_entry = report['results'][f'backtest_{backtest}']
+            vectorized_entry['speedup'] = round(replay['seconds'] / vectorized_entry['seconds'], 1) \
+                if vectorized_entry['seconds'] > 0 else None
+            logger.info(f"回测 [{backtest}]: 向量化 {vectorized_entry['seconds']}s, 逐日回放 {replay['seconds']}s, "
+                        f"加速 {vectorized_entry['speedup']} 倍")
+
+    return report
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.2) -> List[str]:
+    """
+    与基准结果比较
+
+    Args:
+        report: 本次结果
+        baseline: 基准结果
+        threshold: 允许的性能下降比例（0.2 即吞吐量下降或峰值内存增加超过20%视为退化）
+
+    Returns:
+        退化说明列表（为空表示未退化）
+    """
+    regressions = []
+    for name, current in report.get('results', {}).items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        if previous.get('stocks_per_sec') and current.get('stocks_per_sec') is not None:
+            ratio = current['stocks_per_sec'] / previous['stocks_per_sec']
+            if ratio < 1 - threshold:
+                regressions.append(f"{name}: 吞吐量 {current['stocks_per_sec']} 只/秒，"
+                                   f"基准 {previous['stocks_per_sec']} 只/秒（下降 {(1 - ratio) * 100:.1f}%）")
+        if previous.get('peak_memory_mb') and current.get('peak_memory_mb') is not None:
+            ratio = current['peak_memory_mb'] / previous['peak_memory_mb']
+            if ratio > 1 + threshold:
+                regressions.append(f"{name}: 峰值内存 {current['peak_memory_mb']}MB，"
+                                   f"基准 {previous['peak_memory_mb']}MB（增加 {(ratio - 1) * 100:.1f}%）")
+    return regressions
+
+
+def format_report(report: Dict[str, Any], top_conditions: int = 5) -> str:
+    """格式化为文本表格"""
+    env = report['environment']
+    lines = [
+        f"合成数据: A股 {env['a_shares']} 只, 港股 {env['hk']} 只, {env['trade_days']} 个交易日 "
+        f"（面板窗口 {env['panel_days']} 个交易日）, 生成耗时 {env['generate_seconds']}s, 进程数 {env['workers']}",
+        f"{'名称':<24}{'股票数':>10}{'命中':>8}{'耗时(s)':>10}{'只/秒':>12}{'峰值内存(MB)':>14}",
+    ]
+    for name, item in report['results'].items():
+        memory = '-' if item['peak_memory_mb'] is None else item['peak_memory_mb']
+        lines.append(f"{name:<24}{item['stocks']:>10}{item['hits']:>8}{item['seconds']:>10}"
+                     f"{item['stocks_per_sec'] or '-':>12}{memory:>14}")
+        for condition in item['conditions'][:top_conditions]:
+            lines.append(f"    {condition['name']:<48}{condition['calls']:>10} 次{condition['seconds']:>10}s"
+                         f"{condition['us_per_call'] or '-':>10}us")
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='选股策略基准测试（合成全市场数据，离线运行）')
+    parser.add_argument('--a-shares', type=int, default=5500, help='A股数量')
+    parser.add_argument('--hk', type=int, default=2600, help='港股数量（0 为不测试港股）')
+    parser.add_argument('--years', type=int, default=5, help='行情年数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--strategies', default='', help='策略标识，逗号分隔，默认全部')
+    parser.add_argument('--workers', type=int, default=None, help='并行进程数，默认按配置')
+    parser.add_argument('--repeat', type=int, default=1, help='计时运行次数（取最快一次）')
+    parser.add_argument('--no-profile', action='store_true', help='不统计峰值内存与各条件耗时')
+    parser.add_argument('--no-expression', action='store_true', help='不测试表达式选股')
+    parser.add_argument('--backtest', default=None, help='额外回测的策略标识')
+    parser.add_argument('--backtest-days', type=int, default=250, help='回测的交易日数')
+    parser.add_argument('--output', default=None, help='结果保存路径（JSON，可作为后续比较的基准）')
+    parser.add_argument('--baseline', default=None, help='基准结果路径（JSON）')
+    parser.add_argument('--threshold', type=float, default=0.2, help='允许的性能下降比例')
+    parser.add_argument('--verbose', action='store_true', help='输出策略执行日志')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    report = run_benchmark(
+        a_shares=args.a_shares, hk=args.hk, years=args.years, seed=args.seed,
+        strategies=[s for s in args.strategies.split(',') if s] or None,
+        workers=args.workers, repeat=args.repeat, profile=not args.no_profile,
+        expression=not args.no_expression, backtest=args.backtest, backtest_days=args.backtest_days,
+    )
+    print(format_report(report))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.threshold)
+        if regressions:
+            print(f"性能退化（阈值 {args.threshold * 100:.0f}%）:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"与基准相比未发现超过 {args.threshold * 100:.0f}% 的性能退化")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
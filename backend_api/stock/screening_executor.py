@@ -0,0 +1,273 @@
+"""
+选股并行执行器
+将股票池切分为若干块，在进程池中并行执行策略的逐只计算，再按原顺序合并结果
+
+使用方式:
+    executor = get_screening_executor()
+    results = executor.run(HighTightFlagStrategy.screen_high_tight_flag_stocks, panel, stocks,
+                           start_date_str, end_date_str)
+
+说明:
+- 传给子进程的是按块截取的小面板（只含该块股票与所需日期区间），避免把整个面板序列化到每个子进程
+- 每个块单独设置超时，超时或异常的块跳过，其余块的结果照常返回；跳过的股票记录在返回结果的 failed 属性中
+  （ScreeningResults），调用方据此标记结果不完整
+- 分块超时后卡住的工作进程无法取消：该进程池不再接收新任务（之后的调用使用新进程池），等仍在使用它的调用
+  全部结束后终止其工作进程；不会取消其他并发调用已提交的分块
+- 工作进程数 <= 1 时在当前进程内顺序执行，便于调试和单元测试
+- 配置了增量选股状态（ScreeningState）时，只重新计算窗口数据发生变化的股票，其余股票复用上次的结果
+- 传入 progress 回调时按较小的分块（progress_chunk_size）执行，每完成一块回调一次，用于异步选股任务的进度与结果推送
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+
+from config import SCREENING_CONFIG
+from stock.price_panel import PricePanel
+from stock.screening_state import ScreeningState
+
+logger = logging.getLogger(__name__)
+
+
+# 进度回调: progress(已处理股票数, 股票总数, 本块命中结果)
+ProgressCallback = Callable[[int, int, List[Dict]], None]
+
+
+def _default_workers() -> int:
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+class ScreeningResults(list):
+    """选股结果列表，failed 为超时或执行失败而未计算的 (code, name)"""
+
+    def __init__(self, results=(), failed: Sequence[Tuple[str, str]] = ()):
+        super().__init__(results)
+        self.failed: List[Tuple[str, str]] = list(failed)
+
+    @property
+    def incomplete(self) -> bool:
+        """是否有股票未完成计算"""
+        return bool(self.failed)
+
+
+def failed_stocks(results) -> List[Tuple[str, str]]:
+    """选股结果中未完成计算的股票（非 ScreeningResults 时为空）"""
+    return list(getattr(results, 'failed', []))
+
+
+def _terminate_pool(pool: ProcessPoolExecutor):
+    """关闭进程池并终止其工作进程（超时卡住的任务无法通过 shutdown 取消）"""
+    processes = list((getattr(pool, '_processes', None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+class ScreeningExecutor:
+    """选股分块并行执行器"""
+
+    def __init__(self, max_workers: Optional[int] = None, chunk_size: int = 500,
+                 chunk_timeout: float = 120, progress_chunk_size: int = 100,
+                 state: Optional[ScreeningState] = None):
+        self.max_workers = max_workers if max_workers is not None else _default_workers()
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_timeout = chunk_timeout
+        self.progress_chunk_size = max(1, progress_chunk_size)
+        # 增量选股状态，为None时每次全量计算
+        self.state = state
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # 进程池 -> 正在使用它的调用数
+        self._users: Dict[ProcessPoolExecutor, int] = {}
+        # 已停止接收新任务、等待使用者全部结束后终止的进程池
+        self._retired: set = set()
+        self._lock = threading.Lock()
+
+    @property
+    def parallel(self) -> bool:
+        return self.max_workers > 1
+
+    def _acquire_pool(self) -> ProcessPoolExecutor:
+        """取得当前进程池并登记使用（与 _release_pool 成对调用）"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                logger.info(f"选股进程池已启动，工作进程数: {self.max_workers}")
+            self._users[self._pool] = self._users.get(self._pool, 0) + 1
+            return self._pool
+
+    def _release_pool(self, pool: ProcessPoolExecutor, broken: bool):
+        """
+        结束对进程池的使用
+
+        Args:
+            pool: _acquire_pool 返回的进程池
+            broken: 本次调用是否有分块超时（工作进程可能仍卡在超时的任务上）
+        """
+        with self._lock:
+            if broken:
+                # 之后的调用使用新进程池；其他调用仍在使用的旧进程池等它们结束后再终止
+                self._retired.add(pool)
+                if self._pool is pool:
+                    self._pool = None
+            self._users[pool] -= 1
+            if self._users[pool] > 0 or pool not in self._retired:
+                return
+            del self._users[pool]
+            self._retired.discard(pool)
+        _terminate_pool(pool)
+        logger.info("已终止分块超时的选股进程池")
+
+    def split(self, stocks: Sequence[Tuple[str, str]], chunk_size: Optional[int] = None) -> List[List[Tuple[str, str]]]:
+        """按 chunk_size 切分股票池"""
+        size = chunk_size or self.chunk_size
+        stocks = [(str(code), name) for code, name in stocks]
+        return [stocks[i:i + size] for i in range(0, len(stocks), size)]
+
+    def run(self, func: Callable[..., List[Dict]], panel: PricePanel, stocks: Sequence[Tuple[str, str]],
+            start_date: Optional[str] = None, end_date: Optional[str] = None,
+            progress: Optional[ProgressCallback] = None, window_bars: Optional[int] = None,
+            incremental: bool = True, timeout: bool = True, **kwargs) -> ScreeningResults:
+        """
+        分块执行逐只选股函数并合并结果
+
+        Args:
+            func: 模块级或类静态方法，签名为 func(panel, stocks, start_date, end_date, **kwargs) -> List[Dict]
+            panel: 行情面板
+            stocks: (code, name) 列表
+            start_date: 数据开始日期（YYYY-MM-DD）
+            end_date: 数据结束日期（YYYY-MM-DD）
+            progress: 进度回调，每完成一个分块调用一次（在调用线程中执行）
+            window_bars: 策略依赖的最近交易日数，用于增量选股判断数据是否变化（None 表示整个日期区间）
+            incremental: 是否使用增量选股状态（回测等一次性计算传False，避免占用状态缓存）
+            timeout: 是否对分块设置 chunk_timeout 超时（回测等后台计算传False，等待全部分块完成）
+            **kwargs: 传给 func 的策略参数
+
+        Returns:
+            按股票池原顺序合并的结果列表（ScreeningResults，failed 为超时或执行失败的股票）
+        """
+        stocks = [(str(code), name) for code, name in stocks]
+        if incremental and self.state is not None:
+            failed: List[Tuple[str, str]] = []
+
+            def runner(*args, **run_kwargs):
+                run_results, run_failed = self._run(*args, timeout=timeout, **run_kwargs)
+                failed.extend(run_failed)
+                return run_results, run_failed
+
+            results = self.state.run(runner, func, panel, stocks, start_date, end_date,
+                                     window_bars=window_bars, progress=progress, **kwargs)
+            return ScreeningResults(results, failed)
+        results, failed = self._run(func, panel, stocks, start_date, end_date, progress=progress,
+                                    timeout=timeout, **kwargs)
+        return ScreeningResults(results, failed)
+
+    def _run(self, func: Callable[..., List[Dict]], panel: PricePanel, stocks: List[Tuple[str, str]],
+             start_date: Optional[str], end_date: Optional[str],
+             progress: Optional[ProgressCallback] = None, timeout: bool = True,
+             **kwargs) -> Tuple[List[Dict], List[Tuple[str, str]]]:
+        """分块执行，返回 (结果列表, 超时或失败分块中的股票)"""
+        chunks = self.split(stocks, self.progress_chunk_size if progress else None)
+        if not chunks:
+            return [], []
+        total = sum(len(chunk) for chunk in chunks)
+
+        if not self.parallel or len(chunks) == 1:
+            if progress is None:
+                return func(panel, [s for chunk in chunks for s in chunk], start_date, end_date, **kwargs), []
+            results: List[Dict] = []
+            processed = 0
+            for chunk in chunks:
+                chunk_results = func(panel, chunk, start_date, end_date, **kwargs)
+                results.extend(chunk_results)
+                processed += len(chunk)
+                progress(processed, total, chunk_results)
+            return results, []
+
+        started = time.time()
+        results: List[Dict] = []
+        failed: List[Tuple[str, str]] = []
+        broken = False
+        processed = 0
+        pool = self._acquire_pool()
+        try:
+            futures = []
+            for chunk in chunks:
+                sub_panel = panel.subset([code for code, _ in chunk], start_date, end_date)
+                futures.append(pool.submit(func, sub_panel, chunk, start_date, end_date, **kwargs))
+
+            for idx, future in enumerate(futures):
+                chunk_results: List[Dict] = []
+                try:
+                    chunk_results = future.result(timeout=self.chunk_timeout if timeout else None)
+                    results.extend(chunk_results)
+                except FutureTimeoutError:
+                    failed.extend(chunks[idx])
+                    broken = True
+                    future.cancel()
+                    logger.error(f"选股分块 {idx + 1}/{len(futures)} 超时（>{self.chunk_timeout}s），已跳过")
+                except CancelledError:
+                    failed.extend(chunks[idx])
+                    logger.error(f"选股分块 {idx + 1}/{len(futures)} 已被取消，已跳过")
+                except Exception as e:
+                    failed.extend(chunks[idx])
+                    logger.error(f"选股分块 {idx + 1}/{len(futures)} 执行失败: {str(e)}")
+                if progress is not None:
+                    processed += len(chunks[idx])
+                    progress(processed, total, chunk_results)
+        finally:
+            # 超时的任务仍占用工作进程，该进程池不再使用，其他调用结束后终止
+            self._release_pool(pool, broken)
+
+        logger.info(f"并行选股完成: {len(chunks)} 个分块, {self.max_workers} 个进程, "
+                    f"失败 {len(failed)} 只股票, 耗时 {time.time() - started:.2f}s")
+        return results, failed
+
+    def shutdown(self):
+        """关闭进程池并终止工作进程"""
+        with self._lock:
+            pools = set(self._users) | self._retired
+            if self._pool is not None:
+                pools.add(self._pool)
+            self._pool = None
+            self._users.clear()
+            self._retired.clear()
+        for pool in pools:
+            _terminate_pool(pool)
+
+
+_executor: Optional[ScreeningExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_screening_executor() -> ScreeningExecutor:
+    """获取进程级选股执行器"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ScreeningExecutor(
+                max_workers=SCREENING_CONFIG.get('executor_workers'),
+                chunk_size=SCREENING_CONFIG.get('executor_chunk_size', 500),
+                chunk_timeout=SCREENING_CONFIG.get('executor_chunk_timeout', 120),
+                progress_chunk_size=SCREENING_CONFIG.get('progress_chunk_size', 100),
+                state=ScreeningState(SCREENING_CONFIG.get('incremental_max_entries', 32))
+                if SCREENING_CONFIG.get('incremental', True) else None,
+            )
+        return _executor
+
+
+def set_screening_executor(executor: Optional[ScreeningExecutor]) -> Optional[ScreeningExecutor]:
+    """
+    替换进程级选股执行器（离线基准测试使用），返回原执行器
+
+    Args:
+        executor: 新的执行器，None 表示下次使用时按配置重新创建
+    """
+    global _executor
+    with _executor_lock:
+        previous = _executor
+        _executor = executor
+        return previous
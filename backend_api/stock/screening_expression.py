@@ -0,0 +1,441 @@
+"""
+选股表达式
+用简单的表达式描述选股条件，解析一次后编译为对整个行情面板的 NumPy 向量化计算，无需为每个条件编写逐只循环的策略模块
+
+示例:
+    close > ma(close, 250) and ref(change_percent, 1) >= 9.5 and count(change_percent >= 9.5, 20) >= 2
+
+语法:
+- 字段: open, close, high, low, change_percent, volume, amount, turnover_rate（当日值）
+- 运算: + - * /，比较 > >= < <= == !=（支持连写 a < b < c），逻辑 and / or / not，括号
+- 函数（n 为正整数常量，按每只股票自身的交易日计算，停牌日不占位置）:
+    ref(x, n)    n 个交易日前的值
+    ma(x, n)     n 日均值            sum(x, n)    n 日求和            std(x, n)   n 日标准差（总体）
+    hhv(x, n)    n 日最高值          llv(x, n)    n 日最低值
+    count(c, n)  n 日内条件成立天数  every(c, n)  n 日内条件均成立    exist(c, n) n 日内条件至少成立一次
+    cross(a, b)  a 上穿 b（当日 a > b 且前一日 a <= b）
+    abs(x)       max(a, b)        min(a, b)
+
+计算规则:
+- 数据不足（上市或有效交易日不够）时结果为未知，未知参与的比较为未知，最终只有确定成立的股票命中
+- 逻辑运算为三值逻辑：False and 未知 = False，True or 未知 = True
+- 相同的子表达式只计算一次；编译结果按表达式缓存，选股结果按 (表达式, 面板快照) 缓存
+
+使用方式:
+    result = run_expression_screening(db, 'close > ma(close, 20) and volume > 2 * ma(volume, 5)')
+"""
+
+import ast
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from config import SCREENING_CONFIG
+from stock.indicators import rolling_extreme, rolling_sum, shift
+from stock.price_panel import MARKET_TABLES, PANEL_FIELDS, PanelWindow, PricePanel, get_price_panel
+
+logger = logging.getLogger(__name__)
+
+# 窗口函数: 名称 -> 第一个参数的类型（num 数值 / bool 条件）
+WINDOW_FUNCTIONS = {
+    'ref': 'num', 'ma': 'num', 'sum': 'num', 'std': 'num', 'hhv': 'num', 'llv': 'num',
+    'count': 'bool', 'every': 'bool', 'exist': 'bool',
+}
+# 逐元素函数: 名称 -> 参数个数
+ELEMENT_FUNCTIONS = {'abs': 1, 'max': 2, 'min': 2, 'cross': 2}
+
+_COMPARE_OPS = {ast.Gt: '>', ast.GtE: '>=', ast.Lt: '<', ast.LtE: '<=', ast.Eq: '==', ast.NotEq: '!='}
+_ARITH_OPS = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/'}
+
+# 停牌等缺失交易日的余量：按所需交易日数额外截取的面板交易日比例和最少天数
+_WINDOW_SLACK_RATIO = 0.25
+_WINDOW_SLACK_MIN = 10
+
+
+class ExpressionError(ValueError):
+    """表达式语法或语义错误"""
+
+
+class Node:
+    """
+    编译后的表达式节点
+
+    - op: 运算（field / const / 运算符 / 函数名）
+    - args: 子节点
+    - value: 字段名、常量或窗口长度
+    - kind: 结果类型 num / bool
+    - key: 规范化文本，相同 key 的节点为同一对象（公共子表达式）
+    - bars: 计算当日结果需要的交易日数
+    """
+
+    __slots__ = ('op', 'args', 'value', 'kind', 'key', 'bars')
+
+    def __init__(self, op: str, args: Tuple['Node', ...], value: Any, kind: str, key: str, bars: int):
+        self.op = op
+        self.args = args
+        self.value = value
+        self.kind = kind
+        self.key = key
+        self.bars = bars
+
+
+class CompiledExpression:
+    """编译结果：根节点、按依赖顺序排列的全部节点以及所需交易日数"""
+
+    def __init__(self, source: str, root: Node, nodes: List[Node]):
+        self.source = source
+        self.root = root
+        self.nodes = nodes
+        self.key = root.key
+        self.digest = hashlib.sha1(root.key.encode('utf-8')).hexdigest()
+        self.bars = root.bars
+        self.fields = sorted({node.value for node in nodes if node.op == 'field'})
+
+
+class _Compiler:
+    """将 Python 语法树编译为节点图（只接受白名单内的语法）"""
+
+    def __init__(self, max_period: int):
+        self.max_period = max_period
+        self.nodes: Dict[str, Node] = {}
+
+    def _intern(self, op: str, args: Tuple[Node, ...], value: Any, kind: str, key: str, bars: int) -> Node:
+        node = self.nodes.get(key)
+        if node is None:
+            node = Node(op, args, value, kind, key, bars)
+            self.nodes[key] = node
+        return node
+
+    def _const(self, value: float) -> Node:
+        return self._intern('const', (), float(value), 'num', repr(float(value)), 1)
+
+    def _expect(self, node: Node, kind: str, context: str) -> Node:
+        if node.kind != kind:
+            expected = '条件' if kind == 'bool' else '数值'
+            raise ExpressionError(f"{context} 需要{expected}表达式: {node.key}")
+        return node
+
+    def _period(self, arg: ast.AST, func: str) -> int:
+        if not isinstance(arg, ast.Constant) or isinstance(arg.value, bool) or not isinstance(arg.value, (int, float)) \
+                or float(arg.value) != int(arg.value):
+            raise ExpressionError(f"{func} 的周期必须是正整数常量")
+        period = int(arg.value)
+        if period < (0 if func == 'ref' else 1) or period > self.max_period:
+            raise ExpressionError(f"{func} 的周期超出范围（1~{self.max_period}）: {period}")
+        return period
+
+    def visit(self, tree: ast.AST) -> Node:
+        if isinstance(tree, ast.Expression):
+            return self.visit(tree.body)
+
+        if isinstance(tree, ast.Name):
+            if tree.id not in PANEL_FIELDS:
+                raise ExpressionError(f"未知字段: {tree.id}，可用字段: {', '.join(PANEL_FIELDS)}")
+            return self._intern('field', (), tree.id, 'num', tree.id, 1)
+
+        if isinstance(tree, ast.Constant) and not isinstance(tree.value, bool) and isinstance(tree.value, (int, float)):
+            return self._const(tree.value)
+
+        if isinstance(tree, ast.UnaryOp):
+            operand = self.visit(tree.operand)
+            if isinstance(tree.op, ast.Not):
+                self._expect(operand, 'bool', 'not')
+                return self._intern('not', (operand,), None, 'bool', f"(not {operand.key})", operand.bars)
+            if isinstance(tree.op, ast.USub):
+                if operand.op == 'const':
+                    return self._const(-operand.value)
+                return self._intern('neg', (operand,), None, 'num', f"(-{operand.key})", operand.bars)
+            if isinstance(tree.op, ast.UAdd):
+                return operand
+            raise ExpressionError("不支持的一元运算")
+
+        if isinstance(tree, ast.BinOp):
+            op = _ARITH_OPS.get(type(tree.op))
+            if op is None:
+                raise ExpressionError("只支持 + - * / 四则运算")
+            left, right = self.visit(tree.left), self.visit(tree.right)
+            return self._intern(op, (left, right), None, 'num', f"({left.key} {op} {right.key})",
+                                max(left.bars, right.bars))
+
+        if isinstance(tree, ast.Compare):
+            operands = [self.visit(tree.left)] + [self.visit(item) for item in tree.comparators]
+            parts = []
+            for op_type, left, right in zip(tree.ops, operands, operands[1:]):
+                op = _COMPARE_OPS.get(type(op_type))
+                if op is None:
+                    raise ExpressionError("只支持 > >= < <= == != 比较")
+                parts.append(self._intern(op, (left, right), None, 'bool', f"({left.key} {op} {right.key})",
+                                          max(left.bars, right.bars)))
+            return parts[0] if len(parts) == 1 else self._bool_op('and', parts)
+
+        if isinstance(tree, ast.BoolOp):
+            op = 'and' if isinstance(tree.op, ast.And) else 'or'
+            return self._bool_op(op, [self._expect(self.visit(item), 'bool', op) for item in tree.values])
+
+        if isinstance(tree, ast.Call):
+            return self._call(tree)
+
+        raise ExpressionError(f"不支持的语法: {type(tree).__name__}")
+
+    def _bool_op(self, op: str, items: List[Node]) -> Node:
+        node = items[0]
+        for item in items[1:]:
+            node = self._intern(op, (node, item), None, 'bool', f"({node.key} {op} {item.key})",
+                                max(node.bars, item.bars))
+        return node
+
+    def _call(self, tree: ast.Call) -> Node:
+        if not isinstance(tree.func, ast.Name) or tree.keywords:
+            raise ExpressionError("函数调用格式错误")
+        func = tree.func.id.lower()
+
+        if func in WINDOW_FUNCTIONS:
+            if len(tree.args) != 2:
+                raise ExpressionError(f"{func} 需要2个参数: {func}(x, n)")
+            arg = self._expect(self.visit(tree.args[0]), WINDOW_FUNCTIONS[func], func)
+            period = self._period(tree.args[1], func)
+            kind = 'bool' if func in ('every', 'exist') else 'num'
+            bars = arg.bars + (period if func == 'ref' else period - 1)
+            if func == 'ref' and period == 0:
+                return arg
+            return self._intern(func, (arg,), period, kind, f"{func}({arg.key}, {period})", bars)
+
+        if func in ELEMENT_FUNCTIONS:
+            if len(tree.args) != ELEMENT_FUNCTIONS[func]:
+                raise ExpressionError(f"{func} 需要{ELEMENT_FUNCTIONS[func]}个参数")
+            args = tuple(self._expect(self.visit(item), 'num', func) for item in tree.args)
+            kind = 'bool' if func == 'cross' else 'num'
+            bars = max(arg.bars for arg in args) + (1 if func == 'cross' else 0)
+            return self._intern(func, args, None, kind, f"{func}({', '.join(arg.key for arg in args)})", bars)
+
+        raise ExpressionError(f"未知函数: {func}")
+
+
+@lru_cache(maxsize=256)
+def compile_expression(source: str) -> CompiledExpression:
+    """
+    解析并编译选股表达式（按表达式文本缓存）
+
+    Args:
+        source: 表达式文本
+
+    Returns:
+        CompiledExpression
+
+    Raises:
+        ExpressionError: 语法错误、未知字段或函数、结果不是条件表达式等
+    """
+    source = (source or '').strip()
+    if not source:
+        raise ExpressionError("表达式不能为空")
+    max_length = SCREENING_CONFIG.get('expression_max_length', 1000)
+    if len(source) > max_length:
+        raise ExpressionError(f"表达式长度不能超过 {max_length} 个字符")
+    try:
+        tree = ast.parse(source, mode='eval')
+    except SyntaxError as e:
+        raise ExpressionError(f"表达式语法错误: {e.msg}（第 {e.offset} 个字符）")
+
+    compiler = _Compiler(SCREENING_CONFIG.get('expression_max_period', 500))
+    root = compiler.visit(tree)
+    if root.kind != 'bool':
+        raise ExpressionError("表达式的结果必须是条件（包含比较或逻辑运算）")
+    # 节点按创建顺序即为依赖顺序（子节点先于父节点创建）
+    return CompiledExpression(source, root, list(compiler.nodes.values()))
+
+
+# ---------------------------------------------------------------------------
+# 向量化计算（每行为一只股票右对齐的交易日序列，缺失为 NaN，条件用 1.0 / 0.0 / NaN 表示）
+# ---------------------------------------------------------------------------
+
+def _logic(op: str, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """三值逻辑与/或"""
+    if op == 'and':
+        return np.where((a == 0) | (b == 0), 0.0, np.where((a == 1) & (b == 1), 1.0, np.nan))
+    return np.where((a == 1) | (b == 1), 1.0, np.where((a == 0) & (b == 0), 0.0, np.nan))
+
+
+def _compare(op: str, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid='ignore'):
+        if op == '>':
+            value = a > b
+        elif op == '>=':
+            value = a >= b
+        elif op == '<':
+            value = a < b
+        elif op == '<=':
+            value = a <= b
+        elif op == '==':
+            value = a == b
+        else:
+            value = a != b
+    return np.where(np.isnan(a) | np.isnan(b), np.nan, value.astype(np.float64))
+
+
+def _eval_node(node: Node, values: Dict[str, np.ndarray], window: PanelWindow, shape: Tuple[int, int]) -> np.ndarray:
+    if node.op == 'field':
+        return np.where(window.valid, window.fields[node.value], np.nan)
+    if node.op == 'const':
+        return np.full(shape, node.value)
+
+    args = [values[arg.key] for arg in node.args]
+    op = node.op
+    if op in ('+', '-', '*', '/'):
+        a, b = args
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = a + b if op == '+' else a - b if op == '-' else a * b if op == '*' else a / b
+        return np.where(np.isfinite(result), result, np.nan)
+    if op == 'neg':
+        return -args[0]
+    if op in ('>', '>=', '<', '<=', '==', '!='):
+        return _compare(op, *args)
+    if op in ('and', 'or'):
+        return _logic(op, *args)
+    if op == 'not':
+        return 1.0 - args[0]
+
+    period = node.value
+    if op == 'ref':
+        return shift(args[0], period)
+    if op == 'ma':
+        return rolling_sum(args[0], period) / period
+    if op in ('sum', 'count'):
+        return rolling_sum(args[0], period)
+    if op == 'std':
+        mean = rolling_sum(args[0], period) / period
+        mean_sq = rolling_sum(args[0] * args[0], period) / period
+        return np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+    if op == 'hhv':
+        return rolling_extreme(args[0], period, np.maximum)
+    if op == 'llv':
+        return rolling_extreme(args[0], period, np.minimum)
+    if op == 'every':
+        total = rolling_sum(args[0], period)
+        return np.where(np.isnan(total), np.nan, (total == period).astype(np.float64))
+    if op == 'exist':
+        total = rolling_sum(args[0], period)
+        return np.where(np.isnan(total), np.nan, (total > 0).astype(np.float64))
+    if op == 'abs':
+        return np.abs(args[0])
+    if op == 'max':
+        return np.maximum(*args)
+    if op == 'min':
+        return np.minimum(*args)
+    if op == 'cross':
+        a, b = args
+        above = _compare('>', a, b)
+        return _logic('and', above, _compare('<=', shift(a, 1), shift(b, 1)))
+    raise ExpressionError(f"未知运算: {op}")
+
+
+def evaluate_window(compiled: CompiledExpression, window: PanelWindow) -> np.ndarray:
+    """
+    在窗口上计算表达式
+
+    Returns:
+        每只股票最新交易日的结果（1.0 成立 / 0.0 不成立 / NaN 未知）
+    """
+    shape = window.valid.shape
+    if shape[0] == 0 or shape[1] == 0:
+        return np.full(shape[0], np.nan)
+    values: Dict[str, np.ndarray] = {}
+    for node in compiled.nodes:
+        values[node.key] = _eval_node(node, values, window, shape)
+    return values[compiled.root.key][:, -1]
+
+
+def evaluate_panel(compiled: CompiledExpression, panel: PricePanel, codes: Optional[List[str]] = None) -> List[Dict]:
+    """
+    在行情面板上执行选股表达式
+
+    Args:
+        compiled: 编译后的表达式
+        panel: 行情面板
+        codes: 股票代码列表，默认面板中的全部股票
+
+    Returns:
+        命中的股票列表 [{'code', 'name', 'date', 'close', 'change_percent'}]，按代码排序
+    """
+    if len(panel.dates) == 0:
+        return []
+    # 按所需交易日数截取最近的面板交易日（留出停牌余量）
+    columns = compiled.bars + max(_WINDOW_SLACK_MIN, int(math.ceil(compiled.bars * _WINDOW_SLACK_RATIO)))
+    start_date = panel.dates[max(0, len(panel.dates) - columns)]
+    fields = sorted(set(compiled.fields) | {'close', 'change_percent'})
+    window = panel.window(panel.codes.tolist() if codes is None else codes, start_date, None, fields=fields)
+    verdict = evaluate_window(compiled, window)
+
+    results = []
+    last = window.width - 1
+    for row in np.nonzero(verdict == 1.0)[0]:
+        results.append({
+            'code': window.codes[row],
+            'name': window.names[row],
+            'date': window.date(row, last),
+            'close': float(window.fields['close'][row, last]),
+            'change_percent': float(window.fields['change_percent'][row, last]),
+        })
+    return results
+
+
+# 选股结果缓存: (表达式摘要, 市场, 面板快照) -> 结果
+_result_cache: 'OrderedDict[tuple, List[Dict]]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def run_expression_screening(db: Session, expression: str, market: str = 'A') -> Dict[str, Any]:
+    """
+    执行选股表达式
+
+    Args:
+        db: 数据库会话
+        expression: 选股表达式
+        market: 市场（'A' 或 'HK'）
+
+    Returns:
+        {'data': 命中的股票, 'expression': 规范化表达式, 'market', 'trade_date', 'bars': 所需交易日数,
+         'cached': 是否来自缓存, 'elapsed': 耗时（秒）}
+
+    Raises:
+        ExpressionError: 表达式无效或市场不支持
+    """
+    if market not in MARKET_TABLES:
+        raise ExpressionError(f"不支持的市场: {market}，可选: {', '.join(MARKET_TABLES)}")
+    compiled = compile_expression(expression)
+    started = time.time()
+    panel = get_price_panel(db, market)
+    # 面板刷新时整体替换，对象标识与最新交易日即可区分快照
+    key = (compiled.digest, market, id(panel), panel.last_date)
+
+    with _cache_lock:
+        results = _result_cache.get(key)
+        if results is not None:
+            _result_cache.move_to_end(key)
+    cached = results is not None
+    if results is None:
+        results = evaluate_panel(compiled, panel)
+        with _cache_lock:
+            _result_cache[key] = results
+            while len(_result_cache) > SCREENING_CONFIG.get('expression_cache_size', 64):
+                _result_cache.popitem(last=False)
+
+    elapsed = time.time() - started
+    logger.info(f"表达式选股 [{market}] {compiled.key}: 命中 {len(results)} 只, 耗时 {elapsed:.3f}s"
+                f"{'（缓存）' if cached else ''}")
+    return {
+        'data': list(results),
+        'expression': compiled.key,
+        'market': market,
+        'trade_date': panel.last_date,
+        'bars': compiled.bars,
+        'cached': cached,
+        'elapsed': round(elapsed, 4),
+    }
@@ -0,0 +1,228 @@
+"""
+异步选股任务
+选股在后台线程中按分块执行，每完成一块更新进度并追加命中的股票，
+接口可随时查询进度，或通过 SSE 实时接收命中结果，避免长耗时策略阻塞单个HTTP请求而超时。
+
+策略回测（stock/strategy_backtest.py）同样以任务方式执行，results 为逐步追加的回测信号，完成后 report 为统计结果。
+
+任务状态: pending -> running -> completed / failed
+"""
+
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import logging
+
+from config import SCREENING_CONFIG
+from database import SessionLocal
+from stock.price_panel import get_panel_store
+from stock.screening_executor import failed_stocks
+from stock.screening_registry import get_strategy, resolve_params, run_strategy
+from stock.screening_results import load_precomputed
+from stock.strategy_backtest import check_backtest_request, run_backtest
+
+logger = logging.getLogger(__name__)
+
+# 全局变量存储选股任务状态
+screening_jobs: Dict[str, Dict[str, Any]] = {}
+job_lock = threading.Lock()
+
+FINISHED_STATUSES = ('completed', 'failed')
+
+
+def _cleanup_jobs():
+    """清理已结束且超过保留时间的任务（调用方需持有 job_lock）"""
+    ttl = SCREENING_CONFIG.get('job_ttl', 3600)
+    now = datetime.now()
+    expired = [job_id for job_id, job in screening_jobs.items()
+               if job['status'] in FINISHED_STATUSES and job['end_time']
+               and (now - job['end_time']).total_seconds() > ttl]
+    for job_id in expired:
+        del screening_jobs[job_id]
+
+
+def _register_job(prefix: str, strategy: str, params: Dict[str, Any], **fields) -> str:
+    """登记任务（检查运行中的任务数上限）"""
+    spec = get_strategy(strategy)
+    with job_lock:
+        _cleanup_jobs()
+        running = sum(1 for job in screening_jobs.values() if job['status'] not in FINISHED_STATUSES)
+        max_running = SCREENING_CONFIG.get('max_running_jobs', 2)
+        if running >= max_running:
+            raise ValueError(f"已有 {running} 个选股任务正在运行，请等待完成后再提交")
+
+        job_id = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        screening_jobs[job_id] = {
+            "status": "pending",
+            "strategy": strategy,
+            "strategy_name": spec['name'],
+            "params": params,
+            "progress": 0,
+            "total_stocks": 0,
+            "processed_stocks": 0,
+            "results": [],
+            "precomputed": False,
+            "trade_date": None,
+            "failed_count": 0,
+            "incomplete": False,
+            "start_time": datetime.now(),
+            "end_time": None,
+            "error_message": None,
+            **fields,
+        }
+    return job_id
+
+
+def create_screening_job(strategy: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    登记选股任务
+
+    Args:
+        strategy: 策略标识
+        params: 策略参数
+
+    Returns:
+        任务ID
+
+    Raises:
+        ValueError: 未知策略，或运行中的任务数已达上限
+    """
+    return _register_job('screening', strategy, resolve_params(strategy, params), kind='screening')
+
+
+def create_backtest_job(strategy: str, start_date: str, end_date: str, params: Optional[Dict[str, Any]] = None,
+                        horizons: Optional[List[int]] = None) -> str:
+    """
+    登记策略回测任务（与选股任务共用任务表与运行数上限，results 为回测信号，完成后 report 为统计结果）
+
+    Args:
+        strategy: 策略标识
+        start_date: 回测开始日期（YYYY-MM-DD）
+        end_date: 回测结束日期（YYYY-MM-DD）
+        params: 策略参数
+        horizons: 远期交易日数列表
+
+    Returns:
+        任务ID
+
+    Raises:
+        ValueError: 未知策略、日期区间无效，或运行中的任务数已达上限
+    """
+    check_backtest_request(strategy, start_date, end_date)
+    return _register_job('backtest', strategy, resolve_params(strategy, params), kind='backtest',
+                         start_date=start_date, end_date=end_date, horizons=horizons, report=None)
+
+
+def _update_job(job_id: str, **fields):
+    with job_lock:
+        job = screening_jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+
+
+def _progress_callback(job_id: str):
+    """进度回调：追加命中结果并更新已处理股票数"""
+    def on_progress(processed: int, total: int, hits: List[Dict]):
+        with job_lock:
+            job = screening_jobs.get(job_id)
+            if job is None:
+                return
+            job['results'].extend(hits)
+            job['processed_stocks'] = processed
+            job['total_stocks'] = total
+            job['progress'] = int(processed * 100 / total) if total else 100
+    return on_progress
+
+
+def run_screening_job(job_id: str):
+    """后台执行选股任务"""
+    with job_lock:
+        job = screening_jobs.get(job_id)
+        if job is None:
+            return
+        job['status'] = 'running'
+        strategy, params = job['strategy'], job['params']
+
+    on_progress = _progress_callback(job_id)
+    db = SessionLocal()
+    try:
+        logger.info(f"开始执行选股任务: {job_id}, 策略: {strategy}, 参数: {params}")
+        stored = load_precomputed(db, strategy, params)
+        if stored is not None:
+            _update_job(job_id, results=list(stored['data']), precomputed=True,
+                        trade_date=stored['trade_date'], progress=100)
+        else:
+            results = run_strategy(strategy, db, params, progress=on_progress)
+            with job_lock:
+                job = screening_jobs.get(job_id)
+                if job is not None and job['processed_stocks'] == 0:
+                    # 股票池为空等未触发进度回调的情况，直接使用最终结果
+                    job['results'] = list(results)
+            failed = failed_stocks(results)
+            if failed:
+                logger.warning(f"选股任务结果不完整: {job_id}, {len(failed)} 只股票超时或执行失败")
+            _update_job(job_id, trade_date=get_panel_store().latest_date(db), failed_count=len(failed),
+                        incomplete=bool(failed))
+        _update_job(job_id, status='completed', progress=100, end_time=datetime.now())
+        logger.info(f"选股任务完成: {job_id}")
+    except Exception as e:
+        logger.error(f"选股任务执行失败: {job_id}, 错误: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        _update_job(job_id, status='failed', error_message=str(e), end_time=datetime.now())
+    finally:
+        db.close()
+
+
+def run_backtest_job(job_id: str):
+    """后台执行策略回测任务"""
+    with job_lock:
+        job = screening_jobs.get(job_id)
+        if job is None:
+            return
+        job['status'] = 'running'
+        strategy, params = job['strategy'], job['params']
+        start_date, end_date, horizons = job['start_date'], job['end_date'], job['horizons']
+
+    db = SessionLocal()
+    try:
+        logger.info(f"开始执行回测任务: {job_id}, 策略: {strategy}, 区间: {start_date} 至 {end_date}")
+        report = run_backtest(db, strategy, start_date, end_date, params=params, horizons=horizons,
+                              progress=_progress_callback(job_id))
+        signals = report.pop('signals')
+        # 信号顺序与进度回调追加的顺序一致，替换为带远期收益的完整信号
+        _update_job(job_id, results=signals, report=report, status='completed', progress=100,
+                    end_time=datetime.now())
+        logger.info(f"回测任务完成: {job_id}, 信号 {len(signals)} 个")
+    except Exception as e:
+        logger.error(f"回测任务执行失败: {job_id}, 错误: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        _update_job(job_id, status='failed', error_message=str(e), end_time=datetime.now())
+    finally:
+        db.close()
+
+
+def get_screening_job(job_id: str, offset: int = 0) -> Optional[Dict[str, Any]]:
+    """
+    获取任务状态快照
+
+    Args:
+        job_id: 任务ID
+        offset: 只返回第 offset 个之后的命中结果（用于增量拉取）
+
+    Returns:
+        任务状态字典，任务不存在时返回None
+    """
+    with job_lock:
+        job = screening_jobs.get(job_id)
+        if job is None:
+            return None
+        snapshot = {key: value for key, value in job.items() if key != 'results'}
+        snapshot['job_id'] = job_id
+        snapshot['hit_count'] = len(job['results'])
+        snapshot['offset'] = offset
+        snapshot['results'] = list(job['results'][offset:])
+    return snapshot
+
@@ -0,0 +1,152 @@
+"""
+选股策略注册表
+统一登记各选股策略的名称、主函数与默认参数，供预计算、任务接口等按策略标识调用
+
+backtest 为逐只执行策略所需的定义（策略回测 stock/strategy_backtest.py、组合选股 stock/composite_screening.py 使用），
+与主函数中的股票池和日期范围保持一致：
+- screen: 逐只选股函数 screen(panel, stocks, start_date, end_date, **screen_params)
+- stock_pool: 股票池的 stock_basic_info 查询条件
+- lookback_days: 回看自然日数（可为参数的函数）
+- screen_params: 需要传给逐只选股函数的参数名
+- signals: 可选，向量化的回测信号函数 signals(panel, stocks, as_of_dates, lookback_days, **screen_params)，
+  一次计算全部回放日的信号（与逐日回放 screen 的结果一致），回测优先使用
+"""
+
+import json
+from typing import Any, Callable, Dict
+
+from stock.stock_screening import StockScreeningStrategy
+from stock.cyb_midline_vectorized import CybMidlineVectorizedStrategy
+from stock.high_tight_flag_strategy import HighTightFlagStrategy
+from stock.keep_increasing_strategy import KeepIncreasingStrategy
+from stock.long_lower_shadow_strategy import LongLowerShadowStrategy
+from stock.low_nine_strategy import LowNineStrategy
+
+
+# 策略标识 -> {name: 策略名称, func: 主函数 func(db, **params), defaults: 默认参数, backtest: 回测定义}
+SCREENING_STRATEGIES: Dict[str, Dict[str, Any]] = {
+    'cyb_midline': {
+        'name': '创业板中线选股策略',
+        'func': CybMidlineVectorizedStrategy.screening_cyb_midline_strategy,
+        'defaults': {'months': 4},
+        'backtest': {
+            'screen': StockScreeningStrategy.screen_cyb_midline_stocks,
+            'stock_pool': "code LIKE '3%' AND LENGTH(code) = 6 AND name NOT LIKE '%ST%'",
+            'lookback_days': lambda params: params['months'] * 30,
+            'screen_params': ('months',),
+            'signals': CybMidlineVectorizedStrategy.replay_signals,
+        },
+    },
+    'parking_apron': {
+        'name': '停机坪',
+        'func': StockScreeningStrategy.screening_parking_apron_strategy,
+        'defaults': {},
+        'backtest': {
+            'screen': StockScreeningStrategy.screen_parking_apron_stocks,
+            'stock_pool': "LENGTH(code) = 6 AND code NOT LIKE '3%'",
+            'lookback_days': 30,
+            'screen_params': (),
+            'signals': StockScreeningStrategy.replay_parking_apron_signals,
+        },
+    },
+    'backtrace_ma250': {
+        'name': '回踩年线',
+        'func': StockScreeningStrategy.screening_backtrace_ma250_strategy,
+        'defaults': {},
+        'backtest': {
+            'screen': StockScreeningStrategy.screen_backtrace_ma250_stocks,
+            'stock_pool': "LENGTH(code) = 6",
+            'lookback_days': 400,
+            'screen_params': (),
+            'signals': StockScreeningStrategy.replay_backtrace_ma250_signals,
+        },
+    },
+    'high_tight_flag': {
+        'name': '高而窄的旗形',
+        'func': HighTightFlagStrategy.screening_high_tight_flag_strategy,
+        'defaults': {},
+        'backtest': {
+            'screen': HighTightFlagStrategy.screen_high_tight_flag_stocks,
+            'stock_pool': "LENGTH(code) = 6",
+            'lookback_days': 100,
+            'screen_params': (),
+            'signals': HighTightFlagStrategy.replay_signals,
+        },
+    },
+    'keep_increasing': {
+        'name': '持续上涨（MA30向上）',
+        'func': KeepIncreasingStrategy.screening_keep_increasing_strategy,
+        'defaults': {},
+        'backtest': {
+            'screen': KeepIncreasingStrategy.screen_keep_increasing_stocks,
+            'stock_pool': "LENGTH(code) = 6",
+            'lookback_days': 60,
+            'screen_params': (),
+            'signals': KeepIncreasingStrategy.replay_signals,
+        },
+    },
+    'long_lower_shadow': {
+        'name': '长下影阳线',
+        'func': LongLowerShadowStrategy.screening_long_lower_shadow_strategy,
+        'defaults': {
+            'lower_shadow_ratio': 1.0,
+            'upper_shadow_ratio': 0.3,
+            'min_amplitude': 0.02,
+            'recent_days': 2,
+        },
+        'backtest': {
+            'screen': LongLowerShadowStrategy.screen_long_lower_shadow_stocks,
+            'stock_pool': "LENGTH(code) = 6 AND code NOT LIKE '3%' AND code NOT LIKE '688%' AND code NOT LIKE '9%'",
+            'lookback_days': 30,
+            'screen_params': ('lower_shadow_ratio', 'upper_shadow_ratio', 'min_amplitude', 'recent_days'),
+            'signals': LongLowerShadowStrategy.replay_signals,
+        },
+    },
+    'low_nine': {
+        'name': '低九策略',
+        'func': LowNineStrategy.screening_low_nine_strategy,
+        'defaults': {'limit': None},
+        'backtest': {
+            'screen': LowNineStrategy.screen_low_nine_stocks,
+            'stock_pool': "LENGTH(code) = 6 AND name NOT LIKE '%ST%'",
+            'lookback_days': 30,
+            'screen_params': (),
+            'signals': LowNineStrategy.replay_signals,
+        },
+    },
+}
+
+
+def get_strategy(strategy: str) -> Dict[str, Any]:
+    """按标识获取策略定义，未知策略抛出 ValueError"""
+    spec = SCREENING_STRATEGIES.get(strategy)
+    if spec is None:
+        raise ValueError(f"未知的选股策略: {strategy}")
+    return spec
+
+
+def resolve_params(strategy: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
+    """合并默认参数，忽略值为None的传入参数"""
+    resolved = dict(get_strategy(strategy)['defaults'])
+    for key, value in (params or {}).items():
+        if value is not None:
+            resolved[key] = value
+    return resolved
+
+
+def is_default_params(strategy: str, params: Dict[str, Any] = None) -> bool:
+    """参数是否与默认参数一致"""
+    return resolve_params(strategy, params) == get_strategy(strategy)['defaults']
+
+
+def params_key(params: Dict[str, Any]) -> str:
+    """参数的规范化字符串表示，用作存储键"""
+    return json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+
+def run_strategy(strategy: str, db, params: Dict[str, Any] = None, progress: Callable = None) -> list:
+    """按标识执行选股策略，progress 为进度回调（见 ScreeningExecutor.run）"""
+    func: Callable = get_strategy(strategy)['func']
+    if progress is not None:
+        return func(db, progress=progress, **resolve_params(strategy, params))
+    return func(db, **resolve_params(strategy, params))
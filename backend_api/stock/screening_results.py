@@ -0,0 +1,182 @@
+"""
+选股结果物化存储
+收盘后按默认参数预先执行全部选股策略，将结果按 (strategy, params, trade_date) 写入 screening_results 表；
+接口在参数为默认值且存储结果对应最新交易日时直接返回存储结果，否则实时计算。
+
+使用方式:
+    # 收盘后（由 backend_core 定时任务调用）
+    precompute_screening_results(db)
+
+    # 接口
+    screening = get_screening_results(db, 'low_nine', {'limit': None})
+    results = screening['data']
+"""
+
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+import logging
+
+from stock.json_utils import json_default
+from stock.price_panel import get_panel_store
+from stock.screening_executor import failed_stocks
+from stock.screening_registry import (
+    SCREENING_STRATEGIES, get_strategy, is_default_params, params_key, resolve_params, run_strategy
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ScreeningResultStore:
+    """选股结果表读写"""
+
+    _table_ready = False
+
+    @staticmethod
+    def ensure_table(db: Session):
+        """创建 screening_results 表（每个进程只执行一次）"""
+        if ScreeningResultStore._table_ready:
+            return
+        db.execute(text("""
+            CREATE TABLE IF NOT EXISTS screening_results (
+                strategy TEXT NOT NULL,
+                params TEXT NOT NULL,
+                trade_date TEXT NOT NULL,
+                results TEXT NOT NULL,
+                total INTEGER NOT NULL DEFAULT 0,
+                elapsed REAL,
+                created_at TIMESTAMP,
+                PRIMARY KEY (strategy, params, trade_date)
+            )
+        """))
+        db.commit()
+        ScreeningResultStore._table_ready = True
+
+    @staticmethod
+    def save(db: Session, strategy: str, params: Dict[str, Any], trade_date: str,
+             results: List[Dict], elapsed: Optional[float] = None):
+        """写入（覆盖）一次选股结果"""
+        ScreeningResultStore.ensure_table(db)
+        db.execute(text("""
+            INSERT INTO screening_results (strategy, params, trade_date, results, total, elapsed, created_at)
+            VALUES (:strategy, :params, :trade_date, :results, :total, :elapsed, :created_at)
+            ON CONFLICT (strategy, params, trade_date) DO UPDATE SET
+                results = EXCLUDED.results,
+                total = EXCLUDED.total,
+                elapsed = EXCLUDED.elapsed,
+                created_at = EXCLUDED.created_at
+        """), {
+            'strategy': strategy,
+            'params': params_key(params),
+            'trade_date': trade_date,
+            'results': json.dumps(results, ensure_ascii=False, default=json_default),
+            'total': len(results),
+            'elapsed': elapsed,
+            'created_at': datetime.now(),
+        })
+        db.commit()
+
+    @staticmethod
+    def load(db: Session, strategy: str, params: Dict[str, Any], trade_date: str) -> Optional[List[Dict]]:
+        """读取指定交易日的选股结果，不存在时返回None"""
+        ScreeningResultStore.ensure_table(db)
+        row = db.execute(text("""
+            SELECT results FROM screening_results
+            WHERE strategy = :strategy AND params = :params AND trade_date = :trade_date
+        """), {'strategy': strategy, 'params': params_key(params), 'trade_date': trade_date}).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+
+def precompute_screening_results(db: Session, strategies: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    按默认参数执行选股策略并写入 screening_results
+
+    Args:
+        db: 数据库会话
+        strategies: 策略标识列表，默认全部策略
+
+    Returns:
+        执行统计 {'trade_date', 'success': [...], 'failed': [...]}
+    """
+    store = get_panel_store()
+    panel = store.refresh(db)
+    trade_date = panel.last_date
+    summary = {'trade_date': trade_date, 'success': [], 'failed': []}
+    if trade_date is None:
+        logger.warning("行情面板为空，跳过选股结果预计算")
+        return summary
+
+    logger.info(f"开始预计算选股结果，交易日: {trade_date}")
+    for strategy in strategies or list(SCREENING_STRATEGIES.keys()):
+        params = get_strategy(strategy)['defaults']
+        try:
+            started = time.time()
+            results = run_strategy(strategy, db, params)
+            elapsed = time.time() - started
+            failed = failed_stocks(results)
+            if failed:
+                # 不完整的结果不写入，接口改为实时计算
+                summary['failed'].append(strategy)
+                logger.error(f"选股结果预计算不完整 [{strategy}]: {len(failed)} 只股票超时或执行失败，未写入")
+                continue
+            ScreeningResultStore.save(db, strategy, params, trade_date, results, elapsed=elapsed)
+            summary['success'].append(strategy)
+            logger.info(f"选股结果预计算完成 [{strategy}]: {len(results)} 只, 耗时 {elapsed:.2f}s")
+        except Exception as e:
+            db.rollback()
+            summary['failed'].append(strategy)
+            logger.error(f"选股结果预计算失败 [{strategy}]: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+    return summary
+
+
+def load_precomputed(db: Session, strategy: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    读取最新交易日的预计算结果，非默认参数、无结果或读取失败时返回None
+
+    Returns:
+        {'data': 结果列表, 'trade_date': 数据交易日, 'precomputed': True, 'failed_count': 0, 'incomplete': False}
+    """
+    params = resolve_params(strategy, params)
+    if not is_default_params(strategy, params):
+        return None
+    try:
+        trade_date = get_panel_store().latest_date(db)
+        stored = ScreeningResultStore.load(db, strategy, params, trade_date) if trade_date else None
+        if stored is not None:
+            return {'data': stored, 'trade_date': trade_date, 'precomputed': True,
+                    'failed_count': 0, 'incomplete': False}
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"读取预计算选股结果失败 [{strategy}]: {str(e)}")
+    return None
+
+
+def get_screening_results(db: Session, strategy: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    获取选股结果：默认参数且已有最新交易日的预计算结果时直接返回，否则实时计算
+
+    Args:
+        db: 数据库会话
+        strategy: 策略标识
+        params: 策略参数（None 值按默认参数处理）
+
+    Returns:
+        {'data': 结果列表, 'trade_date': 数据交易日, 'precomputed': 是否来自预计算结果,
+         'failed_count': 超时或执行失败而未计算的股票数, 'incomplete': 结果是否不完整}
+    """
+    stored = load_precomputed(db, strategy, params)
+    if stored is not None:
+        return stored
+
+    results = run_strategy(strategy, db, params)
+    failed = failed_stocks(results)
+    return {'data': results, 'trade_date': get_panel_store().latest_date(db), 'precomputed': False,
+            'failed_count': len(failed), 'incomplete': bool(failed)}
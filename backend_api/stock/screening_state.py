@@ -0,0 +1,157 @@
+"""
+增量选股状态
+按 (策略函数, 参数, 日期区间) 保存每只股票上次计算时的窗口指纹与结果。
+再次执行时先对全部股票计算指纹，只有出现新交易日或历史数据被修正的股票才重新计算，其余直接复用上次的结果。
+
+窗口指纹包括：
+- 策略依赖的最近 window_bars 个交易日（None 为整个日期区间）的全部行情字段与交易日
+- 日期区间内的有效交易日数（策略普遍有"至少N个交易日"的判断）
+- 股票名称（结果中包含名称）
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+
+from stock.price_panel import PANEL_FIELDS, PricePanel
+
+logger = logging.getLogger(__name__)
+
+# 面板中不存在的股票使用的固定指纹
+_MISSING = b'missing'
+
+
+class ScreeningState:
+    """增量选股状态（进程内，按 LRU 保留最近使用的若干组状态）"""
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max(1, max_entries)
+        # key -> {code: (指纹, 该股票的结果列表)}
+        self._entries: 'OrderedDict[tuple, Dict[str, Tuple[bytes, List[Dict]]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprints(panel: PricePanel, stocks: Sequence[Tuple[str, str]], start_date: Optional[str] = None,
+                     end_date: Optional[str] = None, window_bars: Optional[int] = None) -> Dict[str, bytes]:
+        """
+        计算每只股票的窗口指纹
+
+        Args:
+            panel: 行情面板
+            stocks: (code, name) 列表
+            start_date: 开始日期（YYYY-MM-DD）
+            end_date: 结束日期（YYYY-MM-DD）
+            window_bars: 策略依赖的最近交易日数（None 为整个日期区间）
+
+        Returns:
+            code -> 指纹
+        """
+        names = {str(code): name for code, name in stocks}
+        window = panel.window(list(names.keys()), start_date, end_date)
+        result = {code: _MISSING for code in names}
+        if len(window) == 0:
+            return result
+
+        width = window.width
+        bars = width if window_bars is None else min(window_bars, width)
+        tail = slice(width - bars, width)
+        valid = window.valid[:, tail]
+        # 右对齐窗口左侧的填充位置不参与指纹
+        block = np.concatenate(
+            [np.where(valid, window.fields[f][:, tail], 0.0) for f in PANEL_FIELDS]
+            + [np.where(valid, window.date_index[:, tail], -1).astype(np.float64)],
+            axis=1,
+        )
+        block = np.ascontiguousarray(block)
+        for row, code in enumerate(window.codes):
+            digest = hashlib.blake2b(block[row].tobytes(), digest_size=16)
+            digest.update(int(window.lengths[row]).to_bytes(4, 'little'))
+            digest.update(str(names[code]).encode('utf-8'))
+            result[code] = digest.digest()
+        return result
+
+    def run(self, runner: Callable, func: Callable[..., List[Dict]], panel: PricePanel,
+            stocks: List[Tuple[str, str]], start_date: Optional[str], end_date: Optional[str],
+            window_bars: Optional[int] = None, progress: Optional[Callable] = None, **kwargs) -> List[Dict]:
+        """
+        增量执行选股
+
+        Args:
+            runner: 实际执行函数，runner(func, panel, stocks, start_date, end_date, progress=..., **kwargs)
+                    返回 (结果列表, 执行失败的股票)
+            func: 逐只选股函数
+            panel: 行情面板
+            stocks: (code, name) 列表
+            start_date: 开始日期
+            end_date: 结束日期
+            window_bars: 策略依赖的最近交易日数
+            progress: 进度回调
+            **kwargs: 策略参数
+
+        Returns:
+            按股票池原顺序合并的结果列表
+        """
+        key = (func.__module__, func.__qualname__, start_date, end_date,
+               json.dumps(kwargs, sort_keys=True, default=str), window_bars)
+        prints = self.fingerprints(panel, stocks, start_date, end_date, window_bars)
+
+        with self._lock:
+            entry = dict(self._entries.get(key, {}))
+
+        changed = [(code, name) for code, name in stocks
+                   if code not in entry or entry[code][0] != prints[code]]
+        reused = len(stocks) - len(changed)
+        total = len(stocks)
+
+        wrapped = None
+        if progress is not None:
+            if reused:
+                changed_codes = {code for code, _ in changed}
+                progress(reused, total, [hit for code, _ in stocks if code not in changed_codes
+                                         for hit in entry[code][1]])
+
+            def wrapped(processed, _total, hits):
+                progress(reused + processed, total, hits)
+
+        new_results, failed = runner(func, panel, changed, start_date, end_date, progress=wrapped, **kwargs) \
+            if changed else ([], [])
+
+        by_code: Dict[str, List[Dict]] = {}
+        for item in new_results:
+            by_code.setdefault(str(item.get('code')), []).append(item)
+        failed_codes = {code for code, _ in failed}
+        for code, _ in changed:
+            if code in failed_codes:
+                # 执行失败的股票不写入状态，下次重新计算
+                entry.pop(code, None)
+            else:
+                entry[code] = (prints[code], by_code.get(code, []))
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        logger.info(f"增量选股 [{func.__qualname__}]: 股票 {total} 只, 复用 {reused} 只, "
+                    f"重新计算 {len(changed)} 只")
+
+        results: List[Dict] = []
+        for code, _ in stocks:
+            if code in failed_codes:
+                continue
+            if code in by_code:
+                results.extend(by_code[code])
+            elif code in entry:
+                results.extend(entry[code][1])
+        return results
+
+    def clear(self):
+        """清空全部状态"""
+        with self._lock:
+            self._entries.clear()
@@ -2,16 +2,26 @@ import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
+import asyncio
+import copy
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from bisect import bisect_left, insort
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from database import get_db
 from models import HistoricalQuotes, StockRealtimeQuote, HistoricalQuotesHK, StockRealtimeQuoteHK, StockBasicInfoHK, StockBasicInfo
+from config import ANALYSIS_CONFIG
+from stock import indicators
+from stock.analysis_cache import get_analysis_cache
+from stock.analysis_snapshots import AnalysisSnapshots
 
 logger = logging.getLogger(__name__)
 
 class TechnicalIndicators:
-    """技术指标计算类"""
+    """技术指标计算类（单只股票接口，计算由 stock.indicators 向量化实现）"""
     
     @staticmethod
     def calculate_rsi(prices: List[float], period: int = 14) -> float:
@@ -19,19 +29,7 @@ class TechnicalIndicators:
         if len(prices) < period + 1:
             return 50.0
         
-        deltas = np.diff(prices)
-        gains = np.where(deltas > 0, deltas, 0)
-        losses = np.where(deltas < 0, -deltas, 0)
-        
-        avg_gain = np.mean(gains[-period:])
-        avg_loss = np.mean(losses[-period:])
-        
-        if avg_loss == 0:
-            return 100.0
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return round(rsi, 2)
+        return round(float(indicators.rsi(prices, period)[0, -1]), 2)
     
     @staticmethod
     def calculate_macd(prices: List[float], fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, float]:
@@ -39,18 +37,12 @@ class TechnicalIndicators:
         if len(prices) < slow:
             return {"macd": 0.0, "signal": 0.0, "histogram": 0.0}
         
-        prices_array = np.array(prices)
-        ema_fast = TechnicalIndicators._calculate_ema(prices_array, fast)
-        ema_slow = TechnicalIndicators._calculate_ema(prices_array, slow)
-        
-        macd_line = ema_fast - ema_slow
-        signal_line = TechnicalIndicators._calculate_ema(macd_line, signal)
-        histogram = macd_line - signal_line
+        macd_line, signal_line, histogram = indicators.macd(prices, fast, slow, signal)
         
         return {
-            "macd": round(macd_line[-1], 4),
-            "signal": round(signal_line[-1], 4),
-            "histogram": round(histogram[-1], 4)
+            "macd": round(float(macd_line[0, -1]), 4),
+            "signal": round(float(signal_line[0, -1]), 4),
+            "histogram": round(float(histogram[0, -1]), 4)
         }
     
     @staticmethod
@@ -59,29 +51,12 @@ class TechnicalIndicators:
         if len(closes) < period:
             return {"k": 50.0, "d": 50.0, "j": 50.0}
         
-        highs_array = np.array(highs)
-        lows_array = np.array(lows)
-        closes_array = np.array(closes)
-        
-        # 计算RSV
-        highest_high = pd.Series(highs_array).rolling(window=period).max()
-        lowest_low = pd.Series(lows_array).rolling(window=period).min()
-        rsv = 100 * (closes_array - lowest_low) / (highest_high - lowest_low)
-        
-        # 计算K、D、J值
-        k = 50.0
-        d = 50.0
-        
-        for i in range(len(rsv)):
-            if not np.isnan(rsv[i]):
-                k = (2/3) * k + (1/3) * rsv[i]
-                d = (2/3) * d + (1/3) * k
-                j = 3 * k - 2 * d
+        k, d, j = indicators.kdj(highs, lows, closes, period)
         
         return {
-            "k": round(k, 2),
-            "d": round(d, 2),
-            "j": round(j, 2)
+            "k": round(float(k[0, -1]), 2),
+            "d": round(float(d[0, -1]), 2),
+            "j": round(float(j[0, -1]), 2)
         }
     
     @staticmethod
@@ -90,37 +65,89 @@ class TechnicalIndicators:
         if len(prices) < period:
             return {"upper": 0.0, "middle": 0.0, "lower": 0.0}
         
-        prices_array = np.array(prices)
-        middle = np.mean(prices_array[-period:])
-        std = np.std(prices_array[-period:])
-        
-        upper = middle + (std_dev * std)
-        lower = middle - (std_dev * std)
+        upper, middle, lower = indicators.bollinger(prices, period, std_dev)
         
         return {
-            "upper": round(upper, 2),
-            "middle": round(middle, 2),
-            "lower": round(lower, 2)
+            "upper": round(float(upper[0, -1]), 2),
+            "middle": round(float(middle[0, -1]), 2),
+            "lower": round(float(lower[0, -1]), 2)
         }
     
     @staticmethod
-    def _calculate_ema(prices: np.ndarray, period: int) -> np.ndarray:
-        """计算指数移动平均"""
-        alpha = 2 / (period + 1)
-        ema = np.zeros_like(prices)
-        ema[0] = prices[0]
+    def calculate_atr(highs: List[float], lows: List[float], closes: List[float], period: int = 14) -> float:
+        """计算ATR（平均真实波幅）"""
+        if len(closes) < period:
+            return 0.0
+        
+        return round(float(indicators.atr(highs, lows, closes, period)[0, -1]), 4)
+    
+    @staticmethod
+    def calculate_batch(highs: List[List[float]], lows: List[List[float]], closes: List[List[float]]) -> List[Dict]:
+        """
+        批量计算多只股票的技术指标（一次向量化计算）
         
-        for i in range(1, len(prices)):
-            ema[i] = alpha * prices[i] + (1 - alpha) * ema[i-1]
+        Args:
+            highs: 每只股票的最高价序列（时间升序）
+            lows: 每只股票的最低价序列
+            closes: 每只股票的收盘价序列
         
-        return ema
+        Returns:
+            与输入顺序一致的 [{'rsi', 'macd', 'kdj', 'bollinger_bands', 'atr'}]，
+            各项与单只股票接口（calculate_rsi 等）的结果相同
+        """
+        if not closes:
+            return []
+        
+        close_matrix = indicators.align_series(closes)
+        high_matrix = indicators.align_series(highs)
+        low_matrix = indicators.align_series(lows)
+        rsi = indicators.rsi(close_matrix)[:, -1]
+        macd_line, signal_line, histogram = indicators.macd(close_matrix)
+        k, d, j = indicators.kdj(high_matrix, low_matrix, close_matrix)
+        upper, middle, lower = indicators.bollinger(close_matrix)
+        atr = indicators.atr(high_matrix, low_matrix, close_matrix)[:, -1]
+        
+        results = []
+        for row, series in enumerate(closes):
+            length = len(series)
+            results.append({
+                "rsi": round(float(rsi[row]), 2) if length >= 15 else 50.0,
+                "macd": {
+                    "macd": round(float(macd_line[row, -1]), 4),
+                    "signal": round(float(signal_line[row, -1]), 4),
+                    "histogram": round(float(histogram[row, -1]), 4)
+                } if length >= 26 else {"macd": 0.0, "signal": 0.0, "histogram": 0.0},
+                "kdj": {
+                    "k": round(float(k[row, -1]), 2),
+                    "d": round(float(d[row, -1]), 2),
+                    "j": round(float(j[row, -1]), 2)
+                } if length >= 9 else {"k": 50.0, "d": 50.0, "j": 50.0},
+                "bollinger_bands": {
+                    "upper": round(float(upper[row, -1]), 2),
+                    "middle": round(float(middle[row, -1]), 2),
+                    "lower": round(float(lower[row, -1]), 2)
+                } if length >= 20 else {"upper": 0.0, "middle": 0.0, "lower": 0.0},
+                "atr": round(float(atr[row]), 4) if length >= 14 else 0.0,
+            })
+        return results
+    
+    @staticmethod
+    def _calculate_ema(prices: np.ndarray, period: int) -> np.ndarray:
+        """计算指数移动平均"""
+        return indicators.ema(prices, period)[0]
 
 class PricePrediction:
     """价格预测类"""
     
     @staticmethod
-    def predict_price(historical_data: List[Dict], days: int = 30) -> Dict:
-        """基于历史数据预测价格"""
+    def predict_price(historical_data: List[Dict], days: int = 30, technical: Dict = None) -> Dict:
+        """基于历史数据预测价格
+        
+        Args:
+            historical_data: 历史数据
+            days: 预测天数
+            technical: 已计算的技术指标（可选，TechnicalIndicators.calculate_batch 的单只股票结果）
+        """
         if len(historical_data) < 20:
             return {
                 "target_price": 0.0,
@@ -133,8 +160,11 @@ class PricePrediction:
         closes = [float(data['close']) for data in historical_data]
         
         # 计算技术指标
-        rsi = TechnicalIndicators.calculate_rsi(closes)
-        macd = TechnicalIndicators.calculate_macd(closes)
+        if technical:
+            rsi, macd = technical["rsi"], technical["macd"]
+        else:
+            rsi = TechnicalIndicators.calculate_rsi(closes)
+            macd = TechnicalIndicators.calculate_macd(closes)
         
         # 简单的线性回归预测
         x = np.arange(len(closes))
@@ -196,13 +226,15 @@ class TradingRecommendation:
     """交易建议类"""
     
     @staticmethod
-    def generate_recommendation(historical_data: List[Dict], current_price: float, price_prediction: Dict = None) -> Dict:
+    def generate_recommendation(historical_data: List[Dict], current_price: float, price_prediction: Dict = None,
+                                technical: Dict = None) -> Dict:
         """生成交易建议
         
         Args:
             historical_data: 历史数据
             current_price: 当前价格
             price_prediction: 价格预测结果（可选），包含target_price和change_percent
+            technical: 已计算的技术指标（可选，TechnicalIndicators.calculate_batch 的单只股票结果）
         """
         if len(historical_data) < 20:
             return {
@@ -219,10 +251,13 @@ class TradingRecommendation:
         lows = [float(data['low']) for data in historical_data]
         
         # 计算技术指标
-        rsi = TechnicalIndicators.calculate_rsi(closes)
-        macd = TechnicalIndicators.calculate_macd(closes)
-        kdj = TechnicalIndicators.calculate_kdj(highs, lows, closes)
-        bb = TechnicalIndicators.calculate_bollinger_bands(closes)
+        if technical:
+            rsi, macd, kdj, bb = technical["rsi"], technical["macd"], technical["kdj"], technical["bollinger_bands"]
+        else:
+            rsi = TechnicalIndicators.calculate_rsi(closes)
+            macd = TechnicalIndicators.calculate_macd(closes)
+            kdj = TechnicalIndicators.calculate_kdj(highs, lows, closes)
+            bb = TechnicalIndicators.calculate_bollinger_bands(closes)
         
         # 分析信号
         signals = TradingRecommendation._analyze_signals(rsi, macd, kdj, bb, current_price, volumes)
@@ -475,27 +510,55 @@ class KeyLevels:
         
         return resistance_levels[:3]
     
+    @staticmethod
+    def _local_extrema(values: List[float], window_size: int, find_max: bool) -> np.ndarray:
+        """
+        局部极值点下标：values[i] 不低于（find_max）/ 不高于前后 window_size 根K线的全部值，首尾 window_size 根除外
+        
+        以 2*window_size+1 日滑动最高/最低值（stock.indicators，向量化）判断，与逐根比较整个窗口的结果相同
+        """
+        n = len(values)
+        span = 2 * window_size + 1
+        if n < span:
+            return np.array([], dtype=int)
+        series = np.asarray(values, dtype=float)
+        extreme = (indicators.rolling_max if find_max else indicators.rolling_min)(series, span)[0]
+        # 窗口 [i-w, i+w] 的极值位于 extreme[i+w]
+        centers = series[window_size:n - window_size]
+        window_extreme = extreme[span - 1:]
+        if find_max:
+            return np.nonzero(centers >= window_extreme)[0] + window_size
+        return np.nonzero(centers <= window_extreme)[0] + window_size
+    
+    @staticmethod
+    def _is_near_existing(value: float, existing: List[float], tolerance: float) -> bool:
+        """existing 为升序列表，判断其中是否有与 value 距离小于 tolerance 的价位（只需比较相邻的两个）"""
+        pos = bisect_left(existing, value)
+        if pos < len(existing) and abs(value - existing[pos]) < tolerance:
+            return True
+        return pos > 0 and abs(value - existing[pos - 1]) < tolerance
+    
     @staticmethod
     def _find_significant_lows(lows: List[float], volumes: List[float], current_price: float) -> List[float]:
         """寻找重要低点（参考东方财富网、同花顺等主流网站）"""
         significant_lows = []
+        accepted = []  # 已选低点的升序副本，用于邻近判断
         window_size = 3  # 滑动窗口大小，参考主流网站
+        avg_volume = sum(volumes) / len(volumes) if volumes else 0
         
-        for i in range(window_size, len(lows) - window_size):
-            # 检查是否为局部最低点
-            is_local_min = all(lows[i] <= lows[j] for j in range(i - window_size, i + window_size + 1))
-            
+        for i in KeyLevels._local_extrema(lows, window_size, find_max=False):
             # 支撑位必须严格小于当前价格
-            if is_local_min and lows[i] < current_price and lows[i] > 0:
+            if lows[i] < current_price and lows[i] > 0:
                 # 计算成交量权重
-                avg_volume = sum(volumes) / len(volumes) if volumes else 0
                 volume_weight = volumes[i] / avg_volume if avg_volume > 0 else 1
                 
                 # 只有成交量较大的低点才被认为是重要的（参考主流网站标准）
                 if volume_weight > 0.8:  # 成交量超过平均值的80%
                     # 避免过于接近的低点
-                    if not any(abs(lows[i] - existing) < current_price * 0.02 for existing in significant_lows):
-                        significant_lows.append(round(lows[i], 2))
+                    if not KeyLevels._is_near_existing(lows[i], accepted, current_price * 0.02):
+                        level = round(lows[i], 2)
+                        significant_lows.append(level)
+                        insort(accepted, level)
         
         return significant_lows
     
@@ -503,23 +566,23 @@ class KeyLevels:
     def _find_significant_highs(highs: List[float], volumes: List[float], current_price: float) -> List[float]:
         """寻找重要高点（参考东方财富网、同花顺等主流网站）"""
         significant_highs = []
+        accepted = []  # 已选高点的升序副本，用于邻近判断
         window_size = 3  # 滑动窗口大小，参考主流网站
+        avg_volume = sum(volumes) / len(volumes) if volumes else 0
         
-        for i in range(window_size, len(highs) - window_size):
-            # 检查是否为局部最高点
-            is_local_max = all(highs[i] >= highs[j] for j in range(i - window_size, i + window_size + 1))
-            
+        for i in KeyLevels._local_extrema(highs, window_size, find_max=True):
             # 阻力位必须严格大于当前价格
-            if is_local_max and highs[i] > current_price:
+            if highs[i] > current_price:
                 # 计算成交量权重
-                avg_volume = sum(volumes) / len(volumes) if volumes else 0
                 volume_weight = volumes[i] / avg_volume if avg_volume > 0 else 1
                 
                 # 只有成交量较大的高点才被认为是重要的（参考主流网站标准）
                 if volume_weight > 0.8:  # 成交量超过平均值的80%
                     # 避免过于接近的高点
-                    if not any(abs(highs[i] - existing) < current_price * 0.02 for existing in significant_highs):
-                        significant_highs.append(round(highs[i], 2))
+                    if not KeyLevels._is_near_existing(highs[i], accepted, current_price * 0.02):
+                        level = round(highs[i], 2)
+                        significant_highs.append(level)
+                        insort(accepted, level)
         
         return significant_highs
     
@@ -684,33 +747,52 @@ class KeyLevels:
             filtered_levels.sort()
         
         # 去除过于接近的价位（避免重复，参考主流网站标准）
+        # 价位已按离当前价格由近及远排序，只需与最后保留的价位比较
         final_levels = []
         min_distance = current_price * 0.015  # 最小距离为当前价格的1.5%
+        # 限制返回的价位数量，参考主流网站通常显示3-5个价位
+        max_levels = 5
         
         for level in filtered_levels:
-            if not any(abs(level - existing) < min_distance for existing in final_levels):
+            if not final_levels or abs(level - final_levels[-1]) >= min_distance:
                 final_levels.append(round(level, 2))
+                if len(final_levels) >= max_levels:
+                    break
         
-        # 限制返回的价位数量，参考主流网站通常显示3-5个价位
-        max_levels = 5
-        return final_levels[:max_levels]
+        return final_levels
 
 class StockAnalysisService:
     """股票分析服务类"""
     
-    def __init__(self):
-        self.db = next(get_db())
+    # 股票代码 -> 是否港股（进程内缓存，股票所属市场不会变化）
+    _market_cache: Dict[str, bool] = {}
+    # 股票代码 -> (获取时间, 当前价格)
+    _price_cache: Dict[str, Tuple[float, Optional[float]]] = {}
+    _price_lock = threading.Lock()
+    # 股票代码 -> 进行中的异步分析，相同股票的并发请求共享一次计算
+    _inflight: Dict[str, "asyncio.Future"] = {}
+    # 分析计算（指标、预测、关键价位）使用的线程池，限制同时进行的CPU计算数
+    _compute_executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+    
+    def __init__(self, db: Optional[Session] = None):
+        self.db = db if db is not None else next(get_db())
     
     def _is_hk_stock(self, stock_code: str) -> bool:
         """判断是否为港股"""
+        cached = StockAnalysisService._market_cache.get(stock_code)
+        if cached is not None:
+            return cached
         try:
             # 先查询港股表
             hk_stock = self.db.query(StockBasicInfoHK).filter(StockBasicInfoHK.code == stock_code).first()
             if hk_stock:
+                StockAnalysisService._market_cache[stock_code] = True
                 return True
             # 再查询A股表
             a_stock = self.db.query(StockBasicInfo).filter(StockBasicInfo.code == stock_code).first()
             if a_stock:
+                StockAnalysisService._market_cache[stock_code] = False
                 return False
             # 如果两个表都没有，根据代码长度判断（港股5位，A股6位）
             return len(stock_code) == 5
@@ -720,193 +802,540 @@ class StockAnalysisService:
             return len(stock_code) == 5
     
     def get_stock_analysis(self, stock_code: str) -> Dict:
-        """获取股票智能分析结果"""
+        """
+        获取股票智能分析结果
+        
+        有收盘后预计算快照时直接返回快照（见 stock.analysis_snapshots），
+        否则按 股票代码 + 最新K线日期 + 价格档位 缓存（见 stock.analysis_cache）
+        """
         try:
-            # 获取历史数据
-            historical_data = self._get_historical_data(stock_code)
-            if not historical_data:
-                logger.warning(f"股票 {stock_code} 无法获取历史数据，返回空分析结果")
-                return {
-                    "success": False,
-                    "error": "无法获取历史数据",
-                    "data": {
-                        "technical_indicators": {},
-                        "price_prediction": {
-                            "target_price": 0.0,
-                            "change_percent": 0.0,
-                            "prediction_range": {"min": 0.0, "max": 0.0},
-                            "confidence": 0.0
-                        },
-                        "trading_recommendation": {
-                            "action": "hold",
-                            "reasons": ["数据不足，无法给出建议"],
-                            "risk_level": "high",
-                            "strength": 0
-                        },
-                        "key_levels": {
-                            "resistance_levels": [],
-                            "support_levels": [],
-                            "current_price": 0.0
-                        },
-                        "current_price": 0.0,
-                        "analysis_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    }
-                }
+            if ANALYSIS_CONFIG.get('snapshot_enabled', True):
+                snapshot = AnalysisSnapshots.get(self.db, stock_code)
+                if snapshot is not None:
+                    return snapshot
             
-            # 获取当前价格
             current_price = self._get_current_price(stock_code)
-            if not current_price:
-                current_price = float(historical_data[-1]['close'])
             
-            # 计算技术指标
-            technical_indicators = self._calculate_technical_indicators(historical_data)
+            cache_key = None
+            if ANALYSIS_CONFIG.get('cache_enabled', True):
+                last_bar_date = self._get_last_bar_date(stock_code)
+                if last_bar_date:
+                    cache = get_analysis_cache()
+                    cache_key = cache.make_key(stock_code, last_bar_date, current_price)
+                    cached = cache.get(self.db, cache_key)
+                    if cached is not None:
+                        return cached
+            
+            result = self._analyze(stock_code, current_price)
+            if cache_key is not None and result.get("success"):
+                get_analysis_cache().put(self.db, cache_key, result)
+            return result
+            
+        except Exception as e:
+            logger.error(f"分析股票 {stock_code} 时出错: {str(e)}")
+            return {"error": f"分析失败: {str(e)}"}
+    
+    async def get_stock_analysis_async(self, stock_code: str, session_factory=None) -> Dict:
+        """
+        异步获取股票智能分析结果（结果与 get_stock_analysis 相同）
+        
+        数据库查询和行情接口调用在线程中执行（行情接口设置超时），不阻塞事件循环；
+        同一股票的并发请求共享一次进行中的计算（发起请求被取消时计算继续，其余请求仍可获得结果）
+        
+        Args:
+            stock_code: 股票代码
+            session_factory: 创建数据库会话的工厂（如 SessionLocal），传入时共享计算使用独立会话，
+                             不依赖发起请求的会话生命周期；默认使用本服务的会话
+        """
+        future = StockAnalysisService._inflight.get(stock_code)
+        if future is None or future.done():
+            future = asyncio.ensure_future(self._run_shared_analysis(stock_code, session_factory))
+            StockAnalysisService._inflight[stock_code] = future
+            
+            def release(done, code=stock_code):
+                if StockAnalysisService._inflight.get(code) is done:
+                    del StockAnalysisService._inflight[code]
+            future.add_done_callback(release)
+        
+        # 各请求取得独立副本，避免修改共享结果
+        return copy.deepcopy(await asyncio.shield(future))
+    
+    async def _run_shared_analysis(self, stock_code: str, session_factory=None) -> Dict:
+        if session_factory is None:
+            return await self._analyze_async(stock_code)
+        db = session_factory()
+        try:
+            return await StockAnalysisService(db)._analyze_async(stock_code)
+        finally:
+            db.close()
+    
+    @staticmethod
+    def _get_compute_executor() -> ThreadPoolExecutor:
+        with StockAnalysisService._executor_lock:
+            if StockAnalysisService._compute_executor is None:
+                StockAnalysisService._compute_executor = ThreadPoolExecutor(
+                    max_workers=ANALYSIS_CONFIG.get('compute_workers', 4), thread_name_prefix='stock-analysis')
+            return StockAnalysisService._compute_executor
+    
+    @staticmethod
+    async def _with_timeout(func, *args, timeout: float, default=None, description: str = ''):
+        """在线程中执行阻塞调用，超时或出错返回 default（超时后线程中的调用仍会执行完毕，只是不再等待）"""
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(func, *args), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{description}超时（{timeout}秒）")
+        except Exception as e:
+            logger.warning(f"{description}失败: {str(e)}")
+        return default
+    
+    def _load_local_data(self, stock_code: str, is_hk: bool, need_price: bool) -> Tuple[Optional[str], Optional[float], List[Dict]]:
+        """一个线程内顺序执行的数据库读取：最新K线日期、实时行情表价格、最近60根K线"""
+        last_bar_date = self._get_last_bar_date(stock_code) if ANALYSIS_CONFIG.get('cache_enabled', True) else None
+        db_price = None
+        if need_price:
+            try:
+                db_price = self._get_db_price(stock_code, is_hk)
+            except Exception as e:
+                self.db.rollback()
+                logger.warning(f"从数据库获取当前价格失败: {str(e)}")
+        return last_bar_date, db_price, self._query_historical_data(stock_code, is_hk)
+    
+    async def _analyze_async(self, stock_code: str) -> Dict:
+        """
+        分阶段执行分析（有收盘后预计算快照时直接返回快照）:
+        1. 并发：实时行情接口取价（A股，有超时）与数据库读取（最新K线日期、实时行情表价格、历史K线，同一线程顺序执行，
+           超时由数据库连接的语句超时控制，避免放弃等待后线程仍在使用会话）
+        2. 按缓存键查分析缓存
+        3. 数据库无港股历史数据时从akshare获取（有超时）
+        4. 指标、预测、关键价位在计算线程池中执行，结果写入缓存
+        """
+        try:
+            if ANALYSIS_CONFIG.get('snapshot_enabled', True):
+                snapshot = await asyncio.to_thread(AnalysisSnapshots.get, self.db, stock_code)
+                if snapshot is not None:
+                    return snapshot
+            
+            is_hk = await asyncio.to_thread(self._is_hk_stock, stock_code)
+            
+            cached_price = self._cached_price(stock_code)
+            live_task = None
+            if cached_price is None and not is_hk:
+                live_task = self._with_timeout(
+                    self._fetch_live_price, stock_code, timeout=ANALYSIS_CONFIG.get('price_timeout', 3),
+                    description=f"从实时API获取 {stock_code} 价格")
+            local_task = asyncio.to_thread(self._load_local_data, stock_code, is_hk, cached_price is None)
             
-            # 价格预测
-            price_prediction = PricePrediction.predict_price(historical_data)
+            if live_task is not None:
+                live_price, (last_bar_date, db_price, historical_data) = await asyncio.gather(live_task, local_task)
+            else:
+                live_price = None
+                last_bar_date, db_price, historical_data = await local_task
             
-            # 交易建议（传入价格预测结果）
-            trading_recommendation = TradingRecommendation.generate_recommendation(
-                historical_data, 
-                current_price, 
-                price_prediction=price_prediction
-            )
+            if cached_price is not None:
+                current_price = cached_price[0]
+            else:
+                current_price = live_price or db_price
+                self._remember_price(stock_code, current_price)
             
-            # 关键价位
-            key_levels = KeyLevels.calculate_key_levels(historical_data, current_price)
+            cache_key = None
+            if last_bar_date:
+                cache = get_analysis_cache()
+                cache_key = cache.make_key(stock_code, last_bar_date, current_price)
+                cached = await asyncio.to_thread(cache.get, self.db, cache_key)
+                if cached is not None:
+                    return cached
+            
+            if not historical_data and is_hk:
+                historical_data = await self._with_timeout(
+                    self._fetch_hk_history, stock_code, timeout=ANALYSIS_CONFIG.get('history_timeout', 10),
+                    default=[], description=f"从akshare获取 {stock_code} 历史数据")
+            if not historical_data:
+                logger.warning(f"股票 {stock_code} 无法获取历史数据，返回空分析结果")
+                return self._empty_analysis()
+            
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(
+                self._get_compute_executor(), self._build_analysis, historical_data, current_price)
+            result = {"success": True, "data": data}
+            
+            if cache_key is not None:
+                await asyncio.to_thread(get_analysis_cache().put, self.db, cache_key, result)
+            return result
+            
+        except Exception as e:
+            logger.error(f"分析股票 {stock_code} 时出错: {str(e)}")
+            return {"error": f"分析失败: {str(e)}"}
+    
+    def get_batch_analysis(self, stock_codes: List[str], days: int = 60) -> Dict:
+        """
+        批量获取多只股票的智能分析结果
+        
+        有收盘后预计算快照的股票直接返回快照（见 stock.analysis_snapshots）；
+        其余股票的历史数据和当前价格按市场批量读取（当前价格来自实时行情表，不调用实时行情接口），
+        技术指标由 TechnicalIndicators.calculate_batch 一次向量化计算；已缓存的股票直接返回缓存结果。
+        与单只股票分析相同，数据库没有历史数据的港股从akshare补取（并发 history_workers 个线程，
+        总超时 history_timeout 秒，超时的股票返回"无法获取历史数据"），补取的结果不缓存
+        
+        Args:
+            stock_codes: 股票代码列表（A股6位，港股5位）
+            days: 每只股票读取的K线数
+        
+        Returns:
+            {"success": True, "data": [{"code", "success", "data" 或 "message"}]（与输入顺序一致，已去重）,
+             "total", "cached": 命中缓存的股票数, "snapshots": 使用快照的股票数}
+        """
+        codes = list(dict.fromkeys(str(code).strip() for code in stock_codes if code and str(code).strip()))
+        
+        results: Dict[str, Dict] = {}
+        if ANALYSIS_CONFIG.get('snapshot_enabled', True):
+            results.update(AnalysisSnapshots.get_many(self.db, codes))
+        snapshot_count = len(results)
+        pending = [code for code in codes if code not in results]
+        
+        markets = self._classify_markets(pending)
+        prices: Dict[str, Optional[float]] = {}
+        last_dates: Dict[str, str] = {}
+        for is_hk in (False, True):
+            group = [code for code in pending if markets[code] == is_hk]
+            if group:
+                prices.update(self._get_current_prices(group, is_hk))
+                last_dates.update(self._get_last_bar_dates(group, is_hk))
+        
+        # 先查缓存，只为未命中的股票读取历史数据
+        keys = {}
+        cache = get_analysis_cache()
+        if ANALYSIS_CONFIG.get('cache_enabled', True):
+            keys = {code: cache.make_key(code, last_dates[code], prices.get(code)) for code in pending if code in last_dates}
+            results.update(cache.get_many(self.db, list(keys.values())))
+        cached_count = len(results) - snapshot_count
+        
+        # 数据库没有历史数据的港股从akshare补取（与单只股票分析一致）
+        hk_missing = [code for code in pending if markets[code] and code not in last_dates]
+        pending = [code for code in pending if code in last_dates and code not in results]
+        computed = self._compute_batch(pending, markets, prices, last_dates, days)
+        if hk_missing:
+            computed.update(self._compute_histories(self._fetch_hk_histories(hk_missing, days), prices))
+        results.update(computed)
+        to_cache = [(keys[code], result) for code, result in computed.items() if code in keys and result.get("success")]
+        if to_cache:
+            cache.put_many(self.db, to_cache)
+        
+        data = []
+        for code in codes:
+            result = results.get(code)
+            if result is None:
+                data.append({"code": code, "success": False, "message": "无法获取历史数据"})
+            elif result.get("success"):
+                data.append({"code": code, "success": True, "data": result["data"]})
+            else:
+                data.append({"code": code, "success": False, "message": result.get("error")})
+        logger.info(f"批量分析完成: {len(codes)} 只股票, 快照 {snapshot_count} 只, 缓存命中 {cached_count} 只, "
+                    f"计算 {len(computed)} 只")
+        return {"success": True, "data": data, "total": len(data), "cached": cached_count, "snapshots": snapshot_count}
+    
+    def compute_analyses(self, stock_codes: List[str], days: int = 60) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+        """
+        以最新收盘价为当前价格批量计算分析结果（收盘后预计算快照使用，不读取实时价格、不使用缓存）
+        
+        Returns:
+            (股票代码 -> 分析结果（只包含有历史数据的股票）, 股票代码 -> 最新K线日期)
+        """
+        codes = list(dict.fromkeys(str(code) for code in stock_codes))
+        markets = self._classify_markets(codes)
+        last_dates: Dict[str, str] = {}
+        for is_hk in (False, True):
+            group = [code for code in codes if markets[code] == is_hk]
+            if group:
+                last_dates.update(self._get_last_bar_dates(group, is_hk))
+        pending = [code for code in codes if code in last_dates]
+        return self._compute_batch(pending, markets, {}, last_dates, days), last_dates
+    
+    def _compute_batch(self, codes: List[str], markets: Dict[str, bool], prices: Dict[str, Optional[float]],
+                       last_dates: Dict[str, str], days: int) -> Dict[str, Dict]:
+        """按市场读取历史数据、一次向量化计算技术指标后逐只生成分析结果（无历史数据的股票不在结果中）"""
+        histories: Dict[str, List[Dict]] = {}
+        for is_hk in (False, True):
+            group = [code for code in codes if markets[code] == is_hk]
+            if group:
+                histories.update(self._get_historical_data_batch(group, is_hk, last_dates, days))
+        return self._compute_histories({code: histories[code] for code in codes if histories.get(code)}, prices)
+    
+    def _compute_histories(self, histories: Dict[str, List[Dict]], prices: Dict[str, Optional[float]]) -> Dict[str, Dict]:
+        """一次向量化计算多只股票的技术指标后逐只生成分析结果（history 为空的股票不在结果中）"""
+        computable = [code for code, history in histories.items() if history]
+        technical = TechnicalIndicators.calculate_batch(
+            [[bar['high'] for bar in histories[code]] for code in computable],
+            [[bar['low'] for bar in histories[code]] for code in computable],
+            [[bar['close'] for bar in histories[code]] for code in computable],
+        )
+        results: Dict[str, Dict] = {}
+        for code, values in zip(computable, technical):
+            try:
+                results[code] = {"success": True, "data": self._build_analysis(histories[code], prices.get(code), values)}
+            except Exception as e:
+                logger.error(f"分析股票 {code} 时出错: {str(e)}")
+                results[code] = {"error": f"分析失败: {str(e)}"}
+        return results
+    
+    def _fetch_hk_histories(self, codes: List[str], days: int) -> Dict[str, List[Dict]]:
+        """并发从akshare获取多只港股的历史数据，总超时 history_timeout 秒（超时的股票不在结果中）"""
+        timeout = ANALYSIS_CONFIG.get('history_timeout', 10)
+        executor = ThreadPoolExecutor(max_workers=max(1, min(len(codes), ANALYSIS_CONFIG.get('history_workers', 4))),
+                                      thread_name_prefix='hk_history')
+        futures = {executor.submit(self._fetch_hk_history, code, days): code for code in codes}
+        done, not_done = wait(futures, timeout=timeout)
+        # 不等待超时的请求（线程中的调用仍会执行完毕，结果丢弃）
+        executor.shutdown(wait=False, cancel_futures=True)
+        if not_done:
+            logger.warning(f"从akshare获取 {len(not_done)} 只港股历史数据超时（{timeout}秒）")
+        histories = {}
+        for future in done:
+            try:
+                histories[futures[future]] = future.result()
+            except Exception as e:
+                logger.warning(f"从akshare获取 {futures[future]} 历史数据失败: {str(e)}")
+        return histories
+    
+    def _query_codes(self, sql: str, codes: List[str], **params):
+        """执行带股票代码列表参数（:codes）的查询"""
+        statement = text(sql).bindparams(bindparam("codes", expanding=True))
+        return self.db.execute(statement, {"codes": list(codes), **params}).fetchall()
+    
+    def _classify_markets(self, codes: List[str]) -> Dict[str, bool]:
+        """批量判断股票是否为港股（与 _is_hk_stock 规则相同）"""
+        markets = {code: StockAnalysisService._market_cache[code] for code in codes
+                   if code in StockAnalysisService._market_cache}
+        unknown = [code for code in codes if code not in markets]
+        if not unknown:
+            return markets
+        try:
+            hk_codes = {row[0] for row in self._query_codes(
+                "SELECT code FROM stock_basic_info_hk WHERE code IN :codes", unknown)}
+            a_codes = {row[0] for row in self._query_codes(
+                "SELECT code FROM stock_basic_info WHERE code IN :codes", unknown)}
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"批量判断股票类型失败: {str(e)}")
+            hk_codes, a_codes = set(), set()
+        for code in unknown:
+            if code in hk_codes or code in a_codes:
+                markets[code] = StockAnalysisService._market_cache[code] = code in hk_codes
+            else:
+                # 如果两个表都没有，根据代码长度判断（港股5位，A股6位）
+                markets[code] = len(code) == 5
+        return markets
+    
+    def _get_last_bar_dates(self, codes: List[str], is_hk: bool) -> Dict[str, str]:
+        """批量获取最新日K线日期"""
+        table = "historical_quotes_hk" if is_hk else "historical_quotes"
+        try:
+            rows = self._query_codes(f"SELECT code, MAX(date) FROM {table} WHERE code IN :codes GROUP BY code", codes)
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"批量获取最新K线日期失败: {str(e)}")
+            return {}
+        return {str(code): value.strftime("%Y-%m-%d") if hasattr(value, 'strftime') else str(value)[:10]
+                for code, value in rows if value is not None}
+    
+    def _get_current_prices(self, codes: List[str], is_hk: bool) -> Dict[str, Optional[float]]:
+        """批量获取实时行情表中最新交易日的当前价格"""
+        if is_hk:
+            sql = """
+                SELECT code, current_price FROM stock_realtime_quote_hk
+                WHERE code IN :codes AND trade_date = (
+                    SELECT MAX(trade_date) FROM stock_realtime_quote_hk WHERE change_percent IS NOT NULL
+                )
+            """
+        else:
+            sql = """
+                SELECT code, current_price FROM stock_realtime_quote
+                WHERE code IN :codes AND trade_date = (
+                    SELECT MAX(trade_date) FROM stock_realtime_quote
+                    WHERE change_percent IS NOT NULL AND change_percent != 0
+                )
+            """
+        try:
+            rows = self._query_codes(sql, codes)
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"批量获取当前价格失败: {str(e)}")
+            return {}
+        return {str(code): float(price) if price else None for code, price in rows}
+    
+    def _get_historical_data_batch(self, codes: List[str], is_hk: bool, last_dates: Dict[str, str],
+                                   days: int = 60) -> Dict[str, List[Dict]]:
+        """
+        窗口查询读取多只股票最近 days 根K线（按日期正序）
+        
+        股票按最新K线日期分组，每组一条查询，扫描范围限定为该日期向前 days*2 个自然日
+        （停牌股票的最新K线日期较早，不会把其他股票的扫描范围拉长）；
+        K线不足（长期停牌、上市较晚等）的股票再不限日期补查一次
+        """
+        table = "historical_quotes_hk" if is_hk else "historical_quotes"
+        change_column = "change_amount" if is_hk else "change"
+        columns = f"code, name, date, open, high, low, close, volume, amount, change_percent, {change_column}, turnover_rate"
+        
+        def load(group: List[str], since: Optional[str]) -> Dict[str, List[Dict]]:
+            date_filter = "AND date >= :since" if since else ""
+            rows = self._query_codes(f"""
+                SELECT {columns} FROM (
+                    SELECT {columns}, ROW_NUMBER() OVER (PARTITION BY code ORDER BY date DESC) AS rn
+                    FROM {table}
+                    WHERE code IN :codes {date_filter}
+                ) recent
+                WHERE rn <= :days
+                ORDER BY code, date
+            """, group, days=days, since=since)
+            histories: Dict[str, List[Dict]] = {}
+            for row in rows:
+                try:
+                    histories.setdefault(str(row[0]), []).append(self._row_to_bar(row))
+                except Exception as e:
+                    logger.warning(f"处理历史数据行时出错: {e}, row: {row}")
+            return histories
+        
+        try:
+            groups: Dict[str, List[str]] = {}
+            for code in codes:
+                groups.setdefault(last_dates[code][:10], []).append(code)
+            histories: Dict[str, List[Dict]] = {}
+            for last_date, group in groups.items():
+                since = (datetime.strptime(last_date, "%Y-%m-%d") - timedelta(days=days * 2)).strftime("%Y-%m-%d")
+                histories.update(load(group, since))
+            short = [code for code in codes if len(histories.get(code, [])) < days]
+            if short:
+                histories.update(load(short, None))
+            return histories
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"批量获取历史数据失败: {str(e)}")
+            return {}
+    
+    def _analyze(self, stock_code: str, current_price: Optional[float]) -> Dict:
+        """计算股票智能分析结果"""
+        try:
+            # 获取历史数据
+            historical_data = self._get_historical_data(stock_code)
+            if not historical_data:
+                logger.warning(f"股票 {stock_code} 无法获取历史数据，返回空分析结果")
+                return self._empty_analysis()
             
             return {
                 "success": True,
-                "data": {
-                    "technical_indicators": technical_indicators,
-                    "price_prediction": price_prediction,
-                    "trading_recommendation": trading_recommendation,
-                    "key_levels": key_levels,
-                    "current_price": current_price,
-                    "analysis_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
+                "data": self._build_analysis(historical_data, current_price)
             }
             
         except Exception as e:
             logger.error(f"分析股票 {stock_code} 时出错: {str(e)}")
             return {"error": f"分析失败: {str(e)}"}
     
+    @staticmethod
+    def _empty_analysis() -> Dict:
+        """无历史数据时的分析结果"""
+        return {
+            "success": False,
+            "error": "无法获取历史数据",
+            "data": {
+                "technical_indicators": {},
+                "price_prediction": {
+                    "target_price": 0.0,
+                    "change_percent": 0.0,
+                    "prediction_range": {"min": 0.0, "max": 0.0},
+                    "confidence": 0.0
+                },
+                "trading_recommendation": {
+                    "action": "hold",
+                    "reasons": ["数据不足，无法给出建议"],
+                    "risk_level": "high",
+                    "strength": 0
+                },
+                "key_levels": {
+                    "resistance_levels": [],
+                    "support_levels": [],
+                    "current_price": 0.0
+                },
+                "current_price": 0.0,
+                "analysis_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+        }
+    
+    def _build_analysis(self, historical_data: List[Dict], current_price: Optional[float],
+                        technical: Optional[Dict] = None) -> Dict:
+        """
+        由历史数据计算分析结果
+        
+        Args:
+            historical_data: 历史数据（按日期正序）
+            current_price: 当前价格，不可用时使用最新收盘价
+            technical: 已计算的技术指标（可选，批量分析时由 TechnicalIndicators.calculate_batch 一次算出）
+        """
+        # 当前价格不可用时使用最新收盘价
+        if not current_price:
+            current_price = float(historical_data[-1]['close'])
+        
+        # 计算技术指标
+        technical_indicators = self._calculate_technical_indicators(historical_data, technical)
+        
+        # 价格预测
+        price_prediction = PricePrediction.predict_price(historical_data, technical=technical)
+        
+        # 交易建议（传入价格预测结果）
+        trading_recommendation = TradingRecommendation.generate_recommendation(
+            historical_data, 
+            current_price, 
+            price_prediction=price_prediction,
+            technical=technical
+        )
+        
+        # 关键价位
+        key_levels = KeyLevels.calculate_key_levels(historical_data, current_price)
+        
+        return {
+            "technical_indicators": technical_indicators,
+            "price_prediction": price_prediction,
+            "trading_recommendation": trading_recommendation,
+            "key_levels": key_levels,
+            "current_price": current_price,
+            "analysis_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+    
+    @staticmethod
+    def _row_to_bar(row) -> Dict:
+        """历史行情查询结果行（code, name, date, open, high, low, close, volume, amount, change_percent, change, turnover_rate）转换为字典"""
+        # 处理日期格式
+        date_val = row[2]
+        if hasattr(date_val, 'strftime'):
+            date_str = date_val.strftime("%Y-%m-%d")
+        elif isinstance(date_val, str):
+            date_str = date_val
+        else:
+            date_str = str(date_val)
+        
+        return {
+            "code": row[0],
+            "name": row[1],
+            "date": date_str,
+            "open": float(row[3]) if row[3] is not None else 0.0,
+            "high": float(row[4]) if row[4] is not None else 0.0,
+            "low": float(row[5]) if row[5] is not None else 0.0,
+            "close": float(row[6]) if row[6] is not None else 0.0,
+            "volume": float(row[7]) if row[7] is not None else 0.0,
+            "amount": float(row[8]) if row[8] is not None else 0.0,
+            "change_percent": float(row[9]) if row[9] is not None else 0.0,
+            "change": float(row[10]) if row[10] is not None else 0.0,  # 港股用change_amount，A股用change
+            "turnover_rate": float(row[11]) if row[11] is not None else 0.0
+        }
+    
     def _get_historical_data(self, stock_code: str, days: int = 60) -> List[Dict]:
         """获取历史数据（支持A股和港股）"""
         try:
             is_hk = self._is_hk_stock(stock_code)
-            
-            if is_hk:
-                # 港股：从historical_quotes_hk表查询
-                query = text("""
-                    SELECT code, name, date, open, high, low, close, volume, amount, 
-                           change_percent, change_amount, turnover_rate
-                    FROM historical_quotes_hk 
-                    WHERE code = :code 
-                    ORDER BY date DESC 
-                    LIMIT :days
-                """)
-            else:
-                # A股：从historical_quotes表查询
-                query = text("""
-                    SELECT code, name, date, open, high, low, close, volume, amount, 
-                           change_percent, change, turnover_rate
-                    FROM historical_quotes 
-                    WHERE code = :code 
-                    ORDER BY date DESC 
-                    LIMIT :days
-                """)
-            
-            result = self.db.execute(query, {"code": stock_code, "days": days})
-            rows = result.fetchall()
-            
-            # 转换为字典列表
-            data = []
-            for row in rows:
-                try:
-                    # 处理日期格式
-                    date_val = row[2]
-                    if hasattr(date_val, 'strftime'):
-                        date_str = date_val.strftime("%Y-%m-%d")
-                    elif isinstance(date_val, str):
-                        date_str = date_val
-                    else:
-                        date_str = str(date_val)
-                    
-                    data.append({
-                        "code": row[0],
-                        "name": row[1],
-                        "date": date_str,
-                        "open": float(row[3]) if row[3] is not None else 0.0,
-                        "high": float(row[4]) if row[4] is not None else 0.0,
-                        "low": float(row[5]) if row[5] is not None else 0.0,
-                        "close": float(row[6]) if row[6] is not None else 0.0,
-                        "volume": float(row[7]) if row[7] is not None else 0.0,
-                        "amount": float(row[8]) if row[8] is not None else 0.0,
-                        "change_percent": float(row[9]) if row[9] is not None else 0.0,
-                        "change": float(row[10]) if row[10] is not None else 0.0,  # 港股用change_amount，A股用change
-                        "turnover_rate": float(row[11]) if row[11] is not None else 0.0
-                    })
-                except Exception as e:
-                    logger.warning(f"处理历史数据行时出错: {e}, row: {row}")
-                    continue
+            data = self._query_historical_data(stock_code, is_hk, days)
             
             # 如果数据库没有数据，尝试从akshare获取（仅对港股）
             if not data and is_hk:
-                logger.info(f"数据库没有股票 {stock_code} 的历史数据，尝试从akshare获取")
-                try:
-                    import akshare as ak
-                    from datetime import datetime, timedelta
-                    
-                    # 计算日期范围（最近days天）
-                    end_date = datetime.now()
-                    start_date = end_date - timedelta(days=days * 2)  # 多取一些，因为要排除非交易日
-                    
-                    end_date_str = end_date.strftime("%Y%m%d")
-                    start_date_str = start_date.strftime("%Y%m%d")
-                    
-                    df = ak.stock_hk_hist(symbol=stock_code, period='daily', start_date=start_date_str, end_date=end_date_str, adjust='')
-                    
-                    if df is not None and not df.empty:
-                        # 转换DataFrame为字典列表
-                        for _, row_df in df.iterrows():
-                            try:
-                                date_val = row_df.get('日期', '')
-                                if isinstance(date_val, pd.Timestamp):
-                                    date_str = date_val.strftime("%Y-%m-%d")
-                                else:
-                                    date_str = str(date_val)
-                                    if len(date_str) == 8 and date_str.isdigit():
-                                        date_str = f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:8]}"
-                                
-                                data.append({
-                                    "code": stock_code,
-                                    "name": "",  # akshare接口可能没有名称
-                                    "date": date_str,
-                                    "open": float(row_df.get('开盘', 0)) if pd.notna(row_df.get('开盘')) else 0.0,
-                                    "high": float(row_df.get('最高', 0)) if pd.notna(row_df.get('最高')) else 0.0,
-                                    "low": float(row_df.get('最低', 0)) if pd.notna(row_df.get('最低')) else 0.0,
-                                    "close": float(row_df.get('收盘', 0)) if pd.notna(row_df.get('收盘')) else 0.0,
-                                    "volume": float(row_df.get('成交量', 0)) if pd.notna(row_df.get('成交量')) else 0.0,
-                                    "amount": float(row_df.get('成交额', 0)) if pd.notna(row_df.get('成交额')) else 0.0,
-                                    "change_percent": float(row_df.get('涨跌幅', 0)) if pd.notna(row_df.get('涨跌幅')) else 0.0,
-                                    "change": float(row_df.get('涨跌额', 0)) if pd.notna(row_df.get('涨跌额')) else 0.0,
-                                    "turnover_rate": float(row_df.get('换手率', 0)) if pd.notna(row_df.get('换手率')) else 0.0
-                                })
-                            except Exception as e:
-                                logger.warning(f"处理akshare历史数据行时出错: {e}")
-                                continue
-                        
-                        # 限制返回数量
-                        data = data[:days]
-                        logger.info(f"从akshare获取到 {len(data)} 条历史数据")
-                except Exception as e:
-                    logger.warning(f"从akshare获取历史数据失败: {e}")
-            
-            # 按日期正序排列
-            if data:
-                return list(reversed(data))
-            else:
-                return []
+                data = self._fetch_hk_history(stock_code, days)
+            return data
             
         except Exception as e:
             logger.error(f"获取历史数据失败: {str(e)}")
@@ -914,86 +1343,230 @@ class StockAnalysisService:
             traceback.print_exc()
             return []
     
+    def _query_historical_data(self, stock_code: str, is_hk: bool, days: int = 60) -> List[Dict]:
+        """从数据库读取最近 days 根K线（按日期正序）"""
+        if is_hk:
+            # 港股：从historical_quotes_hk表查询
+            query = text("""
+                SELECT code, name, date, open, high, low, close, volume, amount, 
+                       change_percent, change_amount, turnover_rate
+                FROM historical_quotes_hk 
+                WHERE code = :code 
+                ORDER BY date DESC 
+                LIMIT :days
+            """)
+        else:
+            # A股：从historical_quotes表查询
+            query = text("""
+                SELECT code, name, date, open, high, low, close, volume, amount, 
+                       change_percent, change, turnover_rate
+                FROM historical_quotes 
+                WHERE code = :code 
+                ORDER BY date DESC 
+                LIMIT :days
+            """)
+        
+        result = self.db.execute(query, {"code": stock_code, "days": days})
+        rows = result.fetchall()
+        
+        # 转换为字典列表
+        data = []
+        for row in rows:
+            try:
+                data.append(self._row_to_bar(row))
+            except Exception as e:
+                logger.warning(f"处理历史数据行时出错: {e}, row: {row}")
+                continue
+        
+        # 按日期正序排列
+        return list(reversed(data))
+    
+    @staticmethod
+    def _fetch_hk_history(stock_code: str, days: int = 60) -> List[Dict]:
+        """数据库没有港股历史数据时从akshare获取（按日期正序，不访问数据库）"""
+        logger.info(f"数据库没有股票 {stock_code} 的历史数据，尝试从akshare获取")
+        data = []
+        try:
+            import akshare as ak
+            
+            # 计算日期范围（最近days天）
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=days * 2)  # 多取一些，因为要排除非交易日
+            
+            end_date_str = end_date.strftime("%Y%m%d")
+            start_date_str = start_date.strftime("%Y%m%d")
+            
+            df = ak.stock_hk_hist(symbol=stock_code, period='daily', start_date=start_date_str, end_date=end_date_str, adjust='')
+            
+            if df is not None and not df.empty:
+                # 转换DataFrame为字典列表
+                for _, row_df in df.iterrows():
+                    try:
+                        date_val = row_df.get('日期', '')
+                        if isinstance(date_val, pd.Timestamp):
+                            date_str = date_val.strftime("%Y-%m-%d")
+                        else:
+                            date_str = str(date_val)
+                            if len(date_str) == 8 and date_str.isdigit():
+                                date_str = f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:8]}"
+                        
+                        data.append({
+                            "code": stock_code,
+                            "name": "",  # akshare接口可能没有名称
+                            "date": date_str,
+                            "open": float(row_df.get('开盘', 0)) if pd.notna(row_df.get('开盘')) else 0.0,
+                            "high": float(row_df.get('最高', 0)) if pd.notna(row_df.get('最高')) else 0.0,
+                            "low": float(row_df.get('最低', 0)) if pd.notna(row_df.get('最低')) else 0.0,
+                            "close": float(row_df.get('收盘', 0)) if pd.notna(row_df.get('收盘')) else 0.0,
+                            "volume": float(row_df.get('成交量', 0)) if pd.notna(row_df.get('成交量')) else 0.0,
+                            "amount": float(row_df.get('成交额', 0)) if pd.notna(row_df.get('成交额')) else 0.0,
+                            "change_percent": float(row_df.get('涨跌幅', 0)) if pd.notna(row_df.get('涨跌幅')) else 0.0,
+                            "change": float(row_df.get('涨跌额', 0)) if pd.notna(row_df.get('涨跌额')) else 0.0,
+                            "turnover_rate": float(row_df.get('换手率', 0)) if pd.notna(row_df.get('换手率')) else 0.0
+                        })
+                    except Exception as e:
+                        logger.warning(f"处理akshare历史数据行时出错: {e}")
+                        continue
+                
+                # 限制返回数量（akshare按日期正序返回，取最近 days 条）
+                data = data[-days:]
+                logger.info(f"从akshare获取到 {len(data)} 条历史数据")
+        except Exception as e:
+            logger.warning(f"从akshare获取历史数据失败: {e}")
+        return data
+    
+    def _get_last_bar_date(self, stock_code: str) -> Optional[str]:
+        """获取数据库中最新一根日K线的日期（分析缓存键的一部分），无数据返回None"""
+        table = "historical_quotes_hk" if self._is_hk_stock(stock_code) else "historical_quotes"
+        try:
+            value = self.db.execute(
+                text(f"SELECT MAX(date) FROM {table} WHERE code = :code"), {"code": stock_code}
+            ).scalar()
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"获取最新K线日期失败: {str(e)}")
+            return None
+        if value is None:
+            return None
+        return value.strftime("%Y-%m-%d") if hasattr(value, 'strftime') else str(value)[:10]
+    
     def _get_current_price(self, stock_code: str) -> Optional[float]:
+        """获取当前价格（进程内缓存 price_ttl 秒）"""
+        cached = self._cached_price(stock_code)
+        if cached is not None:
+            return cached[0]
+        
+        price = self._fetch_current_price(stock_code)
+        self._remember_price(stock_code, price)
+        return price
+    
+    @staticmethod
+    def _cached_price(stock_code: str) -> Optional[Tuple[Optional[float]]]:
+        """未过期的缓存价格，返回 (价格,)；未缓存或已过期返回None"""
+        ttl = ANALYSIS_CONFIG.get('price_ttl', 30)
+        with StockAnalysisService._price_lock:
+            cached = StockAnalysisService._price_cache.get(stock_code)
+        if cached is not None and time.monotonic() - cached[0] < ttl:
+            return (cached[1],)
+        return None
+    
+    @staticmethod
+    def _remember_price(stock_code: str, price: Optional[float]):
+        with StockAnalysisService._price_lock:
+            StockAnalysisService._price_cache[stock_code] = (time.monotonic(), price)
+    
+    def _fetch_current_price(self, stock_code: str) -> Optional[float]:
         """获取当前价格（支持A股和港股）"""
         try:
             is_hk = self._is_hk_stock(stock_code)
             
-            if is_hk:
-                # 港股：从stock_realtime_quote_hk表获取
-                latest_date_result = pd.read_sql_query("""
-                    SELECT MAX(trade_date) as latest_date 
-                    FROM stock_realtime_quote_hk 
-                    WHERE change_percent IS NOT NULL
-                """, self.db.bind)
-                
-                stock = None
-                if not latest_date_result.empty and latest_date_result.iloc[0]['latest_date'] is not None:
-                    latest_trade_date = latest_date_result.iloc[0]['latest_date']
-                    if isinstance(latest_trade_date, str):
-                        latest_trade_date = latest_trade_date[:10]
-                    else:
-                        latest_trade_date = str(latest_trade_date)[:10]
-                    
-                    stock = self.db.query(StockRealtimeQuoteHK).filter(
-                        StockRealtimeQuoteHK.code == stock_code,
-                        StockRealtimeQuoteHK.trade_date == latest_trade_date
-                    ).first()
-                
-                if stock:
-                    return float(stock.current_price) if stock.current_price else None
-            else:
+            if not is_hk:
                 # A股：优先从实时行情API获取最新价格
-                import akshare as ak
-                
-                try:
-                    df_bid_ask = ak.stock_bid_ask_em(symbol=stock_code)
-                    if not df_bid_ask.empty:
-                        bid_ask_dict = dict(zip(df_bid_ask['item'], df_bid_ask['value']))
-                        current_price = bid_ask_dict.get("最新")
-                        if current_price:
-                            return float(current_price)
-                except Exception as e:
-                    logger.warning(f"从实时API获取价格失败: {str(e)}")
-                
-                # 如果实时API失败，从数据库获取
-                latest_date_result = pd.read_sql_query("""
-                    SELECT MAX(trade_date) as latest_date 
-                    FROM stock_realtime_quote 
-                    WHERE change_percent IS NOT NULL AND change_percent != 0
-                """, self.db.bind)
-                
-                stock = None
-                if not latest_date_result.empty and latest_date_result.iloc[0]['latest_date'] is not None:
-                    latest_trade_date = latest_date_result.iloc[0]['latest_date']
-                    stock = self.db.query(StockRealtimeQuote).filter(
-                        StockRealtimeQuote.code == stock_code,
-                        StockRealtimeQuote.trade_date == latest_trade_date
-                    ).first()
-                
-                if stock:
-                    return float(stock.current_price) if stock.current_price else None
+                current_price = self._fetch_live_price(stock_code)
+                if current_price:
+                    return current_price
             
-            return None
+            # 港股 / 实时API失败：从实时行情表获取
+            return self._get_db_price(stock_code, is_hk)
         except Exception as e:
             logger.error(f"获取当前价格失败: {str(e)}")
             return None
     
-    def _calculate_technical_indicators(self, historical_data: List[Dict]) -> Dict:
-        """计算技术指标"""
+    @staticmethod
+    def _fetch_live_price(stock_code: str) -> Optional[float]:
+        """从实时行情API获取A股最新价格（不访问数据库），失败返回None"""
+        import akshare as ak
+        
+        try:
+            df_bid_ask = ak.stock_bid_ask_em(symbol=stock_code)
+            if not df_bid_ask.empty:
+                bid_ask_dict = dict(zip(df_bid_ask['item'], df_bid_ask['value']))
+                current_price = bid_ask_dict.get("最新")
+                if current_price:
+                    return float(current_price)
+        except Exception as e:
+            logger.warning(f"从实时API获取价格失败: {str(e)}")
+        return None
+    
+    def _get_db_price(self, stock_code: str, is_hk: bool) -> Optional[float]:
+        """从实时行情表获取最新交易日的当前价格"""
+        if is_hk:
+            # 港股：从stock_realtime_quote_hk表获取
+            latest_date_result = pd.read_sql_query("""
+                SELECT MAX(trade_date) as latest_date 
+                FROM stock_realtime_quote_hk 
+                WHERE change_percent IS NOT NULL
+            """, self.db.bind)
+            
+            stock = None
+            if not latest_date_result.empty and latest_date_result.iloc[0]['latest_date'] is not None:
+                latest_trade_date = latest_date_result.iloc[0]['latest_date']
+                if isinstance(latest_trade_date, str):
+                    latest_trade_date = latest_trade_date[:10]
+                else:
+                    latest_trade_date = str(latest_trade_date)[:10]
+                
+                stock = self.db.query(StockRealtimeQuoteHK).filter(
+                    StockRealtimeQuoteHK.code == stock_code,
+                    StockRealtimeQuoteHK.trade_date == latest_trade_date
+                ).first()
+        else:
+            latest_date_result = pd.read_sql_query("""
+                SELECT MAX(trade_date) as latest_date 
+                FROM stock_realtime_quote 
+                WHERE change_percent IS NOT NULL AND change_percent != 0
+            """, self.db.bind)
+            
+            stock = None
+            if not latest_date_result.empty and latest_date_result.iloc[0]['latest_date'] is not None:
+                latest_trade_date = latest_date_result.iloc[0]['latest_date']
+                stock = self.db.query(StockRealtimeQuote).filter(
+                    StockRealtimeQuote.code == stock_code,
+                    StockRealtimeQuote.trade_date == latest_trade_date
+                ).first()
+        
+        if stock:
+            return float(stock.current_price) if stock.current_price else None
+        return None
+    
+    def _calculate_technical_indicators(self, historical_data: List[Dict], technical: Optional[Dict] = None) -> Dict:
+        """计算技术指标（technical 为已计算的指标时只生成信号）"""
         if len(historical_data) < 20:
             return {}
         
-        # 提取数据
-        closes = [data['close'] for data in historical_data]
-        highs = [data['high'] for data in historical_data]
-        lows = [data['low'] for data in historical_data]
-        
-        # 计算各项指标
-        rsi = TechnicalIndicators.calculate_rsi(closes)
-        macd = TechnicalIndicators.calculate_macd(closes)
-        kdj = TechnicalIndicators.calculate_kdj(highs, lows, closes)
-        bb = TechnicalIndicators.calculate_bollinger_bands(closes)
+        if technical:
+            rsi, macd, kdj, bb = technical["rsi"], technical["macd"], technical["kdj"], technical["bollinger_bands"]
+        else:
+            # 提取数据
+            closes = [data['close'] for data in historical_data]
+            highs = [data['high'] for data in historical_data]
+            lows = [data['low'] for data in historical_data]
+            
+            # 计算各项指标
+            rsi = TechnicalIndicators.calculate_rsi(closes)
+            macd = TechnicalIndicators.calculate_macd(closes)
+            kdj = TechnicalIndicators.calculate_kdj(highs, lows, closes)
+            bb = TechnicalIndicators.calculate_bollinger_bands(closes)
         
         # 判断信号
         rsi_signal = "超卖" if rsi < 30 else "超买" if rsi > 70 else "中性"
@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import Optional
 import logging
-from database import get_db
+from config import ANALYSIS_CONFIG
+from database import SessionLocal, get_db
+from models import BatchAnalysisRequest
+from .indicator_state import IndicatorStateStore
 from .stock_analysis import StockAnalysisService
 
 logger = logging.getLogger(__name__)
@@ -17,6 +21,8 @@ async def get_stock_analysis(
     """
     获取股票智能分析结果
     
+    数据库查询和行情接口调用在线程中执行，不阻塞事件循环；同一股票的并发请求共享一次计算
+    
     Args:
         stock_code: 股票代码
         
@@ -32,10 +38,10 @@ async def get_stock_analysis(
             )
         
         # 创建分析服务
-        analysis_service = StockAnalysisService()
+        analysis_service = StockAnalysisService(db)
         
         # 获取分析结果
-        result = analysis_service.get_stock_analysis(stock_code)
+        result = await analysis_service.get_stock_analysis_async(stock_code, session_factory=SessionLocal)
         
         # 如果返回结果中包含error，但同时也包含data，说明是数据不足的情况，应该返回200但success为False
         if "error" in result and "data" in result:
@@ -78,8 +84,8 @@ async def get_technical_indicators(
         技术指标数据（RSI、MACD、KDJ、布林带）
     """
     try:
-        analysis_service = StockAnalysisService()
-        result = analysis_service.get_stock_analysis(stock_code)
+        analysis_service = StockAnalysisService(db)
+        result = await analysis_service.get_stock_analysis_async(stock_code, session_factory=SessionLocal)
         
         if "error" in result:
             return JSONResponse(
@@ -102,6 +108,52 @@ async def get_technical_indicators(
             content={"success": False, "message": f"获取技术指标失败: {str(e)}"}
         )
 
+@router.get("/indicators/{stock_code}")
+async def get_incremental_indicators(
+    stock_code: str,
+    live: bool = Query(True, description="是否计入实时价格（作为临时K线，不修改保存的状态）"),
+    db: Session = Depends(get_db)
+):
+    """
+    获取增量指标状态对应的 MACD、RSI（Wilder）、KDJ
+    
+    状态由收盘后的历史行情采集任务逐日推进（stock_indicator_state 表），这里只读取一行状态，
+    盘中再把实时价格作为临时K线推进一步
+    
+    Args:
+        stock_code: 股票代码
+        live: 是否计入实时价格
+        
+    Returns:
+        指标值、状态日期、是否包含临时K线
+    """
+    try:
+        if not stock_code or len(stock_code) not in (5, 6):
+            return JSONResponse(
+                status_code=400,
+                content={"success": False, "message": "股票代码格式错误（A股6位，港股5位）"}
+            )
+        
+        store = IndicatorStateStore(db, market='HK' if len(stock_code) == 5 else 'A')
+        result = await run_in_threadpool(store.get_indicators, [stock_code], live)
+        if stock_code not in result:
+            return JSONResponse(
+                status_code=404,
+                content={"success": False, "message": f"股票 {stock_code} 暂无指标状态"}
+            )
+        
+        return JSONResponse(content={
+            "success": True,
+            "data": result[stock_code]
+        })
+        
+    except Exception as e:
+        logger.error(f"获取增量指标失败: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": f"获取增量指标失败: {str(e)}"}
+        )
+
 @router.get("/prediction/{stock_code}")
 async def get_price_prediction(
     stock_code: str,
@@ -119,8 +171,8 @@ async def get_price_prediction(
         价格预测结果
     """
     try:
-        analysis_service = StockAnalysisService()
-        result = analysis_service.get_stock_analysis(stock_code)
+        analysis_service = StockAnalysisService(db)
+        result = await analysis_service.get_stock_analysis_async(stock_code, session_factory=SessionLocal)
         
         if "error" in result:
             return JSONResponse(
@@ -158,8 +210,8 @@ async def get_trading_recommendation(
         交易建议和风险分析
     """
     try:
-        analysis_service = StockAnalysisService()
-        result = analysis_service.get_stock_analysis(stock_code)
+        analysis_service = StockAnalysisService(db)
+        result = await analysis_service.get_stock_analysis_async(stock_code, session_factory=SessionLocal)
         
         if "error" in result:
             return JSONResponse(
@@ -197,8 +249,8 @@ async def get_key_levels(
         支撑位和阻力位
     """
     try:
-        analysis_service = StockAnalysisService()
-        result = analysis_service.get_stock_analysis(stock_code)
+        analysis_service = StockAnalysisService(db)
+        result = await analysis_service.get_stock_analysis_async(stock_code, session_factory=SessionLocal)
         
         if "error" in result:
             return JSONResponse(
@@ -236,8 +288,8 @@ async def get_analysis_summary(
         分析摘要信息
     """
     try:
-        analysis_service = StockAnalysisService()
-        result = analysis_service.get_stock_analysis(stock_code)
+        analysis_service = StockAnalysisService(db)
+        result = await analysis_service.get_stock_analysis_async(stock_code, session_factory=SessionLocal)
         
         if "error" in result:
             return JSONResponse(
@@ -279,4 +331,45 @@ async def get_analysis_summary(
         return JSONResponse(
             status_code=500,
             content={"success": False, "message": f"获取分析摘要失败: {str(e)}"}
-        ) 
\ No newline at end of file
+        ) 
+
+@router.post("/batch")
+async def get_batch_analysis(
+    request: BatchAnalysisRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    批量获取多只股票的智能分析结果（自选股列表、日报等）
+    
+    历史数据和当前价格按市场各一条查询读取，技术指标一次向量化计算
+    
+    Args:
+        request: {"codes": [股票代码]}
+        
+    Returns:
+        {"success": True, "data": [{"code", "success", "data" 或 "message"}], "total", "cached"}
+    """
+    try:
+        codes = [str(code).strip() for code in request.codes if str(code).strip()]
+        max_codes = ANALYSIS_CONFIG.get('batch_max_codes', 300)
+        if not codes:
+            return JSONResponse(status_code=400, content={"success": False, "message": "股票代码列表不能为空"})
+        if len(codes) > max_codes:
+            return JSONResponse(status_code=400, content={"success": False, "message": f"单次最多分析 {max_codes} 只股票"})
+        invalid = [code for code in codes if len(code) not in (5, 6)]
+        if invalid:
+            return JSONResponse(
+                status_code=400,
+                content={"success": False, "message": f"股票代码格式错误（A股6位，港股5位）: {', '.join(invalid[:10])}"}
+            )
+        
+        analysis_service = StockAnalysisService(db)
+        result = await run_in_threadpool(analysis_service.get_batch_analysis, codes)
+        return JSONResponse(content=result)
+        
+    except Exception as e:
+        logger.error(f"批量分析失败: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": f"批量分析失败: {str(e)}"}
+        )
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Request,Query
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 import akshare as ak
 from database import get_db
 from sqlalchemy.orm import Session
@@ -33,7 +34,7 @@ async def get_history(code: str = Query(None, description="股票代码")):
         return JSONResponse({"success": False, "message": "缺少股票代码参数code"}, status_code=400)
     try:
         print(f"[get_history] 调用ak.stock_individual_fund_flow_rank")
-        df = ak.stock_individual_fund_flow_rank(indicator='今日')
+        df = await run_in_threadpool(ak.stock_individual_fund_flow_rank, indicator='今日')
         if df is None or df.empty:
             print(f"[get_history] 未找到股票代码: {code} 的资金流向数据")
             return JSONResponse({"success": False, "message": f"未找到股票代码: {code} 的资金流向数据"}, status_code=404)
@@ -68,7 +69,7 @@ async def get_today(code: str = Query(None, description="股票代码")):
         # 尝试方法1：使用 stock_individual_fund_flow
         try:
             print(f"[get_stock_fund_flow_today] 尝试方法-上交所: 调用ak.stock_individual_fund_flow, stock={code}")
-            df = ak.stock_individual_fund_flow(stock=code,market='sh')
+            df = await run_in_threadpool(ak.stock_individual_fund_flow, stock=code,market='sh')
             if df is not None and not df.empty:
                 print(f"[get_stock_fund_flow_today] 方法1成功获取数据，DataFrame形状: {df.shape}")
             else:
@@ -81,7 +82,7 @@ async def get_today(code: str = Query(None, description="股票代码")):
         if df is None or df.empty:
             try:
                 print(f"[get_stock_fund_flow_today] 尝试方法-深交所: 调用ak.stock_individual_fund_flow, stock={code}")
-                df = ak.stock_individual_fund_flow(stock=code,market='sz')
+                df = await run_in_threadpool(ak.stock_individual_fund_flow, stock=code,market='sz')
                 if df is not None and not df.empty:
                     print(f"[get_stock_fund_flow_today] 方法2成功获取数据，DataFrame形状: {df.shape}")
                 else:
@@ -94,7 +95,7 @@ async def get_today(code: str = Query(None, description="股票代码")):
         if df is None or df.empty:
             try:
                 print(f"[get_stock_fund_flow_today] 尝试方法-北交所: 调用ak.stock_individual_fund_flow, stock={code}")
-                df = ak.stock_individual_fund_flow(stock=code,market='bj')
+                df = await run_in_threadpool(ak.stock_individual_fund_flow, stock=code,market='bj')
                 if df is not None and not df.empty:
                     print(f"[get_stock_fund_flow_today] 方法3成功获取数据，DataFrame形状: {df.shape}")
                 else:
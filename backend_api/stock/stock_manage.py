@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Request, Query
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 import akshare as ak
 from database import get_db
 from sqlalchemy.orm import Session
@@ -512,7 +513,7 @@ async def get_realtime_quote_by_code(code: str = Query(None, description="股票
         
         # 获取买卖盘数据
         try:
-            df_bid_ask = ak.stock_bid_ask_em(symbol=code)
+            df_bid_ask = await run_in_threadpool(ak.stock_bid_ask_em, symbol=code)
             if df_bid_ask.empty:
                 print(f"[realtime_quote_by_code] 未找到股票代码: {code}")
                 return JSONResponse({"success": False, "message": f"未找到股票代码: {code}"}, status_code=404)
@@ -550,7 +551,7 @@ async def get_realtime_quote_by_code(code: str = Query(None, description="股票
         else:
             # 数据库没有市盈率数据，从akshare获取作为备选
             try:
-                df_spot = ak.stock_zh_a_spot_em()
+                df_spot = await run_in_threadpool(ak.stock_zh_a_spot_em)
                 stock_spot_data = df_spot[df_spot['代码'] == code]
                 if not stock_spot_data.empty:
                     pe_dynamic = stock_spot_data.iloc[0]['市盈率-动态']
@@ -621,7 +622,7 @@ async def get_minute_data_by_code(code: str = Query(None, description="股票代
         print(f"[minute_data_by_code] 缺少参数code")
         return JSONResponse({"success": False, "message": "缺少股票代码参数code"}, status_code=400)
     try:
-        trade_dates = ak.tool_trade_date_hist_sina()['trade_date'].tolist()
+        trade_dates = (await run_in_threadpool(ak.tool_trade_date_hist_sina))['trade_date'].tolist()
         trade_dates_str = [d.strftime('%Y-%m-%d') for d in trade_dates]
         print(f"[minute_data_by_code] 交易日历: {trade_dates_str[:10]} ... 共{len(trade_dates_str)}天")
         today = datetime.date.today()
@@ -634,7 +635,7 @@ async def get_minute_data_by_code(code: str = Query(None, description="股票代
         print(f"[minute_data_by_code] 今日是否交易日: {is_trading_day}")
         result = []
         if is_trading_day:
-            df = ak.stock_intraday_em(symbol=code)
+            df = await run_in_threadpool(ak.stock_intraday_em, symbol=code)
             if df is None or df.empty:
                 print(f"[minute_data_by_code] 未找到股票代码: {code}")
                 return JSONResponse({"success": False, "message": f"未找到股票代码: {code}"}, status_code=404)
@@ -656,7 +657,7 @@ async def get_minute_data_by_code(code: str = Query(None, description="股票代
             print(f"[minute_data_by_code] 交易日，返回{len(result)}条分时数据")
         else:
             # 非交易日，取最近一个交易日的分钟数据
-            df = ak.stock_zh_a_hist_pre_min_em(symbol=code, start_time="09:00:00", end_time="15:40:00")
+            df = await run_in_threadpool(ak.stock_zh_a_hist_pre_min_em, symbol=code, start_time="09:00:00", end_time="15:40:00")
             if df is None or df.empty:
                 print(f"[minute_data_by_code] 非交易日未找到股票代码: {code}")
                 return JSONResponse({"success": False, "message": f"未找到股票代码: {code}"}, status_code=404)
@@ -709,7 +710,7 @@ async def get_kline_hist(
         # 日期格式化为YYYYMMDD
         start_date_fmt = start_date.replace('-', '') if start_date else None
         end_date_fmt = end_date.replace('-', '') if end_date else None
-        df = ak.stock_zh_a_hist(symbol=code, period=period, start_date=start_date_fmt, end_date=end_date_fmt, adjust=adjust)
+        df = await run_in_threadpool(ak.stock_zh_a_hist, symbol=code, period=period, start_date=start_date_fmt, end_date=end_date_fmt, adjust=adjust)
         if df is None or df.empty:
             print(f"[kline_hist] 未找到股票代码: {code}")
             return JSONResponse({"success": False, "message": f"未找到股票代码: {code}"}, status_code=404)
@@ -792,7 +793,7 @@ async def get_kline_min_hist(
         # 1分钟线不支持复权，adjust传空
         ak_adjust = '' if period == '1' else adjust
         print(f"[kline_min_hist] 调用ak，symbol={code}, period={period}, start={start_dt_fmt}, end={end_dt_fmt}, adjust={ak_adjust}")
-        df = ak.stock_zh_a_hist_min_em(symbol=code, period=period, start_date=start_dt_fmt, end_date=end_dt_fmt, adjust=ak_adjust)
+        df = await run_in_threadpool(ak.stock_zh_a_hist_min_em, symbol=code, period=period, start_date=start_dt_fmt, end_date=end_dt_fmt, adjust=ak_adjust)
         if df is None or df.empty:
             print(f"[kline_min_hist] 未找到股票代码: {code}")
             return JSONResponse({"success": False, "message": f"未找到股票代码: {code}"}, status_code=404)
@@ -846,7 +847,7 @@ async def get_latest_financial(code: str = Query(..., description="股票代码"
         if is_hk:
             # 港股：使用 stock_hk_financial_indicator_em 接口
             try:
-                df = ak.stock_hk_financial_indicator_em(symbol=code)
+                df = await run_in_threadpool(ak.stock_hk_financial_indicator_em, symbol=code)
             except Exception as e:
                 print(f"[latest_financial] 港股调用akshare接口失败: {e}")
                 import traceback
@@ -925,7 +926,7 @@ async def get_latest_financial(code: str = Query(..., description="股票代码"
             return JSONResponse({"success": True, "data": result})
         else:
             # A股：使用 stock_financial_abstract 接口（原有逻辑）
-            df = ak.stock_financial_abstract(symbol=code)
+            df = await run_in_threadpool(ak.stock_financial_abstract, symbol=code)
             print(f"[latest_financial] A股获取到原始数据: {df.shape if df is not None else None}")
             if df is None or df.empty:
                 print(f"[latest_financial] A股未获取到财务数据")
@@ -1012,7 +1013,7 @@ async def get_financial_indicator_list(
             # 港股：使用 stock_hk_financial_indicator_em 接口
             # 注意：该接口只返回最新报告期的单行数据，没有历史数据
             try:
-                df = ak.stock_hk_financial_indicator_em(symbol=symbol)
+                df = await run_in_threadpool(ak.stock_hk_financial_indicator_em, symbol=symbol)
             except Exception as e:
                 print(f"[financial_indicator_list] 港股调用akshare接口失败: {e}")
                 import traceback
@@ -1091,7 +1092,7 @@ async def get_financial_indicator_list(
                 indicator = "按单季度"
             else:
                 indicator = "按报告期"
-            df = ak.stock_financial_abstract_ths(symbol=symbol, indicator=indicator)
+            df = await run_in_threadpool(ak.stock_financial_abstract_ths, symbol=symbol, indicator=indicator)
             print(f"[financial_indicator_list] A股原始数据列: {df.columns.tolist()}")
             if df is None or df.empty:
                 return JSONResponse({"success": False, "message": "未获取到财务数据"}, status_code=404)
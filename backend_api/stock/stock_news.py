@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Query, Request, Depends, HTTPException
 from fastapi.responses import JSONResponse, StreamingResponse, HTMLResponse
+from fastapi.concurrency import run_in_threadpool
 import akshare as ak
 from database import get_db
 from sqlalchemy.orm import Session
 import traceback
 import datetime
 import pandas as pd
+import asyncio
 import difflib
-import time
 import aiohttp
 import logging
 from models import StockNoticeReport, StockNews, StockResearchReport
@@ -202,7 +203,7 @@ async def _get_research_data(symbol: str, limit: int = 20) -> list:
         print(f"[_get_research_data] 开始获取{symbol}的研报数据...")
         
         # 添加延迟避免请求过于频繁
-        time.sleep(2)  # 增加延迟到2秒
+        await asyncio.sleep(2)  # 增加延迟到2秒
         
         # 尝试获取研报数据，如果失败则重试
         max_retries = 3
@@ -212,7 +213,7 @@ async def _get_research_data(symbol: str, limit: int = 20) -> list:
         while retry_count < max_retries:
             try:
                 print(f"[_get_research_data] 第{retry_count + 1}次尝试获取研报数据...")
-                research_df = ak.stock_research_report_em(symbol=symbol)
+                research_df = await run_in_threadpool(ak.stock_research_report_em, symbol=symbol)
                 if research_df is not None:
                     print(f"[_get_research_data] 成功获取研报数据")
                     break
@@ -232,7 +233,7 @@ async def _get_research_data(symbol: str, limit: int = 20) -> list:
                 
                 if retry_count < max_retries:
                     print(f"[_get_research_data] 等待{wait_time}秒后重试...")
-                    time.sleep(wait_time)
+                    await asyncio.sleep(wait_time)
                 else:
                     print(f"[_get_research_data] 达到最大重试次数，返回空数据")
                     research_df = None
@@ -342,7 +343,7 @@ async def get_stock_news_combined(
         
         # 获取新闻数据
         try:
-            news_df = ak.stock_news_em(symbol=symbol)
+            news_df = await run_in_threadpool(ak.stock_news_em, symbol=symbol)
             if news_df is not None and not news_df.empty:
                 print(f"[stock_news_combined] AkShare返回{len(news_df)}条原始新闻数据")
                 
@@ -680,7 +681,7 @@ async def get_stock_name(symbol: str) -> str:
     """获取股票名称"""
     try:
         # 尝试从AkShare获取股票基本信息
-        stock_info = ak.stock_individual_info_em(symbol=symbol)
+        stock_info = await run_in_threadpool(ak.stock_individual_info_em, symbol=symbol)
         if stock_info is not None and not stock_info.empty:
             # 查找股票名称字段
             name_row = stock_info[stock_info['item'] == '股票简称']
@@ -695,7 +696,7 @@ async def get_stock_industry(symbol: str) -> str:
     """获取股票行业信息"""
     try:
         # 尝试从AkShare获取股票基本信息
-        stock_info = ak.stock_individual_info_em(symbol=symbol)
+        stock_info = await run_in_threadpool(ak.stock_individual_info_em, symbol=symbol)
         if stock_info is not None and not stock_info.empty:
             # 查找行业字段
             industry_row = stock_info[stock_info['item'] == '所处行业']
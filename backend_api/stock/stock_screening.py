@@ -11,6 +11,10 @@ import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from stock.indicators import rolling_mean
+from stock.price_panel import BarSequence, PricePanel, get_price_panel
+from stock.screening_executor import ProgressCallback, get_screening_executor
+
 logger = logging.getLogger(__name__)
 
 
@@ -263,13 +267,113 @@ class StockScreeningStrategy:
         return is_aligned, ma_info
     
     @staticmethod
-    def screening_cyb_midline_strategy(db: Session, months: int = 4) -> List[Dict]:
+    def screen_cyb_midline_stocks(panel: PricePanel, stocks: List[Tuple[str, str]],
+                                  start_date_str: str, end_date_str: str,
+                                  months: int = 4) -> List[Dict]:
+        """
+        对一组股票逐只检查创业板中线策略条件（可由并行执行器在子进程中按块调用）
+        
+        Args:
+            panel: 行情面板
+            stocks: (股票代码, 名称) 列表
+            start_date_str: 数据开始日期（YYYY-MM-DD）
+            end_date_str: 数据结束日期（YYYY-MM-DD）
+            months: 涨停前检查无涨停的月数（默认4个月）
+        
+        Returns:
+            符合条件的股票列表
+        """
+        results = []
+        
+        for idx, (code, name) in enumerate(stocks):
+            if idx % 100 == 0:
+                logger.info(f"处理进度: {idx}/{len(stocks)}")
+            
+            try:
+                # 从共享行情面板获取该股票的历史数据（倒序，最新在前）
+                historical_data = panel.get_history(code, start_date_str, end_date_str, name=name)
+                
+                if len(historical_data) < 20:  # 数据不足
+                    continue
+                
+                # 检查策略条件
+                # 条件1：查找第一个涨停（今天涨停前3-4个月都没有过涨停）
+                limit_up_info = StockScreeningStrategy.find_first_limit_up(historical_data, months_before=months)
+                if not limit_up_info:
+                    continue
+                
+                # 条件2：检查回调不破底
+                has_pullback, pullback_info = StockScreeningStrategy.check_pullback_not_break_bottom(
+                    historical_data, limit_up_info
+                )
+                if not has_pullback:
+                    continue
+                
+                # 条件3：检查突破涨停高点
+                has_breakthrough, breakthrough_info = StockScreeningStrategy.check_breakthrough(
+                    historical_data, limit_up_info
+                )
+                if not has_breakthrough:
+                    continue
+                
+                # 条件4：检查跳空和揉搓线
+                has_gap_doji, gap_dates, doji_dates = StockScreeningStrategy.check_gap_and_doji(
+                    historical_data, 
+                    limit_up_info['index'], 
+                    breakthrough_info['index']
+                )
+                if not has_gap_doji:
+                    continue
+                
+                # 条件5：检查均线多头排列（使用最新数据）
+                has_ma_alignment, ma_info = StockScreeningStrategy.check_ma_alignment(
+                    historical_data, current_index=0
+                )
+                if not has_ma_alignment:
+                    continue
+                
+                # 获取当前价格信息
+                current_data = historical_data[0] if historical_data else {}
+                current_price = float(current_data.get('close', 0))
+                current_change_percent = current_data.get('change_percent', 0)
+                
+                # 所有条件满足，加入结果列表
+                result_item = {
+                    'code': str(code),
+                    'name': name,
+                    'limit_up_date': str(limit_up_info['date']),
+                    'limit_up_price': round(limit_up_info['close'], 2),
+                    'limit_up_low': round(limit_up_info['low'], 2),
+                    'limit_up_high': round(limit_up_info['high'], 2),
+                    'breakthrough_date': str(breakthrough_info['date']),
+                    'breakthrough_price': round(breakthrough_info['close'], 2),
+                    'current_price': round(current_price, 2),
+                    'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0,
+                    'ma5': ma_info.get('ma5', 0),
+                    'ma10': ma_info.get('ma10', 0),
+                    'ma20': ma_info.get('ma20', 0),
+                    'gap_dates': gap_dates,
+                    'doji_dates': doji_dates
+                }
+                
+                results.append(result_item)
+                logger.info(f"找到符合条件的股票: {code} {name}")
+                
+            except Exception as e:
+                logger.error(f"处理股票 {code} 时出错: {str(e)}")
+                continue
+        
+        return results
+    
+    @staticmethod
+    def screening_cyb_midline_strategy(db: Session, months: int = 4, progress: Optional[ProgressCallback] = None) -> List[Dict]:
         """
         创业板中线选股策略主函数
         
         Args:
             db: 数据库会话
             months: 查询月数（默认4个月）
+            progress: 进度回调（异步选股任务使用，每完成一个分块调用一次）
         
         Returns:
             符合条件的股票列表
@@ -299,127 +403,16 @@ class StockScreeningStrategy:
             
             logger.info(f"查询日期范围: {start_date_str} 至 {end_date_str}")
             
-            # 3. 对每只股票执行选股策略
-            for idx, (code, name) in enumerate(cyb_stocks):
-                if idx % 100 == 0:
-                    logger.info(f"处理进度: {idx}/{len(cyb_stocks)}")
-                
-                try:
-                    # 获取该股票的历史数据（倒序，最新在前）
-                    # 注意：数据库中的date字段是text类型，所以使用字符串比较
-                    history_query = db.execute(text("""
-                        SELECT code, name, date, open, close, high, low, 
-                               change_percent, volume, amount
-                        FROM historical_quotes 
-                        WHERE code = :code 
-                        AND date >= :start_date 
-                        AND date <= :end_date
-                        ORDER BY date DESC
-                    """), {
-                        'code': str(code),
-                        'start_date': start_date_str,
-                        'end_date': end_date_str
-                    })
-                    
-                    history_rows = history_query.fetchall()
-                    
-                    if len(history_rows) < 20:  # 数据不足
-                        continue
-                    
-                    # 转换为字典列表
-                    historical_data = []
-                    for row in history_rows:
-                        date_val = row[2]
-                        # 确保日期是字符串格式
-                        if hasattr(date_val, 'strftime'):
-                            date_str = date_val.strftime('%Y-%m-%d')
-                        else:
-                            date_str = str(date_val)
-                        
-                        historical_data.append({
-                            'code': row[0],
-                            'name': row[1],
-                            'date': date_str,
-                            'open': float(row[3]) if row[3] else 0.0,
-                            'close': float(row[4]) if row[4] else 0.0,
-                            'high': float(row[5]) if row[5] else 0.0,
-                            'low': float(row[6]) if row[6] else 0.0,
-                            'change_percent': float(row[7]) if row[7] else 0.0,
-                            'volume': float(row[8]) if row[8] else 0.0,
-                            'amount': float(row[9]) if row[9] else 0.0
-                        })
-                    
-                    # 检查策略条件
-                    # 条件1：查找第一个涨停（今天涨停前3-4个月都没有过涨停）
-                    limit_up_info = StockScreeningStrategy.find_first_limit_up(historical_data, months_before=months)
-                    if not limit_up_info:
-                        continue
-                    
-                    # 条件2：检查回调不破底
-                    has_pullback, pullback_info = StockScreeningStrategy.check_pullback_not_break_bottom(
-                        historical_data, limit_up_info
-                    )
-                    if not has_pullback:
-                        continue
-                    
-                    # 条件3：检查突破涨停高点
-                    has_breakthrough, breakthrough_info = StockScreeningStrategy.check_breakthrough(
-                        historical_data, limit_up_info
-                    )
-                    if not has_breakthrough:
-                        continue
-                    
-                    # 条件4：检查跳空和揉搓线
-                    has_gap_doji, gap_dates, doji_dates = StockScreeningStrategy.check_gap_and_doji(
-                        historical_data, 
-                        limit_up_info['index'], 
-                        breakthrough_info['index']
-                    )
-                    if not has_gap_doji:
-                        continue
-                    
-                    # 条件5：检查均线多头排列（使用最新数据）
-                    has_ma_alignment, ma_info = StockScreeningStrategy.check_ma_alignment(
-                        historical_data, current_index=0
-                    )
-                    if not has_ma_alignment:
-                        continue
-                    
-                    # 获取当前价格信息
-                    current_data = historical_data[0] if historical_data else {}
-                    current_price = float(current_data.get('close', 0))
-                    current_change_percent = current_data.get('change_percent', 0)
-                    
-                    # 所有条件满足，加入结果列表
-                    result_item = {
-                        'code': str(code),
-                        'name': name,
-                        'limit_up_date': str(limit_up_info['date']),
-                        'limit_up_price': round(limit_up_info['close'], 2),
-                        'limit_up_low': round(limit_up_info['low'], 2),
-                        'limit_up_high': round(limit_up_info['high'], 2),
-                        'breakthrough_date': str(breakthrough_info['date']),
-                        'breakthrough_price': round(breakthrough_info['close'], 2),
-                        'current_price': round(current_price, 2),
-                        'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0,
-                        'ma5': ma_info.get('ma5', 0),
-                        'ma10': ma_info.get('ma10', 0),
-                        'ma20': ma_info.get('ma20', 0),
-                        'gap_dates': gap_dates,
-                        'doji_dates': doji_dates
-                    }
-                    
-                    results.append(result_item)
-                    logger.info(f"找到符合条件的股票: {code} {name}")
-                    
-                except Exception as e:
-                    logger.error(f"处理股票 {code} 时出错: {str(e)}")
-                    # 回滚事务以重置失败状态，避免影响后续查询
-                    try:
-                        db.rollback()
-                    except Exception as rollback_error:
-                        logger.warning(f"回滚事务时出错: {str(rollback_error)}")
-                    continue
+            # 从共享行情面板读取历史数据，避免逐只股票查询数据库
+            panel = get_price_panel(db)
+            
+            # 3. 对每只股票执行选股策略（股票较多时分块并行执行）
+            results = get_screening_executor().run(
+                StockScreeningStrategy.screen_cyb_midline_stocks,
+                panel, cyb_stocks, start_date_str, end_date_str,
+                progress=progress,
+                months=months
+            )
             
             logger.info(f"选股策略执行完成，找到 {len(results)} 只符合条件的股票")
             
@@ -574,7 +567,126 @@ class StockScreeningStrategy:
         return True, limit_up_info
     
     @staticmethod
-    def screening_parking_apron_strategy(db: Session) -> List[Dict]:
+    def screen_parking_apron_stocks(panel: PricePanel, stocks: List[Tuple[str, str]],
+                                    start_date_str: str, end_date_str: str) -> List[Dict]:
+        """
+        对一组股票逐只检查停机坪策略条件（可由并行执行器在子进程中按块调用）
+        
+        Args:
+            panel: 行情面板
+            stocks: (股票代码, 名称) 列表
+            start_date_str: 数据开始日期（YYYY-MM-DD）
+            end_date_str: 数据结束日期（YYYY-MM-DD）
+        
+        Returns:
+            符合条件的股票列表
+        """
+        results = []
+        
+        for idx, (code, name) in enumerate(stocks):
+            if idx % 100 == 0:
+                logger.info(f"处理进度: {idx}/{len(stocks)}")
+            
+            try:
+                # 从共享行情面板获取该股票的历史数据（倒序，最新在前）
+                historical_data = panel.get_history(code, start_date_str, end_date_str, name=name)
+                
+                if len(historical_data) < 18:  # 至少需要18个交易日的数据
+                    continue
+                
+                # 检查停机坪策略条件
+                is_valid, limit_up_info = StockScreeningStrategy.check_parking_apron_conditions(
+                    historical_data, threshold=15
+                )
+                
+                if not is_valid or not limit_up_info:
+                    continue
+                
+                # 获取当前价格信息
+                current_data = historical_data[0] if historical_data else {}
+                current_price = float(current_data.get('close', 0))
+                current_change_percent = current_data.get('change_percent', 0)
+                
+                # 所有条件满足，加入结果列表
+                result_item = {
+                    'code': str(code),
+                    'name': name,
+                    'limit_up_date': str(limit_up_info['date']),
+                    'limit_up_price': round(limit_up_info['close'], 2),
+                    'current_price': round(current_price, 2),
+                    'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0
+                }
+                
+                results.append(result_item)
+                logger.info(f"找到符合条件的股票: {code} {name}")
+                
+            except Exception as e:
+                logger.error(f"处理股票 {code} 时出错: {str(e)}")
+                continue
+        
+        return results
+
+    @staticmethod
+    def replay_parking_apron_signals(panel: PricePanel, stocks: List[Tuple[str, str]], as_of_dates: List[str],
+                                     lookback_days: int = 30, threshold: int = 15) -> List[Dict]:
+        """
+        回测用：在全部股票的K线序列上一次计算全部回放日的停机坪信号，与逐日执行 screen_parking_apron_stocks 的结果一致
+
+        回放日窗口内最近 threshold 根K线中最新的放量涨停（前15根K线都在窗口内），之后3根K线满足高开、收涨条件。
+
+        Args:
+            panel: 行情面板
+            stocks: (code, name) 列表
+            as_of_dates: 回放日列表（升序）
+            lookback_days: 每个回放日的回看自然日数
+            threshold: 查找涨停的最近K线数
+
+        Returns:
+            信号列表 [{'date': 回放日, 'code', 'name'}]，按回放日、股票池顺序排列
+        """
+        bars = BarSequence(panel, stocks, fields=('open', 'close', 'change_percent', 'volume'))
+        if len(bars) == 0 or not as_of_dates:
+            return []
+        opens, closes = bars.fields['open'], bars.fields['close']
+        change, volume = bars.fields['change_percent'], bars.fields['volume']
+        index = np.arange(len(bars))
+
+        # 放量：成交量 >= 前15根K线中成交量为正的K线平均值的1.5倍（与 check_volume_increase 相同的累加顺序）
+        volume_sum = np.zeros(len(bars))
+        volume_count = np.zeros(len(bars))
+        for k in range(1, 16):
+            prev = bars.take(volume, index - k)
+            volume_sum += np.where(prev > 0, prev, 0.0)
+            volume_count += prev > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            limit_up = (change > 9.5) & ~(volume <= 0) & (volume_count > 0) & \
+                (volume >= volume_sum / volume_count * 1.5)
+        last_limit_up = np.maximum.accumulate(np.where(limit_up, index, -1))
+
+        # 涨停后3根K线：高开、收盘高于涨停收盘价，收盘/开盘在 [0.97, 1.03) 内；后2根涨跌幅在 (-5%, 5%) 内
+        follow = np.ones(len(bars), dtype=bool)
+        for k in (1, 2, 3):
+            day_open, day_close = bars.take(opens, index + k), bars.take(closes, index + k)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = day_close / day_open
+                follow &= ~(day_open <= closes) & ~(day_close <= closes) & ~(day_open <= 0) & \
+                    ~((ratio < 0.97) | (ratio >= 1.03))
+                if k > 1:
+                    day_change = bars.take(change, index + k)
+                    follow &= ~((day_change <= -5) | (day_change >= 5))
+
+        entry, length = bars.windows(as_of_dates, lookback_days)
+        first = entry - length + 1
+        ok = length >= max(18, threshold + 3)
+        found = bars.take(last_limit_up, entry)
+        # 最新的涨停需在最近 threshold 根K线内且前15根K线在窗口内，否则更早的涨停同样不满足
+        ok &= (found >= entry - (threshold - 1)) & (found - 15 >= first)
+        ok &= entry - found >= 3
+        ok &= bars.take(follow, found)
+        return bars.signals(ok, as_of_dates)
+
+    @staticmethod
+    def screening_parking_apron_strategy(db: Session, progress: Optional[ProgressCallback] = None) -> List[Dict]:
         """
         停机坪选股策略主函数
         
@@ -585,6 +697,7 @@ class StockScreeningStrategy:
         
         Args:
             db: 数据库会话
+            progress: 进度回调（异步选股任务使用，每完成一个分块调用一次）
         
         Returns:
             符合条件的股票列表
@@ -612,87 +725,15 @@ class StockScreeningStrategy:
             
             logger.info(f"查询日期范围: {start_date_str} 至 {end_date_str}")
             
-            # 3. 对每只股票执行选股策略
-            for idx, (code, name) in enumerate(stocks):
-                if idx % 100 == 0:
-                    logger.info(f"处理进度: {idx}/{len(stocks)}")
-                
-                try:
-                    # 获取该股票的历史数据（倒序，最新在前）
-                    history_query = db.execute(text("""
-                        SELECT code, name, date, open, close, high, low, 
-                               change_percent, volume, amount
-                        FROM historical_quotes 
-                        WHERE code = :code 
-                        AND date >= :start_date 
-                        AND date <= :end_date
-                        ORDER BY date DESC
-                    """), {
-                        'code': str(code),
-                        'start_date': start_date_str,
-                        'end_date': end_date_str
-                    })
-                    
-                    history_rows = history_query.fetchall()
-                    
-                    if len(history_rows) < 18:  # 至少需要18个交易日的数据
-                        continue
-                    
-                    # 转换为字典列表
-                    historical_data = []
-                    for row in history_rows:
-                        date_val = row[2]
-                        if hasattr(date_val, 'strftime'):
-                            date_str = date_val.strftime('%Y-%m-%d')
-                        else:
-                            date_str = str(date_val)
-                        
-                        historical_data.append({
-                            'code': row[0],
-                            'name': row[1],
-                            'date': date_str,
-                            'open': float(row[3]) if row[3] else 0.0,
-                            'close': float(row[4]) if row[4] else 0.0,
-                            'high': float(row[5]) if row[5] else 0.0,
-                            'low': float(row[6]) if row[6] else 0.0,
-                            'change_percent': float(row[7]) if row[7] else 0.0,
-                            'volume': float(row[8]) if row[8] else 0.0,
-                            'amount': float(row[9]) if row[9] else 0.0
-                        })
-                    
-                    # 检查停机坪策略条件
-                    is_valid, limit_up_info = StockScreeningStrategy.check_parking_apron_conditions(
-                        historical_data, threshold=15
-                    )
-                    
-                    if not is_valid or not limit_up_info:
-                        continue
-                    
-                    # 获取当前价格信息
-                    current_data = historical_data[0] if historical_data else {}
-                    current_price = float(current_data.get('close', 0))
-                    current_change_percent = current_data.get('change_percent', 0)
-                    
-                    # 所有条件满足，加入结果列表
-                    result_item = {
-                        'code': str(code),
-                        'name': name,
-                        'limit_up_date': str(limit_up_info['date']),
-                        'limit_up_price': round(limit_up_info['close'], 2),
-                        'current_price': round(current_price, 2),
-                        'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0
-                    }
-                    
-                    results.append(result_item)
-                    logger.info(f"找到符合条件的股票: {code} {name}")
-                    
-                except Exception as e:
-                    logger.error(f"处理股票 {code} 时出错: {str(e)}")
-                    try:
-                        db.rollback()
-                    except Exception as rollback_error:
-                        logger.warning(f"回滚事务时出错: {str(rollback_error)}")
-                    continue
+            # 从共享行情面板读取历史数据，避免逐只股票查询数据库
+            panel = get_price_panel(db)
+            
+            # 3. 对每只股票执行选股策略（股票较多时分块并行执行）
+            results = get_screening_executor().run(
+                StockScreeningStrategy.screen_parking_apron_stocks,
+                panel, stocks, start_date_str, end_date_str,
+                progress=progress
+            )
             
             logger.info(f"停机坪选股策略执行完成，找到 {len(results)} 只符合条件的股票")
             
@@ -718,17 +759,8 @@ class StockScreeningStrategy:
             return []
         
         closes = [float(data.get('close', 0)) for data in historical_data]
-        ma250_list = []
-        
-        for i in range(len(closes)):
-            if i < 249:
-                ma250_list.append(0.0)  # 前249个数据点无法计算MA250
-            else:
-                # 计算最近250个交易日的平均收盘价
-                ma250 = np.mean(closes[i-249:i+1])
-                ma250_list.append(ma250)
-        
-        return ma250_list
+        # 前249个数据点无法计算MA250，记为0
+        return np.nan_to_num(rolling_mean(closes, 250)[0], nan=0.0).tolist()
     
     @staticmethod
     def check_backtrace_ma250_conditions(historical_data: List[Dict], threshold: int = 60) -> Tuple[bool, Optional[Dict]]:
@@ -879,7 +911,141 @@ class StockScreeningStrategy:
         }
     
     @staticmethod
-    def screening_backtrace_ma250_strategy(db: Session) -> List[Dict]:
+    def screen_backtrace_ma250_stocks(panel: PricePanel, stocks: List[Tuple[str, str]],
+                                      start_date_str: str, end_date_str: str) -> List[Dict]:
+        """
+        对一组股票逐只检查回踩年线策略条件（可由并行执行器在子进程中按块调用）
+        
+        Args:
+            panel: 行情面板
+            stocks: (股票代码, 名称) 列表
+            start_date_str: 数据开始日期（YYYY-MM-DD）
+            end_date_str: 数据结束日期（YYYY-MM-DD）
+        
+        Returns:
+            符合条件的股票列表
+        """
+        results = []
+        
+        for idx, (code, name) in enumerate(stocks):
+            if idx % 100 == 0:
+                logger.info(f"处理进度: {idx}/{len(stocks)}")
+            
+            try:
+                # 从共享行情面板获取该股票的历史数据（倒序，最新在前）
+                historical_data = panel.get_history(code, start_date_str, end_date_str, name=name)
+                
+                if len(historical_data) < 250:  # 至少需要250个交易日的数据
+                    continue
+                
+                # 检查回踩年线策略条件
+                is_valid, strategy_info = StockScreeningStrategy.check_backtrace_ma250_conditions(
+                    historical_data, threshold=60
+                )
+                
+                if not is_valid or not strategy_info:
+                    continue
+                
+                # 获取当前价格信息
+                current_data = historical_data[0] if historical_data else {}
+                current_price = float(current_data.get('close', 0))
+                current_change_percent = current_data.get('change_percent', 0)
+                
+                # 所有条件满足，加入结果列表
+                result_item = {
+                    'code': str(code),
+                    'name': name,
+                    'highest_date': strategy_info['highest_date'],
+                    'highest_price': round(strategy_info['highest_price'], 2),
+                    'lowest_date': strategy_info['lowest_date'],
+                    'lowest_price': round(strategy_info['lowest_price'], 2),
+                    'current_price': round(current_price, 2),
+                    'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0,
+                    'trading_days_diff': strategy_info['trading_days_diff'],
+                    'volume_ratio': round(strategy_info['volume_ratio'], 2),
+                    'price_ratio': round(strategy_info['price_ratio'], 4)
+                }
+                
+                results.append(result_item)
+                logger.info(f"找到符合条件的股票: {code} {name}")
+                
+            except Exception as e:
+                logger.error(f"处理股票 {code} 时出错: {str(e)}")
+                continue
+        
+        return results
+
+    @staticmethod
+    def replay_backtrace_ma250_signals(panel: PricePanel, stocks: List[Tuple[str, str]], as_of_dates: List[str],
+                                       lookback_days: int = 400) -> List[Dict]:
+        """
+        回测用：在全部股票的K线序列上一次计算全部回放日的回踩年线信号，与逐日执行 screen_backtrace_ma250_stocks 的结果一致
+
+        与 check_backtrace_ma250_conditions 相同，年线由最近250根K线计算，只在最新一根K线上有值，更早的K线记为0；
+        最高价、后段最低价按逐只版本的遍历顺序取最新出现的位置。
+
+        Args:
+            panel: 行情面板
+            stocks: (code, name) 列表
+            as_of_dates: 回放日列表（升序）
+            lookback_days: 每个回放日的回看自然日数
+
+        Returns:
+            信号列表 [{'date': 回放日, 'code', 'name'}]，按回放日、股票池顺序排列
+        """
+        bars = BarSequence(panel, stocks, fields=('close', 'volume'))
+        if len(bars) < 250 or not as_of_dates:
+            return []
+        closes, volume = bars.fields['close'], bars.fields['volume']
+        entry, length = bars.windows(as_of_dates, lookback_days)
+        ok = length >= 250
+        # 划分前后段的最近K线数（与 screen_backtrace_ma250_stocks 的 threshold 一致）
+        recent = 60
+
+        ma250 = bars.take(np.nan_to_num(rolling_mean(closes, 250)[0], nan=0.0), entry)
+
+        def ma250_at(offset):
+            return np.where(offset == 0, ma250, 0.0)
+
+        # 最近 recent 根K线中的最高收盘价（相同时取最新）
+        highest = np.zeros(entry.shape)
+        highest_index = np.full(entry.shape, -1)
+        for k in range(recent):
+            close = bars.take(closes, entry - k)
+            higher = close > highest
+            highest = np.where(higher, close, highest)
+            highest_index = np.where(higher, k, highest_index)
+        highest_volume = bars.take(volume, entry - highest_index)
+        ok &= (highest_index >= 0) & ~(highest_volume <= 0)
+        # 前段非空，且由年线以下向上突破
+        ok &= highest_index + 1 < recent
+        front_last = highest_index + 1
+        ok &= ~(bars.take(closes, entry - (recent - 1)) >= ma250_at(recent - 1)) & \
+            ~(bars.take(closes, entry - front_last) <= ma250_at(front_last))
+
+        # 后段在年线以上运行，并找到后段最低价（相同时取最新）
+        lowest = np.full(entry.shape, np.inf)
+        lowest_index = np.full(entry.shape, -1)
+        for k in range(recent):
+            in_back = k <= highest_index
+            close = bars.take(closes, entry - k)
+            ok &= ~(in_back & (ma250_at(k) > 0) & (close < ma250_at(k)))
+            lower = in_back & (close < lowest)
+            lowest = np.where(lower, close, lowest)
+            lowest_index = np.where(lower, k, lowest_index)
+        lowest_volume = bars.take(volume, entry - lowest_index)
+        ok &= (lowest_index >= 0) & ~(lowest_volume <= 0)
+        ok &= (lowest_index >= 10) & (lowest_index <= 50)
+
+        # 回踩缩量：最高价日成交量 / 后段最低价日成交量 > 2，后段最低价 / 最高价 < 0.8
+        with np.errstate(divide='ignore', invalid='ignore'):
+            volume_ratio = np.where(lowest_volume > 0, highest_volume / lowest_volume, 0.0)
+            price_ratio = np.where(highest > 0, lowest / highest, 1.0)
+        ok &= ~(volume_ratio <= 2) & ~(price_ratio >= 0.8)
+        return bars.signals(ok, as_of_dates)
+
+    @staticmethod
+    def screening_backtrace_ma250_strategy(db: Session, progress: Optional[ProgressCallback] = None) -> List[Dict]:
         """
         回踩年线选股策略主函数
         
@@ -891,6 +1057,7 @@ class StockScreeningStrategy:
         
         Args:
             db: 数据库会话
+            progress: 进度回调（异步选股任务使用，每完成一个分块调用一次）
         
         Returns:
             符合条件的股票列表
@@ -918,92 +1085,15 @@ class StockScreeningStrategy:
             
             logger.info(f"查询日期范围: {start_date_str} 至 {end_date_str}")
             
-            # 3. 对每只股票执行选股策略
-            for idx, (code, name) in enumerate(stocks):
-                if idx % 100 == 0:
-                    logger.info(f"处理进度: {idx}/{len(stocks)}")
-                
-                try:
-                    # 获取该股票的历史数据（倒序，最新在前）
-                    history_query = db.execute(text("""
-                        SELECT code, name, date, open, close, high, low, 
-                               change_percent, volume, amount
-                        FROM historical_quotes 
-                        WHERE code = :code 
-                        AND date >= :start_date 
-                        AND date <= :end_date
-                        ORDER BY date DESC
-                    """), {
-                        'code': str(code),
-                        'start_date': start_date_str,
-                        'end_date': end_date_str
-                    })
-                    
-                    history_rows = history_query.fetchall()
-                    
-                    if len(history_rows) < 250:  # 至少需要250个交易日的数据
-                        continue
-                    
-                    # 转换为字典列表
-                    historical_data = []
-                    for row in history_rows:
-                        date_val = row[2]
-                        if hasattr(date_val, 'strftime'):
-                            date_str = date_val.strftime('%Y-%m-%d')
-                        else:
-                            date_str = str(date_val)
-                        
-                        historical_data.append({
-                            'code': row[0],
-                            'name': row[1],
-                            'date': date_str,
-                            'open': float(row[3]) if row[3] else 0.0,
-                            'close': float(row[4]) if row[4] else 0.0,
-                            'high': float(row[5]) if row[5] else 0.0,
-                            'low': float(row[6]) if row[6] else 0.0,
-                            'change_percent': float(row[7]) if row[7] else 0.0,
-                            'volume': float(row[8]) if row[8] else 0.0,
-                            'amount': float(row[9]) if row[9] else 0.0
-                        })
-                    
-                    # 检查回踩年线策略条件
-                    is_valid, strategy_info = StockScreeningStrategy.check_backtrace_ma250_conditions(
-                        historical_data, threshold=60
-                    )
-                    
-                    if not is_valid or not strategy_info:
-                        continue
-                    
-                    # 获取当前价格信息
-                    current_data = historical_data[0] if historical_data else {}
-                    current_price = float(current_data.get('close', 0))
-                    current_change_percent = current_data.get('change_percent', 0)
-                    
-                    # 所有条件满足，加入结果列表
-                    result_item = {
-                        'code': str(code),
-                        'name': name,
-                        'highest_date': strategy_info['highest_date'],
-                        'highest_price': round(strategy_info['highest_price'], 2),
-                        'lowest_date': strategy_info['lowest_date'],
-                        'lowest_price': round(strategy_info['lowest_price'], 2),
-                        'current_price': round(current_price, 2),
-                        'current_change_percent': round(current_change_percent, 2) if current_change_percent else 0,
-                        'trading_days_diff': strategy_info['trading_days_diff'],
-                        'volume_ratio': round(strategy_info['volume_ratio'], 2),
-                        'price_ratio': round(strategy_info['price_ratio'], 4)
-                    }
-                    
-                    results.append(result_item)
-                    logger.info(f"找到符合条件的股票: {code} {name}")
-                    
-                except Exception as e:
-                    logger.error(f"处理股票 {code} 时出错: {str(e)}")
-                    try:
-                        db.rollback()
-                    except Exception as rollback_error:
-                        logger.warning(f"回滚事务时出错: {str(rollback_error)}")
-                    continue
+            # 从共享行情面板读取历史数据，避免逐只股票查询数据库
+            panel = get_price_panel(db)
+            
+            # 3. 对每只股票执行选股策略（股票较多时分块并行执行）
+            results = get_screening_executor().run(
+                StockScreeningStrategy.screen_backtrace_ma250_stocks,
+                panel, stocks, start_date_str, end_date_str,
+                progress=progress
+            )
             
             logger.info(f"回踩年线选股策略执行完成，找到 {len(results)} 只符合条件的股票")
             
@@ -1,20 +1,36 @@
 """
 选股策略API路由
 提供创业板中线选股策略接口
+默认参数的请求优先返回收盘后预计算的结果（见 stock/screening_results.py）
+长耗时策略可通过 /api/screening/jobs 异步执行，查询进度或通过 SSE 实时接收命中结果
+策略回测通过 /api/screening/backtest 以任务方式执行（见 stock/strategy_backtest.py）
+多个策略可通过 /api/screening/composite 一次执行并按 AND / OR 组合（见 stock/composite_screening.py）
+自定义条件可通过 /api/screening/expression 以表达式选股（见 stock/screening_expression.py）
 """
 
-from fastapi import APIRouter, Depends, Query, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, HTTPException, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from datetime import datetime
+import asyncio
+import json
 import logging
 
+from config import SCREENING_CONFIG
 from database import get_db
-from stock.stock_screening import StockScreeningStrategy
-from stock.high_tight_flag_strategy import HighTightFlagStrategy
-from stock.keep_increasing_strategy import KeepIncreasingStrategy
-from stock.long_lower_shadow_strategy import LongLowerShadowStrategy
+from models import (
+    CompositeScreeningRequest, ExpressionScreeningRequest, ScreeningBacktestRequest, ScreeningJobRequest
+)
 from stock.low_nine_strategy import LowNineStrategy
+from stock.screening_jobs import (
+    FINISHED_STATUSES, create_backtest_job, create_screening_job, get_screening_job, run_backtest_job,
+    run_screening_job
+)
+from stock.composite_screening import run_composite_screening
+from stock.screening_expression import ExpressionError, compile_expression, run_expression_screening
+from stock.json_utils import json_default
+from stock.screening_results import get_screening_results
 
 logger = logging.getLogger(__name__)
 
@@ -50,8 +66,9 @@ async def get_cyb_midline_strategy(
     try:
         logger.info(f"开始执行创业板中线选股策略，查询月数: {months}")
         
-        # 执行选股策略
-        results = StockScreeningStrategy.screening_cyb_midline_strategy(db, months=months)
+        # 执行选股策略（默认参数优先返回收盘后预计算结果；实时计算使用向量化版本，在线程池中执行，避免阻塞事件循环）
+        screening = await run_in_threadpool(get_screening_results, db, 'cyb_midline', {'months': months})
+        results = screening['data']
         
         logger.info(f"选股策略执行完成，找到 {len(results)} 只符合条件的股票")
         
@@ -60,6 +77,10 @@ async def get_cyb_midline_strategy(
             "data": results,
             "total": len(results),
             "search_date": datetime.now().strftime("%Y-%m-%d"),
+            "trade_date": screening['trade_date'],
+            "precomputed": screening['precomputed'],
+            "failed_count": screening['failed_count'],
+            "incomplete": screening['incomplete'],
             "months": months,
             "strategy_name": "创业板中线选股策略"
         })
@@ -96,7 +117,8 @@ async def get_parking_apron_strategy(
         logger.info("开始执行停机坪选股策略")
         
         # 执行选股策略
-        results = StockScreeningStrategy.screening_parking_apron_strategy(db)
+        screening = await run_in_threadpool(get_screening_results, db, 'parking_apron')
+        results = screening['data']
         
         logger.info(f"停机坪选股策略执行完成，找到 {len(results)} 只符合条件的股票")
         
@@ -105,6 +127,10 @@ async def get_parking_apron_strategy(
             "data": results,
             "total": len(results),
             "search_date": datetime.now().strftime("%Y-%m-%d"),
+            "trade_date": screening['trade_date'],
+            "precomputed": screening['precomputed'],
+            "failed_count": screening['failed_count'],
+            "incomplete": screening['incomplete'],
             "strategy_name": "停机坪"
         })
         
@@ -141,7 +167,8 @@ async def get_backtrace_ma250_strategy(
         logger.info("开始执行回踩年线选股策略")
         
         # 执行选股策略
-        results = StockScreeningStrategy.screening_backtrace_ma250_strategy(db)
+        screening = await run_in_threadpool(get_screening_results, db, 'backtrace_ma250')
+        results = screening['data']
         
         logger.info(f"回踩年线选股策略执行完成，找到 {len(results)} 只符合条件的股票")
         
@@ -150,6 +177,10 @@ async def get_backtrace_ma250_strategy(
             "data": results,
             "total": len(results),
             "search_date": datetime.now().strftime("%Y-%m-%d"),
+            "trade_date": screening['trade_date'],
+            "precomputed": screening['precomputed'],
+            "failed_count": screening['failed_count'],
+            "incomplete": screening['incomplete'],
             "strategy_name": "回踩年线"
         })
         
@@ -185,7 +216,8 @@ async def get_high_tight_flag_strategy(
         logger.info("开始执行高而窄的旗形选股策略")
         
         # 执行选股策略
-        results = HighTightFlagStrategy.screening_high_tight_flag_strategy(db)
+        screening = await run_in_threadpool(get_screening_results, db, 'high_tight_flag')
+        results = screening['data']
         
         logger.info(f"高而窄的旗形选股策略执行完成，找到 {len(results)} 只符合条件的股票")
         
@@ -194,6 +226,10 @@ async def get_high_tight_flag_strategy(
             "data": results,
             "total": len(results),
             "search_date": datetime.now().strftime("%Y-%m-%d"),
+            "trade_date": screening['trade_date'],
+            "precomputed": screening['precomputed'],
+            "failed_count": screening['failed_count'],
+            "incomplete": screening['incomplete'],
             "strategy_name": "高而窄的旗形"
         })
         
@@ -228,7 +264,8 @@ async def get_keep_increasing_strategy(
         logger.info("开始执行持续上涨（MA30向上）选股策略")
         
         # 执行选股策略
-        results = KeepIncreasingStrategy.screening_keep_increasing_strategy(db)
+        screening = await run_in_threadpool(get_screening_results, db, 'keep_increasing')
+        results = screening['data']
         
         logger.info(f"持续上涨（MA30向上）选股策略执行完成，找到 {len(results)} 只符合条件的股票")
         
@@ -237,6 +274,10 @@ async def get_keep_increasing_strategy(
             "data": results,
             "total": len(results),
             "search_date": datetime.now().strftime("%Y-%m-%d"),
+            "trade_date": screening['trade_date'],
+            "precomputed": screening['precomputed'],
+            "failed_count": screening['failed_count'],
+            "incomplete": screening['incomplete'],
             "strategy_name": "持续上涨（MA30向上）"
         })
         
@@ -289,13 +330,13 @@ async def get_long_lower_shadow_strategy(
                    f"上影线比例={upper_shadow_ratio}, 最小振幅={min_amplitude}, 检查天数={recent_days}")
         
         # 执行选股策略（传入参数）
-        results = LongLowerShadowStrategy.screening_long_lower_shadow_strategy(
-            db, 
-            lower_shadow_ratio=lower_shadow_ratio,
-            upper_shadow_ratio=upper_shadow_ratio,
-            min_amplitude=min_amplitude,
-            recent_days=recent_days
-        )
+        screening = await run_in_threadpool(get_screening_results, db, 'long_lower_shadow', {
+            'lower_shadow_ratio': lower_shadow_ratio,
+            'upper_shadow_ratio': upper_shadow_ratio,
+            'min_amplitude': min_amplitude,
+            'recent_days': recent_days
+        })
+        results = screening['data']
         
         logger.info(f"长下影阳线选股策略执行完成，找到 {len(results)} 只符合条件的股票")
         
@@ -304,6 +345,10 @@ async def get_long_lower_shadow_strategy(
             "data": results,
             "total": len(results),
             "search_date": datetime.now().strftime("%Y-%m-%d"),
+            "trade_date": screening['trade_date'],
+            "precomputed": screening['precomputed'],
+            "failed_count": screening['failed_count'],
+            "incomplete": screening['incomplete'],
             "strategy_name": "长下影阳线",
             "parameters": {
                 "lower_shadow_ratio": lower_shadow_ratio,
@@ -353,7 +398,8 @@ async def get_low_nine_strategy(
             logger.info("开始执行低九策略选股（生产模式：处理所有股票）")
         
         # 执行选股策略
-        results = LowNineStrategy.screening_low_nine_strategy(db, limit=limit)
+        screening = await run_in_threadpool(get_screening_results, db, 'low_nine', {'limit': limit})
+        results = screening['data']
         
         logger.info(f"低九策略选股执行完成，找到 {len(results)} 只符合条件的股票")
         
@@ -362,6 +408,10 @@ async def get_low_nine_strategy(
             "data": results,
             "total": len(results),
             "search_date": datetime.now().strftime("%Y-%m-%d"),
+            "trade_date": screening['trade_date'],
+            "precomputed": screening['precomputed'],
+            "failed_count": screening['failed_count'],
+            "incomplete": screening['incomplete'],
             "strategy_name": "低九策略",
             "test_mode": limit is not None,
             "limit": limit
@@ -375,3 +425,307 @@ async def get_low_nine_strategy(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"低九策略选股执行失败: {str(e)}"
         )
+
+
+
+@router.get("/low-nine-count")
+async def get_low_nine_count_stocks(
+    count: int = Query(..., ge=1, le=9, description="九转序列计数（1-9，9表示计数>=9即满足低九）"),
+    db: Session = Depends(get_db)
+):
+    """
+    按九转序列计数查询股票
+
+    计数由收盘后的历史行情采集任务逐日推进（td_setup_counts 表），这里只做索引查询：
+    - count=9: 满足低九的股票
+    - count=7/8: 即将形成低九的预警列表
+
+    Args:
+        count: 九转序列计数
+        db: 数据库会话
+
+    Returns:
+        当前计数为 count 的股票列表
+    """
+    try:
+        results = await run_in_threadpool(LowNineStrategy.query_setup_count_stocks, db, count)
+
+        return JSONResponse({
+            "success": True,
+            "data": results,
+            "total": len(results),
+            "trade_date": results[0]['trade_date'] if results else None,
+            "count": count,
+            "strategy_name": "九转序列计数"
+        })
+
+    except Exception as e:
+        logger.error(f"查询九转序列计数失败: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"查询九转序列计数失败: {str(e)}"
+        )
+
+@router.post("/composite")
+async def composite_screening(
+    request: CompositeScreeningRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    组合选股：一次执行多个策略并按 AND / OR 组合
+
+    所有策略共用一次行情读取，每只股票的历史数据只构建一次；默认参数且已有预计算结果的策略直接使用存储结果。
+
+    Args:
+        request: 如 {"strategies": ["low_nine", "long_lower_shadow"], "mode": "or",
+                     "params": {"long_lower_shadow": {"recent_days": 3}}}
+
+    Returns:
+        命中任一策略的股票列表，每只股票包含各策略的命中标记 flags、组合结果 matched 以及各策略的详情 details
+    """
+    try:
+        logger.info(f"开始执行组合选股: {request.strategies}, 组合方式: {request.mode}")
+        result = await run_in_threadpool(run_composite_screening, db, request.strategies,
+                                         request.params, request.mode)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"执行组合选股失败: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"执行组合选股失败: {str(e)}"
+        )
+
+    return Response(
+        content=json.dumps({
+            "success": True,
+            **result,
+            "total": len(result['data']),
+            "search_date": datetime.now().strftime("%Y-%m-%d")
+        }, ensure_ascii=False, default=json_default),
+        media_type="application/json"
+    )
+
+
+@router.post("/expression")
+async def expression_screening(
+    request: ExpressionScreeningRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    表达式选股
+
+    表达式在全市场行情面板上向量化计算，语法见 stock/screening_expression.py，例如:
+    close > ma(close, 250) and ref(change_percent, 1) >= 9.5 and count(change_percent >= 9.5, 20) >= 2
+
+    Args:
+        request: {"expression": 选股表达式, "market": "A" 或 "HK"}
+
+    Returns:
+        最新交易日满足表达式的股票列表
+    """
+    try:
+        result = await run_in_threadpool(run_expression_screening, db, request.expression, request.market)
+    except ExpressionError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"执行表达式选股失败: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"执行表达式选股失败: {str(e)}"
+        )
+
+    return JSONResponse({
+        "success": True,
+        **result,
+        "total": len(result['data']),
+        "search_date": datetime.now().strftime("%Y-%m-%d")
+    })
+
+
+@router.get("/expression/validate")
+async def validate_screening_expression(
+    expression: str = Query(..., description="选股表达式")
+):
+    """
+    校验选股表达式（只编译不计算）
+
+    Returns:
+        规范化表达式、所需交易日数以及使用的字段
+    """
+    try:
+        compiled = compile_expression(expression)
+    except ExpressionError as e:
+        return JSONResponse({"success": False, "message": str(e)})
+    return JSONResponse({
+        "success": True,
+        "expression": compiled.key,
+        "bars": compiled.bars,
+        "fields": compiled.fields
+    })
+
+
+def _format_job(job: dict) -> dict:
+    """任务快照转换为可JSON序列化的响应"""
+    data = dict(job)
+    for key in ('start_time', 'end_time'):
+        if data.get(key) is not None:
+            data[key] = data[key].strftime('%Y-%m-%d %H:%M:%S')
+    return data
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=json_default)}\n\n"
+
+
+@router.post("/jobs")
+async def submit_screening_job(
+    request: ScreeningJobRequest,
+    background_tasks: BackgroundTasks
+):
+    """
+    提交异步选股任务
+
+    立即返回任务ID，选股在后台执行。通过 GET /api/screening/jobs/{job_id} 查询进度，
+    或通过 GET /api/screening/jobs/{job_id}/stream（SSE）实时接收命中的股票。
+
+    Args:
+        request: 策略标识与参数，如 {"strategy": "backtrace_ma250", "params": {}}
+
+    Returns:
+        任务ID
+    """
+    try:
+        job_id = create_screening_job(request.strategy, request.params)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    background_tasks.add_task(run_screening_job, job_id)
+    logger.info(f"提交选股任务: {job_id}, 策略: {request.strategy}")
+
+    job = get_screening_job(job_id)
+    return JSONResponse({
+        "success": True,
+        "job_id": job_id,
+        "status": job['status'],
+        "strategy": job['strategy'],
+        "strategy_name": job['strategy_name'],
+        "params": job['params']
+    })
+
+
+@router.post("/backtest")
+async def submit_backtest_job(
+    request: ScreeningBacktestRequest,
+    background_tasks: BackgroundTasks
+):
+    """
+    提交选股策略回测任务
+
+    在 [start_date, end_date] 的每个交易日按当日可见的数据回放策略，统计信号之后 5/10/20 个交易日的收益。
+    通过 GET /api/screening/jobs/{job_id} 查询进度，完成后 report 为统计结果，results 为带远期收益的信号列表。
+
+    Args:
+        request: 如 {"strategy": "low_nine", "start_date": "2024-01-01", "end_date": "2024-12-31"}
+
+    Returns:
+        任务ID
+    """
+    try:
+        job_id = create_backtest_job(request.strategy, request.start_date, request.end_date,
+                                     params=request.params, horizons=request.horizons)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    background_tasks.add_task(run_backtest_job, job_id)
+    logger.info(f"提交回测任务: {job_id}, 策略: {request.strategy}, 区间: {request.start_date} 至 {request.end_date}")
+
+    job = get_screening_job(job_id)
+    return JSONResponse({
+        "success": True,
+        "job_id": job_id,
+        "status": job['status'],
+        "strategy": job['strategy'],
+        "strategy_name": job['strategy_name'],
+        "params": job['params'],
+        "start_date": job['start_date'],
+        "end_date": job['end_date']
+    })
+
+
+@router.get("/jobs/{job_id}")
+async def get_screening_job_status(
+    job_id: str,
+    offset: int = Query(0, ge=0, description="只返回第offset个之后的命中结果（增量拉取）")
+):
+    """
+    查询选股任务进度
+
+    Returns:
+        任务状态、进度（已处理股票数/股票总数）以及 offset 之后的命中结果
+    """
+    job = get_screening_job(job_id, offset=offset)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="选股任务不存在或已过期")
+    return Response(
+        content=json.dumps({"success": True, **_format_job(job)}, ensure_ascii=False, default=json_default),
+        media_type="application/json"
+    )
+
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_screening_job(job_id: str):
+    """
+    以 SSE 推送选股任务的进度和命中结果
+
+    事件:
+    - progress: {"processed_stocks", "total_stocks", "progress"}
+    - hit: 命中的股票（格式与同步接口 data 中的元素一致）
+    - done: {"status", "hit_count", "error_message"}
+    """
+    if get_screening_job(job_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="选股任务不存在或已过期")
+
+    interval = SCREENING_CONFIG.get('job_stream_interval', 0.5)
+
+    async def event_stream():
+        sent = 0
+        last_processed = -1
+        while True:
+            job = get_screening_job(job_id, offset=sent)
+            if job is None:
+                yield _sse("done", {"status": "expired", "hit_count": sent, "error_message": "选股任务已过期"})
+                return
+            for hit in job['results']:
+                yield _sse("hit", hit)
+            sent += len(job['results'])
+            if job['processed_stocks'] != last_processed:
+                last_processed = job['processed_stocks']
+                yield _sse("progress", {
+                    "processed_stocks": job['processed_stocks'],
+                    "total_stocks": job['total_stocks'],
+                    "progress": job['progress']
+                })
+            if job['status'] in FINISHED_STATUSES:
+                yield _sse("done", {
+                    "status": job['status'],
+                    "hit_count": sent,
+                    "error_message": job['error_message']
+                })
+                return
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # 禁止nginx缓冲，保证事件实时送达
+        }
+    )
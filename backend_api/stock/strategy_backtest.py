@@ -0,0 +1,329 @@
+"""
+选股策略回测
+在历史交易日区间内逐日回放已登记的选股策略（按回放日截取的时点数据），统计每个信号之后 N 个交易日的收益
+
+设计要点:
+1. 时点一致：回放日 D 的输入为 [D - 回看自然日数, D] 的行情，与当日实时选股的日期范围规则完全相同，不使用 D 之后的数据
+2. 向量化信号：登记了 signals 的策略直接在面板上计算全部回放日的信号，结果与逐日回放逐条一致；
+   低九、停机坪、回踩年线、高而窄的旗形、持续上涨、长下影线在压缩的K线序列（BarSequence）上一次算出，
+   创业板中线每个回放日对全部股票一次计算
+3. 复用策略代码：未登记 signals 的策略（及 vectorized=False 的对比回测）直接调用逐只选股函数逐日回放，回测信号与实时选股结果逐条一致；
+   每只股票的历史数据只构建一次（HistoryCache），各回放日按日期区间切片
+4. 并行执行：逐日回放按股票分块交给选股执行器的进程池，每块回放全部回放日；回测不设分块超时，
+   执行失败的分块中的股票记入 summary（failed_stocks），不参与信号和基准收益的统计
+5. 向量化收益：远期收益在面板上按 (股票 × 交易日) 矩阵一次计算，同时得到同日股票池的平均收益作为基准
+
+使用方式:
+    report = run_backtest(db, 'low_nine', start_date='2024-01-01', end_date='2024-12-31')
+    report['horizons']['5']['mean']   # 信号后5个交易日的平均收益率（%）
+
+说明:
+- 股票池为当前 stock_basic_info 中的股票（已退市股票不在其中，存在幸存者偏差）
+- 入场价为回放日（停牌时为回放日之前最近一个交易日）的收盘价，N日收益按该股票自身的第N个后续交易日收盘价计算
+- 远期数据不足N个交易日的信号不计入该周期的统计
+- 面板中没有行情的股票不参与回测，数量见 summary 的 excluded_count
+- 两种信号计算方式的耗时对比见 python -m stock.screening_benchmark --backtest low_nine
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from config import SCREENING_CONFIG
+from stock.price_panel import HistoryCache, PricePanel, get_panel_store
+from stock.screening_executor import ProgressCallback, failed_stocks, get_screening_executor
+from stock.screening_registry import get_strategy, resolve_params
+
+logger = logging.getLogger(__name__)
+
+# 默认统计的远期交易日数
+DEFAULT_HORIZONS = (5, 10, 20)
+
+
+@contextmanager
+def _quiet_logger(name: str):
+    """回放期间屏蔽策略逐只输出的 INFO 日志（每个回放日都会重复输出）"""
+    target = logging.getLogger(name)
+    level = target.level
+    target.setLevel(max(logging.WARNING, level))
+    try:
+        yield
+    finally:
+        target.setLevel(level)
+
+
+def _shift_date(date_str: str, days: int) -> str:
+    return (datetime.strptime(date_str, '%Y-%m-%d') + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def replay_signals(panel: PricePanel, stocks: List[Tuple[str, str]], start_date: Optional[str],
+                   end_date: Optional[str], screen: Callable[..., List[Dict]] = None,
+                   as_of_dates: Sequence[str] = (), lookback_days: int = 30,
+                   screen_params: Optional[Dict[str, Any]] = None) -> List[Dict]:
+    """
+    对一组股票逐日回放选股函数（可由并行执行器在子进程中按块调用）
+
+    Args:
+        panel: 行情面板（至少包含 [首个回放日 - lookback_days, 最后回放日]）
+        stocks: (code, name) 列表
+        start_date: 数据开始日期（由执行器截取子面板使用）
+        end_date: 数据结束日期（由执行器截取子面板使用）
+        screen: 逐只选股函数 screen(panel, stocks, start_date, end_date, **screen_params)
+        as_of_dates: 回放日列表（升序）
+        lookback_days: 每个回放日的回看自然日数
+        screen_params: 选股函数参数
+
+    Returns:
+        信号列表 [{'date': 回放日, 'code', 'name'}]，按回放日、股票池顺序排列
+    """
+    cache = HistoryCache(panel)
+    signals: List[Dict] = []
+    with _quiet_logger(screen.__module__):
+        for as_of in as_of_dates:
+            window_start = _shift_date(as_of, -lookback_days)
+            for item in screen(cache, stocks, window_start, as_of, **(screen_params or {})):
+                signals.append({'date': as_of, 'code': str(item.get('code')), 'name': item.get('name')})
+    return signals
+
+
+def forward_returns(panel: PricePanel, horizons: Sequence[int]) -> Tuple[np.ndarray, Dict[int, np.ndarray]]:
+    """
+    计算面板上每个 (股票, 交易日) 的远期收益
+
+    每只股票的有效K线压缩为连续序列，位置 (i, j) 的入场K线为该股票在交易日 j 及之前的最后一根K线，
+    N日收益为其后第N根K线收盘价相对入场收盘价的涨跌幅（%）。
+
+    Args:
+        panel: 行情面板
+        horizons: 远期交易日数列表
+
+    Returns:
+        (entry_close, {N: 收益矩阵})，无入场K线、后续K线不足或价格无效的位置为 NaN
+    """
+    mask = panel.mask
+    close = panel.fields['close']
+    counts = mask.sum(axis=1)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    # 按行展开的有效收盘价（行内按日期升序）
+    flat = close[mask]
+    rank = np.cumsum(mask, axis=1) - 1
+    has_entry = rank >= 0
+    entry_pos = offsets[:-1, None] + np.where(has_entry, rank, 0)
+
+    entry_close = np.where(has_entry, flat[entry_pos] if len(flat) else 0.0, np.nan)
+    entry_ok = has_entry & (entry_close > 0)
+
+    result = {}
+    for horizon in horizons:
+        target = entry_pos + horizon
+        ok = entry_ok & (target < offsets[1:, None])
+        exit_close = flat[np.where(ok, target, 0)] if len(flat) else np.zeros(mask.shape)
+        ok &= exit_close > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[horizon] = np.where(ok, (exit_close / np.where(ok, entry_close, 1.0) - 1) * 100, np.nan)
+    return entry_close, result
+
+
+def _round(value, digits: int = 2):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def _summarize(returns: np.ndarray, benchmark: np.ndarray) -> Dict[str, Any]:
+    """单个远期周期的统计"""
+    valid = ~np.isnan(returns)
+    values = returns[valid]
+    if len(values) == 0:
+        return {'count': 0, 'mean': None, 'median': None, 'win_rate': None, 'max': None, 'min': None,
+                'std': None, 'benchmark_mean': None, 'excess_mean': None}
+    bench = benchmark[valid]
+    bench_mean = np.nanmean(bench) if (~np.isnan(bench)).any() else np.nan
+    return {
+        'count': int(len(values)),
+        'mean': _round(values.mean()),
+        'median': _round(np.median(values)),
+        'win_rate': _round((values > 0).mean() * 100),
+        'max': _round(values.max()),
+        'min': _round(values.min()),
+        'std': _round(values.std()),
+        'benchmark_mean': _round(bench_mean),
+        'excess_mean': _round(values.mean() - bench_mean),
+    }
+
+
+def _load_stock_pool(db: Session, stock_pool: str) -> List[Tuple[str, str]]:
+    rows = db.execute(text(f"""
+        SELECT DISTINCT code, name
+        FROM stock_basic_info
+        WHERE {stock_pool}
+        ORDER BY code
+    """)).fetchall()
+    return [(str(code), name) for code, name in rows]
+
+
+def _load_panel(db: Session, start_date: str) -> PricePanel:
+    """优先使用共享面板，回看范围超出共享面板时单独加载"""
+    store = get_panel_store()
+    panel = store.get(db)
+    if panel.first_date is not None and panel.first_date <= start_date:
+        return panel
+    return store.load_range(db, start_date)
+
+
+def check_backtest_request(strategy: str, start_date: str, end_date: str) -> Dict[str, Any]:
+    """
+    校验回测请求
+
+    Returns:
+        策略的回测定义
+
+    Raises:
+        ValueError: 未知策略、策略不支持回测或日期区间无效
+    """
+    backtest = get_strategy(strategy).get('backtest')
+    if backtest is None:
+        raise ValueError(f"选股策略不支持回测: {strategy}")
+    try:
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise ValueError("日期格式错误，应为 YYYY-MM-DD")
+    if start > end:
+        raise ValueError("回测开始日期不能晚于结束日期")
+    max_days = SCREENING_CONFIG.get('backtest_max_days', 400)
+    if (end - start).days > max_days:
+        raise ValueError(f"回测区间不能超过 {max_days} 天")
+    return backtest
+
+
+def run_backtest(db: Session, strategy: str, start_date: str, end_date: str,
+                 params: Optional[Dict[str, Any]] = None, horizons: Optional[Sequence[int]] = None,
+                 progress: Optional[ProgressCallback] = None, panel: Optional[PricePanel] = None,
+                 stocks: Optional[Sequence[Tuple[str, str]]] = None, vectorized: bool = True) -> Dict[str, Any]:
+    """
+    回测选股策略
+
+    Args:
+        db: 数据库会话
+        strategy: 策略标识
+        start_date: 回测开始日期（YYYY-MM-DD）
+        end_date: 回测结束日期（YYYY-MM-DD）
+        params: 策略参数（未指定的使用默认值）
+        horizons: 远期交易日数列表，默认 5/10/20
+        progress: 进度回调，每完成一个股票分块调用一次，命中为该块的信号
+        panel: 行情面板（为空时从数据库加载）
+        stocks: 股票池（为空时按策略定义从 stock_basic_info 读取）
+        vectorized: 策略登记了向量化信号函数时是否使用（False 时逐日回放逐只选股函数，用于对比）
+
+    Returns:
+        回测报告 {'summary', 'horizons', 'daily', 'signals'}
+
+    Raises:
+        ValueError: 未知策略、策略不支持回测或日期区间无效
+    """
+    spec = get_strategy(strategy)
+    backtest = check_backtest_request(strategy, start_date, end_date)
+
+    params = resolve_params(strategy, params)
+    horizons = sorted({int(h) for h in (horizons or SCREENING_CONFIG.get('backtest_horizons', DEFAULT_HORIZONS))
+                       if int(h) > 0})
+    lookback = backtest['lookback_days']
+    lookback_days = lookback(params) if callable(lookback) else lookback
+    screen_params = {key: params[key] for key in backtest['screen_params'] if key in params}
+
+    started = time.time()
+    window_start = _shift_date(start_date, -lookback_days)
+    if panel is None:
+        panel = _load_panel(db, window_start)
+    if stocks is None:
+        stocks = _load_stock_pool(db, backtest['stock_pool'])
+    stocks = [(str(code), name) for code, name in stocks]
+
+    date_cols = panel.date_slice(start_date, end_date)
+    as_of_dates = panel.dates[date_cols].tolist()
+    logger.info(f"开始回测 [{strategy}]: {start_date} 至 {end_date}, 回放 {len(as_of_dates)} 个交易日, "
+                f"股票 {len(stocks)} 只, 参数: {params}")
+
+    signals: List[Dict] = []
+    failed: List[Tuple[str, str]] = []
+    if as_of_dates and stocks:
+        if vectorized and backtest.get('signals') is not None:
+            signals = backtest['signals'](panel, stocks, as_of_dates, lookback_days, **screen_params)
+            if progress is not None:
+                progress(len(stocks), len(stocks), signals)
+        else:
+            # 回测在后台执行，不设分块超时，避免部分股票的信号缺失
+            signals = get_screening_executor().run(
+                replay_signals, panel, stocks, window_start, as_of_dates[-1],
+                progress=progress, incremental=False, timeout=False,
+                screen=backtest['screen'], as_of_dates=as_of_dates, lookback_days=lookback_days,
+                screen_params=screen_params
+            )
+            failed = failed_stocks(signals)
+            signals = list(signals)
+    if failed:
+        logger.warning(f"回测 [{strategy}] 有 {len(failed)} 只股票执行失败，不参与统计")
+    failed_codes = {code for code, _ in failed}
+    excluded = [code for code, _ in stocks if panel.code_index(code) is None]
+
+    # 远期收益：面板上向量化计算，再按信号位置取值
+    entry_close, returns = forward_returns(panel, horizons)
+    pool_rows = np.array(sorted({row for row in (panel.code_index(code) for code, _ in stocks
+                                                 if code not in failed_codes) if row is not None}),
+                         dtype=np.int64)
+    benchmark = {}
+    for horizon in horizons:
+        # 同一交易日股票池中当日有行情的股票的平均远期收益
+        pool_returns = np.where(panel.mask[pool_rows], returns[horizon][pool_rows], np.nan)
+        counts = (~np.isnan(pool_returns)).sum(axis=0)
+        sums = np.nansum(pool_returns, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            benchmark[horizon] = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    rows = np.array([panel.code_index(item['code']) for item in signals], dtype=np.int64)
+    cols = np.searchsorted(panel.dates, [item['date'] for item in signals]).astype(np.int64)
+    signal_returns = {h: returns[h][rows, cols] for h in horizons} if len(signals) else \
+        {h: np.array([], dtype=np.float64) for h in horizons}
+    signal_bench = {h: benchmark[h][cols] for h in horizons} if len(signals) else signal_returns
+    entries = entry_close[rows, cols] if len(signals) else np.array([], dtype=np.float64)
+
+    for i, item in enumerate(signals):
+        item['close'] = _round(entries[i], 4)
+        for horizon in horizons:
+            item[f'return_{horizon}'] = _round(signal_returns[horizon][i])
+
+    daily: Dict[str, int] = {}
+    for item in signals:
+        daily[item['date']] = daily.get(item['date'], 0) + 1
+
+    elapsed = time.time() - started
+    report = {
+        'summary': {
+            'strategy': strategy,
+            'strategy_name': spec['name'],
+            'params': params,
+            'start_date': start_date,
+            'end_date': end_date,
+            'trade_days': len(as_of_dates),
+            'stock_count': len(stocks) - len(failed_codes) - len(excluded),
+            'pool_count': len(stocks),
+            'failed_count': len(failed_codes),
+            'failed_stocks': sorted(failed_codes),
+            'excluded_count': len(excluded),
+            'vectorized': bool(vectorized and backtest.get('signals') is not None),
+            'signal_count': len(signals),
+            'signal_stocks': len({item['code'] for item in signals}),
+            'signal_days': len(daily),
+            'elapsed': round(elapsed, 2),
+        },
+        'horizons': {str(h): _summarize(signal_returns[h], signal_bench[h]) for h in horizons},
+        'daily': [{'date': date, 'count': daily.get(date, 0)} for date in as_of_dates],
+        'signals': signals,
+    }
+    logger.info(f"回测完成 [{strategy}]: 信号 {len(signals)} 个, 耗时 {elapsed:.2f}s")
+    return report
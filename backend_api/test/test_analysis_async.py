@@ -0,0 +1,142 @@
+"""
+异步智能分析测试
+验证异步分析与同步分析结果一致、同一股票的并发请求共享一次计算、实时行情接口超时时使用实时行情表价格且不阻塞事件循环
+"""
+
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import stock.stock_analysis as analysis_module
+from models import StockBasicInfo, StockBasicInfoHK, StockRealtimeQuote, StockRealtimeQuoteHK
+from stock.analysis_cache import AnalysisCache
+from stock.stock_analysis import StockAnalysisService
+
+A_CODE = '600000'
+HK_CODE = '00700'
+
+
+def _session():
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    for model in (StockBasicInfo, StockBasicInfoHK, StockRealtimeQuote, StockRealtimeQuoteHK):
+        model.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+    for table, change in (('historical_quotes', 'change'), ('historical_quotes_hk', 'change_amount')):
+        db.execute(text(f"""
+            CREATE TABLE {table} (
+                code TEXT, name TEXT, date TEXT, open REAL, high REAL, low REAL, close REAL, volume REAL,
+                amount REAL, change_percent REAL, {change} REAL, turnover_rate REAL
+            )
+        """))
+    dates = [d.strftime('%Y-%m-%d') for d in pd.bdate_range('2024-01-02', periods=80)]
+    for d, date in enumerate(dates):
+        close = 10 + (d * 7 % 13) * 0.3
+        db.execute(text("INSERT INTO historical_quotes VALUES (:code, 'x', :date, :close, :high, :low, :close, 1e6, 1e7, 0.1, 0.01, 1.0)"),
+                   {'code': A_CODE, 'date': date, 'close': close, 'high': close * 1.02, 'low': close * 0.97})
+    db.execute(text("INSERT INTO stock_basic_info_hk (code, name) VALUES (:code, 'x')"), {'code': HK_CODE})
+    db.execute(text("INSERT INTO stock_realtime_quote (code, trade_date, current_price, change_percent) "
+                    "VALUES (:code, '2024-06-14', 12.3, 1.2)"), {'code': A_CODE})
+    db.commit()
+    return db
+
+
+@pytest.fixture
+def service(monkeypatch):
+    db = _session()
+    cache = AnalysisCache(max_entries=16)
+    monkeypatch.setattr(analysis_module, 'get_analysis_cache', lambda: cache)
+    monkeypatch.setattr(StockAnalysisService, '_market_cache', {})
+    monkeypatch.setattr(StockAnalysisService, '_price_cache', {})
+    monkeypatch.setattr(StockAnalysisService, '_inflight', {})
+    monkeypatch.setattr(StockAnalysisService, '_fetch_live_price', staticmethod(lambda code: 12.5))
+    return StockAnalysisService(db), cache
+
+
+def _strip_time(result):
+    data = dict(result['data'])
+    data.pop('analysis_time')
+    return data
+
+
+def test_async_matches_sync(service, monkeypatch):
+    svc, cache = service
+    monkeypatch.setitem(analysis_module.ANALYSIS_CONFIG, 'cache_enabled', False)
+    async_result = asyncio.run(svc.get_stock_analysis_async(A_CODE))
+    sync_result = svc.get_stock_analysis(A_CODE)
+    assert async_result['success'] and async_result['data']['current_price'] == 12.5
+    assert _strip_time(async_result) == _strip_time(sync_result)
+
+
+def test_concurrent_requests_share_one_computation(service, monkeypatch):
+    svc, cache = service
+    calls = []
+    build = StockAnalysisService._build_analysis
+
+    def slow_build(self, *args, **kwargs):
+        calls.append(threading.current_thread().name)
+        time.sleep(0.2)
+        return build(self, *args, **kwargs)
+
+    monkeypatch.setattr(StockAnalysisService, '_build_analysis', slow_build)
+
+    async def run():
+        results = await asyncio.gather(*[svc.get_stock_analysis_async(A_CODE) for _ in range(5)])
+        assert not StockAnalysisService._inflight
+        return results
+
+    results = asyncio.run(run())
+    assert len(calls) == 1 and calls[0].startswith('stock-analysis')
+    assert all(result == results[0] for result in results)
+    # 各请求得到独立副本
+    results[0]['data']['current_price'] = 0
+    assert results[1]['data']['current_price'] == 12.5
+    # 计算完成后再次请求命中分析缓存
+    asyncio.run(svc.get_stock_analysis_async(A_CODE))
+    assert len(calls) == 1 and cache.stats()['hits'] == 1
+
+
+def test_live_price_timeout_falls_back_without_blocking(service, monkeypatch):
+    svc, _ = service
+    monkeypatch.setitem(analysis_module.ANALYSIS_CONFIG, 'price_timeout', 0.2)
+    monkeypatch.setattr(StockAnalysisService, '_fetch_live_price', staticmethod(lambda code: time.sleep(1) or 99.0))
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        start = time.perf_counter()
+        result = await svc.get_stock_analysis_async(A_CODE)
+        elapsed = time.perf_counter() - start
+        task.cancel()
+        return result, elapsed, ticks
+
+    result, elapsed, ticks = asyncio.run(run())
+    assert result['success'] and result['data']['current_price'] == 12.3
+    assert elapsed < 0.9
+    # 等待期间事件循环仍在调度其他协程
+    assert ticks >= 5
+
+
+def test_hk_history_fallback(service, monkeypatch):
+    svc, _ = service
+    bars = svc._query_historical_data(A_CODE, False)
+    monkeypatch.setattr(StockAnalysisService, '_fetch_hk_history',
+                        staticmethod(lambda code, days=60: [dict(bar, code=code) for bar in bars]))
+    result = asyncio.run(svc.get_stock_analysis_async(HK_CODE))
+    assert result['success'] and result['data']['current_price'] == bars[-1]['close']
+
+    monkeypatch.setattr(StockAnalysisService, '_fetch_hk_history', staticmethod(lambda code, days=60: []))
+    result = asyncio.run(svc.get_stock_analysis_async('01810'))
+    assert not result['success'] and result['error'] == '无法获取历史数据'
@@ -0,0 +1,109 @@
+"""
+智能分析结果缓存测试
+验证相同 (股票代码, 最新K线日期, 价格档位) 的重复查看直接返回缓存结果，写入新K线或价格进入新档位后重新计算，
+以及进程内缓存失效后可从数据库表命中
+"""
+
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import stock.stock_analysis as analysis_module
+from stock.analysis_cache import AnalysisCache
+from stock.stock_analysis import StockAnalysisService
+
+
+def _session(n_days=80):
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    db = sessionmaker(bind=engine)()
+    db.execute(text("""
+        CREATE TABLE historical_quotes (
+            code TEXT, name TEXT, date TEXT, open REAL, high REAL, low REAL, close REAL, volume REAL,
+            amount REAL, change_percent REAL, change REAL, turnover_rate REAL
+        )
+    """))
+    for i in range(n_days):
+        _insert_bar(db, f'2024-{1 + i // 28:02d}-{1 + i % 28:02d}', 10 + (i % 9) * 0.3)
+    db.commit()
+    return db
+
+
+def _insert_bar(db, date, close):
+    db.execute(text("""
+        INSERT INTO historical_quotes VALUES ('600000', '测试', :date, :close, :high, :low, :close, 1e6, 1e7, 0.5, 0.05, 1.0)
+    """), {'date': date, 'close': close, 'high': close * 1.02, 'low': close * 0.98})
+
+
+@pytest.fixture
+def service(monkeypatch):
+    db = _session()
+    cache = AnalysisCache(max_entries=8)
+    prices = {'600000': 10.5}
+    monkeypatch.setattr(analysis_module, 'get_analysis_cache', lambda: cache)
+    monkeypatch.setattr(StockAnalysisService, '_fetch_current_price', lambda self, code: prices[code])
+    monkeypatch.setattr(StockAnalysisService, '_market_cache', {'600000': False})
+    monkeypatch.setattr(StockAnalysisService, '_price_cache', {})
+    monkeypatch.setitem(analysis_module.ANALYSIS_CONFIG, 'price_ttl', 0)
+
+    calls = {'history': 0}
+    original = StockAnalysisService._get_historical_data
+
+    def counting(self, code, days=60):
+        calls['history'] += 1
+        return original(self, code, days)
+
+    monkeypatch.setattr(StockAnalysisService, '_get_historical_data', counting)
+    svc = StockAnalysisService.__new__(StockAnalysisService)
+    svc.db = db
+    return svc, cache, prices, calls
+
+
+def test_repeat_views_hit_cache(service):
+    svc, cache, prices, calls = service
+    first = svc.get_stock_analysis('600000')
+    assert first['success'] and calls['history'] == 1
+
+    started = time.perf_counter()
+    second = svc.get_stock_analysis('600000')
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"缓存命中耗时 {elapsed:.2f}ms, {cache.stats()}")
+    assert second == first and calls['history'] == 1
+    assert elapsed < 10
+
+    # 返回副本，调用方修改不影响缓存
+    second['data']['current_price'] = -1
+    assert svc.get_stock_analysis('600000') == first
+
+    # 同一价格档位内复用，进入新档位重新计算
+    prices['600000'] = next(p for p in (10.5 * 1.0005, 10.5 * 0.9995) if cache.price_bucket(p) == cache.price_bucket(10.5))
+    svc.get_stock_analysis('600000')
+    assert calls['history'] == 1
+    prices['600000'] = 10.5 * 1.01
+    svc.get_stock_analysis('600000')
+    assert calls['history'] == 2
+
+
+def test_new_bar_and_db_tier(service):
+    svc, cache, prices, calls = service
+    svc.get_stock_analysis('600000')
+
+    # 进程内缓存清空后从数据库表命中
+    cache.invalidate()
+    assert svc.get_stock_analysis('600000')['success']
+    assert calls['history'] == 1 and cache.stats()['db_hits'] == 1
+
+    # 写入新K线后缓存键变化，重新计算
+    _insert_bar(svc.db, '2024-12-31', 12.0)
+    svc.db.commit()
+    svc.get_stock_analysis('600000')
+    assert calls['history'] == 2
+
+
+def test_price_bucket():
+    cache = AnalysisCache(price_step=0.002)
+    assert cache.price_bucket(None) == cache.price_bucket(0) == -1
+    assert cache.price_bucket(10.0) == cache.price_bucket(10.01)
+    assert cache.price_bucket(10.0) != cache.price_bucket(10.1)
@@ -0,0 +1,120 @@
+"""
+自选股智能分析快照测试
+验证快照与以收盘价计算的单只股票分析一致，快照存在时单只/批量分析直接返回快照而不读取实时价格和历史数据，
+删除快照后回到正常计算
+"""
+
+import asyncio
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import stock.stock_analysis as analysis_module
+from stock.analysis_cache import AnalysisCache
+from stock.analysis_snapshots import AnalysisSnapshots, build_watchlist_snapshots, get_watchlist_codes
+from stock.stock_analysis import StockAnalysisService
+
+A_CODES = ['600000', '000001']
+HK_CODE = '00700'
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'analysis.db'}")
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    for table, change in (('historical_quotes', 'change'), ('historical_quotes_hk', 'change_amount')):
+        db.execute(text(f"""
+            CREATE TABLE {table} (
+                code TEXT, name TEXT, date TEXT, open REAL, high REAL, low REAL, close REAL, volume REAL,
+                amount REAL, change_percent REAL, {change} REAL, turnover_rate REAL
+            )
+        """))
+    for table in ('stock_realtime_quote', 'stock_realtime_quote_hk'):
+        db.execute(text(f"CREATE TABLE {table} (code TEXT, trade_date TEXT, current_price REAL, change_percent REAL)"))
+    for table in ('stock_basic_info', 'stock_basic_info_hk'):
+        db.execute(text(f"CREATE TABLE {table} (code TEXT, name TEXT)"))
+    db.execute(text("CREATE TABLE watchlist (id INTEGER PRIMARY KEY, user_id INTEGER, stock_code TEXT, stock_name TEXT)"))
+
+    dates = [d.strftime('%Y-%m-%d') for d in pd.bdate_range('2024-01-02', periods=90)]
+    for i, code in enumerate(A_CODES + [HK_CODE]):
+        table = 'historical_quotes_hk' if code == HK_CODE else 'historical_quotes'
+        for d, date in enumerate(dates):
+            close = 10 + i + ((d * (i + 3)) % 11) * 0.2
+            db.execute(text(f"INSERT INTO {table} VALUES (:code, 'x', :date, :close, :high, :low, :close, 1e6, 1e7, 0.1, 0.01, 1.0)"),
+                       {'code': code, 'date': date, 'close': close, 'high': close * 1.02, 'low': close * 0.97})
+        db.execute(text(f"INSERT INTO {'stock_basic_info_hk' if code == HK_CODE else 'stock_basic_info'} VALUES (:code, 'x')"),
+                   {'code': code})
+    # 两个用户的自选股有重复；300750 没有历史数据
+    for user_id, code in ((1, '600000'), (1, HK_CODE), (2, '600000'), (2, '000001'), (2, ' 300750 '), (2, 'AAPL')):
+        db.execute(text("INSERT INTO watchlist (user_id, stock_code, stock_name) VALUES (:user_id, :code, 'x')"),
+                   {'user_id': user_id, 'code': code})
+    db.commit()
+    db.close()
+
+    monkeypatch.setattr(analysis_module, 'get_analysis_cache', lambda: AnalysisCache(max_entries=16, use_db=False))
+    monkeypatch.setattr(StockAnalysisService, '_market_cache', {})
+    monkeypatch.setattr(StockAnalysisService, '_price_cache', {})
+    monkeypatch.setattr(StockAnalysisService, '_inflight', {})
+    return session_factory
+
+
+def _strip_time(data):
+    return {k: v for k, v in data.items() if k != 'analysis_time'}
+
+
+def test_build_snapshots_for_watchlist_union(factory):
+    db = factory()
+    assert get_watchlist_codes(db) == sorted(A_CODES + [HK_CODE, '300750'])
+
+    result = build_watchlist_snapshots(factory, workers=2, chunk_size=1)
+    assert result['total'] == 4 and result['success'] == 3 and result['failed'] == 1
+
+    snapshots = AnalysisSnapshots.get_many(db, A_CODES + [HK_CODE, '300750'])
+    assert sorted(snapshots) == sorted(A_CODES + [HK_CODE])
+    svc = StockAnalysisService(db)
+    for code, snapshot in snapshots.items():
+        assert snapshot['snapshot_date'] == '2024-05-06'
+        # 快照以最新收盘价为当前价格
+        expected = svc._analyze(code, None)
+        assert _strip_time(snapshot['data']) == _strip_time(expected['data'])
+
+
+def test_snapshot_served_without_price_or_history(factory, monkeypatch):
+    build_watchlist_snapshots(factory)
+    db = factory()
+    svc = StockAnalysisService(db)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('快照存在时不应读取实时价格或历史数据')
+
+    for name in ('_fetch_current_price', '_fetch_live_price', '_get_historical_data', '_query_historical_data',
+                 '_get_historical_data_batch', '_get_current_prices'):
+        monkeypatch.setattr(StockAnalysisService, name, fail)
+
+    single = svc.get_stock_analysis('600000')
+    assert single['success'] and single['snapshot_date'] == '2024-05-06'
+    assert asyncio.run(svc.get_stock_analysis_async(HK_CODE))['snapshot_date'] == '2024-05-06'
+
+    batch = svc.get_batch_analysis(A_CODES + [HK_CODE])
+    assert batch['snapshots'] == 3 and batch['cached'] == 0
+    assert batch['data'][0]['data'] == single['data']
+
+
+def test_invalidated_snapshot_falls_back(factory, monkeypatch):
+    build_watchlist_snapshots(factory)
+    db = factory()
+    AnalysisSnapshots.invalidate(db, ['600000'])
+    monkeypatch.setattr(StockAnalysisService, '_fetch_current_price', lambda self, code: 11.0)
+
+    result = StockAnalysisService(db).get_stock_analysis('600000')
+    assert result['success'] and 'snapshot_date' not in result
+    assert result['data']['current_price'] == 11.0
+
+    batch = StockAnalysisService(db).get_batch_analysis(['600000', '000001'])
+    assert batch['snapshots'] == 1 and all(item['success'] for item in batch['data'])
+
+    monkeypatch.setitem(analysis_module.ANALYSIS_CONFIG, 'snapshot_enabled', False)
+    assert 'snapshot_date' not in StockAnalysisService(db).get_stock_analysis('000001')
@@ -0,0 +1,140 @@
+"""
+批量智能分析测试
+验证批量接口（窗口查询 + 向量化指标）的结果与逐只调用单只股票分析一致，以及缓存命中和数据缺失的股票
+"""
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import stock.stock_analysis as analysis_module
+from stock.analysis_cache import AnalysisCache
+from stock.stock_analysis import StockAnalysisService
+
+A_CODES = ['600000', '000001', '300750']
+HK_CODE = '00700'
+
+
+def _session():
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    db = sessionmaker(bind=engine)()
+    for table, change in (('historical_quotes', 'change'), ('historical_quotes_hk', 'change_amount')):
+        db.execute(text(f"""
+            CREATE TABLE {table} (
+                code TEXT, name TEXT, date TEXT, open REAL, high REAL, low REAL, close REAL, volume REAL,
+                amount REAL, change_percent REAL, {change} REAL, turnover_rate REAL
+            )
+        """))
+    for table in ('stock_realtime_quote', 'stock_realtime_quote_hk'):
+        db.execute(text(f"CREATE TABLE {table} (code TEXT, trade_date TEXT, current_price REAL, change_percent REAL)"))
+    for table in ('stock_basic_info', 'stock_basic_info_hk'):
+        db.execute(text(f"CREATE TABLE {table} (code TEXT, name TEXT)"))
+
+    dates = [d.strftime('%Y-%m-%d') for d in pd.bdate_range('2024-01-02', periods=120)]
+    for i, code in enumerate(A_CODES + [HK_CODE]):
+        table = 'historical_quotes_hk' if code == HK_CODE else 'historical_quotes'
+        # 300750 只有30根K线（上市较晚）
+        for d, date in enumerate(dates[90 if code == '300750' else 0:]):
+            close = 10 + i + ((d * (i + 3)) % 11) * 0.2
+            db.execute(text(f"INSERT INTO {table} VALUES (:code, 'x', :date, :close, :high, :low, :close, 1e6, 1e7, 0.1, 0.01, 1.0)"),
+                       {'code': code, 'date': date, 'close': close, 'high': close * 1.02, 'low': close * 0.97})
+        db.execute(text(f"INSERT INTO {'stock_basic_info_hk' if code == HK_CODE else 'stock_basic_info'} VALUES (:code, 'x')"),
+                   {'code': code})
+        quote = 'stock_realtime_quote_hk' if code == HK_CODE else 'stock_realtime_quote'
+        db.execute(text(f"INSERT INTO {quote} VALUES (:code, '2024-06-14', :price, 1.2)"), {'code': code, 'price': 11.0 + i})
+    db.commit()
+    return db
+
+
+@pytest.fixture
+def service(monkeypatch):
+    db = _session()
+    cache = AnalysisCache(max_entries=16)
+    monkeypatch.setattr(analysis_module, 'get_analysis_cache', lambda: cache)
+    monkeypatch.setattr(StockAnalysisService, '_market_cache', {})
+    monkeypatch.setattr(StockAnalysisService, '_price_cache', {})
+    prices = {row[0]: row[1] for table in ('stock_realtime_quote', 'stock_realtime_quote_hk')
+              for row in db.execute(text(f"SELECT code, current_price FROM {table}"))}
+    monkeypatch.setattr(StockAnalysisService, '_fetch_current_price', lambda self, code: prices.get(code))
+    return StockAnalysisService(db), cache
+
+
+def _strip_time(data):
+    return {k: v for k, v in data.items() if k != 'analysis_time'}
+
+
+def test_batch_matches_single_stock(service, monkeypatch):
+    svc, cache = service
+    monkeypatch.setitem(analysis_module.ANALYSIS_CONFIG, 'cache_enabled', False)
+    codes = A_CODES + [HK_CODE, '999999', '600000']
+    result = svc.get_batch_analysis(codes)
+
+    assert result['total'] == 5 and result['cached'] == 0
+    assert [item['code'] for item in result['data']] == A_CODES + [HK_CODE, '999999']
+    missing = result['data'][-1]
+    assert not missing['success'] and missing['message']
+
+    for item in result['data'][:-1]:
+        single = svc.get_stock_analysis(item['code'])
+        assert item['success'] and single['success']
+        assert _strip_time(item['data']) == _strip_time(single['data'])
+        print(f"{item['code']}: {item['data']['trading_recommendation']['action']}, RSI {item['data']['technical_indicators']['rsi']['value']}")
+
+
+def test_batch_uses_and_fills_cache(service):
+    svc, cache = service
+    first = svc.get_batch_analysis(A_CODES)
+    assert first['cached'] == 0
+    second = svc.get_batch_analysis(A_CODES + [HK_CODE])
+    assert second['cached'] == len(A_CODES)
+    assert [_strip_time(item['data']) for item in second['data'][:3]] == [_strip_time(item['data']) for item in first['data']]
+
+    # 单只股票接口命中批量接口写入的缓存
+    calls = []
+    svc._get_historical_data = lambda code, days=60: calls.append(code) or []
+    assert svc.get_stock_analysis('600000')['success'] and calls == []
+
+
+def test_batch_history_window_per_last_date(service, monkeypatch):
+    svc, _ = service
+    monkeypatch.setitem(analysis_module.ANALYSIS_CONFIG, 'cache_enabled', False)
+    # 000001 停牌：最新K线比其他股票早40个交易日
+    svc.db.execute(text("DELETE FROM historical_quotes WHERE code = '000001' AND date > '2024-04-26'"))
+    svc.db.commit()
+    calls = []
+    query_codes = svc._query_codes
+    monkeypatch.setattr(svc, '_query_codes', lambda sql, codes, **params: calls.append((sorted(codes), params.get('since')))
+                        or query_codes(sql, codes, **params))
+    result = svc.get_batch_analysis(A_CODES)
+    assert all(item['success'] for item in result['data'])
+
+    def since(code):
+        last = svc.db.execute(text("SELECT MAX(date) FROM historical_quotes WHERE code = :code"), {'code': code}).scalar()
+        return (pd.Timestamp(last) - pd.Timedelta(days=120)).strftime('%Y-%m-%d')
+
+    windows = [(codes, since) for codes, since in calls if since is not None]
+    # 每个最新K线日期一条查询，停牌股票不拉长其他股票的扫描范围
+    assert sorted(windows) == [(['000001'], since('000001')), (['300750', '600000'], since('600000'))]
+    for item in result['data']:
+        single = svc.get_stock_analysis(item['code'])
+        assert _strip_time(item['data']) == _strip_time(single['data'])
+
+
+def test_batch_fetches_hk_history_without_db_rows(service, monkeypatch):
+    svc, _ = service
+    monkeypatch.setitem(analysis_module.ANALYSIS_CONFIG, 'cache_enabled', False)
+    history = svc._query_historical_data(HK_CODE, True)
+    svc.db.execute(text("DELETE FROM historical_quotes_hk"))
+    svc.db.commit()
+    fetched = []
+    monkeypatch.setattr(StockAnalysisService, '_fetch_hk_history',
+                        staticmethod(lambda code, days=60: fetched.append(code) or history))
+
+    result = svc.get_batch_analysis([HK_CODE, '600000'])
+    assert fetched == [HK_CODE]
+    assert all(item['success'] for item in result['data'])
+    # 与单只股票分析的补取结果一致
+    single = svc.get_stock_analysis(HK_CODE)
+    assert _strip_time(result['data'][0]['data']) == _strip_time(single['data'])
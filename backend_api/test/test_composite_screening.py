@@ -0,0 +1,116 @@
+"""
+组合选股测试
+验证一次遍历得到的各策略命中与分别执行各策略一致，以及 AND / OR 组合和预计算结果的合并
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import stock.composite_screening as composite_module
+from stock.composite_screening import run_composite_screening
+from stock.price_panel import PricePanel
+from stock.screening_executor import ScreeningExecutor
+from stock.screening_registry import get_strategy, resolve_params
+
+STRATEGIES = ['low_nine', 'long_lower_shadow', 'high_tight_flag']
+
+
+class _FakeStore:
+    def latest_date(self, db):
+        return '2024-06-03'
+
+
+def _build_panel(n_stocks=30, n_days=120, seed=11):
+    rng = random.Random(seed)
+    dates = [d.strftime('%Y-%m-%d') for d in pd.bdate_range(end=datetime.now().date(), periods=n_days)]
+    rows = []
+    for i in range(n_stocks):
+        code = f'{600000 + i}'
+        close = 10.0 + i
+        for d, date in enumerate(dates):
+            drift = -0.015 if i % 3 == 0 else 0.003
+            prev = close
+            close = max(1.0, close * (1 + drift + rng.uniform(-0.02, 0.02)))
+            open_ = prev * (1 + rng.uniform(-0.01, 0.01))
+            low = min(open_, close) * (1 - rng.uniform(0, 0.05))
+            high = max(open_, close) * (1 + rng.uniform(0, 0.01))
+            rows.append([code, f'股票{i}', date, open_, close, high, low, (close / prev - 1) * 100, 1e6, 1e7, 1.0])
+    stocks = [(f'{600000 + i}', f'股票{i}') for i in range(n_stocks)]
+    return PricePanel.from_rows(rows), stocks
+
+
+def _expected_hits(panel, stocks):
+    """分别执行各策略得到的命中股票"""
+    end_date = datetime.now().date()
+    expected = {}
+    for strategy in STRATEGIES:
+        spec = get_strategy(strategy)['backtest']
+        params = {k: v for k, v in resolve_params(strategy).items() if k in spec['screen_params']}
+        start = (end_date - timedelta(days=spec['lookback_days'])).strftime('%Y-%m-%d')
+        results = spec['screen'](panel, stocks, start, end_date.strftime('%Y-%m-%d'), **params)
+        expected[strategy] = {item['code'] for item in results}
+    return expected
+
+
+def _setup(monkeypatch, panel, stocks, workers=1, stored=None):
+    executor = ScreeningExecutor(max_workers=workers, chunk_size=8)
+    monkeypatch.setattr(composite_module, 'get_screening_executor', lambda: executor)
+    monkeypatch.setattr(composite_module, 'get_price_panel', lambda db: panel)
+    monkeypatch.setattr(composite_module, 'get_panel_store', lambda market='A': _FakeStore())
+    monkeypatch.setattr(composite_module, '_load_memberships',
+                        lambda db, strategies: (stocks, {code: list(strategies) for code, _ in stocks}))
+    monkeypatch.setattr(composite_module, 'load_precomputed',
+                        lambda db, strategy, params: (stored or {}).get(strategy))
+    return executor
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_single_pass_matches_individual_strategies(monkeypatch, workers):
+    """一次遍历得到的各策略命中标记与分别执行各策略一致"""
+    panel, stocks = _build_panel()
+    expected = _expected_hits(panel, stocks)
+    executor = _setup(monkeypatch, panel, stocks, workers=workers)
+    try:
+        result = run_composite_screening(None, STRATEGIES, mode='or')
+    finally:
+        executor.shutdown()
+
+    for strategy in STRATEGIES:
+        actual = {item['code'] for item in result['data'] if item['flags'][strategy]}
+        print(f"{strategy}: 命中 {len(actual)} 只")
+        assert actual == expected[strategy]
+    union = set().union(*expected.values())
+    assert union
+    assert {item['code'] for item in result['data']} == union
+    assert all(item['matched'] for item in result['data'])
+    assert result['precomputed'] == []
+
+
+def test_and_mode_and_precomputed_results(monkeypatch):
+    """AND 组合只标记全部命中的股票；有预计算结果的策略直接使用存储结果"""
+    panel, stocks = _build_panel()
+    expected = _expected_hits(panel, stocks)
+    stored = {'low_nine': {'data': [{'code': code, 'name': 'x'} for code in sorted(expected['low_nine'])],
+                           'trade_date': '2024-06-03', 'precomputed': True}}
+    executor = _setup(monkeypatch, panel, stocks, stored=stored)
+    try:
+        result = run_composite_screening(None, ['low_nine', 'long_lower_shadow'], mode='AND')
+    finally:
+        executor.shutdown()
+
+    both = expected['low_nine'] & expected['long_lower_shadow']
+    assert result['precomputed'] == ['low_nine']
+    assert {item['code'] for item in result['data'] if item['matched']} == both
+    assert result['matched_count'] == len(both)
+
+
+def test_invalid_requests():
+    with pytest.raises(ValueError):
+        run_composite_screening(None, [])
+    with pytest.raises(ValueError):
+        run_composite_screening(None, ['low_nine'], mode='xor')
+    with pytest.raises(ValueError):
+        run_composite_screening(None, ['unknown'])
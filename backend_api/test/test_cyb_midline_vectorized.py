@@ -0,0 +1,133 @@
+"""
+创业板中线选股策略向量化版本测试
+在合成行情上对比向量化结果与逐只计算版本的结果，要求完全一致
+"""
+
+import random
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import stock.cyb_midline_vectorized as vectorized_module
+import stock.stock_screening as screening_module
+from stock.cyb_midline_vectorized import CybMidlineVectorizedStrategy
+from stock.price_panel import PricePanel
+from stock.stock_screening import StockScreeningStrategy
+
+
+def _bar(date, open_, close, high, low, prev_close):
+    change_percent = round((close / prev_close - 1) * 100, 2) if prev_close else 0.0
+    return date, round(open_, 2), round(close, 2), round(high, 2), round(low, 2), change_percent
+
+
+def _random_walk(dates, rng, price=10.0, spike_prob=0.0):
+    """普通随机游走，偶尔出现涨停"""
+    bars = []
+    prev = price
+    for date in dates:
+        move = 0.1 if rng.random() < spike_prob else rng.uniform(-0.04, 0.04)
+        close = prev * (1 + move)
+        open_ = prev * (1 + rng.uniform(-0.01, 0.01))
+        high = max(open_, close) * (1 + rng.uniform(0, 0.02))
+        low = min(open_, close) * (1 - rng.uniform(0, 0.02))
+        bars.append(_bar(date, open_, close, high, low, prev))
+        prev = close
+    return bars
+
+
+def _pattern(dates, rng):
+    """构造 涨停-回调-跳空-揉搓-突破-均线多头 形态，并随机破坏其中一个环节"""
+    variant = rng.choice(['full', 'full', 'full', 'break_bottom', 'no_gap', 'no_doji', 'early_limit_up', 'flat'])
+    lu_pos = rng.randint(25, 45)
+    bars = _random_walk(dates[:lu_pos], rng, price=10.0)
+    if variant == 'early_limit_up':
+        date, o, c, h, l, _ = bars[lu_pos - 10]
+        bars[lu_pos - 10] = (date, o, c, h, l, 10.0)
+    prev = bars[-1][2]
+
+    lu_close, lu_high, lu_low = prev * 1.1, prev * 1.13, prev * 1.0
+    bars.append(_bar(dates[lu_pos], prev * 1.01, lu_close, lu_high, lu_low, prev))
+    pull_low = lu_low * (0.98 if variant == 'break_bottom' else 1.03)
+    bars.append(_bar(dates[lu_pos + 1], lu_close * 0.99, lu_close * 0.955, lu_close * 0.985, pull_low, lu_close))
+    prev = lu_close * 0.955
+    if variant == 'no_gap':
+        bars.append(_bar(dates[lu_pos + 2], prev, prev * 1.01, prev * 1.02, prev * 0.99, prev))
+    else:
+        bars.append(_bar(dates[lu_pos + 2], lu_close * 0.995, lu_close, lu_close * 1.005, lu_close * 0.99, prev))
+    prev = bars[-1][2]
+    if variant == 'no_doji':
+        bars.append(_bar(dates[lu_pos + 3], prev, prev * 1.005, prev * 1.006, prev * 0.999, prev))
+    else:
+        bars.append(_bar(dates[lu_pos + 3], prev, prev * 1.005, prev * 1.022, prev * 0.985, prev))
+    prev = bars[-1][2]
+
+    step = 0.0 if variant == 'flat' else 0.012
+    for date in dates[lu_pos + 4:]:
+        close = prev * (1 + step + rng.uniform(-0.003, 0.003))
+        bars.append(_bar(date, prev * 1.002, close, close * 1.004, prev * 0.998, prev))
+        prev = close
+    return bars
+
+
+def _build_market(n_stocks=240, seed=7):
+    rng = random.Random(seed)
+    dates = [d.strftime('%Y-%m-%d') for d in pd.bdate_range(end=datetime.now().date(), periods=95)]
+    stocks, rows = [], []
+    for i in range(n_stocks):
+        code = f'3{i:05d}'
+        name = f'创业{i}'
+        stocks.append((code, name))
+        if i % 3 == 0:
+            bars = _pattern(dates, rng)
+        else:
+            bars = _random_walk(dates, rng, price=rng.uniform(5, 50), spike_prob=0.03)
+        # 随机停牌若干天
+        if rng.random() < 0.15:
+            drop = set(rng.sample(range(len(bars) - 1), 3))
+            bars = [b for k, b in enumerate(bars) if k not in drop]
+        for date, o, c, h, l, cp in bars:
+            rows.append((code, name, date, o, c, h, l, cp, 1e6, 1e7, 1.0))
+    return stocks, PricePanel.from_rows(rows)
+
+
+class _StockListSession:
+    """只返回股票列表的假会话"""
+
+    def __init__(self, stocks):
+        self.stocks = stocks
+
+    def execute(self, statement, params=None):
+        stocks = self.stocks
+
+        class _Result:
+            def fetchall(self):
+                return stocks
+
+        return _Result()
+
+    def rollback(self):
+        pass
+
+
+@pytest.mark.parametrize('months', [3, 4])
+def test_vectorized_matches_loop(monkeypatch, months):
+    """向量化版本与逐只计算版本的结果完全一致"""
+    stocks, panel = _build_market()
+    monkeypatch.setattr(screening_module, 'get_price_panel', lambda db: panel)
+    monkeypatch.setattr(vectorized_module, 'get_price_panel', lambda db: panel)
+    db = _StockListSession(stocks)
+
+    expected = StockScreeningStrategy.screening_cyb_midline_strategy(db, months=months)
+    actual = CybMidlineVectorizedStrategy.screening_cyb_midline_strategy(db, months=months)
+
+    print(f"逐只计算: {len(expected)} 只, 向量化: {len(actual)} 只")
+    assert len(expected) > 0
+    assert actual == expected
+
+
+def test_vectorized_handles_empty_window():
+    """没有股票或数据不足时返回空列表"""
+    _, panel = _build_market(n_stocks=3)
+    assert CybMidlineVectorizedStrategy.evaluate(panel.window([])) == []
+    assert CybMidlineVectorizedStrategy.evaluate(panel.window(['300000'], start_date='2099-01-01')) == []
@@ -0,0 +1,220 @@
+"""
+增量技术指标状态测试
+验证逐根推进的状态与全量计算一致（MACD/KDJ 逐位相同，RSI 为 Wilder 平滑），
+逐日推进与一次补齐结果相同，临时K线不修改保存的状态
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from stock import indicators
+from stock.indicator_state import IndicatorStateStore
+
+CODES = ['600000', '000001', '300750']
+
+
+def wilder_rsi(closes, period=14):
+    deltas = np.diff(closes)
+    gains, losses = np.maximum(deltas, 0), np.maximum(-deltas, 0)
+    avg_gain, avg_loss = gains[:period].mean(), losses[:period].mean()
+    for gain, loss in zip(gains[period:], losses[period:]):
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+    return 100.0 if avg_loss == 0 else 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+def make_prices(n_stocks, n_days, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = np.round(20 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_stocks, n_days)), axis=1)), 2)
+    highs = np.round(closes * (1 + np.abs(rng.normal(0, 0.01, closes.shape))), 2)
+    lows = np.round(closes * (1 - np.abs(rng.normal(0, 0.01, closes.shape))), 2)
+    return highs, lows, closes
+
+
+def test_advance_state_matches_full_computation():
+    highs, lows, closes = make_prices(4, 200)
+    # 一字板：最高价 = 最低价，RSV 无效时 K/D 保持不变
+    highs[1, 50:60] = lows[1, 50:60] = closes[1, 50:60]
+    state = indicators.init_state(4)
+    for i in range(closes.shape[1]):
+        state = indicators.advance_state(state, highs[:, i], lows[:, i], closes[:, i])
+        if i == 10:
+            assert np.isnan(indicators.state_values(state)['rsi']).all()
+    values = indicators.state_values(state)
+
+    macd_line, signal_line, histogram = indicators.macd(closes)
+    k, d, j = indicators.kdj(highs, lows, closes)
+    assert np.array_equal(values['macd'], macd_line[:, -1])
+    assert np.array_equal(values['signal'], signal_line[:, -1])
+    assert np.array_equal(values['histogram'], histogram[:, -1])
+    assert np.array_equal(values['k'], k[:, -1])
+    assert np.array_equal(values['d'], d[:, -1])
+    assert np.array_equal(values['j'], j[:, -1])
+    assert np.allclose(values['rsi'], [wilder_rsi(row) for row in closes])
+
+
+def test_missing_close_keeps_state():
+    highs, lows, closes = make_prices(2, 30)
+    state = indicators.init_state(2)
+    for i in range(30):
+        state = indicators.advance_state(state, highs[:, i], lows[:, i], closes[:, i])
+    after = indicators.advance_state(state, [np.nan, 21.0], [np.nan, 20.0], [np.nan, 20.5])
+    for field, value in state.items():
+        assert np.array_equal(after[field][0], value[0], equal_nan=True)
+    assert after['bars'][1] == 31
+
+
+def _session(n_days=80):
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    db = sessionmaker(bind=engine)()
+    db.execute(text("CREATE TABLE historical_quotes (code TEXT, date TEXT, high REAL, low REAL, close REAL)"))
+    db.execute(text("""
+        CREATE TABLE stock_realtime_quote (
+            code TEXT, trade_date TEXT, current_price REAL, high REAL, low REAL, change_percent REAL
+        )
+    """))
+    dates = [d.strftime('%Y-%m-%d') for d in pd.bdate_range('2024-01-02', periods=n_days)]
+    highs, lows, closes = make_prices(len(CODES), n_days, seed=5)
+    for i, code in enumerate(CODES):
+        # 300750 上市较晚
+        start = 60 if code == '300750' else 0
+        for d in range(start, n_days):
+            db.execute(text("INSERT INTO historical_quotes VALUES (:code, :date, :high, :low, :close)"),
+                       {'code': code, 'date': dates[d], 'high': highs[i, d], 'low': lows[i, d], 'close': closes[i, d]})
+    db.commit()
+    return db, dates, (highs, lows, closes)
+
+
+def _full_values(highs, lows, closes):
+    state = indicators.init_state(1)
+    for i in range(len(closes)):
+        state = indicators.advance_state(state, highs[i:i + 1], lows[i:i + 1], closes[i:i + 1])
+    return indicators.state_values(state)
+
+
+def test_daily_advance_matches_one_shot_bootstrap():
+    db, dates, (highs, lows, closes) = _session()
+    store = IndicatorStateStore(db, market='A', bootstrap_days=1000)
+    store.advance_for_date(dates[40])
+    for date in dates[41:]:
+        result = store.advance_for_date(date)
+        assert result['failed'] == 0
+        assert result['bars'] == (len(CODES) if date >= dates[60] else len(CODES) - 1)
+
+    daily = store.get_indicators(CODES, live=False)
+
+    other, _, _ = _session()
+    IndicatorStateStore(other, market='A', bootstrap_days=1000).advance_for_date(dates[-1])
+    one_shot = IndicatorStateStore(other, market='A').get_indicators(CODES, live=False)
+    assert daily == one_shot
+
+    for i, code in enumerate(CODES):
+        start = 60 if code == '300750' else 0
+        expected = _full_values(highs[i, start:], lows[i, start:], closes[i, start:])
+        item = daily[code]
+        assert item['trade_date'] == dates[-1]
+        assert item['bars'] == len(dates) - start
+        assert not item['provisional']
+        assert item['macd']['macd'] == round(float(expected['macd'][0]), 4)
+        assert item['kdj']['k'] == round(float(expected['k'][0]), 2)
+        assert item['rsi'] == round(float(expected['rsi'][0]), 2)
+
+
+def test_live_price_is_provisional():
+    db, dates, (highs, lows, closes) = _session()
+    store = IndicatorStateStore(db, market='A', bootstrap_days=1000)
+    store.advance_for_date(dates[-1])
+    stored = db.execute(text("SELECT * FROM stock_indicator_state ORDER BY code")).fetchall()
+
+    db.execute(text("INSERT INTO stock_realtime_quote VALUES ('600000', '2024-12-31', 30.0, 30.5, 29.0, 1.5)"))
+    db.execute(text("INSERT INTO stock_realtime_quote VALUES ('000001', '2024-12-31', NULL, NULL, NULL, 0.0)"))
+    db.commit()
+    live = store.get_indicators(CODES, live=True)
+
+    assert live['600000']['provisional'] and live['600000']['price'] == 30.0
+    assert live['600000']['bars'] == len(dates) + 1
+    expected = _full_values(np.append(highs[0], 30.5), np.append(lows[0], 29.0), np.append(closes[0], 30.0))
+    assert live['600000']['macd']['histogram'] == round(float(expected['histogram'][0]), 4)
+    # 无有效实时价格的股票使用收盘状态
+    assert not live['000001']['provisional']
+    assert live['000001'] == store.get_indicators(['000001'], live=False)['000001']
+    # 保存的状态未被临时K线修改
+    assert db.execute(text("SELECT * FROM stock_indicator_state ORDER BY code")).fetchall() == stored
+
+
+def test_rebuild_after_correction():
+    db, dates, _ = _session()
+    store = IndicatorStateStore(db, market='A', bootstrap_days=1000)
+    store.advance_for_date(dates[-1])
+    before = store.get_indicators(['600000'], live=False)['600000']
+    db.execute(text("UPDATE historical_quotes SET close = close * 1.1 WHERE code = '600000' AND date = :date"),
+               {'date': dates[-5]})
+    db.commit()
+    # 状态日期之前的修正不会被增量推进读取
+    assert store._load_new_bars(dates[-1]) == []
+    result = store.rebuild(dates[-1], ['600000'])
+    assert result['total'] == 1 and result['bars'] == len(dates)
+    assert store.get_indicators(['600000'], live=False)['600000']['macd'] != before['macd']
+
+
+def test_backfilled_bar_recomputes_state():
+    db, dates, _ = _session()
+    store = IndicatorStateStore(db, market='A', bootstrap_days=1000)
+    store.advance_for_date(dates[-1])
+    # 回补 600000 在 dates[-5] 的K线（采集延迟或修正）
+    db.execute(text("UPDATE historical_quotes SET close = close * 1.1 WHERE code = '600000' AND date = :date"),
+               {'date': dates[-5]})
+    db.commit()
+
+    result = store.advance_for_date(dates[-5])
+    assert result['failed'] == 0
+    # 目标日期有K线的股票都重新计算到原状态日期
+    assert result['bars'] == sum(len(dates) - (60 if code == '300750' else 0) for code in CODES)
+
+    other, _, _ = _session()
+    other.execute(text("UPDATE historical_quotes SET close = close * 1.1 WHERE code = '600000' AND date = :date"),
+                  {'date': dates[-5]})
+    other.commit()
+    fresh = IndicatorStateStore(other, market='A', bootstrap_days=1000)
+    fresh.advance_for_date(dates[-1])
+    assert store.get_indicators(CODES, live=False) == fresh.get_indicators(CODES, live=False)
+
+
+def test_new_bars_use_constant_date_bound():
+    db, dates, _ = _session()
+    store = IndicatorStateStore(db, market='A', bootstrap_days=30)
+
+    def bootstrap_start(date):
+        return (pd.Timestamp(date) - pd.Timedelta(days=30)).strftime('%Y-%m-%d')
+
+    # 尚无状态时下界为 bootstrap 起始日
+    assert store._min_load_date(dates[50], bootstrap_start(dates[50])) == bootstrap_start(dates[50])
+    store.advance_for_date(dates[50])
+    # 全部股票都有状态时下界为最早的状态日期
+    assert store._min_load_date(dates[55], bootstrap_start(dates[55])) == dates[50]
+    # 目标日期有尚无状态的股票（300750 上市）时下界不晚于 bootstrap 起始日
+    store.advance_for_date(dates[59])
+    assert store._min_load_date(dates[60], bootstrap_start(dates[60])) == bootstrap_start(dates[60])
+    rows = store._load_new_bars(dates[60])
+    assert {str(row[0]) for row in rows} == set(CODES)
+    assert all(str(row[1]) == dates[60] for row in rows)
+
+
+def test_stale_state_does_not_pin_date_bound():
+    db, dates, _ = _session()
+    # 000001 在 dates[20] 之后停牌（或退市），指标状态停留在 dates[20]
+    db.execute(text("DELETE FROM historical_quotes WHERE code = '000001' AND date > :date"), {'date': dates[20]})
+    db.commit()
+    store = IndicatorStateStore(db, market='A', bootstrap_days=1000)
+    store.advance_for_date(dates[-2])
+    stale = db.execute(text("SELECT trade_date FROM stock_indicator_state WHERE code = '000001'")).scalar()
+    assert str(stale) == dates[20]
+
+    bootstrap_start = (pd.Timestamp(dates[-1]) - pd.Timedelta(days=1000)).strftime('%Y-%m-%d')
+    # 下界为目标日期有K线的股票中最早的状态日期，不会回退到停牌股票的状态日期
+    assert store._min_load_date(dates[-1], bootstrap_start) == dates[-2]
+    result = store.advance_for_date(dates[-1])
+    assert result['failed'] == 0 and result['bars'] == 2
@@ -0,0 +1,107 @@
+"""
+向量化技术指标测试
+验证指标库与原有单只股票实现（逐根K线循环）的结果一致，以及批量计算与单只股票接口一致
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock import indicators
+from stock.keep_increasing_strategy import KeepIncreasingStrategy
+from stock.stock_analysis import TechnicalIndicators
+
+
+def _random_series(n_stocks=12, seed=3, min_len=5, max_len=160):
+    rng = np.random.default_rng(seed)
+    series = []
+    for _ in range(n_stocks):
+        length = int(rng.integers(min_len, max_len))
+        closes = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+        highs = closes * (1 + rng.uniform(0, 0.03, length))
+        lows = closes * (1 - rng.uniform(0, 0.03, length))
+        series.append((highs.tolist(), lows.tolist(), closes.tolist()))
+    return series
+
+
+# 原有实现（逐根K线循环），作为对照
+def _legacy_ema(prices, period):
+    alpha = 2 / (period + 1)
+    ema = np.zeros_like(prices)
+    ema[0] = prices[0]
+    for i in range(1, len(prices)):
+        ema[i] = alpha * prices[i] + (1 - alpha) * ema[i - 1]
+    return ema
+
+
+def _legacy_rsi(prices, period=14):
+    deltas = np.diff(prices)
+    gains = np.where(deltas > 0, deltas, 0)
+    losses = np.where(deltas < 0, -deltas, 0)
+    avg_gain, avg_loss = np.mean(gains[-period:]), np.mean(losses[-period:])
+    return 100.0 if avg_loss == 0 else 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def _legacy_kdj(highs, lows, closes, period=9):
+    highest_high = pd.Series(highs).rolling(window=period).max()
+    lowest_low = pd.Series(lows).rolling(window=period).min()
+    rsv = 100 * (np.array(closes) - lowest_low) / (highest_high - lowest_low)
+    k = d = 50.0
+    for i in range(len(rsv)):
+        if not np.isnan(rsv[i]):
+            k = (2 / 3) * k + (1 / 3) * rsv[i]
+            d = (2 / 3) * d + (1 / 3) * k
+    return k, d, 3 * k - 2 * d
+
+
+def _reference_atr(highs, lows, closes, period=14):
+    tr = [highs[0] - lows[0]] + [max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1]))
+                                 for i in range(1, len(closes))]
+    value = sum(tr[:period]) / period
+    for item in tr[period:]:
+        value = (value * (period - 1) + item) / period
+    return value
+
+
+def test_matches_legacy_single_stock():
+    """各指标的最新值与原有实现逐位一致"""
+    for highs, lows, closes in _random_series(min_len=30):
+        prices = np.array(closes)
+        assert np.array_equal(indicators.ema(prices, 12)[0], _legacy_ema(prices, 12))
+        macd_line = _legacy_ema(prices, 12) - _legacy_ema(prices, 26)
+        assert indicators.macd(prices)[1][0, -1] == _legacy_ema(macd_line, 9)[-1]
+        assert indicators.rsi(closes)[0, -1] == _legacy_rsi(closes)
+        assert tuple(v[0, -1] for v in indicators.kdj(highs, lows, closes)) == _legacy_kdj(highs, lows, closes)
+        upper, middle, lower = indicators.bollinger(closes)
+        assert middle[0, -1] == np.mean(prices[-20:])
+        assert upper[0, -1] == np.mean(prices[-20:]) + 2 * np.std(prices[-20:])
+        assert indicators.atr(highs, lows, closes)[0, -1] == pytest.approx(_reference_atr(highs, lows, closes))
+
+
+def test_batch_matches_single_stock_api():
+    """批量计算（长度不同的股票右对齐）与逐只调用单只股票接口的结果相同，数据不足时返回相同的默认值"""
+    series = _random_series(n_stocks=40)
+    batch = TechnicalIndicators.calculate_batch([s[0] for s in series], [s[1] for s in series], [s[2] for s in series])
+    for (highs, lows, closes), result in zip(series, batch):
+        assert result == {
+            'rsi': TechnicalIndicators.calculate_rsi(closes),
+            'macd': TechnicalIndicators.calculate_macd(closes),
+            'kdj': TechnicalIndicators.calculate_kdj(highs, lows, closes),
+            'bollinger_bands': TechnicalIndicators.calculate_bollinger_bands(closes),
+            'atr': TechnicalIndicators.calculate_atr(highs, lows, closes),
+        }
+    print(f"批量计算 {len(batch)} 只股票，长度 {min(len(s[2]) for s in series)}-{max(len(s[2]) for s in series)}")
+
+
+def test_rolling_helpers():
+    """滑动均值与逐窗口 np.mean 一致，窗口内缺失或不足周期为 NaN；MA30 与原有逐日计算一致"""
+    closes = [10 + (i % 7) * 0.37 for i in range(80)]
+    ma = indicators.rolling_mean(closes, 30)[0]
+    assert np.isnan(ma[:29]).all()
+    assert all(ma[i] == np.mean(closes[i - 29:i + 1]) for i in range(29, 80))
+    assert KeepIncreasingStrategy.calculate_ma30([{'close': c} for c in closes]) == [0.0] * 29 + ma[29:].tolist()
+
+    aligned = indicators.align_series([[1.0, 2.0, 3.0], [4.0]])
+    assert np.isnan(aligned[1, :2]).all() and aligned[1, 2] == 4.0
+    assert np.isnan(indicators.rolling_sum(aligned, 2)[1]).tolist() == [True, True, True]
+    assert indicators.rolling_max(aligned, 2)[0].tolist()[1:] == [2.0, 3.0]
@@ -0,0 +1,71 @@
+"""
+盘中快照查询测试
+验证单只股票按交易日返回全部快照、按时间点返回当天不晚于该时间的最近一次全市场快照（A股与港股分开），
+表不存在时返回空结果
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from stock.intraday_snapshots import IntradaySnapshots
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'snapshots.db'}")
+    session = sessionmaker(bind=engine)()
+    session.execute(text("""
+        CREATE TABLE stock_intraday_snapshot (
+            trade_date DATE, ts TIMESTAMP, code TEXT, current_price REAL, change_percent REAL, open REAL, high REAL,
+            low REAL, pre_close REAL, volume BIGINT, amount DOUBLE PRECISION, turnover_rate REAL,
+            PRIMARY KEY (trade_date, ts, code)
+        )
+    """))
+    rows = [
+        ('2024-06-13', '2024-06-13 14:59:00', '600000', 9.8),
+        ('2024-06-14', '2024-06-14 09:31:00', '600000', 10.0),
+        ('2024-06-14', '2024-06-14 09:31:00', '000001', 20.0),
+        ('2024-06-14', '2024-06-14 09:32:00', '600000', 10.1),
+        ('2024-06-14', '2024-06-14 09:32:00', '000001', 20.2),
+        ('2024-06-14', '2024-06-14 09:33:00', '600000', 10.2),
+        ('2024-06-14', '2024-06-14 09:32:30', '00700', 300.0),
+    ]
+    for trade_date, ts, code, price in rows:
+        session.execute(text("""
+            INSERT INTO stock_intraday_snapshot (trade_date, ts, code, current_price)
+            VALUES (:trade_date, :ts, :code, :price)
+        """), {'trade_date': trade_date, 'ts': ts, 'code': code, 'price': price})
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_code_day_defaults_to_latest_trade_date(db):
+    result = IntradaySnapshots.code_day(db, '600000')
+    assert result['trade_date'] == '2024-06-14'
+    assert [(item['ts'], item['current_price']) for item in result['items']] == [
+        ('2024-06-14 09:31:00', 10.0), ('2024-06-14 09:32:00', 10.1), ('2024-06-14 09:33:00', 10.2),
+    ]
+    assert [item['current_price'] for item in IntradaySnapshots.code_day(db, '600000', '2024-06-13')['items']] == [9.8]
+    assert IntradaySnapshots.code_day(db, '300750') == {"code": '300750', "trade_date": None, "items": []}
+
+
+def test_market_at_returns_latest_snapshot_not_after_ts(db):
+    result = IntradaySnapshots.market_at(db, datetime(2024, 6, 14, 9, 32, 45))
+    assert result['ts'] == '2024-06-14 09:32:00'
+    assert [(item['code'], item['current_price']) for item in result['items']] == [('000001', 20.2), ('600000', 10.1)]
+
+    hk = IntradaySnapshots.market_at(db, datetime(2024, 6, 14, 9, 32, 45), market='HK')
+    assert hk['ts'] == '2024-06-14 09:32:30' and [item['code'] for item in hk['items']] == ['00700']
+
+    assert IntradaySnapshots.market_at(db, datetime(2024, 6, 14, 9, 0))['items'] == []
+
+
+def test_missing_table_returns_empty(tmp_path):
+    session = sessionmaker(bind=create_engine(f"sqlite:///{tmp_path / 'empty.db'}"))()
+    assert IntradaySnapshots.code_day(db=session, code='600000')['items'] == []
+    assert IntradaySnapshots.market_at(session, datetime(2024, 6, 14, 10, 0))['ts'] is None
+    session.close()
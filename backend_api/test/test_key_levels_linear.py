@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+关键价位线性算法测试：与原逐窗口比较 / 逐个比较去重的实现结果一致，长周期数据耗时线性增长
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock.stock_analysis import KeyLevels
+
+
+def legacy_significant(values, volumes, current_price, find_max):
+    """原实现：逐根比较整个窗口，逐个与已选价位比较"""
+    result = []
+    window_size = 3
+    for i in range(window_size, len(values) - window_size):
+        window = values[i - window_size:i + window_size + 1]
+        if find_max:
+            is_extreme = all(values[i] >= v for v in window)
+            on_side = values[i] > current_price
+        else:
+            is_extreme = all(values[i] <= v for v in window)
+            on_side = 0 < values[i] < current_price
+        if is_extreme and on_side:
+            avg_volume = sum(volumes) / len(volumes)
+            volume_weight = volumes[i] / avg_volume if avg_volume > 0 else 1
+            if volume_weight > 0.8:
+                if not any(abs(values[i] - existing) < current_price * 0.02 for existing in result):
+                    result.append(round(values[i], 2))
+    return result
+
+
+def legacy_filter(levels, current_price, is_support):
+    """原实现：与全部已保留价位比较"""
+    if not levels:
+        return []
+    unique_levels = list(set(levels))
+    if is_support:
+        filtered = sorted((l for l in unique_levels if 0 < l < current_price), reverse=True)
+    else:
+        filtered = sorted(l for l in unique_levels if l > current_price)
+    final_levels = []
+    min_distance = current_price * 0.015
+    for level in filtered:
+        if not any(abs(level - existing) < min_distance for existing in final_levels):
+            final_levels.append(round(level, 2))
+    return final_levels[:5]
+
+
+def make_bars(n, seed, tick=0.01):
+    rng = np.random.default_rng(seed)
+    closes = np.maximum(20 * np.exp(np.cumsum(rng.normal(0, 0.02, n))), 0.5)
+    highs = np.round((closes * (1 + np.abs(rng.normal(0, 0.01, n)))) / tick) * tick
+    lows = np.round((closes * (1 - np.abs(rng.normal(0, 0.01, n)))) / tick) * tick
+    volumes = rng.uniform(1e6, 5e6, n)
+    return highs.tolist(), lows.tolist(), closes.tolist(), volumes.tolist()
+
+
+def test_significant_levels_match_legacy():
+    """不同长度、含平台（相同低点/高点）的随机数据，结果与原实现一致"""
+    for seed, n in enumerate([7, 8, 20, 60, 250, 1000]):
+        # 较粗的价格刻度制造相等的相邻极值
+        highs, lows, closes, volumes = make_bars(n, seed, tick=0.1 if seed % 2 else 0.01)
+        for current_price in (closes[-1], float(np.median(closes)), max(highs) * 1.1, min(lows) * 0.9):
+            assert KeyLevels._find_significant_lows(lows, volumes, current_price) == \
+                legacy_significant(lows, volumes, current_price, find_max=False)
+            assert KeyLevels._find_significant_highs(highs, volumes, current_price) == \
+                legacy_significant(highs, volumes, current_price, find_max=True)
+
+
+def test_significant_levels_short_and_zero_volume():
+    """数据不足一个窗口、成交量全为0时与原实现一致"""
+    assert KeyLevels._find_significant_lows([10.0] * 6, [1.0] * 6, 11.0) == []
+    lows = [10, 9, 8, 7, 8, 9, 10, 9, 8, 9]
+    zero_volumes = [0.0] * len(lows)
+    assert KeyLevels._find_significant_lows(lows, zero_volumes, 12.0) == \
+        legacy_significant(lows, zero_volumes, 12.0, find_max=False)
+    print(KeyLevels._find_significant_lows(lows, zero_volumes, 12.0))
+
+
+def test_filter_and_sort_levels_match_legacy():
+    rng = np.random.default_rng(7)
+    for _ in range(200):
+        current_price = float(rng.uniform(1, 100))
+        levels = [round(float(v), 2) for v in current_price * rng.uniform(0.7, 1.3, rng.integers(0, 60))]
+        levels += levels[:5]  # 重复价位
+        for is_support in (True, False):
+            assert KeyLevels._filter_and_sort_levels(levels, current_price, is_support) == \
+                legacy_filter(levels, current_price, is_support)
+
+
+def test_calculate_key_levels_long_history():
+    """5年日线的关键价位计算结果与原实现一致，耗时随长度线性增长"""
+    highs, lows, closes, volumes = make_bars(1250, 42)
+    current_price = closes[-1]
+    assert KeyLevels._find_significant_lows(lows, volumes, current_price) == \
+        legacy_significant(lows, volumes, current_price, find_max=False)
+
+    historical_data = [
+        {'high': h, 'low': l, 'close': c, 'volume': v}
+        for h, l, c, v in zip(highs, lows, closes, volumes)
+    ]
+    result = KeyLevels.calculate_key_levels(historical_data, current_price)
+    assert all(level < current_price for level in result['support_levels'])
+    assert all(level > current_price for level in result['resistance_levels'])
+
+    def timed(n):
+        data = [dict(bar) for bar in historical_data] * (n // len(historical_data))
+        start = time.perf_counter()
+        KeyLevels.calculate_key_levels(data, current_price)
+        return time.perf_counter() - start
+
+    short, long = timed(1250), timed(1250 * 16)
+    print(f"1250根: {short * 1000:.1f}ms, 20000根: {long * 1000:.1f}ms")
+    # 线性增长约16倍；原实现在低点多时接近平方增长
+    assert long < 1.0
@@ -140,5 +140,40 @@ def test_low_nine_pattern():
     print("=" * 50)
 
 
+class _CountSession:
+    """记录SQL并返回固定结果的假会话"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.sql = None
+        self.params = None
+
+    def execute(self, statement, params=None):
+        self.sql, self.params = str(statement), params
+        rows = self.rows
+
+        class _Result:
+            def fetchall(self):
+                return rows
+
+        return _Result()
+
+
+def test_query_setup_count_stocks():
+    """按九转序列计数查询：count=9 匹配计数>=9，其余精确匹配"""
+    rows = [('600001', '测试一', '2025-12-12', 11, 9.876), ('600002', '测试二', '2025-12-12', 9, None)]
+    db = _CountSession(rows)
+    results = LowNineStrategy.query_setup_count_stocks(db, 9)
+    print(results)
+    assert 't.setup_count >= :count' in db.sql
+    assert db.params == {'count': 9}
+    assert results[0] == {'code': '600001', 'name': '测试一', 'trade_date': '2025-12-12',
+                          'setup_count': 11, 'current_price': 9.88}
+    assert results[1]['current_price'] is None
+
+    LowNineStrategy.query_setup_count_stocks(db, 7)
+    assert 't.setup_count = :count' in db.sql
+
+
 if __name__ == "__main__":
     test_low_nine_pattern()
@@ -0,0 +1,171 @@
+"""
+选股行情面板单元测试
+验证面板数据与逐只股票查询得到的字典列表一致，以及增量刷新逻辑
+"""
+
+import numpy as np
+import pytest
+
+from stock.price_panel import PricePanel, PricePanelStore
+
+
+def _make_rows(codes, dates, base=10.0):
+    """构造 historical_quotes 查询结果行: code, name, date, open, close, high, low, change_percent, volume, amount, turnover_rate"""
+    rows = []
+    for ci, code in enumerate(codes):
+        for di, date in enumerate(dates):
+            close = base + ci + di * 0.1
+            rows.append((code, f'股票{code}', date, close - 0.05, close, close + 0.1, close - 0.1,
+                         1.0 + di, 1000.0 * (di + 1), 10000.0 * (di + 1), None))
+    return rows
+
+
+class _FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+class _FakeSession:
+    """只支持面板加载所需SQL的假会话"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.load_calls = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        if 'MAX(date)' in sql:
+            return _FakeResult([(max(r[2] for r in self.rows),)])
+        if 'GROUP BY date' in sql:
+            totals = {}
+            for r in self.rows:
+                if r[2] >= params['since']:
+                    count, close, volume = totals.get(r[2], (0, 0.0, 0.0))
+                    totals[r[2]] = (count + 1, close + (r[4] or 0.0), volume + (r[8] or 0.0))
+            return _FakeResult([(date, *values) for date, values in sorted(totals.items())])
+        self.load_calls.append(params['start_date'])
+        return _FakeResult([r for r in self.rows if r[2] >= params['start_date']])
+
+
+def test_get_history_matches_row_conversion():
+    """面板返回的历史数据与原先逐行转换的字典一致（倒序，NULL记为0.0）"""
+    dates = ['2025-01-02', '2025-01-03', '2025-01-06']
+    rows = _make_rows(['300001', '600000'], dates)
+    # 600000 缺少一个交易日（停牌）
+    rows = [r for r in rows if not (r[0] == '600000' and r[2] == '2025-01-03')]
+    panel = PricePanel.from_rows(rows)
+
+    history = panel.get_history('300001')
+    assert [d['date'] for d in history] == list(reversed(dates))
+    expected = [r for r in rows if r[0] == '300001'][::-1]
+    for item, row in zip(history, expected):
+        assert item['open'] == float(row[3])
+        assert item['close'] == float(row[4])
+        assert item['high'] == float(row[5])
+        assert item['low'] == float(row[6])
+        assert item['change_percent'] == float(row[7])
+        assert item['volume'] == float(row[8])
+        assert item['amount'] == float(row[9])
+        assert item['turnover_rate'] == 0.0
+
+    suspended = panel.get_history('600000')
+    assert [d['date'] for d in suspended] == ['2025-01-06', '2025-01-02']
+
+    ranged = panel.get_history('300001', start_date='2025-01-03', end_date='2025-01-05')
+    assert [d['date'] for d in ranged] == ['2025-01-03']
+
+    assert panel.get_history('000001') == []
+
+
+def test_panel_is_read_only():
+    """面板数组不可写"""
+    panel = PricePanel.from_rows(_make_rows(['000001'], ['2025-01-02']))
+    with pytest.raises(ValueError):
+        panel.fields['close'][0, 0] = 1.0
+    with pytest.raises(ValueError):
+        panel.mask[0, 0] = False
+
+
+def test_merge_appends_new_dates_and_codes():
+    """增量合并新增交易日与新股票，并裁剪回看窗口之外的交易日"""
+    old = PricePanel.from_rows(_make_rows(['000001'], ['2025-01-02', '2025-01-03']))
+    delta = PricePanel.from_rows(_make_rows(['000001', '000002'], ['2025-01-03', '2025-01-06'], base=20.0))
+
+    merged = old.merge(delta, min_date='2025-01-03')
+
+    assert merged.codes.tolist() == ['000001', '000002']
+    assert merged.dates.tolist() == ['2025-01-03', '2025-01-06']
+    # 重叠的交易日以增量数据为准
+    assert merged.get_history('000001')[-1]['close'] == 20.0
+    assert len(merged.get_history('000002')) == 2
+    # 原面板保持不变
+    assert old.dates.tolist() == ['2025-01-02', '2025-01-03']
+    assert np.array_equal(old.fields['close'][0], [10.0, 10.1])
+
+
+def test_store_refreshes_incrementally():
+    """出现新交易日时只加载新增交易日的数据"""
+    session = _FakeSession(_make_rows(['000001', '000002'], ['2025-01-02', '2025-01-03']))
+    store = PricePanelStore('historical_quotes', lookback_days=100000, refresh_interval=0)
+
+    panel = store.get(session)
+    assert panel.last_date == '2025-01-03'
+    assert len(session.load_calls) == 1
+
+    # 没有新交易日时不重新加载
+    store.get(session)
+    assert len(session.load_calls) == 1
+
+    session.rows = session.rows + _make_rows(['000001', '000002'], ['2025-01-06'])
+    panel = store.get(session)
+    assert panel.last_date == '2025-01-06'
+    # 已有交易日的数据一致，只读取新增的交易日
+    assert session.load_calls[-1] == '2025-01-06'
+    assert len(panel.get_history('000002')) == 3
+
+
+def test_store_reloads_late_and_corrected_rows():
+    """采集过程中晚写入的股票和原地修正的记录在下一次刷新时重新读取"""
+    dates = ['2025-01-02', '2025-01-03', '2025-01-06']
+    rows = _make_rows(['000001', '000002', '000003'], dates)
+    # 刷新时 2025-01-06 只写入了 000001
+    session = _FakeSession([r for r in rows if r[2] < '2025-01-06' or r[0] == '000001'])
+    store = PricePanelStore('historical_quotes', lookback_days=100000, refresh_interval=0, recheck_dates=2)
+    panel = store.get(session)
+    assert panel.last_date == '2025-01-06' and not panel.mask[1, 2]
+
+    # 数据未变化时不重新读取
+    store.get(session)
+    assert len(session.load_calls) == 1
+
+    session.rows = rows
+    panel = store.get(session)
+    assert session.load_calls[-1] == '2025-01-06'
+    assert panel.mask[:, 2].all()
+
+    # 原地修正 000002 在 2025-01-03 的收盘价
+    session.rows = [r if (r[0], r[2]) != ('000002', '2025-01-03') else r[:4] + (99.0,) + r[5:] for r in rows]
+    panel = store.get(session)
+    assert session.load_calls[-1] == '2025-01-03'
+    assert panel.fields['close'][1, 1] == 99.0
+    assert len(session.load_calls) == 3
+
+
+def test_store_full_reload_interval():
+    """超过全量加载间隔时重新全量加载（覆盖核对范围之外的回补）"""
+    session = _FakeSession(_make_rows(['000001'], ['2025-01-02', '2025-01-03', '2025-01-06']))
+    store = PricePanelStore('historical_quotes', lookback_days=100000, refresh_interval=0, recheck_dates=1,
+                            full_reload_interval=3600)
+    store.get(session)
+    session.rows = [r if r[2] != '2025-01-02' else r[:4] + (50.0,) + r[5:] for r in session.rows]
+    # 核对范围（最近1个交易日）之外的修正在全量加载间隔内不读取
+    assert store.get(session).fields['close'][0, 0] != 50.0
+    store._loaded_at -= 3600
+    assert store.get(session).fields['close'][0, 0] == 50.0
+    assert session.load_calls[-1] == session.load_calls[0]
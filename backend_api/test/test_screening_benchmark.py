@@ -0,0 +1,71 @@
+"""
+选股基准测试工具测试
+验证合成行情的基本性质、小规模端到端运行以及与基准结果的比较
+"""
+
+import json
+
+import numpy as np
+
+from stock.screening_benchmark import compare_with_baseline, generate_market, main, run_benchmark
+from stock.screening_registry import SCREENING_STRATEGIES
+
+
+def test_generate_market():
+    """合成行情包含涨停、停牌和上市较晚的股票，价格关系合理"""
+    panel, stocks = generate_market('A', 300, 250, seed=3)
+    assert len(panel) == len(stocks) == 300
+    assert len({code for code, _ in stocks}) == 300
+    mask = panel.mask
+    close, high, low = panel.fields['close'], panel.fields['high'], panel.fields['low']
+    assert np.all(high[mask] >= close[mask]) and np.all(low[mask] <= close[mask])
+    assert np.all(low[mask] > 0)
+    limit_ups = (panel.fields['change_percent'] >= 9.5) & mask
+    print(f"涨停 {int(limit_ups.sum())} 次，停牌/未上市 {int((~mask).sum())} 个交易日")
+    assert limit_ups.sum() > 0
+    assert (~mask).sum() > 0
+    assert any(name.startswith('*ST') for _, name in stocks)
+
+    hk_panel, hk_stocks = generate_market('HK', 50, 100, seed=3)
+    assert all(len(code) == 5 for code, _ in hk_stocks)
+    assert len(hk_panel.dates) == 100
+
+
+def test_run_benchmark_small():
+    """小规模端到端运行全部策略"""
+    report = run_benchmark(a_shares=200, hk=50, years=1, seed=7, workers=1,
+                           backtest='low_nine', backtest_days=10)
+    results = report['results']
+    for strategy in SCREENING_STRATEGIES:
+        entry = results[strategy]
+        print(f"{strategy}: {entry['stocks']} 只, {entry['seconds']}s, {entry['stocks_per_sec']} 只/秒")
+        assert entry['stocks'] > 0
+        assert entry['stocks_per_sec'] > 0
+        assert entry['peak_memory_mb'] is not None
+        assert entry['conditions']
+    assert results['expression_A']['stocks'] == 200
+    assert results['expression_HK']['stocks'] == 50
+    assert results['backtest_low_nine']['trade_days'] == 10
+    # 向量化信号与逐日回放的信号数一致
+    assert results['backtest_low_nine_replay']['hits'] == results['backtest_low_nine']['hits']
+    assert results['backtest_low_nine']['speedup'] is not None
+
+
+def test_compare_with_baseline(tmp_path):
+    """吞吐量下降或峰值内存增加超过阈值视为退化，命令行以非零状态退出"""
+    baseline = {'results': {'low_nine': {'stocks_per_sec': 1000.0, 'peak_memory_mb': 10.0}}}
+    ok = {'results': {'low_nine': {'stocks_per_sec': 850.0, 'peak_memory_mb': 11.0}}}
+    slow = {'results': {'low_nine': {'stocks_per_sec': 700.0, 'peak_memory_mb': 13.0},
+                        'high_tight_flag': {'stocks_per_sec': 1.0, 'peak_memory_mb': 1.0}}}
+    assert compare_with_baseline(ok, baseline, 0.2) == []
+    assert len(compare_with_baseline(slow, baseline, 0.2)) == 2
+
+    args = ['--a-shares', '100', '--hk', '0', '--years', '1', '--workers', '1',
+            '--strategies', 'low_nine', '--no-profile']
+    output = tmp_path / 'report.json'
+    assert main(args + ['--output', str(output)]) == 0
+    report = json.loads(output.read_text(encoding='utf-8'))
+    report['results']['low_nine']['stocks_per_sec'] *= 1000
+    impossible = tmp_path / 'baseline.json'
+    impossible.write_text(json.dumps(report), encoding='utf-8')
+    assert main(args + ['--baseline', str(impossible)]) == 1
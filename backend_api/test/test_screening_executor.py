@@ -0,0 +1,163 @@
+"""
+选股并行执行器测试
+验证分块并行结果与单进程顺序执行一致，以及分块超时处理
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from stock.high_tight_flag_strategy import HighTightFlagStrategy
+from stock.low_nine_strategy import LowNineStrategy
+from stock.price_panel import PricePanel
+from stock.screening_executor import ScreeningExecutor
+
+
+def _build_panel(n_stocks=60, n_days=80):
+    """构造包含低九形态与旗形形态的合成面板"""
+    dates = [d.strftime('%Y-%m-%d') for d in pd.bdate_range(end=datetime.now().date(), periods=n_days)]
+    rows, stocks = [], []
+    for i in range(n_stocks):
+        code = f'{600000 + i}'
+        stocks.append((code, f'股票{i}'))
+        price = 10.0 + i % 7
+        for d, date in enumerate(dates):
+            if i % 4 == 0:
+                # 持续下跌：满足低九
+                close = price * (1 - 0.01 * d / n_days) - d * 0.01
+                change_percent = -1.0
+            elif i % 4 == 1 and n_days - 24 <= d < n_days - 10:
+                # 24~10日内连续涨停，之后维持高位：满足高而窄的旗形
+                close = price * (1.1 ** (d - (n_days - 24) + 1))
+                change_percent = 10.0
+            elif i % 4 == 1 and d >= n_days - 10:
+                close = price * (1.1 ** 14)
+                change_percent = 0.0
+            else:
+                close = price + (d % 5) * 0.1
+                change_percent = 0.5
+            rows.append((code, f'股票{i}', date, close, close, close * 1.01, close * 0.99,
+                         change_percent, 1e6, 1e7, 1.0))
+    return stocks, PricePanel.from_rows(rows)
+
+
+def _slow_screen(panel, stocks, start_date_str, end_date_str, delay=0.0):
+    """模拟耗时的分块计算"""
+    if stocks and stocks[0][0] == '600000':
+        time.sleep(delay)
+    return [{'code': code} for code, _ in stocks]
+
+
+def test_parallel_matches_sequential():
+    """并行执行的结果与顺序执行一致（包括顺序）"""
+    stocks, panel = _build_panel()
+    sequential = ScreeningExecutor(max_workers=1, chunk_size=7)
+    parallel = ScreeningExecutor(max_workers=2, chunk_size=7)
+    try:
+        for func in (LowNineStrategy.screen_low_nine_stocks, HighTightFlagStrategy.screen_high_tight_flag_stocks):
+            expected = sequential.run(func, panel, stocks, '2000-01-01', '2099-12-31')
+            actual = parallel.run(func, panel, stocks, '2000-01-01', '2099-12-31')
+            print(f"{func.__qualname__}: {len(actual)} 只")
+            assert len(expected) > 0
+            assert actual == expected
+    finally:
+        parallel.shutdown()
+
+
+def test_chunk_timeout_skips_slow_chunk():
+    """超时的分块被跳过，其余分块结果正常返回"""
+    stocks, panel = _build_panel(n_stocks=20, n_days=5)
+    executor = ScreeningExecutor(max_workers=2, chunk_size=10, chunk_timeout=0.5)
+    try:
+        results = executor.run(_slow_screen, panel, stocks, delay=5.0)
+        # 第一个分块以 600000 开头，会超时
+        assert [r['code'] for r in results] == [code for code, _ in stocks[10:]]
+        # 超时的股票随结果返回
+        assert results.incomplete
+        assert results.failed == stocks[:10]
+        # 进程池已重建，后续调用正常
+        again = executor.run(_slow_screen, panel, stocks)
+        assert len(again) == 20
+        assert not again.incomplete
+    finally:
+        executor.shutdown()
+
+
+def _stuck_screen(panel, stocks, start_date_str, end_date_str, pid_file=None):
+    """第一个分块记录工作进程号后卡住"""
+    if stocks and stocks[0][0] == '600000':
+        with open(pid_file, 'w') as f:
+            f.write(str(os.getpid()))
+        time.sleep(60)
+    return [{'code': code} for code, _ in stocks]
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # 已退出但尚未回收的子进程
+    with open(f'/proc/{pid}/stat') as f:
+        return f.read().split(')')[-1].split()[0] != 'Z'
+
+
+def test_chunk_timeout_terminates_stuck_workers(tmp_path):
+    """分块超时后卡住的工作进程被终止"""
+    stocks, panel = _build_panel(n_stocks=20, n_days=5)
+    pid_file = tmp_path / 'pid'
+    executor = ScreeningExecutor(max_workers=2, chunk_size=10, chunk_timeout=0.5)
+    try:
+        results = executor.run(_stuck_screen, panel, stocks, pid_file=str(pid_file))
+        assert results.failed == stocks[:10]
+        assert executor._pool is None
+        pid = int(pid_file.read_text())
+        deadline = time.time() + 5
+        while _alive(pid) and time.time() < deadline:
+            time.sleep(0.1)
+        assert not _alive(pid)
+    finally:
+        executor.shutdown()
+
+
+def test_chunk_timeout_keeps_concurrent_runs():
+    """一次调用的分块超时不会取消同时进行的其他调用已提交的分块"""
+    stocks, panel = _build_panel(n_stocks=40, n_days=5)
+    executor = ScreeningExecutor(max_workers=2, chunk_size=10, chunk_timeout=1.0)
+    others = {}
+
+    def other_run():
+        time.sleep(0.2)
+        others['results'] = executor.run(_slow_screen, panel, stocks[20:])
+
+    try:
+        thread = threading.Thread(target=other_run)
+        thread.start()
+        slow = executor.run(_slow_screen, panel, stocks[:20], delay=3.0)
+        thread.join()
+        assert slow.failed == stocks[:10]
+        assert [r['code'] for r in others['results']] == [code for code, _ in stocks[20:]]
+        assert not others['results'].incomplete
+    finally:
+        executor.shutdown()
+
+
+def test_progress_callback_reports_each_chunk():
+    """传入进度回调时按 progress_chunk_size 分块，逐块回调且命中结果与最终结果一致"""
+    stocks, panel = _build_panel(n_stocks=30)
+    for executor in (ScreeningExecutor(max_workers=1, progress_chunk_size=8),
+                     ScreeningExecutor(max_workers=2, progress_chunk_size=8)):
+        calls = []
+        try:
+            results = executor.run(LowNineStrategy.screen_low_nine_stocks, panel, stocks,
+                                   '2000-01-01', '2099-12-31',
+                                   progress=lambda processed, total, hits: calls.append((processed, total, hits)))
+        finally:
+            executor.shutdown()
+        print(f"并行={executor.parallel}: 回调 {len(calls)} 次")
+        assert [c[0] for c in calls] == [8, 16, 24, 30]
+        assert all(c[1] == 30 for c in calls)
+        assert [hit for c in calls for hit in c[2]] == results
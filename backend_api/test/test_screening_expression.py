@@ -0,0 +1,138 @@
+"""
+选股表达式测试
+验证向量化计算结果与逐只股票按定义计算的结果一致，以及公共子表达式、错误提示和结果缓存
+"""
+
+import random
+import statistics
+
+import pandas as pd
+import pytest
+
+import stock.screening_expression as expression_module
+from stock.price_panel import PricePanel
+from stock.screening_expression import ExpressionError, compile_expression, evaluate_panel, run_expression_screening
+
+
+def _build_panel(n_stocks=40, n_days=90, seed=5):
+    rng = random.Random(seed)
+    dates = [d.strftime('%Y-%m-%d') for d in pd.bdate_range('2024-01-02', periods=n_days)]
+    rows = []
+    for i in range(n_stocks):
+        code = f'{600000 + i}'
+        close = 10.0 + i % 7
+        # 部分股票上市较晚、部分股票中途停牌
+        listed = 0 if i % 6 else 50
+        for d, date in enumerate(dates):
+            if d < listed or (i % 4 == 1 and 60 <= d < 63):
+                continue
+            prev = close
+            jump = 0.1 if rng.random() < 0.08 else rng.uniform(-0.04, 0.04)
+            close = round(prev * (1 + jump), 2)
+            change = round((close / prev - 1) * 100, 2)
+            rows.append([code, f'股票{i}', date, prev, close, max(prev, close) * 1.01, min(prev, close) * 0.99,
+                         change, rng.uniform(1e5, 1e6), 1e7, 1.0])
+    return PricePanel.from_rows(rows)
+
+
+def _brute_force(panel, code):
+    """逐只按定义计算（倒序，最新在前），数据不足返回None"""
+    bars = panel.get_history(code)
+    closes = [bar['close'] for bar in bars]
+    changes = [bar['change_percent'] for bar in bars]
+    volumes = [bar['volume'] for bar in bars]
+    results = {}
+
+    def ma(values, n, offset=0):
+        window = values[offset:offset + n]
+        return sum(window) / n if len(window) == n else None
+
+    # close > ma(close, 20) and ref(change_percent, 1) >= 9.5
+    m20 = ma(closes, 20)
+    results['a'] = None if m20 is None or len(changes) < 2 else closes[0] > m20 and changes[1] >= 9.5
+    # count(change_percent >= 9.5, 20) >= 2 or hhv(close, 10) == close
+    count = sum(1 for c in changes[:20] if c >= 9.5) if len(changes) >= 20 else None
+    high = max(closes[:10]) if len(closes) >= 10 else None
+    if count is not None and count >= 2:
+        results['b'] = True
+    elif high is not None and high == closes[0]:
+        results['b'] = True
+    elif count is None or high is None:
+        results['b'] = None
+    else:
+        results['b'] = False
+    # cross(ma(close, 5), ma(close, 10))
+    m5, m10, m5p, m10p = ma(closes, 5), ma(closes, 10), ma(closes, 5, 1), ma(closes, 10, 1)
+    results['c'] = None if None in (m5, m10, m5p, m10p) else m5 > m10 and m5p <= m10p
+    # not every(change_percent > 0, 3) and std(close, 10) < 0.5 * abs(llv(low, 5) - ma(close, 10))
+    if len(bars) < 10:
+        results['d'] = None
+    else:
+        rising = all(c > 0 for c in changes[:3])
+        std = statistics.pstdev(closes[:10])
+        low = min(bar['low'] for bar in bars[:5])
+        results['d'] = (not rising) and std < 0.5 * abs(low - m10)
+    # volume > 1.5 * ma(volume, 5) and close >= llv(close, 3)
+    mv = ma(volumes, 5)
+    results['e'] = None if mv is None else volumes[0] > 1.5 * mv and closes[0] >= min(closes[:3])
+    return results
+
+
+EXPRESSIONS = {
+    'a': 'close > ma(close, 20) and ref(change_percent, 1) >= 9.5',
+    'b': 'count(change_percent >= 9.5, 20) >= 2 or hhv(close, 10) == close',
+    'c': 'cross(ma(close, 5), ma(close, 10))',
+    'd': 'not every(change_percent > 0, 3) and std(close, 10) < 0.5 * abs(llv(low, 5) - ma(close, 10))',
+    'e': 'volume > 1.5 * ma(volume, 5) and close >= llv(close, 3)',
+}
+
+
+@pytest.mark.parametrize('name', sorted(EXPRESSIONS))
+def test_vectorized_matches_brute_force(name):
+    """向量化计算结果与逐只按定义计算一致（含上市较晚、停牌的股票）"""
+    panel = _build_panel()
+    compiled = compile_expression(EXPRESSIONS[name])
+    actual = {item['code'] for item in evaluate_panel(compiled, panel)}
+    expected = {code for code in panel.codes.tolist() if _brute_force(panel, code)[name] is True}
+    print(f"{EXPRESSIONS[name]}: 命中 {len(actual)} 只")
+    assert actual == expected
+
+
+def test_common_subexpressions_are_shared():
+    """相同子表达式只编译为一个节点，所需交易日数按嵌套窗口累加"""
+    compiled = compile_expression('ma(close, 10) > ref(ma(close, 10), 5) and ma(close,10) > 1')
+    keys = [node.key for node in compiled.nodes]
+    assert keys.count('ma(close, 10)') == 1
+    assert len(keys) == len(set(keys))
+    assert compiled.bars == 15
+    assert compile_expression('close > 1').fields == ['close']
+
+
+@pytest.mark.parametrize('expression', [
+    '', 'close', 'close > ma(close)', 'close > foo(close, 3)', 'price > 1', 'close > ma(close, 0)',
+    'close > ma(close, 2.5)', 'close > ma(close, n)', 'count(close, 5) > 1', '__import__("os")',
+    'close > 1 and 2', 'close.real > 1', 'close > ma(close, 100000)', 'close >',
+])
+def test_invalid_expressions(expression):
+    with pytest.raises(ExpressionError):
+        compile_expression(expression)
+
+
+def test_results_are_cached_per_panel_snapshot(monkeypatch):
+    """相同表达式在同一面板快照上直接返回缓存结果，面板刷新后重新计算"""
+    panels = [_build_panel(), _build_panel(seed=6)]
+    current = {'panel': panels[0]}
+    monkeypatch.setattr(expression_module, 'get_price_panel', lambda db, market='A': current['panel'])
+    expression_module._result_cache.clear()
+
+    first = run_expression_screening(None, EXPRESSIONS['e'])
+    second = run_expression_screening(None, '  ' + EXPRESSIONS['e'])
+    assert not first['cached'] and second['cached']
+    assert first['data'] == second['data']
+
+    current['panel'] = panels[1]
+    third = run_expression_screening(None, EXPRESSIONS['e'])
+    assert not third['cached']
+
+    with pytest.raises(ExpressionError):
+        run_expression_screening(None, EXPRESSIONS['e'], market='US')
@@ -0,0 +1,93 @@
+"""
+异步选股任务测试
+验证任务提交、进度查询、增量拉取以及 SSE 推送
+"""
+
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import stock.screening_jobs as jobs_module
+from stock.screening_registry import SCREENING_STRATEGIES
+from stock.stock_screening_routes import router
+
+
+class _FakeSession:
+    def close(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class _FakeStore:
+    def latest_date(self, db):
+        return '2024-06-03'
+
+
+def _fake_strategy(db, step=10, progress=None):
+    """每10只股票回调一次，代码为偶数的股票命中"""
+    stocks = [f'{600000 + i}' for i in range(35)]
+    results = []
+    for start in range(0, len(stocks), step):
+        chunk = stocks[start:start + step]
+        hits = [{'code': code} for code in chunk if int(code) % 2 == 0]
+        results.extend(hits)
+        if progress is not None:
+            progress(start + len(chunk), len(stocks), hits)
+    return results
+
+
+def _client(monkeypatch):
+    monkeypatch.setitem(SCREENING_STRATEGIES, 'fake', {'name': '测试策略', 'func': _fake_strategy, 'defaults': {'step': 10}})
+    monkeypatch.setattr(jobs_module, 'SessionLocal', _FakeSession)
+    monkeypatch.setattr(jobs_module, 'load_precomputed', lambda db, strategy, params: None)
+    monkeypatch.setattr(jobs_module, 'get_panel_store', lambda market='A': _FakeStore())
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_job_lifecycle(monkeypatch):
+    """提交后可查询完成状态，并支持按 offset 增量拉取命中结果"""
+    client = _client(monkeypatch)
+    response = client.post('/api/screening/jobs', json={'strategy': 'fake', 'params': {'step': 5}})
+    assert response.status_code == 200
+    job_id = response.json()['job_id']
+
+    status = client.get(f'/api/screening/jobs/{job_id}').json()
+    print(status)
+    assert status['status'] == 'completed'
+    assert status['processed_stocks'] == status['total_stocks'] == 35
+    assert status['progress'] == 100
+    assert status['hit_count'] == 18
+    assert status['trade_date'] == '2024-06-03'
+    assert [r['code'] for r in status['results']] == [f'{600000 + i}' for i in range(0, 35, 2)]
+
+    tail = client.get(f'/api/screening/jobs/{job_id}', params={'offset': 15}).json()
+    assert [r['code'] for r in tail['results']] == ['600030', '600032', '600034']
+
+
+def test_job_stream_events(monkeypatch):
+    """SSE 依次推送命中结果、进度和结束事件"""
+    client = _client(monkeypatch)
+    job_id = client.post('/api/screening/jobs', json={'strategy': 'fake'}).json()['job_id']
+
+    body = client.get(f'/api/screening/jobs/{job_id}/stream').text
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+
+    assert [e for e, _ in events].count('hit') == 18
+    assert events[-1] == ('done', {'status': 'completed', 'hit_count': 18, 'error_message': None})
+    assert ('progress', {'processed_stocks': 35, 'total_stocks': 35, 'progress': 100}) in events
+
+
+def test_unknown_strategy_and_job(monkeypatch):
+    """未知策略返回400，未知任务返回404"""
+    client = _client(monkeypatch)
+    assert client.post('/api/screening/jobs', json={'strategy': 'nope'}).status_code == 400
+    assert client.get('/api/screening/jobs/missing').status_code == 404
+    assert client.get('/api/screening/jobs/missing/stream').status_code == 404
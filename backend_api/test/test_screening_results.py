@@ -0,0 +1,128 @@
+"""
+选股结果物化存储测试
+验证预计算写入、默认参数命中存储结果、非默认参数与过期结果回退实时计算
+"""
+
+import numpy as np
+
+import stock.screening_results as results_module
+from stock.screening_registry import SCREENING_STRATEGIES
+from stock.screening_results import ScreeningResultStore, get_screening_results, precompute_screening_results
+
+
+class _FakeResult:
+    def __init__(self, row=None):
+        self.row = row
+
+    def fetchone(self):
+        return self.row
+
+
+class _MemorySession:
+    """以字典模拟 screening_results 表的假会话"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        if 'INSERT INTO screening_results' in sql:
+            key = (params['strategy'], params['params'], params['trade_date'])
+            self.rows[key] = params['results']
+        elif 'SELECT results FROM screening_results' in sql:
+            key = (params['strategy'], params['params'], params['trade_date'])
+            return _FakeResult((self.rows[key],) if key in self.rows else None)
+        return _FakeResult()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class _FakePanel:
+    def __init__(self, last_date):
+        self.last_date = last_date
+
+
+class _FakeStore:
+    def __init__(self, last_date):
+        self.last_date = last_date
+
+    def refresh(self, db):
+        return _FakePanel(self.last_date)
+
+    def latest_date(self, db):
+        return self.last_date
+
+
+def _setup(monkeypatch, last_date='2024-06-03'):
+    calls = []
+
+    def fake_strategy(db, threshold=1.0):
+        calls.append(threshold)
+        return [{'code': '000001', 'threshold': threshold, 'score': np.float64(1.5)}]
+
+    store = _FakeStore(last_date)
+    monkeypatch.setitem(SCREENING_STRATEGIES, 'fake', {
+        'name': '测试策略', 'func': fake_strategy, 'defaults': {'threshold': 1.0}
+    })
+    monkeypatch.setattr(results_module, 'get_panel_store', lambda market='A': store)
+    return calls, store
+
+
+def test_precompute_then_serve_stored(monkeypatch):
+    """预计算后，默认参数直接返回存储结果，不再执行策略"""
+    calls, _ = _setup(monkeypatch)
+    db = _MemorySession()
+
+    summary = precompute_screening_results(db, strategies=['fake'])
+    assert summary == {'trade_date': '2024-06-03', 'success': ['fake'], 'failed': []}
+    assert calls == [1.0]
+
+    screening = get_screening_results(db, 'fake', {'threshold': None})
+    print(screening)
+    assert screening['precomputed'] is True
+    assert screening['trade_date'] == '2024-06-03'
+    assert screening['data'] == [{'code': '000001', 'threshold': 1.0, 'score': 1.5}]
+    assert calls == [1.0]
+
+
+def test_non_default_params_compute_live(monkeypatch):
+    """非默认参数总是实时计算"""
+    calls, _ = _setup(monkeypatch)
+    db = _MemorySession()
+    precompute_screening_results(db, strategies=['fake'])
+
+    screening = get_screening_results(db, 'fake', {'threshold': 2.0})
+    assert screening['precomputed'] is False
+    assert screening['data'][0]['threshold'] == 2.0
+    assert calls == [1.0, 2.0]
+
+
+def test_stale_results_fall_back_to_live(monkeypatch):
+    """出现新的交易日而尚未预计算时回退实时计算"""
+    calls, store = _setup(monkeypatch)
+    db = _MemorySession()
+    precompute_screening_results(db, strategies=['fake'])
+
+    store.last_date = '2024-06-04'
+    screening = get_screening_results(db, 'fake')
+    assert screening['precomputed'] is False
+    assert screening['trade_date'] == '2024-06-04'
+    assert calls == [1.0, 1.0]
+
+
+def test_failed_strategy_is_reported(monkeypatch):
+    """单个策略失败不影响其余策略"""
+    _setup(monkeypatch)
+
+    def broken(db):
+        raise RuntimeError('boom')
+
+    monkeypatch.setitem(SCREENING_STRATEGIES, 'broken', {'name': '异常策略', 'func': broken, 'defaults': {}})
+    summary = precompute_screening_results(_MemorySession(), strategies=['broken', 'fake'])
+    assert summary['success'] == ['fake']
+    assert summary['failed'] == ['broken']
+    assert ScreeningResultStore._table_ready is True
@@ -0,0 +1,133 @@
+"""
+增量选股状态测试
+验证重复执行只重新计算窗口数据变化的股票，且结果与全量计算一致
+"""
+
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from stock.low_nine_strategy import LowNineStrategy
+from stock.price_panel import PANEL_FIELDS, PricePanel, PricePanelStore
+from stock.screening_executor import ScreeningExecutor
+from stock.screening_state import ScreeningState
+
+# 记录每次实际计算的股票代码
+_evaluated = []
+
+
+def _counting_low_nine(panel, stocks, start_date_str, end_date_str):
+    _evaluated.extend(code for code, _ in stocks)
+    return LowNineStrategy.screen_low_nine_stocks(panel, stocks, start_date_str, end_date_str)
+
+
+def _build_rows(n_stocks=20, n_days=30):
+    dates = [d.strftime('%Y-%m-%d') for d in pd.bdate_range(end=datetime.now().date(), periods=n_days)]
+    rows = []
+    for i in range(n_stocks):
+        code = f'{600000 + i}'
+        for d, date in enumerate(dates):
+            # 偶数股票持续下跌（满足低九），奇数股票震荡
+            close = 20.0 - d * 0.2 if i % 2 == 0 else 10.0 + (d % 3) * 0.1
+            rows.append([code, f'股票{i}', date, close, close, close * 1.01, close * 0.99, -1.0, 1e6, 1e7, 1.0])
+    stocks = [(f'{600000 + i}', f'股票{i}') for i in range(n_stocks)]
+    return stocks, rows, dates
+
+
+def _run(executor, panel, stocks, window_bars=LowNineStrategy.WINDOW_BARS):
+    _evaluated.clear()
+    return executor.run(_counting_low_nine, panel, stocks, '2000-01-01', '2099-12-31', window_bars=window_bars)
+
+
+def test_rerun_reuses_unchanged_stocks():
+    """数据未变化时重复执行不重新计算任何股票，结果与全量计算一致"""
+    stocks, rows, _ = _build_rows()
+    panel = PricePanel.from_rows(rows)
+    executor = ScreeningExecutor(max_workers=1, state=ScreeningState())
+    expected = LowNineStrategy.screen_low_nine_stocks(panel, stocks, '2000-01-01', '2099-12-31')
+
+    first = _run(executor, panel, stocks)
+    assert len(_evaluated) == 20
+    second = _run(executor, panel, stocks)
+    print(f"第二次执行重新计算 {len(_evaluated)} 只")
+    assert _evaluated == []
+    assert first == second == expected
+    assert len(expected) == 10
+
+
+def test_corrected_bar_only_recomputes_that_stock():
+    """修正窗口内的一根K线只重新计算该股票；修正窗口之外的K线不触发重新计算"""
+    stocks, rows, dates = _build_rows()
+    executor = ScreeningExecutor(max_workers=1, state=ScreeningState())
+    _run(executor, PricePanel.from_rows(rows), stocks)
+
+    # 修正 600000 最新一天的收盘价，使其不再满足低九
+    for row in rows:
+        if row[0] == '600000' and row[2] == dates[-1]:
+            row[4] = 100.0
+    # 修正 600002 在13个交易日之前的数据（不在低九依赖的窗口内）
+    for row in rows:
+        if row[0] == '600002' and row[2] == dates[0]:
+            row[4] = 1.0
+    panel = PricePanel.from_rows(rows)
+
+    results = _run(executor, panel, stocks)
+    assert _evaluated == ['600000']
+    assert '600000' not in [r['code'] for r in results]
+    assert results == LowNineStrategy.screen_low_nine_stocks(panel, stocks, '2000-01-01', '2099-12-31')
+
+    # 不限制窗口时，窗口外的修正同样触发重新计算
+    _run(executor, panel, stocks, window_bars=None)
+    _run(executor, PricePanel.from_rows([r for r in rows if not (r[0] == '600004' and r[2] == dates[0])]),
+         stocks, window_bars=None)
+    assert _evaluated == ['600004']
+
+
+def test_in_place_correction_reaches_shared_panel():
+    """收盘后原地修正最新交易日的K线：共享面板刷新后读到修正，只重新计算该股票"""
+    stocks, rows, dates = _build_rows()
+    db = sessionmaker(bind=create_engine('sqlite://'))()
+    db.execute(text(f"CREATE TABLE historical_quotes (code TEXT, name TEXT, date TEXT, {', '.join(f'{f} REAL' for f in PANEL_FIELDS)})"))
+    db.execute(text(f"INSERT INTO historical_quotes VALUES (:c, :n, :d, {', '.join(':' + f for f in PANEL_FIELDS)})"),
+               [dict(c=r[0], n=r[1], d=r[2], **dict(zip(PANEL_FIELDS, r[3:]))) for r in rows])
+    db.commit()
+    store = PricePanelStore('historical_quotes', lookback_days=100000, refresh_interval=0)
+    executor = ScreeningExecutor(max_workers=1, state=ScreeningState())
+    _run(executor, store.get(db), stocks)
+    assert len(_evaluated) == 20
+
+    db.execute(text("UPDATE historical_quotes SET close = 100.0 WHERE code = '600002' AND date = :date"),
+               {'date': dates[-1]})
+    db.commit()
+    panel = store.get(db)
+    assert panel.last_date == dates[-1]
+
+    results = _run(executor, panel, stocks)
+    assert _evaluated == ['600002']
+    assert '600002' not in [r['code'] for r in results]
+    assert results == LowNineStrategy.screen_low_nine_stocks(panel, stocks, '2000-01-01', '2099-12-31')
+
+
+def test_new_bar_recomputes_and_failed_stocks_are_not_cached():
+    """新增交易日的股票重新计算；执行失败的股票不写入状态"""
+    stocks, rows, dates = _build_rows(n_stocks=4)
+    state = ScreeningState()
+    calls = []
+
+    def runner(func, panel, changed, start_date, end_date, progress=None, **kwargs):
+        calls.append([code for code, _ in changed])
+        ok = [s for s in changed if s[0] != '600001']
+        return func(panel, ok, start_date, end_date), [s for s in changed if s[0] == '600001']
+
+    panel = PricePanel.from_rows(rows)
+    state.run(runner, LowNineStrategy.screen_low_nine_stocks, panel, stocks, None, None, window_bars=13)
+    state.run(runner, LowNineStrategy.screen_low_nine_stocks, panel, stocks, None, None, window_bars=13)
+    assert calls == [['600000', '600001', '600002', '600003'], ['600001']]
+
+    next_day = (pd.Timestamp(dates[-1]) + pd.offsets.BDay(1)).strftime('%Y-%m-%d')
+    rows.append(['600003', '股票3', next_day, 10.0, 10.0, 10.1, 9.9, 0.0, 1e6, 1e7, 1.0])
+    state.run(runner, LowNineStrategy.screen_low_nine_stocks, PricePanel.from_rows(rows), stocks, None, None,
+              window_bars=13)
+    assert calls[-1] == ['600001', '600003']
@@ -0,0 +1,217 @@
+"""
+选股策略回测测试
+验证回放信号与逐日直接执行选股函数的结果一致，以及远期收益的计算
+"""
+
+import math
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import stock.strategy_backtest as backtest_module
+from stock.price_panel import PricePanel
+from stock.screening_executor import ScreeningExecutor
+from stock.screening_registry import get_strategy
+from stock.strategy_backtest import check_backtest_request, forward_returns, replay_signals, run_backtest
+
+
+def _build_panel(n_stocks=24, n_days=160, seed=7):
+    rng = random.Random(seed)
+    dates = [d.strftime('%Y-%m-%d') for d in pd.bdate_range('2024-01-02', periods=n_days)]
+    rows = []
+    for i in range(n_stocks):
+        code = f'{600000 + i}'
+        close = 10.0 + i
+        for d, date in enumerate(dates):
+            # 个别股票停牌若干天
+            if i % 5 == 0 and 40 <= d < 44:
+                continue
+            # 不同股票交替出现下跌/上涨趋势，便于产生各策略信号
+            drift = -0.012 if (d // 25 + i) % 2 == 0 else 0.015
+            prev = close
+            close = max(1.0, close * (1 + drift + rng.uniform(-0.03, 0.03)))
+            open_ = prev * (1 + rng.uniform(-0.01, 0.01))
+            low = min(open_, close) * (1 - rng.uniform(0, 0.05))
+            high = max(open_, close) * (1 + rng.uniform(0, 0.01))
+            rows.append([code, f'股票{i}', date, open_, close, high, low,
+                         (close / prev - 1) * 100, 1e6, 1e7, 1.0])
+    stocks = [(f'{600000 + i}', f'股票{i}') for i in range(n_stocks)]
+
+    # 形态股票：周期性出现放量涨停后小幅高开上涨（停机坪）、连续涨停后急涨（高而窄的旗形）
+    for k, pattern in enumerate(['parking', 'flag']):
+        code = f'{601000 + k}'
+        close = 10.0
+        for d, date in enumerate(dates):
+            phase = d % 40
+            prev = close
+            open_ = prev * 1.005
+            volume = 1e6
+            if pattern == 'parking' and phase == 10:
+                close, volume = prev * 1.10, 5e6
+            elif pattern == 'parking' and 11 <= phase <= 13:
+                open_, close = prev * 1.01, prev * 1.02
+            elif pattern == 'flag' and phase in (5, 6):
+                close = prev * 1.10
+            elif pattern == 'flag' and 7 <= phase <= 25:
+                close = prev * 1.05
+            else:
+                close = prev * (1 + rng.uniform(-0.02, 0.015))
+            low = min(open_, close) * 0.995
+            high = max(open_, close) * 1.005
+            rows.append([code, f'形态{k}', date, open_, close, high, low,
+                         (close / prev - 1) * 100, volume, volume * close, 1.0])
+        stocks.append((code, f'形态{k}'))
+
+    # 创业板中线形态：首个涨停、回调不破底、跳空、揉搓线、突破涨停高点后持续上涨
+    close = 10.0
+    for d, date in enumerate(dates):
+        prev = close
+        limit = prev * 1.10 if d == 70 else None
+        if d < 70:
+            close = prev * (1 + rng.uniform(-0.01, 0.01))
+            open_, high, low = prev, max(prev, close) * 1.002, min(prev, close) * 0.998
+        elif d == 70:
+            close = limit_close = limit
+            open_, high, low = prev * 1.01, close * 1.005, prev
+        elif d == 71:
+            open_, close, high, low = limit_close * 0.99, limit_close * 0.97, limit_close * 0.995, limit_close * 0.96
+        elif d == 72:
+            open_, close, high, low = limit_close, limit_close * 1.002, limit_close * 1.004, limit_close * 0.998
+        elif d == 73:
+            open_, close, high, low = limit_close * 0.985, limit_close * 0.986, limit_close * 0.998, limit_close * 0.97
+        elif d == 74:
+            open_, close, high, low = limit_close * 0.99, limit_close * 1.03, limit_close * 1.035, limit_close * 0.985
+        else:
+            open_, close = prev * 1.002, prev * 1.01
+            high, low = close * 1.003, open_ * 0.997
+        rows.append(['300999', '形态cyb', date, open_, close, high, low,
+                     (close / prev - 1) * 100, 1e6, 1e7, 1.0])
+    stocks.append(('300999', '形态cyb'))
+    return PricePanel.from_rows(rows), stocks, dates
+
+
+def _shift(date_str, days):
+    return (datetime.strptime(date_str, '%Y-%m-%d') + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def _direct_signals(strategy, panel, stocks, as_of_dates, params=None):
+    spec = get_strategy(strategy)['backtest']
+    params = params or {}
+    lookback = spec['lookback_days']
+    lookback_days = lookback(params) if callable(lookback) else lookback
+    signals = []
+    for as_of in as_of_dates:
+        for item in spec['screen'](panel, stocks, _shift(as_of, -lookback_days), as_of, **params):
+            signals.append((as_of, item['code']))
+    return signals
+
+
+@pytest.mark.parametrize('strategy', ['low_nine', 'cyb_midline', 'long_lower_shadow', 'parking_apron', 'high_tight_flag'])
+@pytest.mark.parametrize('workers', [1, 2])
+def test_replay_matches_direct_screening(monkeypatch, strategy, workers):
+    """回放得到的信号与每个回放日直接执行选股函数的结果逐条一致"""
+    panel, stocks, dates = _build_panel()
+    executor = ScreeningExecutor(max_workers=workers, chunk_size=8)
+    monkeypatch.setattr(backtest_module, 'get_screening_executor', lambda: executor)
+    try:
+        report = run_backtest(None, strategy, dates[60], dates[120], panel=panel, stocks=stocks)
+    finally:
+        executor.shutdown()
+
+    as_of_dates = dates[60:121]
+    params = {k: v for k, v in get_strategy(strategy)['defaults'].items()
+              if k in get_strategy(strategy)['backtest']['screen_params']}
+    expected = _direct_signals(strategy, panel, stocks, as_of_dates, params)
+    actual = sorted((item['date'], item['code']) for item in report['signals'])
+    print(f"{strategy} 并行={workers}: 信号 {len(actual)} 个")
+    assert expected
+    assert actual == sorted(expected)
+    assert report['summary']['trade_days'] == len(as_of_dates)
+    assert report['summary']['signal_count'] == len(expected)
+    assert set(report['horizons'].keys()) == {'5', '10', '20'}
+
+
+def _failing_replay(panel, stocks, start_date, end_date, **kwargs):
+    """包含 600003 的分块执行失败"""
+    if any(code == '600003' for code, _ in stocks):
+        raise RuntimeError('分块执行失败')
+    return replay_signals(panel, stocks, start_date, end_date, **kwargs)
+
+
+@pytest.mark.parametrize('strategy', ['low_nine', 'cyb_midline', 'parking_apron', 'high_tight_flag', 'long_lower_shadow'])
+def test_vectorized_signals_match_replay(strategy):
+    """向量化信号与逐日回放逐只选股函数的信号一致"""
+    panel, stocks, dates = _build_panel()
+    vectorized = run_backtest(None, strategy, dates[60], dates[120], panel=panel, stocks=stocks)
+    replayed = run_backtest(None, strategy, dates[60], dates[120], panel=panel, stocks=stocks, vectorized=False)
+    assert vectorized['summary']['vectorized'] and not replayed['summary']['vectorized']
+    assert vectorized['signals']
+    assert sorted(vectorized['signals'], key=lambda item: (item['date'], item['code'])) == \
+        sorted(replayed['signals'], key=lambda item: (item['date'], item['code']))
+    assert vectorized['horizons'] == replayed['horizons']
+
+
+@pytest.mark.parametrize('strategy', ['backtrace_ma250', 'keep_increasing'])
+def test_vectorized_signals_match_replay_long_window(strategy):
+    """回看超过测试面板常规长度的策略：在足够长的面板上向量化信号与逐日回放一致"""
+    panel, stocks, dates = _build_panel(n_days=320)
+    vectorized = run_backtest(None, strategy, dates[260], dates[-1], panel=panel, stocks=stocks)
+    replayed = run_backtest(None, strategy, dates[260], dates[-1], panel=panel, stocks=stocks, vectorized=False)
+    assert vectorized['summary']['vectorized']
+    # 两个检查函数的均线只在最新一根K线上有值（更早的记为0），逐日回放同样不产生信号
+    assert vectorized['signals'] == replayed['signals'] == []
+
+
+def test_failed_chunks_reported_in_summary(monkeypatch):
+    """回测不设分块超时；执行失败的分块中的股票记入 summary，不参与基准收益"""
+    panel, stocks, dates = _build_panel()
+    executor = ScreeningExecutor(max_workers=2, chunk_size=8, chunk_timeout=0.001)
+    monkeypatch.setattr(backtest_module, 'get_screening_executor', lambda: executor)
+    monkeypatch.setattr(backtest_module, 'replay_signals', _failing_replay)
+    try:
+        report = run_backtest(None, 'parking_apron', dates[60], dates[120], panel=panel, stocks=stocks,
+                              vectorized=False)
+    finally:
+        executor.shutdown()
+    summary = report['summary']
+    # 第一个分块（8只股票，含600003）失败，其余分块即使超过 chunk_timeout 也正常完成
+    assert summary['failed_count'] == 8
+    assert '600003' in summary['failed_stocks']
+    assert summary['stock_count'] == len(stocks) - 8
+    assert summary['pool_count'] == len(stocks)
+    assert not any(item['code'] in summary['failed_stocks'] for item in report['signals'])
+    assert any(item['code'] == '601000' for item in report['signals'])
+
+
+def test_forward_returns_follow_each_stock_bars():
+    """远期收益按股票自身的后续K线计算，停牌日使用停牌前最后一根K线作为入场价"""
+    panel, stocks, dates = _build_panel(n_stocks=6, n_days=80)
+    entry, returns = forward_returns(panel, [5])
+
+    row = panel.code_index('600000')  # 第40~43个交易日停牌
+    history = panel.get_history('600000')[::-1]
+    closes = {item['date']: item['close'] for item in history}
+    bar_dates = [item['date'] for item in history]
+
+    col = dates.index(dates[41])
+    assert dates[41] not in closes
+    entry_pos = bar_dates.index(dates[39])
+    assert entry[row, col] == closes[dates[39]]
+    expected = (history[entry_pos + 5]['close'] / closes[dates[39]] - 1) * 100
+    assert math.isclose(returns[5][row, col], expected)
+
+    # 后续K线不足时为 NaN
+    assert math.isnan(returns[5][row, len(dates) - 3])
+
+
+def test_check_backtest_request():
+    """未知策略、日期倒置或区间过长时抛出 ValueError"""
+    assert check_backtest_request('low_nine', '2024-01-01', '2024-06-30')['lookback_days'] == 30
+    for args in [('unknown', '2024-01-01', '2024-02-01'),
+                 ('low_nine', '2024-03-01', '2024-02-01'),
+                 ('low_nine', '2020-01-01', '2024-02-01'),
+                 ('low_nine', '2024/01/01', '2024-02-01')]:
+        with pytest.raises(ValueError):
+            check_backtest_request(*args)
@@ -41,9 +41,51 @@ DATA_COLLECTORS = {
         'random_delay_range': (1, 3),  # 随机延迟范围（秒）
         'ssl_verify': False,  # SSL验证，设为False可解决SSL连接问题
         'use_fallback_sources': True,  # 是否使用备用数据源
+        'basic_info_cache_ttl': 6 * 3600,  # 股票基础信息（代码->名称）缓存有效期（秒），过期后重新读取数据库
+        'intraday_snapshot_keep_days': 30,  # 盘中行情快照保留天数（自然日），过期分区整体删除
+        'hedge_budget': 8,  # 实时行情主数据源超过该时间（秒）未返回时并发请求备用数据源（有足够样本后取主数据源95分位延迟，不超过该值）
+        'hedge_timeout': 120,  # 实时行情多数据源请求总超时（秒）
+        'hedge_min_rows': 1000,  # A股实时行情完整数据的最少行数，不足时视为不完整并请求备用数据源
+        'hedge_hk_min_rows': 1000,  # 港股实时行情完整数据的最少行数
     }
 }
 
+# 上游行情接口限速和连接池配置（见 backend_core/data_collectors/upstream.py）
+UPSTREAM_CONFIG = {
+    'enabled': True,          # 是否在采集进程中接管发往 akshare 上游主机的 requests 请求（经过限速和共享连接池）
+    'pool_connections': 16,   # 共享连接池缓存的主机数
+    'pool_maxsize': 16,       # 每个主机保持的长连接数
+    'timeout': 30,            # 未指定超时的上游请求的超时（秒）
+    # 主机后缀 -> 上游名称（同一上游的多个主机共用一个限速器）；只有这些主机的请求经过限速，
+    # 其他主机（Tushare、内部接口等）的请求不受影响
+    'hosts': {
+        'eastmoney.com': 'eastmoney',
+        'sina.com.cn': 'sina',
+        'sinajs.cn': 'sina',
+        '10jqka.com.cn': 'ths',
+        'gtimg.cn': 'tencent',
+        'cninfo.com.cn': 'cninfo',
+    },
+    # 默认限速参数
+    'default': {
+        'rate': 5.0,           # 初始速率（次/秒）
+        'burst': 10,           # 令牌桶容量（允许的突发请求数）
+        'min_rate': 0.5,       # 速率下限（次/秒）
+        'max_rate': 20.0,      # 速率上限（次/秒）
+        'concurrency': 4,      # 同时进行的请求数上限
+        'rate_step': 0.1,      # 每次正常请求增加的速率（次/秒）
+        'slow_latency': 3.0,   # 平均延迟超过该值（秒）时降速
+        'backoff_base': 2.0,   # 出错后暂停该上游的基础时间（秒），连续出错时翻倍
+        'backoff_max': 60.0,   # 暂停时间上限（秒）
+    },
+    # 各上游覆盖的限速参数
+    'upstreams': {
+        'eastmoney': {'rate': 10.0, 'burst': 30, 'max_rate': 40.0, 'concurrency': 6},  # 全市场行情分页请求较多
+        'sina': {'rate': 3.0, 'burst': 5, 'max_rate': 10.0, 'concurrency': 2},         # 新浪对频繁请求封禁较严
+        'ths': {'rate': 2.0, 'burst': 4, 'max_rate': 8.0, 'concurrency': 2},
+    },
+}
+
 # 创建必要的目录
 for dir_path in [
     ROOT_DIR / 'backend_core' / 'logs',
@@ -15,6 +15,7 @@ from pathlib import Path
 import json
 
 from backend_core.config.config import DATA_COLLECTORS
+from backend_core.data_collectors.upstream import install_upstream_client, retry_backoff
 
 T = TypeVar('T')
 
@@ -30,6 +31,8 @@ class AKShareCollector:
         """
         self.config = config or DATA_COLLECTORS.get('akshare', {})
         self._setup_logging()
+        # 上游请求限速和共享连接池（进程内只安装一次）
+        install_upstream_client()
         
     def _setup_logging(self):
         """设置日志"""
@@ -50,7 +53,7 @@ class AKShareCollector:
         
     def _retry_on_failure(self, func: Callable[..., T], *args, **kwargs) -> T:
         """
-        失败重试装饰器
+        失败重试装饰器（第 i 次失败后等待 retry_delay * 2^i 秒，带随机抖动）
         
         Args:
             func: 要执行的函数
@@ -74,7 +77,7 @@ class AKShareCollector:
                     self.logger.error(f"函数 {func.__name__} 执行失败: {str(e)}")
                     raise
                 self.logger.warning(f"第 {i+1} 次重试失败: {str(e)}")
-                time.sleep(retry_delay)
+                time.sleep(retry_backoff(i, retry_delay))
                 
         raise Exception("重试次数用尽")
     
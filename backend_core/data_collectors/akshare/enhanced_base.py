@@ -20,6 +20,8 @@ from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
 
 from backend_core.config.config import DATA_COLLECTORS
+from backend_core.data_collectors.upstream import install_upstream_client, retry_backoff
+from backend_core.data_collectors.hedged_fetch import SOURCE_LATENCY, hedged_fetch
 
 T = TypeVar('T')
 
@@ -38,6 +40,8 @@ class EnhancedAKShareCollector:
         self._setup_session()
         self._setup_proxy_pool()
         self._setup_user_agents()
+        # 上游请求限速和共享连接池（进程内只安装一次），请求节奏由限速器控制
+        install_upstream_client()
         
     def _setup_logging(self):
         """设置日志"""
@@ -123,14 +127,9 @@ class EnhancedAKShareCollector:
         self.current_ua_index = (self.current_ua_index + 1) % len(self.user_agents)
         return ua
         
-    def _random_delay(self):
-        """随机延迟"""
-        delay = random.uniform(1, 3)  # 1-3秒随机延迟
-        time.sleep(delay)
-        
     def _retry_on_failure(self, func: Callable[..., T], *args, **kwargs) -> T:
         """
-        增强的失败重试装饰器
+        增强的失败重试装饰器（第 i 次失败后等待 retry_delay * 2^i 秒，带随机抖动；SSL/连接错误基础等待时间加倍）
         
         Args:
             func: 要执行的函数
@@ -148,10 +147,6 @@ class EnhancedAKShareCollector:
         
         for i in range(max_retries):
             try:
-                # 随机延迟
-                if i > 0:
-                    self._random_delay()
-                    
                 # 设置User-Agent
                 if hasattr(self.session, 'headers'):
                     self.session.headers.update({'User-Agent': self._get_next_user_agent()})
@@ -172,10 +167,10 @@ class EnhancedAKShareCollector:
                 if any(keyword in error_str for keyword in ['ssl', 'connection', 'timeout', 'eof']):
                     self.logger.warning(f"第 {i+1} 次重试失败 (SSL/连接错误): {str(e)}")
                     # SSL错误时使用更长的延迟
-                    time.sleep(retry_delay * 2)
+                    time.sleep(retry_backoff(i, retry_delay * 2))
                 else:
                     self.logger.warning(f"第 {i+1} 次重试失败: {str(e)}")
-                    time.sleep(retry_delay)
+                    time.sleep(retry_backoff(i, retry_delay))
                     
         raise Exception("重试次数用尽")
     
@@ -224,43 +219,42 @@ class EnhancedAKShareCollector:
     
     def get_realtime_quotes_with_fallback(self) -> pd.DataFrame:
         """
-        获取实时行情数据，支持多种数据源的回退机制
+        获取实时行情数据，对冲请求多个数据源：全市场接口超过延迟预算未返回或失败时，
+        并发请求沪/深/北分市场接口（合并为一张表），取最先返回的完整数据
         
         Returns:
             DataFrame: 实时行情数据
         """
-        # 定义多个数据源，按优先级排序
-        data_sources = [
-            ('stock_zh_a_spot_em', ak.stock_zh_a_spot_em, []),
-            ('stock_sh_a_spot_em', ak.stock_sh_a_spot_em, []),
-            ('stock_sz_a_spot_em', ak.stock_sz_a_spot_em, []),
-            ('stock_bj_a_spot_em', ak.stock_bj_a_spot_em, []),
-        ]
+        source_name, df = hedged_fetch(
+            [('stock_zh_a_spot_em', ak.stock_zh_a_spot_em),
+             ('stock_sh_sz_bj_a_spot_em', self._fetch_quotes_by_exchange)],
+            budget=self.config.get('hedge_budget', 8), min_rows=self.config.get('hedge_min_rows', 1000),
+            timeout=self.config.get('hedge_timeout'), log=self.logger, retry=self._retry_on_failure
+        )
+        self.logger.info(f"成功从 {source_name} 获取 {len(df)} 条数据，数据源延迟统计: {SOURCE_LATENCY.stats()}")
+        return df
+
+    def _fetch_quotes_by_exchange(self) -> pd.DataFrame:
+        """
+        分别获取沪、深、北交所行情并合并（单个交易所失败时跳过，合并结果由调用方判断是否完整）
         
+        每个交易所只请求一次：作为对冲数据源时由 hedged_fetch 计时并整体重试（都失败时）
+        """
         dfs = []
-        successful_sources = []
-        
-        for source_name, source_func, source_args in data_sources:
+        for source_name, source_func in (('stock_sh_a_spot_em', ak.stock_sh_a_spot_em),
+                                         ('stock_sz_a_spot_em', ak.stock_sz_a_spot_em),
+                                         ('stock_bj_a_spot_em', ak.stock_bj_a_spot_em)):
             try:
-                self.logger.info(f"尝试使用数据源: {source_name}")
-                df = self._retry_on_failure(source_func, *source_args)
-                if df is not None and hasattr(df, 'empty') and not df.empty:
+                df = source_func()
+                if df is not None and not df.empty:
                     dfs.append(df)
-                    successful_sources.append(source_name)
-                    self.logger.info(f"成功从 {source_name} 获取 {len(df)} 条数据")
                 else:
                     self.logger.warning(f"数据源 {source_name} 返回空数据")
             except Exception as e:
                 self.logger.warning(f"数据源 {source_name} 失败: {str(e)}")
-                continue
-                
-        if dfs:
-            # 合并所有成功的数据源
-            combined_df = pd.concat(dfs, ignore_index=True)
-            self.logger.info(f"成功从 {len(successful_sources)} 个数据源获取数据，总计 {len(combined_df)} 条记录")
-            return combined_df
-        else:
-            raise Exception("所有数据源都失败了")
+        if not dfs:
+            raise Exception("沪深北分市场数据源都失败了")
+        return pd.concat(dfs, ignore_index=True)
     
     def get_historical_quotes(
         self,
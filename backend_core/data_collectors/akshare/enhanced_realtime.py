@@ -12,7 +12,11 @@ from datetime import datetime
 
 # 直接导入增强的base模块
 from .enhanced_base import EnhancedAKShareCollector
+from .realtime import build_quote_frame, write_quotes
 from backend_core.database.db import SessionLocal
+from backend_core.data_collectors.basic_info_cache import BasicInfoCache
+from backend_core.data_collectors.bulk_upsert import ensure_row_hash_column, run_with_lock_retry
+from backend_core.data_collectors.intraday_snapshots import ensure_snapshot_partitions
 from sqlalchemy import text
 
 class EnhancedRealtimeQuoteCollector(EnhancedAKShareCollector):
@@ -27,6 +31,8 @@ class EnhancedRealtimeQuoteCollector(EnhancedAKShareCollector):
         """
         super().__init__(config)
         self.db_file = Path(self.config.get('db_file', 'database/stock_analysis.db'))
+        # 基础信息缓存（只写入新增或改名的股票）
+        self.basic_info_cache = BasicInfoCache('stock_basic_info', ttl=self.config.get('basic_info_cache_ttl'))
         
     def _init_db(self) -> bool:
         """
@@ -86,18 +92,6 @@ class EnhancedRealtimeQuoteCollector(EnhancedAKShareCollector):
         session.close()
         return True
     
-    def _safe_value(self, val: Any) -> Optional[float]:
-        """
-        安全地转换数值
-        
-        Args:
-            val: 输入值
-            
-        Returns:
-            Optional[float]: 转换后的浮点数，如果转换失败则返回None
-        """
-        return None if pd.isna(val) else float(val)
-    
     def collect_quotes(self) -> bool:
         """
         采集实时行情数据，使用增强的回退机制
@@ -121,111 +115,15 @@ class EnhancedRealtimeQuoteCollector(EnhancedAKShareCollector):
                 
             self.logger.info("采集到 %d 条股票行情数据", len(df))
 
-            for _, row in df.iterrows():
-                code = row['代码']
-                name = row['名称']
-                # 获取当前交易日期
-                trade_date = datetime.now().strftime('%Y-%m-%d')
-                data = {
-                    'code': code,
-                    'name': name,
-                    'trade_date': trade_date,
-                    'current_price': self._safe_value(row['最新价']),
-                    'change_percent': self._safe_value(row['涨跌幅']),
-                    'volume': self._safe_value(row['成交量']),
-                    'amount': self._safe_value(row['成交额']),
-                    'high': self._safe_value(row['最高']),
-                    'low': self._safe_value(row['最低']),
-                    'open': self._safe_value(row['今开']),
-                    'pre_close': self._safe_value(row['昨收']),
-                    'turnover_rate': self._safe_value(row['换手率']),
-                    'pe_dynamic': self._safe_value(row['市盈率-动态']),
-                    'total_market_value': self._safe_value(row['总市值']),
-                    'pb_ratio': self._safe_value(row['市净率']),
-                    'circulating_market_value': self._safe_value(row['流通市值']),
-                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-
-                # --- 重试机制插入 stock_basic_info ---
-                max_retries = 3
-                retry_count = 0
-                while retry_count < max_retries:
-                    try:
-                        session.execute(text('''
-                            INSERT INTO stock_basic_info (code, name, create_date)
-                            VALUES (:code, :name, :create_date)
-                            ON CONFLICT (code) DO UPDATE SET
-                                name = EXCLUDED.name,
-                                create_date = EXCLUDED.create_date
-                        '''), {'code': code, 'name': name, 'create_date': data['update_time']})
-                        break
-                    except Exception as e:
-                        if ("LockNotAvailable" in str(e)) or ("DeadlockDetected" in str(e)):
-                            retry_count += 1
-                            session.rollback()
-                            self.logger.warning(f"stock_basic_info插入锁冲突，第{retry_count}次重试: {e}")
-                            import time
-                            time.sleep(0.2 * retry_count)
-                            continue
-                        else:
-                            session.rollback()
-                            raise
-                if retry_count >= max_retries:
-                    self.logger.error(f"stock_basic_info插入锁冲突重试{max_retries}次仍失败: code={code}, name={name}")
-                    continue
-
-                # --- 重试机制插入 stock_realtime_quote ---
-                retry_count = 0
-                while retry_count < max_retries:
-                    try:
-                        session.execute(    
-                            text('''
-                                INSERT INTO stock_realtime_quote
-                                (code, trade_date, name, current_price, change_percent, volume, amount,
-                                high, low, open, pre_close, turnover_rate, pe_dynamic,
-                                total_market_value, pb_ratio, circulating_market_value,
-                                update_time)
-                                VALUES (
-                                    :code, :trade_date, :name, :current_price, :change_percent, :volume, :amount,
-                                    :high, :low, :open, :pre_close, :turnover_rate, :pe_dynamic,
-                                    :total_market_value, :pb_ratio, :circulating_market_value,
-                                    :update_time
-                                )
-                                ON CONFLICT (code, trade_date) DO UPDATE SET
-                                    name = EXCLUDED.name,
-                                    current_price = EXCLUDED.current_price,
-                                    change_percent = EXCLUDED.change_percent,
-                                    volume = EXCLUDED.volume,
-                                    amount = EXCLUDED.amount,
-                                    high = EXCLUDED.high,
-                                    low = EXCLUDED.low,
-                                    open = EXCLUDED.open,
-                                    pre_close = EXCLUDED.pre_close,
-                                    turnover_rate = EXCLUDED.turnover_rate,
-                                    pe_dynamic = EXCLUDED.pe_dynamic,
-                                    total_market_value = EXCLUDED.total_market_value,
-                                    pb_ratio = EXCLUDED.pb_ratio,
-                                    circulating_market_value = EXCLUDED.circulating_market_value,
-                                    update_time = EXCLUDED.update_time
-                            '''), 
-                            {'code': code, 'trade_date': data['trade_date'], 'name': name, 'current_price': data['current_price'], 'change_percent': data['change_percent'], 'volume': data['volume'], 'amount': data['amount'], 'high': data['high'], 'low': data['low'], 'open': data['open'], 'pre_close': data['pre_close'], 'turnover_rate': data['turnover_rate'], 'pe_dynamic': data['pe_dynamic'], 'total_market_value': data['total_market_value'], 'pb_ratio': data['pb_ratio'], 'circulating_market_value': data['circulating_market_value'], 'update_time': data['update_time']})
-                        break
-                    except Exception as e:
-                        if ("LockNotAvailable" in str(e)) or ("DeadlockDetected" in str(e)):
-                            retry_count += 1
-                            session.rollback()
-                            self.logger.warning(f"stock_realtime_quote插入锁冲突，第{retry_count}次重试: {e}")
-                            import time
-                            time.sleep(0.2 * retry_count)
-                            continue
-                        else:
-                            session.rollback()
-                            raise
-                if retry_count >= max_retries:
-                    self.logger.error(f"stock_realtime_quote插入锁冲突重试{max_retries}次仍失败: code={code}, name={name}")
-                    continue
-
-                affected_rows += 1
+            quotes = build_quote_frame(df)
+            ensure_row_hash_column(session, 'stock_realtime_quote')
+            ensure_snapshot_partitions(session, quotes)
+            basic_rows = self.basic_info_cache.changed(session, quotes)
+            affected_rows = run_with_lock_retry(
+                session, lambda: write_quotes(session, quotes, self.basic_info_cache, basic_rows),
+                label='实时行情批量写入', log=self.logger
+            )
+            self.basic_info_cache.remember(basic_rows)
 
             # 记录操作日志
             session.execute(text('''
@@ -234,7 +132,7 @@ class EnhancedRealtimeQuoteCollector(EnhancedAKShareCollector):
                 VALUES (:operation_type, :operation_desc, :affected_rows, :status, :error_message, :created_at)
             '''), {
                 'operation_type': 'enhanced_realtime_quote_collect',
-                'operation_desc': f'增强采集并更新{len(df)}条股票实时行情数据',
+                'operation_desc': f'增强采集{len(df)}条股票实时行情数据，其中{affected_rows}条有变化并写入',
                 'affected_rows': affected_rows,
                 'status': 'success',
                 'error_message': None,
@@ -246,6 +144,8 @@ class EnhancedRealtimeQuoteCollector(EnhancedAKShareCollector):
             return True
         except Exception as e:
             error_msg = str(e)
+            # 写入失败时基础信息缓存可能与数据库不一致，下次重新读取
+            self.basic_info_cache.clear()
             self.logger.error("采集或入库时出错: %s", error_msg, exc_info=True)
             # 记录错误日志
             try:
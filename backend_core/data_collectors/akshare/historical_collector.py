@@ -21,6 +21,9 @@ sys.path.insert(0, str(project_root))
 import akshare as ak
 import pandas as pd
 from backend_core.database.db import SessionLocal
+from backend_core.data_collectors.tushare.td_setup_counter import TDSetupCounter
+from backend_core.data_collectors.indicator_state import rebuild_indicator_state
+from backend_core.data_collectors.analysis_cache import invalidate_analysis_cache, invalidate_analysis_snapshots
 from sqlalchemy import text
 
 # 配置日志
@@ -283,11 +286,13 @@ class AkshareHistoricalCollector:
             
             # 批量采集
             success_count = 0
+            collected_codes = []
             for i, stock in enumerate(stocks, 1):
                 logger.info(f"进度: {i}/{len(stocks)} - 采集股票 {stock['code']} ({stock['name']})")
                 
                 if self.collect_single_stock_data(stock['code'], start_date, end_date):
                     success_count += 1
+                    collected_codes.append(stock['code'])
                 
                 # 每处理10只股票输出一次进度
                 if i % 10 == 0:
@@ -295,6 +300,14 @@ class AkshareHistoricalCollector:
             
             # 记录采集日志
             self._log_collection_result(start_date, end_date, len(stocks), success_count)
+
+            if collected_codes:
+                # 回补的K线早于九转序列计数和技术指标状态的状态日期，重新计算这些股票的计数和指标状态，
+                # 并删除这些股票基于旧K线的分析缓存和快照
+                TDSetupCounter(self.session).rebuild(datetime.now().strftime('%Y-%m-%d'), collected_codes)
+                rebuild_indicator_state(self.session, datetime.now().strftime('%Y-%m-%d'), 'A', collected_codes)
+                invalidate_analysis_cache(self.session, 'A', collected_codes)
+                invalidate_analysis_snapshots(self.session, 'A', collected_codes)
             
             result = {
                 'total': len(stocks),
@@ -13,6 +13,8 @@ from datetime import datetime, timedelta
 # 直接导入base模块
 from .base import AKShareCollector
 from backend_core.database.db import SessionLocal
+from backend_core.data_collectors.analysis_cache import invalidate_analysis_cache, invalidate_analysis_snapshots
+from backend_core.data_collectors.indicator_state import advance_indicator_state
 from sqlalchemy import text
 
 class HKHistoricalQuoteCollector(AKShareCollector):
@@ -216,6 +218,14 @@ class HKHistoricalQuoteCollector(AKShareCollector):
 
             session.commit()
             self.logger.info(f"{target_date} 共有 {affected} 条港股实时数据同步到了历史行情表")
+            if affected > 0:
+                invalidate_analysis_cache(session, 'HK')
+                invalidate_analysis_snapshots(session, 'HK')
+                try:
+                    state_result = advance_indicator_state(session, target_date, 'HK')
+                    self.logger.info(f"港股技术指标状态推进完成: 股票 {state_result['total']}, K线 {state_result['bars']}")
+                except Exception as e:
+                    self.logger.error(f"推进港股技术指标状态失败: {e}")
             
             # 操作日志记录
             try:
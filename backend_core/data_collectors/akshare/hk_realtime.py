@@ -13,6 +13,13 @@ from datetime import datetime
 # 直接导入base模块
 from .base import AKShareCollector
 from backend_core.database.db import SessionLocal
+from backend_core.data_collectors.bulk_upsert import (
+    ROW_HASH_COLUMN, drop_stage, ensure_row_hash_column, row_hashes, run_with_lock_retry, stage_frame, upsert_from_stage,
+)
+from backend_core.data_collectors.basic_info_cache import BasicInfoCache
+from backend_core.data_collectors.frame_mapping import Field, FrameMapping
+from backend_core.data_collectors.intraday_snapshots import append_snapshots, ensure_snapshot_partitions
+from backend_core.data_collectors.hedged_fetch import SOURCE_LATENCY, hedged_fetch
 from sqlalchemy import text
 
 class HKRealtimeQuoteCollector(AKShareCollector):
@@ -27,6 +34,8 @@ class HKRealtimeQuoteCollector(AKShareCollector):
         """
         super().__init__(config)
         self.db_file = Path(self.config.get('db_file', 'database/stock_analysis.db'))
+        # 基础信息缓存（只写入新增或改名的股票）
+        self.basic_info_cache = BasicInfoCache('stock_basic_info_hk', ttl=self.config.get('basic_info_cache_ttl'))
         
     def _init_db(self) -> bool:
         """
@@ -99,18 +108,73 @@ class HKRealtimeQuoteCollector(AKShareCollector):
         finally:
             session.close()
     
-    def _safe_value(self, val: Any) -> Optional[float]:
+    # 港股行情列映射（东方财富/新浪接口字段名不同，逐行取第一个非空值）
+    QUOTE_MAPPING = FrameMapping([
+        Field('code', ('代码', '股票代码', 'symbol', 'code'), kind='text'),
+        Field('name', ('中文名称', '名称', 'name', '股票名称'), kind='text'),
+        Field('english_name', ('英文名称', '英文名', 'engname', 'english_name'), kind='text'),
+        Field('current_price', ('最新价', '现价', 'lasttrade')),
+        Field('change_percent', ('涨跌幅', '涨跌%', 'changepercent')),
+        Field('change_amount', ('涨跌额', '涨跌', 'pricechange')),
+        Field('volume', ('成交量', 'volume')),
+        Field('amount', ('成交额', 'amount')),
+        Field('high', ('最高', 'high')),
+        Field('low', ('最低', 'low')),
+        Field('open', ('今开', '开盘', 'open')),
+        Field('pre_close', ('昨收', '昨收价', 'prevclose')),
+    ])
+
+    # 参与变化比较的列（不含代码、日期和更新时间）
+    HASH_COLUMNS = QUOTE_MAPPING.targets[1:]
+
+    # 暂存表结构
+    STAGE_COLUMNS = {
+        'code': 'TEXT',
+        'trade_date': 'TEXT',
+        'name': 'TEXT',
+        'english_name': 'TEXT',
+        **{column: 'DOUBLE PRECISION' for column in HASH_COLUMNS[2:]},
+        'update_time': 'TIMESTAMP',
+        ROW_HASH_COLUMN: 'BIGINT',
+    }
+
+    def _build_quote_frame(self, df: pd.DataFrame) -> pd.DataFrame:
         """
-        安全地转换数值
-        
-        Args:
-            val: 输入值
-            
+        按列整理港股实时行情数据
+
         Returns:
-            Optional[float]: 转换后的浮点数，如果转换失败则返回None
+            pd.DataFrame: 列与 STAGE_COLUMNS 一致；缺少代码或名称的行已去除，同一代码保留最后一条，
+                row_hash 为名称和行情数值的内容哈希
         """
-        return None if pd.isna(val) else float(val)
-    
+        now = datetime.now()
+        frame = self.QUOTE_MAPPING.apply(df, trade_date=now.strftime('%Y-%m-%d'),
+                                         update_time=now.strftime('%Y-%m-%d %H:%M:%S'))
+        frame = frame[frame['code'].notna() & frame['name'].notna()]
+        frame = frame.drop_duplicates(subset=['code'], keep='last').reset_index(drop=True)
+        frame[ROW_HASH_COLUMN] = row_hashes(frame, self.HASH_COLUMNS)
+        return frame[list(self.STAGE_COLUMNS)]
+
+    def _write_quotes(self, session, quotes: pd.DataFrame, basic_rows: pd.DataFrame) -> int:
+        """
+        港股实时行情整表写入（不提交）：只写入新增或改名的 stock_basic_info_hk 行，行情载入暂存表后一次写入
+        stock_realtime_quote_hk，行情内容与已保存行相同（row_hash 相同）的股票不更新；
+        有行情变化时把整张行情表追加到盘中快照
+
+        Returns:
+            int: 实际写入（新增或内容变化）的行情行数
+        """
+        # 先写基础信息，保证行情表外键存在
+        self.basic_info_cache.write(session, basic_rows, create_date=datetime.now().replace(microsecond=0))
+        stage = 'stage_realtime_quote_hk'
+        changed = 0
+        if stage_frame(session, stage, quotes, self.STAGE_COLUMNS):
+            changed = upsert_from_stage(session, stage, 'stock_realtime_quote_hk', columns=list(self.STAGE_COLUMNS),
+                                        key_columns=['code', 'trade_date'], changed_only=True)
+        drop_stage(session, stage)
+        if changed:
+            append_snapshots(session, quotes)
+        return changed
+
     def collect_quotes(self) -> bool:
         """
         采集港股实时行情数据
@@ -121,28 +185,20 @@ class HKRealtimeQuoteCollector(AKShareCollector):
             self._init_db()  # 确保表结构存在
             affected_rows = 0 
             session = SessionLocal()
-            # 优先使用 stock_hk_spot_em（东方财富接口），因为它返回的数据更全
-            # 如果失败，再尝试 stock_hk_spot（新浪财经接口）
-            df = None
-            source_name = None
-            
-            # 先尝试调用 stock_hk_spot_em（东方财富接口，数据更全）
+            # 优先使用 stock_hk_spot_em（东方财富接口，数据更全），超过延迟预算未返回或失败时
+            # 并发请求 stock_hk_spot（新浪财经接口），取最先返回的完整数据
             try:
-                df = self._retry_on_failure(ak.stock_hk_spot_em)
-                source_name = "stock_hk_spot_em"
-                self.logger.info("成功使用 stock_hk_spot_em 接口获取港股实时行情数据")
-            except Exception as e1:
-                self.logger.warning(f"调用 stock_hk_spot_em 失败，尝试使用 stock_hk_spot，错误详情: {e1}")
-                # 如果 stock_hk_spot_em 失败，则尝试调用新浪财经接口
-                try:
-                    df = self._retry_on_failure(ak.stock_hk_spot)
-                    source_name = "stock_hk_spot"
-                    self.logger.info("成功使用 stock_hk_spot 接口获取港股实时行情数据")
-                except Exception as e2:
-                    self.logger.error(f"调用 stock_hk_spot 也失败: {e2}")
-                    if 'session' in locals():
-                        session.close()
-                    return False
+                source_name, df = hedged_fetch(
+                    [('stock_hk_spot_em', ak.stock_hk_spot_em), ('stock_hk_spot', ak.stock_hk_spot)],
+                    budget=self.config.get('hedge_budget', 8), min_rows=self.config.get('hedge_hk_min_rows', 1000),
+                    timeout=self.config.get('hedge_timeout'), log=self.logger, retry=self._retry_on_failure
+                )
+                self.logger.info(f"成功使用 {source_name} 接口获取港股实时行情数据，数据源延迟统计: {SOURCE_LATENCY.stats()}")
+            except Exception as e:
+                self.logger.error(f"港股实时行情接口都未能返回数据: {e}")
+                if 'session' in locals():
+                    session.close()
+                return False
             
             if df is None or (hasattr(df, 'empty') and df.empty):
                 self.logger.error("akshare港股实时行情数据为空或无法获取")
@@ -166,165 +222,16 @@ class HKRealtimeQuoteCollector(AKShareCollector):
                                f"中文名称: {first_row.get('中文名称', first_row.get('名称', 'N/A'))}, "
                                f"最新价: {first_row.get('最新价', 'N/A')}")
             
-            for idx, row in df.iterrows():
-                try:
-                    # 港股代码格式：5位数字，如 "00700"
-                    # 兼容不同的字段名，使用更安全的方式访问（使用row.get()方法）
-                    code = None
-                    # 尝试多种可能的字段名
-                    for field_name in ['代码', '股票代码', 'symbol', 'code']:
-                        if field_name in df.columns:
-                            val = row.get(field_name)
-                            if val is not None and pd.notna(val):
-                                code = str(val).strip()
-                                if code:
-                                    break
-                    
-                    if not code:
-                        self.logger.warning(f"无法获取股票代码，跳过该行。可用字段: {list(df.columns)}, 行数据: {row.to_dict() if hasattr(row, 'to_dict') else str(row)}")
-                        continue
-                    
-                    # 兼容不同的名称字段：中文名称、名称
-                    name = None
-                    # 尝试多种可能的字段名
-                    for field_name in ['中文名称', '名称', 'name', '股票名称']:
-                        if field_name in df.columns:
-                            val = row.get(field_name)
-                            if val is not None and pd.notna(val):
-                                name = str(val).strip()
-                                if name:
-                                    break
-                    
-                    if not name:
-                        self.logger.warning(f"股票 {code} 无法获取名称，跳过")
-                        continue
-                    
-                    # 获取当前交易日期
-                    trade_date = datetime.now().strftime('%Y-%m-%d')
-                    
-                    # 处理英文名称，兼容不同的字段名
-                    english_name = None
-                    for field_name in ['英文名称', '英文名', 'engname', 'english_name']:
-                        if field_name in df.columns:
-                            val = row.get(field_name)
-                            if val is not None and pd.notna(val):
-                                english_name = str(val).strip()
-                                if english_name:
-                                    break
-                    
-                    # 安全地获取数值字段
-                    def safe_get_value(*keys):
-                        """安全地获取Series中的值"""
-                        for key in keys:
-                            if key and key in df.columns:
-                                val = row.get(key)
-                                if val is not None and pd.notna(val):
-                                    return val
-                        return None
-                    
-                    data = {
-                        'code': code,
-                        'name': name,
-                        'trade_date': trade_date,
-                        'english_name': english_name,
-                        'current_price': self._safe_value(safe_get_value('最新价', '现价', 'lasttrade')),
-                        'change_percent': self._safe_value(safe_get_value('涨跌幅', '涨跌%', 'changepercent')),
-                        'change_amount': self._safe_value(safe_get_value('涨跌额', '涨跌', 'pricechange')),
-                        'volume': self._safe_value(safe_get_value('成交量', 'volume')),
-                        'amount': self._safe_value(safe_get_value('成交额', 'amount')),
-                        'high': self._safe_value(safe_get_value('最高', 'high')),
-                        'low': self._safe_value(safe_get_value('最低', 'low')),
-                        'open': self._safe_value(safe_get_value('今开', '开盘', 'open')),
-                        'pre_close': self._safe_value(safe_get_value('昨收', '昨收价', 'prevclose')),
-                        'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    }
-
-                    # --- 重试机制插入 stock_basic_info_hk ---
-                    max_retries = 3
-                    retry_count = 0
-                    while retry_count < max_retries:
-                        try:
-                            session.execute(text('''
-                                INSERT INTO stock_basic_info_hk (code, name, create_date)
-                                VALUES (:code, :name, :create_date)
-                                ON CONFLICT (code) DO UPDATE SET
-                                    name = EXCLUDED.name,
-                                    create_date = EXCLUDED.create_date
-                            '''), {'code': code, 'name': name, 'create_date': data['update_time']})
-                            break
-                        except Exception as e:
-                            if ("LockNotAvailable" in str(e)) or ("DeadlockDetected" in str(e)):
-                                retry_count += 1
-                                session.rollback()
-                                self.logger.warning(f"stock_basic_info_hk插入锁冲突，第{retry_count}次重试: {e}")
-                                import time
-                                time.sleep(0.2 * retry_count)
-                                continue
-                            else:
-                                session.rollback()
-                                raise
-                    if retry_count >= max_retries:
-                        self.logger.error(f"stock_basic_info_hk插入锁冲突重试{max_retries}次仍失败: code={code}, name={name}")
-                        continue
-
-                    # --- 重试机制插入 stock_realtime_quote_hk ---
-                    retry_count = 0
-                    while retry_count < max_retries:
-                        try:
-                            session.execute(    
-                                text('''
-                                    INSERT INTO stock_realtime_quote_hk
-                                    (code, trade_date, name, english_name, current_price, change_percent, volume, amount,
-                                    change_amount, high, low, open, pre_close, update_time)
-                                    VALUES (
-                                        :code, :trade_date, :name, :english_name, :current_price, :change_percent, :volume, :amount,
-                                        :change_amount, :high, :low, :open, :pre_close, :update_time)
-                                    ON CONFLICT (code, trade_date) DO UPDATE SET
-                                        name = EXCLUDED.name,
-                                        english_name = EXCLUDED.english_name,
-                                        current_price = EXCLUDED.current_price,
-                                        change_percent = EXCLUDED.change_percent,
-                                        volume = EXCLUDED.volume,
-                                        amount = EXCLUDED.amount,
-                                        change_amount = EXCLUDED.change_amount,
-                                        high = EXCLUDED.high,
-                                        low = EXCLUDED.low,
-                                        open = EXCLUDED.open,
-                                        pre_close = EXCLUDED.pre_close,
-                                        update_time = EXCLUDED.update_time
-                                '''), 
-                                {'code': code, 'trade_date': data['trade_date'], 'name': name, 
-                                 'english_name': data['english_name'], 'current_price': data['current_price'], 'change_percent': data['change_percent'], 
-                                 'volume': data['volume'], 'amount': data['amount'], 
-                                 'change_amount': data['change_amount'], 'high': data['high'], 'low': data['low'], 
-                                 'open': data['open'], 'pre_close': data['pre_close'], 
-                                 'update_time': data['update_time']})
-                            break
-                        except Exception as e:
-                            if ("LockNotAvailable" in str(e)) or ("DeadlockDetected" in str(e)):
-                                retry_count += 1
-                                session.rollback()
-                                self.logger.warning(f"stock_realtime_quote_hk插入锁冲突，第{retry_count}次重试: {e}")
-                                import time
-                                time.sleep(0.2 * retry_count)
-                                continue
-                            else:
-                                session.rollback()
-                                raise
-                    if retry_count >= max_retries:
-                        self.logger.error(f"stock_realtime_quote_hk插入锁冲突重试{max_retries}次仍失败: code={code}, name={name}")
-                        continue
-
-                    affected_rows += 1
-                    
-                    # 每处理100条记录打印一次进度
-                    if affected_rows % 100 == 0:
-                        self.logger.info(f"已处理 {affected_rows} 条港股数据")
-                        
-                except Exception as row_e:
-                    self.logger.error(f"处理第 {idx+1} 条港股数据失败: {row_e}")
-                    self.logger.debug(f"失败的数据行: {row.to_dict() if hasattr(row, 'to_dict') else str(row)}")
-                    continue
+            quotes = self._build_quote_frame(df)
+            skipped = data_count - len(quotes)
+            if skipped:
+                self.logger.warning(f"{skipped} 条港股数据缺少代码或名称（或代码重复），已跳过")
+            ensure_row_hash_column(session, 'stock_realtime_quote_hk')
+            ensure_snapshot_partitions(session, quotes)
+            basic_rows = self.basic_info_cache.changed(session, quotes)
+            affected_rows = run_with_lock_retry(session, lambda: self._write_quotes(session, quotes, basic_rows),
+                                                label='港股实时行情批量写入', log=self.logger)
+            self.basic_info_cache.remember(basic_rows)
 
             # 记录操作日志
             session.execute(text('''
@@ -333,7 +240,7 @@ class HKRealtimeQuoteCollector(AKShareCollector):
                 VALUES (:operation_type, :operation_desc, :affected_rows, :status, :error_message, :collect_source, :created_at)
             '''), {
                 'operation_type': 'hk_realtime_quote_collect',
-                'operation_desc': f'采集并更新{len(df)}条港股实时行情数据',
+                'operation_desc': f'采集{len(df)}条港股实时行情数据，其中{affected_rows}条有变化并写入',
                 'affected_rows': affected_rows,
                 'status': 'success',
                 'error_message': None,
@@ -346,6 +253,8 @@ class HKRealtimeQuoteCollector(AKShareCollector):
             return True
         except Exception as e:
             error_msg = str(e)
+            # 写入失败时基础信息缓存可能与数据库不一致，下次重新读取
+            self.basic_info_cache.clear()
             self.logger.error("采集或入库时出错: %s", error_msg, exc_info=True)
             # 记录错误日志
             try:
@@ -13,8 +13,99 @@ from datetime import datetime
 # 直接导入base模块
 from backend_core.data_collectors.akshare.base import AKShareCollector
 from backend_core.database.db import SessionLocal
+from backend_core.data_collectors.bulk_upsert import (
+    ROW_HASH_COLUMN, drop_stage, ensure_row_hash_column, row_hashes, run_with_lock_retry, stage_frame, upsert_from_stage,
+)
+from backend_core.data_collectors.basic_info_cache import BasicInfoCache
+from backend_core.data_collectors.frame_mapping import Field, FrameMapping
+from backend_core.data_collectors.hedged_fetch import SOURCE_LATENCY, hedged_fetch
+from backend_core.data_collectors.intraday_snapshots import append_snapshots, ensure_snapshot_partitions
 from sqlalchemy import text
 
+# 沪深京A股实时行情列映射（新浪数据源无换手率等字段，市盈率列名为'市盈率'）
+QUOTE_MAPPING = FrameMapping([
+    Field('code', '代码', kind='text'),
+    Field('name', '名称', kind='text'),
+    Field('current_price', '最新价'),
+    Field('change_percent', '涨跌幅'),
+    Field('volume', '成交量'),
+    Field('amount', '成交额'),
+    Field('high', '最高'),
+    Field('low', '最低'),
+    Field('open', '今开'),
+    Field('pre_close', '昨收'),
+    Field('turnover_rate', '换手率'),
+    Field('pe_dynamic', ('市盈率-动态', '市盈率')),
+    Field('total_market_value', '总市值'),
+    Field('pb_ratio', '市净率'),
+    Field('circulating_market_value', '流通市值'),
+])
+
+# 参与变化比较的列（不含代码、日期和更新时间）
+HASH_COLUMNS = QUOTE_MAPPING.targets[1:]
+
+# 暂存表结构
+STAGE_COLUMNS = {
+    'code': 'TEXT',
+    'trade_date': 'TEXT',
+    'name': 'TEXT',
+    **{column: 'DOUBLE PRECISION' for column in HASH_COLUMNS[1:]},
+    'update_time': 'TIMESTAMP',
+    ROW_HASH_COLUMN: 'BIGINT',
+}
+
+
+def build_quote_frame(df: pd.DataFrame, data_source: str = 'em') -> pd.DataFrame:
+    """
+    按列整理实时行情数据
+
+    Args:
+        df: akshare 行情表
+        data_source: 数据源，'sina' 时去掉代码前2位市场前缀
+
+    Returns:
+        pd.DataFrame: 列与 STAGE_COLUMNS 一致，去除无代码的行，同一代码保留最后一条，
+            row_hash 为名称和行情数值的内容哈希
+    """
+    now = datetime.now()
+    frame = QUOTE_MAPPING.apply(df, trade_date=now.strftime('%Y-%m-%d'), update_time=now.strftime('%Y-%m-%d %H:%M:%S'))
+    if data_source == 'sina':
+        # 新浪数据源代码带市场前缀（如 sh600000），过滤掉前2位字母
+        codes = frame['code']
+        frame['code'] = codes.where(codes.isna() | (codes.str.len() <= 2), codes.str[2:])
+    frame = frame[frame['code'].notna()].drop_duplicates(subset=['code'], keep='last').reset_index(drop=True)
+    frame[ROW_HASH_COLUMN] = row_hashes(frame, HASH_COLUMNS)
+    return frame[list(STAGE_COLUMNS)]
+
+
+def write_quotes(session, quotes: pd.DataFrame, basic_info: BasicInfoCache, basic_rows: pd.DataFrame) -> int:
+    """
+    实时行情整表写入（不提交）：只写入新增或改名的 stock_basic_info 行，行情载入暂存表后一次写入
+    stock_realtime_quote，行情内容与已保存行相同（row_hash 相同）的股票不更新；
+    有行情变化时把整张行情表追加到盘中快照（全部未变化时为休市，不追加）
+
+    Args:
+        session: 数据库会话
+        quotes: build_quote_frame 整理后的行情
+        basic_info: 基础信息缓存
+        basic_rows: 需要写入的基础信息行（basic_info.changed 的结果）
+
+    Returns:
+        int: 实际写入（新增或内容变化）的行情行数
+    """
+    # 先写基础信息，保证行情表外键存在
+    basic_info.write(session, basic_rows, create_date=datetime.now().replace(microsecond=0))
+    stage = 'stage_realtime_quote'
+    changed = 0
+    if stage_frame(session, stage, quotes, STAGE_COLUMNS):
+        changed = upsert_from_stage(session, stage, 'stock_realtime_quote', columns=list(STAGE_COLUMNS),
+                                    key_columns=['code', 'trade_date'], changed_only=True)
+    drop_stage(session, stage)
+    if changed:
+        append_snapshots(session, quotes)
+    return changed
+
+
 class AkshareRealtimeQuoteCollector(AKShareCollector):
     """沪深京A股实时行情数据采集器"""
     
@@ -27,6 +118,8 @@ class AkshareRealtimeQuoteCollector(AKShareCollector):
         """
         super().__init__(config)
         self.db_file = Path(self.config.get('db_file', 'database/stock_analysis.db'))
+        # 基础信息缓存（只写入新增或改名的股票）
+        self.basic_info_cache = BasicInfoCache('stock_basic_info', ttl=self.config.get('basic_info_cache_ttl'))
         
     def _init_db(self) -> bool:
         """
@@ -99,18 +192,6 @@ class AkshareRealtimeQuoteCollector(AKShareCollector):
         session.close()
         return True
     
-    def _safe_value(self, val: Any) -> Optional[float]:
-        """
-        安全地转换数值
-        
-        Args:
-            val: 输入值
-            
-        Returns:
-            Optional[float]: 转换后的浮点数，如果转换失败则返回None
-        """
-        return None if pd.isna(val) else float(val)
-    
     def collect_quotes(self) -> bool:
         """
         采集实时行情数据
@@ -120,139 +201,32 @@ class AkshareRealtimeQuoteCollector(AKShareCollector):
         try:
             affected_rows = 0 
             session = SessionLocal()
+            # 东方财富为主数据源，超过延迟预算未返回或失败时并发请求新浪，取最先返回的完整数据
             try:
-                df = self._retry_on_failure(ak.stock_zh_a_spot_em)
+                data_source, df = hedged_fetch(
+                    [('em', ak.stock_zh_a_spot_em), ('sina', ak.stock_zh_a_spot)],
+                    budget=self.config.get('hedge_budget', 8), min_rows=self.config.get('hedge_min_rows', 1000),
+                    timeout=self.config.get('hedge_timeout'), log=self.logger, retry=self._retry_on_failure
+                )
+                self.logger.info(f"数据源延迟统计: {SOURCE_LATENCY.stats()}")
             except Exception as e:
-                self.logger.warning(f"东方财富数据接口（stock_zh_a_spot_em）调用失败: {e}，将尝试切换至新浪接口")
-                try:
-                    # 直接尝试新浪行情数据源
-                    data_source = "sina"
-                    df_sina = self._retry_on_failure(ak.stock_zh_a_spot)
-                    if df_sina is not None and hasattr(df_sina, 'empty') and not df_sina.empty:
-                        df = df_sina
-                        self.logger.info(f"新浪行情接口采集到 {len(df)} 条股票数据")
-                    else:
-                        self.logger.error("新浪数据源（stock_zh_a_spot）采集数据为空")
-                        df = None
-                except Exception as e4:
-                    self.logger.error(f"调用新浪数据源（stock_zh_a_spot）失败: {e4}")
-                    df = None
+                self.logger.error(f"东方财富和新浪行情接口都未能返回数据: {e}")
+                df = None
 
             if df is None or (hasattr(df, 'empty') and df.empty):
                 self.logger.error("akshare主数据源采集到的实时行情数据为空")
                 return False
             self.logger.info("采集到 %d 条股票行情数据", len(df))
 
-            for _, row in df.iterrows():
-                code = row['代码']
-                if 'data_source' in locals() and data_source == "sina":
-                    # 如果新浪数据源，则过滤掉code前2位字母
-                    code = code[2:] if isinstance(code, str) and len(code) > 2 else code
-                name = row['名称']
-                # 获取当前交易日期
-                trade_date = datetime.now().strftime('%Y-%m-%d')
-                data = {
-                    'code': code,
-                    'name': name,
-                    'trade_date': trade_date,
-                    'current_price': self._safe_value(row['最新价']),
-                    'change_percent': self._safe_value(row['涨跌幅']),
-                    'volume': self._safe_value(row['成交量']),
-                    'amount': self._safe_value(row['成交额']),
-                    'high': self._safe_value(row['最高']),
-                    'low': self._safe_value(row['最低']),
-                    'open': self._safe_value(row['今开']),
-                    'pre_close': self._safe_value(row['昨收']),
-                    # 如果是新浪数据源，不采集换手率字段
-                    'turnover_rate': self._safe_value(row['换手率']) if '换手率' in row else None,
-                    # akshare主数据源和新浪数据源市盈率字段兼容处理（新浪无'市盈率-动态'，只有'市盈率'）
-                    'pe_dynamic': self._safe_value(row['市盈率-动态']) if '市盈率-动态' in row else self._safe_value(row['市盈率']) if '市盈率' in row else None,
-                    'total_market_value': self._safe_value(row['总市值']) if '总市值' in row else None,
-                    'pb_ratio': self._safe_value(row['市净率']) if '市净率' in row else None,
-                    'circulating_market_value': self._safe_value(row['流通市值']) if '流通市值' in row else None,
-                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-
-                # --- 重试机制插入 stock_basic_info ---
-                max_retries = 3
-                retry_count = 0
-                while retry_count < max_retries:
-                    try:
-                        session.execute(text('''
-                            INSERT INTO stock_basic_info (code, name, create_date)
-                            VALUES (:code, :name, :create_date)
-                            ON CONFLICT (code) DO UPDATE SET
-                                name = EXCLUDED.name,
-                                create_date = EXCLUDED.create_date
-                        '''), {'code': code, 'name': name, 'create_date': data['update_time']})
-                        break
-                    except Exception as e:
-                        if ("LockNotAvailable" in str(e)) or ("DeadlockDetected" in str(e)):
-                            retry_count += 1
-                            session.rollback()
-                            self.logger.warning(f"stock_basic_info插入锁冲突，第{retry_count}次重试: {e}")
-                            import time
-                            time.sleep(0.2 * retry_count)
-                            continue
-                        else:
-                            session.rollback()
-                            raise
-                if retry_count >= max_retries:
-                    self.logger.error(f"stock_basic_info插入锁冲突重试{max_retries}次仍失败: code={code}, name={name}")
-                    continue
-
-                # --- 重试机制插入 stock_realtime_quote ---
-                retry_count = 0
-                while retry_count < max_retries:
-                    try:
-                        session.execute(    
-                            text('''
-                                INSERT INTO stock_realtime_quote
-                                (code, trade_date, name, current_price, change_percent, volume, amount,
-                                high, low, open, pre_close, turnover_rate, pe_dynamic,
-                                total_market_value, pb_ratio, circulating_market_value,
-                                update_time)
-                                VALUES (
-                                    :code, :trade_date, :name, :current_price, :change_percent, :volume, :amount,
-                                    :high, :low, :open, :pre_close, :turnover_rate, :pe_dynamic,
-                                    :total_market_value, :pb_ratio, :circulating_market_value,
-                                    :update_time
-                                )
-                                ON CONFLICT (code, trade_date) DO UPDATE SET
-                                    name = EXCLUDED.name,
-                                    current_price = EXCLUDED.current_price,
-                                    change_percent = EXCLUDED.change_percent,
-                                    volume = EXCLUDED.volume,
-                                    amount = EXCLUDED.amount,
-                                    high = EXCLUDED.high,
-                                    low = EXCLUDED.low,
-                                    open = EXCLUDED.open,
-                                    pre_close = EXCLUDED.pre_close,
-                                    turnover_rate = EXCLUDED.turnover_rate,
-                                    pe_dynamic = EXCLUDED.pe_dynamic,
-                                    total_market_value = EXCLUDED.total_market_value,
-                                    pb_ratio = EXCLUDED.pb_ratio,
-                                    circulating_market_value = EXCLUDED.circulating_market_value,
-                                    update_time = EXCLUDED.update_time
-                            '''), 
-                            {'code': code, 'trade_date': data['trade_date'], 'name': name, 'current_price': data['current_price'], 'change_percent': data['change_percent'], 'volume': data['volume'], 'amount': data['amount'], 'high': data['high'], 'low': data['low'], 'open': data['open'], 'pre_close': data['pre_close'], 'turnover_rate': data['turnover_rate'], 'pe_dynamic': data['pe_dynamic'], 'total_market_value': data['total_market_value'], 'pb_ratio': data['pb_ratio'], 'circulating_market_value': data['circulating_market_value'], 'update_time': data['update_time']})
-                        break
-                    except Exception as e:
-                        if ("LockNotAvailable" in str(e)) or ("DeadlockDetected" in str(e)):
-                            retry_count += 1
-                            session.rollback()
-                            self.logger.warning(f"stock_realtime_quote插入锁冲突，第{retry_count}次重试: {e}")
-                            import time
-                            time.sleep(0.2 * retry_count)
-                            continue
-                        else:
-                            session.rollback()
-                            raise
-                if retry_count >= max_retries:
-                    self.logger.error(f"stock_realtime_quote插入锁冲突重试{max_retries}次仍失败: code={code}, name={name}")
-                    continue
-
-                affected_rows += 1
+            quotes = build_quote_frame(df, data_source)
+            ensure_row_hash_column(session, 'stock_realtime_quote')
+            ensure_snapshot_partitions(session, quotes)
+            basic_rows = self.basic_info_cache.changed(session, quotes)
+            affected_rows = run_with_lock_retry(
+                session, lambda: write_quotes(session, quotes, self.basic_info_cache, basic_rows),
+                label='实时行情批量写入', log=self.logger
+            )
+            self.basic_info_cache.remember(basic_rows)
 
             # 记录操作日志
             session.execute(text('''
@@ -261,7 +235,7 @@ class AkshareRealtimeQuoteCollector(AKShareCollector):
                 VALUES (:operation_type, :operation_desc, :affected_rows, :status, :error_message, :collect_source, :created_at)
             '''), {
                 'operation_type': 'realtime_quote_collect',
-                'operation_desc': f'采集并更新{len(df)}条股票实时行情数据',
+                'operation_desc': f'采集{len(df)}条股票实时行情数据，其中{affected_rows}条有变化并写入',
                 'affected_rows': affected_rows,
                 'status': 'success',
                 'error_message': None,
@@ -274,6 +248,8 @@ class AkshareRealtimeQuoteCollector(AKShareCollector):
             return True
         except Exception as e:
             error_msg = str(e)
+            # 写入失败时基础信息缓存可能与数据库不一致，下次重新读取
+            self.basic_info_cache.clear()
             self.logger.error("采集或入库时出错: %s", error_msg, exc_info=True)
             # 记录错误日志
             try:
@@ -5,7 +5,11 @@ import logging
 from pathlib import Path
 from backend_core.config.config import DATA_COLLECTORS
 from backend_core.database.db import SessionLocal
-from sqlalchemy import text
+from backend_core.data_collectors.bulk_upsert import (
+    ROW_HASH_COLUMN, changed_rows, ensure_row_hash_column, row_hashes, run_with_lock_retry,
+)
+from backend_core.data_collectors.frame_mapping import Field, FrameMapping, to_records
+from sqlalchemy import bindparam, text
 
 class RealtimeIndexSpotAkCollector:
     def __init__(self, db_path=None):
@@ -57,6 +61,56 @@ class RealtimeIndexSpotAkCollector:
         session.commit()
         return session
 
+    # 指数行情列映射（新浪数据源无振幅、量比，振幅由最高/最低/昨收计算，量比默认为1）
+    QUOTE_MAPPING = FrameMapping([
+        Field('code', '代码', kind='text'),
+        Field('name', '名称', kind='text'),
+        Field('price', '最新价'),
+        Field('change', '涨跌额'),
+        Field('pct_chg', '涨跌幅'),
+        Field('open', '今开'),
+        Field('pre_close', '昨收'),
+        Field('high', '最高'),
+        Field('low', '最低'),
+        Field('volume', '成交量'),
+        Field('amount', '成交额'),
+        Field('amplitude', '振幅'),
+        Field('volume_ratio', '量比', default=1.0),
+        Field('index_spot_type', kind='int'),
+    ])
+
+    def _build_quote_frame(self, df):
+        """
+        按列整理指数行情，row_hash 为名称、行情数值和指数类型的内容哈希
+        """
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        frame = self.QUOTE_MAPPING.apply(df, update_time=now, collect_time=now)
+        # 如果数据来源为新浪，振幅需要系统计算
+        frame['amplitude'] = frame['amplitude'].fillna((frame['high'] - frame['low']) / frame['pre_close'] * 100)
+        frame[ROW_HASH_COLUMN] = row_hashes(frame, self.QUOTE_MAPPING.targets[1:])
+        return frame
+
+    def _write_quotes(self, session, quotes):
+        """
+        指数行情写入（不提交）：表中每个指数只保留一行，只替换新增或内容变化的指数，
+        删除本次未采集到的指数（与原先整表清空后重写的结果一致），内容未变化的行不改写
+
+        Returns:
+            int: 实际写入的行数
+        """
+        changed, removed = changed_rows(session, 'index_realtime_quotes', quotes, 'code')
+        stale = list(changed['code']) + removed
+        if stale:
+            session.execute(text('DELETE FROM index_realtime_quotes WHERE code IN :codes')
+                            .bindparams(bindparam('codes', expanding=True)), {'codes': stale})
+        if not changed.empty:
+            columns = list(quotes.columns)
+            session.execute(text(f"""
+                INSERT INTO index_realtime_quotes ({', '.join(columns)})
+                VALUES ({', '.join(':' + column for column in columns)})
+            """), to_records(changed, columns))
+        return len(changed)
+
     def collect_quotes(self):
         session = None
         try:
@@ -112,49 +166,10 @@ class RealtimeIndexSpotAkCollector:
             if df is None or df.empty:
                 raise ValueError("未能获取有效的指数数据")
                 
-            df['collect_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            df['update_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            affected_rows = 0
-            # 清空表
-            session.execute(text('DELETE FROM index_realtime_quotes'))
-            for _, row in df.iterrows():
-                session.execute(text('''
-                    INSERT INTO index_realtime_quotes (
-                        code, name, price, change, pct_chg, open, pre_close, high, low, volume, amount, amplitude, volume_ratio, update_time, collect_time, index_spot_type
-                    ) VALUES (
-                        :code, :name, :price, :change, :pct_chg, :open, :pre_close, :high, :low, :volume, :amount, :amplitude, :volume_ratio, :update_time, :collect_time, :index_spot_type
-                    )
-                    ON CONFLICT (code, update_time, index_spot_type) DO UPDATE SET
-                        name = EXCLUDED.name,
-                        price = EXCLUDED.price,
-                        change = EXCLUDED.change,
-                        pct_chg = EXCLUDED.pct_chg,
-                        open = EXCLUDED.open,
-                        pre_close = EXCLUDED.pre_close, 
-                        high = EXCLUDED.high,
-                        low = EXCLUDED.low,
-                        volume = EXCLUDED.volume,
-                        amount = EXCLUDED.amount,
-                        amplitude = EXCLUDED.amplitude,
-                        volume_ratio = EXCLUDED.volume_ratio,   
-                        update_time = EXCLUDED.update_time,
-                        collect_time = EXCLUDED.collect_time,
-                        index_spot_type = EXCLUDED.index_spot_type
-                '''), 
-                {'code': row['代码'], 'name': row['名称'], 'price': row['最新价'], 'change': row['涨跌额'], 'pct_chg': row['涨跌幅'], 'open': row['今开'], 'pre_close': row['昨收'],
-                    'high': row['最高'],
-                    'low': row['最低'],
-                    'volume': row['成交量'],
-                    'amount': row['成交额'],
-                    # 如果数据来源为新浪，振幅需要系统计算
-                    'amplitude': (row['最高'] - row['最低']) / row['昨收'] * 100 if '振幅' not in row or pd.isnull(row['振幅']) else row['振幅'],
-                    # 对于新浪数据，量比需要系统自行计算（假设为1，或用合适的算法替代）
-                    'volume_ratio': row['量比'] if '量比' in row and not pd.isnull(row['量比']) else 1,  # 如果量比不存在，则设置为1
-                    'update_time': row['update_time'],
-                    'collect_time': row['collect_time'],
-                    'index_spot_type': row['index_spot_type']
-                })
-                affected_rows += 1
+            quotes = self._build_quote_frame(df)
+            ensure_row_hash_column(session, 'index_realtime_quotes')
+            affected_rows = run_with_lock_retry(session, lambda: self._write_quotes(session, quotes),
+                                                label='指数实时行情写入', log=self.logger)
             # 记录操作日志
             # 安全获取df的长度，防止df为None
             df_len = len(df) if df is not None and not df.empty else 0
@@ -167,7 +182,7 @@ class RealtimeIndexSpotAkCollector:
             '''), 
             {
                 'operation_type': 'index_realtime_quote_collect',
-                'operation_desc': f'采集并更新{df_len}条指数实时行情数据',
+                'operation_desc': f'采集{df_len}条指数实时行情数据，其中{affected_rows}条有变化并写入',
                 'affected_rows': affected_rows,
                 'status': 'success',
                 'error_message': None,
@@ -6,13 +6,37 @@ import sys
 import os
 from backend_core.config.config import DATA_COLLECTORS
 from backend_core.database.db import SessionLocal
-from sqlalchemy import text
+from backend_core.data_collectors.bulk_upsert import (
+    ROW_HASH_COLUMN, changed_rows, ensure_row_hash_column, row_hashes, run_with_lock_retry,
+)
+from backend_core.data_collectors.frame_mapping import Field, FrameMapping, to_records
+from sqlalchemy import bindparam, text
 
 class RealtimeStockIndustryBoardCollector:
+    # 行业板块行情列映射（同花顺数据源的字段在 fetch_data 中已改名为东方财富字段名）
+    QUOTE_MAPPING = FrameMapping([
+        Field('board_code', '板块代码', kind='text'),
+        Field('board_name', '板块名称', kind='text'),
+        Field('latest_price', '最新价'),
+        Field('change_amount', '涨跌额'),
+        Field('change_percent', '涨跌幅'),
+        Field('total_market_value', '总市值'),
+        Field('volume', '成交量'),
+        Field('amount', '成交额'),
+        Field('turnover_rate', '换手率'),
+        Field('up_count', '上涨家数', kind='int'),
+        Field('down_count', '下跌家数', kind='int'),
+        Field('leading_stock_name', '领涨股', kind='text'),
+        Field('leading_stock_change_percent', '领涨股涨跌幅'),
+        Field('leading_stock_code', '领涨股代码', kind='text'),
+    ])
+
     def __init__(self):
         self.db_file = DATA_COLLECTORS['akshare']['db_file']
         self.table_name = 'industry_board_realtime_quotes'
         self.log_table = 'realtime_collect_operation_logs'
+        # 最近一次写入的行数（新增或内容变化的板块数）
+        self.last_affected_rows = 0
         self._init_db()
 
     def _init_db(self):
@@ -125,80 +149,32 @@ class RealtimeStockIndustryBoardCollector:
     def save_to_db(self, df):
         session = SessionLocal()
         try:
-            # 字段映射：中文->英文
-            col_map = {
-                "板块代码": "board_code",
-                "板块名称": "board_name",
-                "最新价": "latest_price",
-                "涨跌额": "change_amount",
-                "涨跌幅": "change_percent",
-                "总市值": "total_market_value",
-                "成交量": "volume",
-                "成交额": "amount",
-                "换手率": "turnover_rate",
-                "上涨家数": "up_count",
-                "下跌家数": "down_count",
-                "领涨股": "leading_stock_name",
-                "领涨股涨跌幅": "leading_stock_change_percent",
-                "领涨股代码": "leading_stock_code"
-            }
-            # 只保留映射字段
             now = datetime.now().replace(microsecond=0)
-            keep_cols = [k for k in col_map.keys() if k in df.columns]
-            df = df[keep_cols].rename(columns=col_map)
-            df['update_time'] = now
-            
-            # 更新行业板块基本信息表
-            # 使用 executemany 优化性能? 或者简单的循环
-            # 这里为了简单和处理冲突，使用循环
-            basic_info_count = 0
-            for _, row in df.iterrows():
-                # 确保 board_code 存在且不为空
-                if pd.isna(row.get('board_code')) or row.get('board_code') == '':
-                    print(f"Skipping row with empty board_code: {row.get('board_name')}")
-                    continue
-                
-                try:
-                    session.execute(text('''
-                        INSERT INTO industry_board_basic_info (board_code, board_name, create_date)
-                        VALUES (:board_code, :board_name, :create_date)
-                        ON CONFLICT (board_code) DO UPDATE SET
-                            board_name = EXCLUDED.board_name,
-                            create_date = EXCLUDED.create_date
-                    '''), {
-                        'board_code': row['board_code'],
-                        'board_name': row['board_name'],
-                        'create_date': now
-                    })
-                    basic_info_count += 1
-                except Exception as e:
-                    print(f"Error inserting basic info for {row.get('board_code')}: {e}")
-            
-            print(f"Inserted/updated {basic_info_count} records in industry_board_basic_info")
+            quotes = self.QUOTE_MAPPING.apply(df)
+            # 确保 board_code 存在且不为空（board_code 为主键，缺失的行无法写入）
+            skipped = quotes['board_code'].isna()
+            if skipped.any():
+                print(f"Skipping {int(skipped.sum())} rows with empty board_code: {list(quotes.loc[skipped, 'board_name'])}")
+            quotes = quotes[~skipped].drop_duplicates(subset=['board_code'], keep='last').reset_index(drop=True)
+
+            # 更新行业板块基本信息表（一次批量写入）
+            if not quotes.empty:
+                session.execute(text('''
+                    INSERT INTO industry_board_basic_info (board_code, board_name, create_date)
+                    VALUES (:board_code, :board_name, :create_date)
+                    ON CONFLICT (board_code) DO UPDATE SET
+                        board_name = EXCLUDED.board_name,
+                        create_date = EXCLUDED.create_date
+                '''), to_records(quotes.assign(create_date=now), ['board_code', 'board_name', 'create_date']))
+            print(f"Inserted/updated {len(quotes)} records in industry_board_basic_info")
             session.commit()  # Commit basic info changes
-            
-            columns = list(df.columns)
-            # 清空旧数据（可选，或用upsert）
-            session.execute(text(f"DELETE FROM {self.table_name}"))
-            # 插入新数据（upsert）
-            for _, row in df.iterrows():
-                value_dict = {}
-                for col in columns:
-                    v = row[col]
-                    if hasattr(v, 'item'):
-                        v = v.item()
-                    if str(type(v)).endswith("Timestamp'>"):
-                        v = v.to_pydatetime().isoformat()
-                    if col == 'update_time' and not isinstance(v, str):
-                        v = v.isoformat()
-                    value_dict[col] = v
-                placeholders = ','.join([f':{col}' for col in columns])
-                col_names = ','.join([f'"{col}"' for col in columns])
-                # 构造upsert SQL
-                update_set = ','.join([f'"{col}"=EXCLUDED."{col}"' for col in columns if col not in ('board_code','update_time')])
-                sql = f'INSERT INTO {self.table_name} ({col_names}) VALUES ({placeholders}) ON CONFLICT (board_code, update_time) DO UPDATE SET {update_set}'
-                session.execute(text(sql), value_dict)
-            session.commit()
+
+            # 只写新增或内容变化的板块
+            quotes['update_time'] = now.isoformat()
+            quotes[ROW_HASH_COLUMN] = row_hashes(quotes, self.QUOTE_MAPPING.targets[1:])
+            ensure_row_hash_column(session, self.table_name)
+            self.last_affected_rows = run_with_lock_retry(session, lambda: self._write_quotes(session, quotes),
+                                                          label='行业板块实时行情写入')
             return True, None
         except Exception as e:
             session.rollback()
@@ -206,6 +182,27 @@ class RealtimeStockIndustryBoardCollector:
         finally:
             session.close()
 
+    def _write_quotes(self, session, quotes):
+        """
+        行业板块行情写入（不提交）：表中每个板块只保留一行，只替换新增或内容变化的板块，
+        删除本次未采集到的板块（与原先整表清空后重写的结果一致），内容未变化的行不改写
+
+        Returns:
+            int: 实际写入的行数
+        """
+        changed, removed = changed_rows(session, self.table_name, quotes, 'board_code')
+        stale = list(changed['board_code']) + removed
+        if stale:
+            session.execute(text(f"DELETE FROM {self.table_name} WHERE board_code IN :codes")
+                            .bindparams(bindparam('codes', expanding=True)), {'codes': stale})
+        if not changed.empty:
+            columns = list(quotes.columns)
+            col_names = ','.join([f'"{col}"' for col in columns])
+            placeholders = ','.join([f':{col}' for col in columns])
+            session.execute(text(f'INSERT INTO {self.table_name} ({col_names}) VALUES ({placeholders})'),
+                            to_records(changed, columns))
+        return len(changed)
+
     def write_log(self, operation_type, operation_desc, affected_rows, status, error_message=None):
         session = SessionLocal()
         try:
@@ -228,8 +225,8 @@ class RealtimeStockIndustryBoardCollector:
                 print("[采集] 数据写入成功")
                 self.write_log(
                     operation_type="industry_board_realtime",
-                    operation_desc="采集行业板块实时行情",
-                    affected_rows=len(df),
+                    operation_desc=f"采集行业板块实时行情{len(df)}条，其中{self.last_affected_rows}条有变化并写入",
+                    affected_rows=self.last_affected_rows,
                     status="success",
                     error_message=None
                 )
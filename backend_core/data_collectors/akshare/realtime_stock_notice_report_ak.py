@@ -14,8 +14,19 @@ import time
 # 直接导入base模块
 from .base import AKShareCollector
 from backend_core.database.db import SessionLocal
+from backend_core.data_collectors.frame_mapping import Field, FrameMapping, to_records
 from sqlalchemy import text
 
+# 公告数据列映射
+NOTICE_MAPPING = FrameMapping([
+    Field('code', '代码', kind='text'),
+    Field('name', '名称', kind='text', default=''),
+    Field('notice_title', '公告标题', kind='text'),
+    Field('notice_type', '公告类型', kind='text'),
+    Field('publish_date', '公告日期', kind='text'),
+    Field('url', '网址', kind='text', default=''),
+])
+
 def convert_dates(obj):
     if isinstance(obj, dict):
         return {k: convert_dates(v) for k, v in obj.items()}
@@ -145,42 +156,26 @@ class AkshareStockNoticeReportCollector(AKShareCollector):
             
             self.logger.info(f"采集到 {len(df)} 条A股公告数据")
             
-            # 批量处理数据
-            affected_rows = 0
-            for _, row in df.iterrows():
-                try:
-                    # 准备数据
-                    data = {
-                        'code': str(row['代码']).strip(),
-                        'name': str(row['名称']).strip(),
-                        'notice_title': str(row['公告标题']).strip(),
-                        'notice_type': str(row['公告类型']).strip(),
-                        'publish_date': str(row['公告日期']).strip(),
-                        'url': str(row['网址']).strip() if pd.notna(row['网址']) else '',
-                        'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                    
-                    # 插入或更新数据（PostgreSQL UPSERT）
-                    data = convert_dates(data)
-                    session.execute(
-                        text('''
-                            INSERT INTO stock_notice_report
-                            (code, name, notice_title, notice_type, publish_date, url, updated_at)
-                            VALUES (:code, :name, :notice_title, :notice_type, :publish_date, :url, :updated_at)
-                            ON CONFLICT (code, notice_title, publish_date)
-                            DO UPDATE SET
-                                name = EXCLUDED.name,
-                                notice_type = EXCLUDED.notice_type,
-                                url = EXCLUDED.url,
-                                updated_at = EXCLUDED.updated_at
-                        '''),
-                        data
-                    )
-                    affected_rows += 1
-                    
-                except Exception as e:
-                    self.logger.warning(f"处理单条公告数据时出错: {str(e)}, 数据: {row.to_dict()}")
-                    raise
+            # 按列整理后一次批量写入（缺少代码或标题的公告无法写入唯一约束列，跳过）
+            notices = NOTICE_MAPPING.apply(df, updated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            notices = notices[notices['code'].notna() & notices['notice_title'].notna()]
+            notices = notices.drop_duplicates(subset=['code', 'notice_title', 'publish_date'], keep='last')
+            if not notices.empty:
+                session.execute(
+                    text('''
+                        INSERT INTO stock_notice_report
+                        (code, name, notice_title, notice_type, publish_date, url, updated_at)
+                        VALUES (:code, :name, :notice_title, :notice_type, :publish_date, :url, :updated_at)
+                        ON CONFLICT (code, notice_title, publish_date)
+                        DO UPDATE SET
+                            name = EXCLUDED.name,
+                            notice_type = EXCLUDED.notice_type,
+                            url = EXCLUDED.url,
+                            updated_at = EXCLUDED.updated_at
+                    '''),
+                    to_records(notices)
+                )
+            affected_rows = len(notices)
             
             # 记录操作日志
             log_data = {
@@ -5,6 +5,9 @@ import akshare as ak
 from sqlalchemy.orm import Session
 from sqlalchemy import exists, text
 from backend_core.database.db import get_db
+from backend_core.data_collectors.tushare.td_setup_counter import TDSetupCounter
+from backend_core.data_collectors.indicator_state import rebuild_indicator_state
+from backend_core.data_collectors.analysis_cache import invalidate_analysis_cache, invalidate_analysis_snapshots
 
 # 假设有自选股表 watchlist，字段 code
 from backend_core.models.watchlist import Watchlist  # 需根据实际路径调整
@@ -326,6 +329,10 @@ def collect_watchlist_history():
                 
                 affected_rows = insert_historical_quotes_hk(db, stock_code, df)
                 log_collection(db, stock_code, affected_rows, 'success')
+                # 整段历史行情已重写，重新计算该股票的技术指标状态，并删除基于旧K线的分析缓存和快照
+                rebuild_indicator_state(db, datetime.now().strftime('%Y-%m-%d'), 'HK', [stock_code])
+                invalidate_analysis_cache(db, 'HK', [stock_code])
+                invalidate_analysis_snapshots(db, 'HK', [stock_code])
                 success_count += 1
             else:
                 # A股处理逻辑
@@ -380,6 +387,11 @@ def collect_watchlist_history():
                 db.commit()
                 affected_rows = insert_historical_quotes(db, stock_code, df)
                 log_collection(db, stock_code, affected_rows, 'success')
+                # 整段历史行情已重写，重新计算该股票的九转序列计数和技术指标状态，并删除基于旧K线的分析缓存和快照
+                TDSetupCounter(db).rebuild(datetime.now().strftime('%Y-%m-%d'), [stock_code])
+                rebuild_indicator_state(db, datetime.now().strftime('%Y-%m-%d'), 'A', [stock_code])
+                invalidate_analysis_cache(db, 'A', [stock_code])
+                invalidate_analysis_snapshots(db, 'A', [stock_code])
                 success_count += 1
         except Exception as e:
             db.rollback()
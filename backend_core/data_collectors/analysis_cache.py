@@ -0,0 +1,92 @@
+"""
+智能分析缓存失效
+backend_api 按 (股票代码, 最新K线日期, 价格档位) 缓存分析结果，并保存在 stock_analysis_cache 表中
+（见 backend_api/stock/analysis_cache.py）。历史行情采集写入新K线后调用 invalidate_analysis_cache
+删除对应市场的缓存行；表尚未创建或删除失败时只记录日志，不影响采集结果。
+回补或整段重写部分股票历史行情的采集（akshare 历史采集、自选股历史采集）传入 codes，只删除这些股票的缓存行和快照。
+
+实时行情采集不删除缓存行：缓存键包含实时价格的档位，价格进入新档位后旧结果自然不再命中，
+价格未变化的股票（以及没有任何行情变化的采集）继续命中缓存。
+
+收盘后预计算的自选股分析快照（stock_analysis_snapshot 表，见 backend_api/stock/analysis_snapshots.py）
+有效期到下一根K线为止，只在历史行情写入后由 invalidate_analysis_snapshots 删除，实时行情采集不影响快照。
+"""
+
+import logging
+from typing import Optional, Sequence
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# 市场 -> 股票代码条件（A股6位，港股5位）
+MARKET_CONDITIONS = {
+    'A': "LENGTH(code) = 6",
+    'HK': "LENGTH(code) = 5",
+}
+
+
+def _delete_condition(market: str, codes: Optional[Sequence[str]], params: dict) -> str:
+    """删除条件：指定 codes 时只删除这些股票，否则删除整个市场"""
+    if codes is None:
+        return MARKET_CONDITIONS[market]
+    params['codes'] = [str(code) for code in codes]
+    return f"{MARKET_CONDITIONS[market]} AND code = ANY(:codes)"
+
+
+def invalidate_analysis_cache(session, market: str = 'A', codes: Optional[Sequence[str]] = None) -> int:
+    """
+    删除指定市场的智能分析缓存行（历史行情写入新K线后调用）
+
+    Args:
+        session: 数据库会话（调用前应已提交采集数据）
+        market: 'A' 或 'HK'
+        codes: 历史行情被改写的股票代码，None 时删除整个市场
+
+    Returns:
+        删除的行数
+    """
+    try:
+        exists = session.execute(text("SELECT to_regclass('stock_analysis_cache')")).scalar()
+        if exists is None:
+            return 0
+        params = {}
+        condition = _delete_condition(market, codes, params)
+        result = session.execute(text(f"DELETE FROM stock_analysis_cache WHERE {condition}"), params)
+        session.commit()
+        if result.rowcount:
+            logger.info(f"已清除 {result.rowcount} 条智能分析缓存 [{market}]")
+        return result.rowcount or 0
+    except Exception as e:
+        session.rollback()
+        logger.warning(f"清除智能分析缓存失败 [{market}]: {str(e)}")
+        return 0
+
+
+def invalidate_analysis_snapshots(session, market: str = 'A', codes: Optional[Sequence[str]] = None) -> int:
+    """
+    删除指定市场的自选股分析快照（历史行情写入新K线后调用）
+
+    Args:
+        session: 数据库会话（调用前应已提交采集数据）
+        market: 'A' 或 'HK'
+        codes: 历史行情被改写的股票代码，None 时删除整个市场
+
+    Returns:
+        删除的行数
+    """
+    try:
+        exists = session.execute(text("SELECT to_regclass('stock_analysis_snapshot')")).scalar()
+        if exists is None:
+            return 0
+        params = {}
+        condition = _delete_condition(market, codes, params)
+        result = session.execute(text(f"DELETE FROM stock_analysis_snapshot WHERE {condition}"), params)
+        session.commit()
+        if result.rowcount:
+            logger.info(f"已清除 {result.rowcount} 条智能分析快照 [{market}]")
+        return result.rowcount or 0
+    except Exception as e:
+        session.rollback()
+        logger.warning(f"清除智能分析快照失败 [{market}]: {str(e)}")
+        return 0
@@ -0,0 +1,18 @@
+"""
+收盘后自选股智能分析快照预计算
+分析实现在 backend_api/stock 下，通过 backend_api_bridge 调用，
+使用 backend_core 的数据库会话为全部用户自选股的并集生成 stock_analysis_snapshot 表，
+供智能分析接口在下一根K线写入前直接返回。
+"""
+
+import logging
+
+from backend_core.database.db import SessionLocal
+from backend_core.data_collectors.backend_api_bridge import analysis_snapshots
+
+logger = logging.getLogger(__name__)
+
+
+def precompute_analysis_snapshots():
+    """为全部自选股并行计算智能分析快照"""
+    return analysis_snapshots.build_watchlist_snapshots(SessionLocal)
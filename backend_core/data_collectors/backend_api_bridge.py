@@ -0,0 +1,32 @@
+"""
+backend_api 桥接
+收盘后的选股结果预计算、自选股分析快照和技术指标状态推进直接调用 backend_api/stock 下的实现。
+backend_api 以自身目录为顶层路径（config、database、stock），本模块是采集程序引用 backend_api 的唯一入口：
+
+- 导入时把 backend_api 目录加入 sys.path（只执行一次）
+- 需要的 backend_api 模块在这里统一导入，采集任务从本模块引用，不再各自修改 sys.path
+- 不修改 backend_api 的 database 模块：API 进程（如数据采集接口）也会导入引用本模块的采集器，
+  替换全局引擎会让 API 的全部路由改用采集程序的连接和语句超时。
+  这里导入的实现都由调用方显式传入数据库会话（或会话工厂），使用采集程序的 backend_core.database.db
+
+使用方式:
+    from backend_core.data_collectors.backend_api_bridge import indicator_state
+    indicator_state.IndicatorStateStore(session, market='A').advance_for_date(target_date)
+"""
+
+import os
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKEND_API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'backend_api'))
+
+if BACKEND_API_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_API_DIR)
+
+from stock import analysis_snapshots, indicator_state, price_panel, screening_executor, screening_results  # noqa: E402
+
+logger.info("backend_api 桥接已加载")
+
+__all__ = ['analysis_snapshots', 'indicator_state', 'price_panel', 'screening_executor', 'screening_results']
@@ -0,0 +1,109 @@
+"""
+股票基础信息差异缓存
+实时行情采集每次都把全部股票代码写入 stock_basic_info / stock_basic_info_hk，而股票名称一年只变化几次，
+逐行更新会持有大量行锁，与其他写入冲突（LockNotAvailable/DeadlockDetected 重试）。
+
+这里在采集进程内缓存 代码 -> 名称（首次使用时从数据库读取，超过 TTL 后重新读取），
+每次采集只把新增代码或名称变化的代码用一条批量语句写入基础信息表。
+
+使用方式:
+    cache = BasicInfoCache('stock_basic_info', ttl=6 * 3600)
+    rows = cache.changed(session, quotes)            # 新增或改名的 (code, name)
+    cache.write(session, rows, create_date=now)      # 与行情写入在同一事务中
+    session.commit()
+    cache.remember(rows)                             # 提交成功后更新缓存
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+import pandas as pd
+from sqlalchemy import text
+
+from backend_core.data_collectors.frame_mapping import to_records
+
+logger = logging.getLogger(__name__)
+
+# 默认缓存有效期（秒）
+DEFAULT_TTL = 6 * 3600
+
+
+class BasicInfoCache:
+    """基础信息表 代码 -> 名称 缓存"""
+
+    def __init__(self, table: str, ttl: Optional[float] = None, code_column: str = 'code',
+                 name_column: str = 'name'):
+        """
+        Args:
+            table: 基础信息表名
+            ttl: 缓存有效期（秒），超过后重新从数据库读取
+            code_column: 代码列名
+            name_column: 名称列名
+        """
+        self.table = table
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self.code_column = code_column
+        self.name_column = name_column
+        self._names: Dict[str, Optional[str]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """清空缓存（下次使用时重新读取数据库），写入失败后调用"""
+        with self._lock:
+            self._names = {}
+            self._loaded_at = None
+
+    def _ensure_loaded(self, session):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        rows = session.execute(text(f"SELECT {self.code_column}, {self.name_column} FROM {self.table}")).fetchall()
+        self._names = {str(code): name for code, name in rows}
+        self._loaded_at = time.monotonic()
+        logger.info(f"{self.table} 基础信息缓存已加载 {len(self._names)} 条")
+
+    def changed(self, session, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        找出需要写入基础信息表的行
+
+        Args:
+            session: 数据库会话
+            frame: 本次采集数据（包含代码列和名称列，代码不重复）
+
+        Returns:
+            pd.DataFrame: 新增代码或名称变化的 (代码, 名称) 行
+        """
+        with self._lock:
+            self._ensure_loaded(session)
+            names = self._names
+        codes = frame[self.code_column]
+        mask = [code not in names or names[code] != name for code, name in zip(codes, frame[self.name_column])]
+        return frame.loc[mask, [self.code_column, self.name_column]].reset_index(drop=True)
+
+    def write(self, session, rows: pd.DataFrame, create_date) -> int:
+        """
+        一条批量语句写入新增或改名的基础信息（不提交）
+
+        Returns:
+            int: 写入行数
+        """
+        if rows.empty:
+            return 0
+        session.execute(text(f"""
+            INSERT INTO {self.table} ({self.code_column}, {self.name_column}, create_date)
+            VALUES (:{self.code_column}, :{self.name_column}, :create_date)
+            ON CONFLICT ({self.code_column}) DO UPDATE SET
+                {self.name_column} = EXCLUDED.{self.name_column},
+                create_date = EXCLUDED.create_date
+        """), to_records(rows.assign(create_date=create_date)))
+        return len(rows)
+
+    def remember(self, rows: pd.DataFrame):
+        """写入提交成功后更新缓存"""
+        if rows.empty:
+            return
+        with self._lock:
+            if self._loaded_at is not None:
+                self._names.update(zip(rows[self.code_column], rows[self.name_column]))
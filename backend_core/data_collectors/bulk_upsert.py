@@ -0,0 +1,225 @@
+"""
+批量暂存写入
+采集到的整张行情表先载入临时暂存表，再用一条 INSERT ... SELECT ... ON CONFLICT 语句写入目标表，
+替代逐行执行 INSERT ... ON CONFLICT（每行一次往返、每行单独重试）。
+
+- PostgreSQL 使用 COPY 载入暂存表（psycopg2 copy_expert），其他数据库（测试用 SQLite）使用 executemany
+- 暂存表为当前连接的临时表，写入结束后删除；调用方在同一事务中完成暂存与全部目标表写入后统一提交
+- 同一主键在暂存数据中出现多次时保留最后一条（与逐行写入时后写覆盖先写的结果一致）
+- 只写变化行：目标表保存每行内容哈希（row_hash 列），内容未变化的行不更新（不产生死元组和WAL）
+
+使用方式:
+    columns = {'code': 'TEXT', 'name': 'TEXT', 'current_price': 'DOUBLE PRECISION', ...}
+    stage_frame(session, 'stage_realtime_quote', frame, columns)
+    upsert_from_stage(session, 'stage_realtime_quote', 'stock_realtime_quote',
+                      columns=list(columns), key_columns=['code', 'trade_date'])
+    drop_stage(session, 'stage_realtime_quote')
+    session.commit()
+
+    # 只写变化行
+    frame['row_hash'] = row_hashes(frame, ['name', 'current_price', ...])
+    upsert_from_stage(..., changed_only=True)     # 返回实际写入（新增或内容变化）的行数
+"""
+
+import csv
+import io
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import pandas as pd
+from sqlalchemy import inspect, text
+
+from backend_core.data_collectors.frame_mapping import to_records
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# COPY 文本中表示 NULL 的标记
+_COPY_NULL = r'\N'
+
+# 行内容哈希列
+ROW_HASH_COLUMN = 'row_hash'
+
+# 已确认存在 row_hash 列的 (数据库引擎, 表名)
+_hash_ready = set()
+
+
+def _is_postgresql(session) -> bool:
+    return session.get_bind().dialect.name == 'postgresql'
+
+
+def stage_frame(session, stage: str, frame: pd.DataFrame, column_types: Dict[str, str],
+                key_columns: Optional[Sequence[str]] = None) -> int:
+    """
+    创建临时暂存表并载入数据
+
+    Args:
+        session: 数据库会话
+        stage: 暂存表名
+        frame: 待写入数据（需包含 column_types 中的全部列）
+        column_types: 列名 -> 列类型（按此顺序建表）
+        key_columns: 主键列，传入时先按主键去重（保留最后一条）
+
+    Returns:
+        载入的行数
+    """
+    columns = list(column_types)
+    if key_columns:
+        frame = frame.drop_duplicates(subset=list(key_columns), keep='last')
+
+    session.execute(text(f"DROP TABLE IF EXISTS {stage}"))
+    session.execute(text(
+        f"CREATE TEMPORARY TABLE {stage} ({', '.join(f'{name} {kind}' for name, kind in column_types.items())})"
+    ))
+    if frame.empty:
+        return 0
+
+    if _is_postgresql(session):
+        buffer = io.StringIO()
+        frame.loc[:, columns].to_csv(buffer, index=False, header=False, na_rep=_COPY_NULL,
+                                     quoting=csv.QUOTE_MINIMAL)
+        buffer.seek(0)
+        cursor = session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {stage} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '{_COPY_NULL}')", buffer
+            )
+        finally:
+            cursor.close()
+    else:
+        session.execute(
+            text(f"INSERT INTO {stage} ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})"),
+            to_records(frame, columns)
+        )
+    return len(frame)
+
+
+def upsert_from_stage(session, stage: str, table: str, columns: Sequence[str], key_columns: Sequence[str],
+                      update_columns: Optional[Sequence[str]] = None,
+                      select_expressions: Optional[Sequence[str]] = None,
+                      where: Optional[str] = None, changed_only: bool = False) -> int:
+    """
+    从暂存表一次写入目标表（INSERT ... SELECT ... ON CONFLICT DO UPDATE）
+
+    Args:
+        session: 数据库会话
+        stage: 暂存表名
+        table: 目标表名
+        columns: 目标表写入列
+        key_columns: 冲突判断列（目标表主键/唯一约束）
+        update_columns: 冲突时更新的列，默认为 columns 中除 key_columns 外的全部列；空列表表示冲突时不更新
+        select_expressions: 与 columns 一一对应的暂存表取值表达式，默认与 columns 同名
+        where: 暂存表筛选条件（可选）
+        changed_only: 只更新 row_hash 变化的行（columns 需包含 row_hash 列）
+
+    Returns:
+        写入（插入或更新）的行数，changed_only 时不含内容未变化而跳过的行
+    """
+    columns = list(columns)
+    select_expressions = list(select_expressions or columns)
+    if update_columns is None:
+        update_columns = [column for column in columns if column not in key_columns]
+    if update_columns:
+        conflict = (f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET "
+                    + ', '.join(f"{column} = EXCLUDED.{column}" for column in update_columns))
+        if changed_only:
+            conflict += f" WHERE {table}.{ROW_HASH_COLUMN} IS DISTINCT FROM EXCLUDED.{ROW_HASH_COLUMN}"
+    else:
+        conflict = f"ON CONFLICT ({', '.join(key_columns)}) DO NOTHING"
+    # SQLite 要求 INSERT ... SELECT ... ON CONFLICT 的 SELECT 带 WHERE 子句
+    result = session.execute(text(f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        SELECT {', '.join(select_expressions)} FROM {stage}
+        WHERE {where or 'TRUE'}
+        {conflict}
+    """))
+    return result.rowcount if result.rowcount is not None and result.rowcount >= 0 else 0
+
+
+def row_hashes(frame: pd.DataFrame, columns: Sequence[str]) -> pd.Series:
+    """
+    计算每行内容哈希（向量化，64位有符号整数，可直接存入 BIGINT 列）
+
+    Args:
+        frame: 数据
+        columns: 参与比较的列（不含更新时间等每次采集都会变化的列）
+    """
+    hashes = pd.util.hash_pandas_object(frame.loc[:, list(columns)], index=False)
+    return pd.Series(hashes.to_numpy().view('int64'), index=frame.index)
+
+
+def ensure_row_hash_column(session, table: str):
+    """目标表缺少 row_hash 列时添加（每个进程、每张表只检查一次）"""
+    key = (session.get_bind(), table)
+    if key in _hash_ready:
+        return
+    columns = {column['name'] for column in inspect(session.get_bind()).get_columns(table)}
+    if ROW_HASH_COLUMN not in columns:
+        session.execute(text(f"ALTER TABLE {table} ADD COLUMN {ROW_HASH_COLUMN} BIGINT"))
+        session.commit()
+        logger.info(f"{table} 已添加 {ROW_HASH_COLUMN} 列")
+    _hash_ready.add(key)
+
+
+def changed_rows(session, table: str, frame: pd.DataFrame, key_column: str) -> Tuple[pd.DataFrame, List]:
+    """
+    与目标表已保存的 row_hash 比较，找出需要写入的行（适用于每个代码一行的小表）
+
+    Args:
+        session: 数据库会话
+        table: 目标表名（需有 row_hash 列）
+        frame: 本次采集数据（需包含 key_column 和 row_hash 列）
+        key_column: 代码列
+
+    Returns:
+        (新增或内容变化的行, 目标表中本次未采集到的代码列表)
+    """
+    stored = dict(session.execute(text(f"SELECT {key_column}, {ROW_HASH_COLUMN} FROM {table}")).fetchall())
+    # 逐个比较整数哈希（不经过 Series.map，避免缺失值把哈希转换为浮点数丢失精度）
+    mask = [stored.get(key) != int(value) for key, value in zip(frame[key_column], frame[ROW_HASH_COLUMN])]
+    changed = frame[mask]
+    removed = sorted(set(stored) - set(frame[key_column]))
+    return changed, removed
+
+
+def drop_stage(session, stage: str):
+    """删除暂存表"""
+    session.execute(text(f"DROP TABLE IF EXISTS {stage}"))
+
+
+def is_lock_conflict(error: Exception) -> bool:
+    """是否为锁等待超时或死锁（可整体重试的错误）"""
+    message = str(error)
+    return "LockNotAvailable" in message or "DeadlockDetected" in message
+
+
+def run_with_lock_retry(session, write: Callable[[], T], max_retries: int = 3, label: str = '',
+                        log: Optional[logging.Logger] = None) -> T:
+    """
+    执行一次批量写入事务，锁冲突时回滚后整体重试
+
+    Args:
+        session: 数据库会话
+        write: 写入函数（在同一事务中完成暂存和全部目标表写入，不提交）
+        max_retries: 最大重试次数
+        label: 日志中的写入描述
+        log: 日志记录器
+
+    Returns:
+        write 的返回值（已提交）
+    """
+    log = log or logger
+    for attempt in range(1, max_retries + 1):
+        try:
+            result = write()
+            session.commit()
+            return result
+        except Exception as e:
+            session.rollback()
+            if is_lock_conflict(e) and attempt < max_retries:
+                log.warning(f"{label}锁冲突，第{attempt}次重试: {e}")
+                time.sleep(0.2 * attempt)
+                continue
+            raise
@@ -0,0 +1,133 @@
+"""
+采集数据列映射
+各采集器把 akshare 返回的中文列行情表转换为目标表列时，原先逐行 iterrows、逐个单元格 _safe_value，
+并在循环内逐个尝试候选字段名。这里改为声明式的列映射：每张表只解析一次源列，按列向量化转换类型，
+缺失值统一转换为 None，输出可直接写入数据库的 DataFrame 或参数字典列表。
+
+- float/int 列使用 pd.to_numeric(errors='coerce')，无法解析的值为缺失（int 列为可空整数 Int64）
+- text 列转换为字符串并去除首尾空白，空字符串视为缺失
+- datetime 列解析为 datetime，无法解析的值为缺失
+- 一个目标列可有多个候选源列（不同数据源字段名不同），逐行取第一个非缺失值
+- 全部候选列缺失时使用默认值（可为无参函数，每次转换时调用）
+
+使用方式:
+    QUOTE_MAPPING = FrameMapping([
+        Field('code', '代码', kind='text'),
+        Field('current_price', ('最新价', '现价')),
+        Field('volume_ratio', '量比', default=1.0),
+    ])
+    frame = QUOTE_MAPPING.apply(df, trade_date='2024-06-14')   # 目标列 DataFrame，常量列追加在后
+    records = QUOTE_MAPPING.records(df)                        # [{'code': ..., 'current_price': ...}]
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+
+# 支持的列类型
+KINDS = ('float', 'int', 'text', 'datetime')
+
+
+class Field:
+    """目标列定义"""
+
+    def __init__(self, target: str, sources: Union[str, Sequence[str], None] = None, kind: str = 'float',
+                 default: Any = None):
+        """
+        Args:
+            target: 目标列名
+            sources: 候选源列名（按顺序逐行取第一个非缺失值），默认与目标列同名
+            kind: 列类型，float/int/text/datetime
+            default: 全部候选列缺失时的取值，可为无参函数
+        """
+        if kind not in KINDS:
+            raise ValueError(f"不支持的列类型: {kind}")
+        if sources is None:
+            sources = (target,)
+        elif isinstance(sources, str):
+            sources = (sources,)
+        self.target = target
+        self.sources = tuple(sources)
+        self.kind = kind
+        self.default = default
+
+
+def _coerce(values: pd.Series, kind: str) -> pd.Series:
+    """按列类型向量化转换，缺失或无法解析的值为 NaN/None/NaT"""
+    if kind == 'float':
+        return pd.to_numeric(values, errors='coerce').astype(float)
+    if kind == 'int':
+        return pd.to_numeric(values, errors='coerce').astype(float).round().astype('Int64')
+    if kind == 'text':
+        text = values.astype('string').str.strip()
+        text = text.mask((text == '').fillna(False))
+        return text.astype(object).where(text.notna(), None)
+    parsed = pd.to_datetime(values, errors='coerce')
+    # 同一列时间格式不一致时（如部分带毫秒），整列解析会把其余格式判为缺失，逐个补解析
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed = parsed.astype(object)
+        parsed[retry] = values[retry].map(lambda v: pd.to_datetime(v, errors='coerce'))
+        parsed = pd.to_datetime(parsed, errors='coerce')
+    return parsed
+
+
+def to_records(frame: pd.DataFrame, columns: Optional[Sequence[str]] = None) -> List[Dict]:
+    """DataFrame 转换为参数字典列表（NaN/NaT 转换为 None，numpy 数值和时间转换为 Python 对象）"""
+    subset = frame if columns is None else frame.loc[:, list(columns)]
+    subset = subset.astype(object)
+    for column in subset.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[column]):
+            subset[column] = pd.Series(frame[column].dt.to_pydatetime(), index=frame.index, dtype=object)
+    subset = subset.where(pd.notna(subset), None)
+    return subset.to_dict('records')
+
+
+class FrameMapping:
+    """声明式列映射：源 DataFrame -> 目标列 DataFrame"""
+
+    def __init__(self, fields: Sequence[Field]):
+        self.fields = list(fields)
+
+    @property
+    def targets(self) -> List[str]:
+        """目标列名（按定义顺序）"""
+        return [field.target for field in self.fields]
+
+    def resolve(self, columns: Sequence[str]) -> Dict[str, List[str]]:
+        """解析每个目标列在源数据中实际存在的候选列"""
+        present = set(columns)
+        return {field.target: [source for source in field.sources if source in present] for field in self.fields}
+
+    def apply(self, df: pd.DataFrame, **constants) -> pd.DataFrame:
+        """
+        转换源数据
+
+        Args:
+            df: 源数据
+            **constants: 追加的常量列（如 trade_date、update_time）
+
+        Returns:
+            pd.DataFrame: 目标列 + 常量列，索引重置为 0..n-1
+        """
+        df = df.reset_index(drop=True)
+        resolved = self.resolve(df.columns)
+        frame = pd.DataFrame(index=df.index)
+        for field in self.fields:
+            values = None
+            for source in resolved[field.target]:
+                coerced = _coerce(df[source], field.kind)
+                values = coerced if values is None else values.where(values.notna(), coerced)
+            default = field.default() if callable(field.default) else field.default
+            if values is None:
+                values = _coerce(pd.Series(default, index=df.index, dtype=object), field.kind)
+            elif default is not None:
+                values = values.where(values.notna(), default)
+            frame[field.target] = values
+        for name, value in constants.items():
+            frame[name] = value
+        return frame
+
+    def records(self, df: pd.DataFrame, **constants) -> List[Dict]:
+        """转换源数据并输出参数字典列表（缺失值为 None）"""
+        return to_records(self.apply(df, **constants))
@@ -0,0 +1,236 @@
+"""
+多数据源对冲请求
+实时行情采集原先先调用主数据源（东方财富），重试全部失败后才调用备用数据源（新浪），最坏情况下
+一次采集要等待主数据源的全部重试。这里改为对冲请求：
+
+- 先请求主数据源；超过延迟预算仍未返回时，并发请求下一个数据源，取最先返回完整数据的结果
+- 数据源出错或返回不完整数据（行数不足）时立即请求下一个数据源，不等待预算
+- 延迟预算默认为配置值；主数据源有足够样本后取其 95 分位延迟（不超过配置值），正常情况下不会多发请求
+- 全部数据源都没有完整数据时，返回行数最多的不完整结果（与原先接受数据量偏少的结果一致），都失败时抛出异常
+- 记录每个数据源最近的请求延迟，提供 50/90/99 分位统计。延迟按单次请求记录：传入 retry 时重试和退避等待
+  在计时之外，延迟分位和预算反映的是数据源本身的响应时间
+- 落后的请求在后台线程中继续执行到结束（不能中断），结果丢弃，延迟仍计入统计。同一数据源上一次的请求
+  仍在执行时不重复提交，直接等待该请求，每个数据源最多只有一个请求在执行；底层 HTTP 请求的超时见
+  upstream.py（UPSTREAM_CONFIG['timeout']）
+
+使用方式:
+    name, df = hedged_fetch([('em', ak.stock_zh_a_spot_em), ('sina', ak.stock_zh_a_spot)], budget=8.0,
+                            min_rows=1000, retry=collector._retry_on_failure)
+    SOURCE_LATENCY.stats()      # {'em': {'count': ..., 'failures': ..., 'p50': ..., 'p90': ..., 'p99': ...}}
+"""
+
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 主数据源有足够样本后，延迟预算取该分位延迟
+BUDGET_PERCENTILE = 95
+
+# 计算分位延迟需要的最少样本数
+MIN_SAMPLES = 20
+
+# 延迟预算下限（秒）
+MIN_BUDGET = 0.5
+
+
+class SourceLatency:
+    """各数据源最近的请求延迟"""
+
+    def __init__(self, window: int = 200):
+        """
+        Args:
+            window: 每个数据源保留的最近成功请求数
+        """
+        self.window = window
+        self._latencies: Dict[str, deque] = {}
+        self._failures: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, ok: bool):
+        """记录一次请求（失败的请求只计数，不计入延迟分位）"""
+        with self._lock:
+            if ok:
+                self._latencies.setdefault(name, deque(maxlen=self.window)).append(seconds)
+            else:
+                self._failures[name] = self._failures.get(name, 0) + 1
+
+    def percentile(self, name: str, q: float) -> Optional[float]:
+        """成功请求延迟的 q 分位（样本不足 MIN_SAMPLES 时为 None）"""
+        with self._lock:
+            samples = list(self._latencies.get(name, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return float(np.percentile(samples, q))
+
+    def budget(self, name: str, default: float) -> float:
+        """数据源的对冲延迟预算：样本足够时取 BUDGET_PERCENTILE 分位延迟，不超过 default"""
+        observed = self.percentile(name, BUDGET_PERCENTILE)
+        if observed is None:
+            return default
+        return min(default, max(MIN_BUDGET, observed))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各数据源的请求数、失败数和延迟分位（秒）"""
+        with self._lock:
+            names = set(self._latencies) | set(self._failures)
+            samples = {name: list(self._latencies.get(name, ())) for name in names}
+            failures = dict(self._failures)
+        result = {}
+        for name in sorted(names):
+            values = samples[name]
+            p50, p90, p99 = (np.percentile(values, [50, 90, 99]) if values else (None, None, None))
+            result[name] = {
+                'count': len(values),
+                'failures': failures.get(name, 0),
+                'p50': None if p50 is None else round(float(p50), 3),
+                'p90': None if p90 is None else round(float(p90), 3),
+                'p99': None if p99 is None else round(float(p99), 3),
+            }
+        return result
+
+
+# 进程内共享的延迟统计
+SOURCE_LATENCY = SourceLatency()
+
+# 对冲请求线程池（落后的请求在这里继续执行到结束，不阻塞调用方）
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='hedged_fetch')
+
+# 数据源名称 -> 正在执行的请求（同一数据源不重复提交）
+_running: Dict[str, Future] = {}
+_running_lock = threading.Lock()
+
+
+def _row_count(result) -> int:
+    if result is None:
+        return 0
+    try:
+        return len(result)
+    except TypeError:
+        return 0
+
+
+def _timed(name: str, fetch: Callable[[], Any], latency: SourceLatency) -> Callable[[], Any]:
+    """单次请求计时：每次调用记录一次延迟（失败只计数）"""
+    @functools.wraps(fetch)
+    def attempt():
+        started = time.monotonic()
+        try:
+            result = fetch()
+        except BaseException:
+            latency.record(name, time.monotonic() - started, ok=False)
+            raise
+        latency.record(name, time.monotonic() - started, ok=True)
+        return result
+    return attempt
+
+
+def _submit(name: str, task: Callable[[], Any]) -> Future:
+    """提交数据源请求；该数据源上一次的请求仍在执行时返回该请求"""
+    with _running_lock:
+        future = _running.get(name)
+        if future is not None and not future.done():
+            return future
+        future = _executor.submit(task)
+        _running[name] = future
+
+    def forget(done: Future):
+        with _running_lock:
+            if _running.get(name) is done:
+                del _running[name]
+
+    future.add_done_callback(forget)
+    return future
+
+
+def hedged_fetch(sources: Sequence[Tuple[str, Callable[[], Any]]], budget: float, min_rows: int = 1,
+                 timeout: Optional[float] = None, latency: SourceLatency = SOURCE_LATENCY,
+                 log: Optional[logging.Logger] = None,
+                 retry: Optional[Callable[[Callable[[], Any]], Any]] = None) -> Tuple[str, Any]:
+    """
+    按顺序对冲请求多个数据源，返回最先得到的完整数据
+
+    Args:
+        sources: [(数据源名称, 无参请求函数)]，按优先级排序；请求函数只发出一次请求，重试由 retry 负责
+        budget: 延迟预算上限（秒），前一个数据源超过预算未返回时并发请求下一个
+        min_rows: 完整数据的最少行数
+        timeout: 总超时（秒），None 为不限
+        latency: 延迟统计
+        log: 日志记录器
+        retry: 失败重试函数（如采集器的 _retry_on_failure），以单次请求函数为参数；None 为不重试
+
+    Returns:
+        (数据源名称, 数据)
+
+    Raises:
+        TimeoutError: 超过总超时仍没有可用数据
+        Exception: 全部数据源都失败
+    """
+    log = log or logger
+    remaining = list(sources)
+    pending = {}
+    errors = []
+    partial: Optional[Tuple[str, Any]] = None
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def launch():
+        name, fetch = remaining.pop(0)
+        attempt = _timed(name, fetch, latency)
+        future = _submit(name, attempt if retry is None else functools.partial(retry, attempt))
+        pending[future] = (name, latency.budget(name, budget))
+
+    launch()
+    while pending:
+        wait_for = None
+        if remaining:
+            # 最近启动的数据源的预算
+            wait_for = list(pending.values())[-1][1]
+        if deadline is not None:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            wait_for = left if wait_for is None else min(wait_for, left)
+        done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+        if not done:
+            if not remaining:
+                break
+            waiting = ', '.join(name for name, _ in pending.values())
+            log.info(f"数据源 {waiting} 超过 {wait_for:.1f} 秒未返回，并发请求 {remaining[0][0]}")
+            launch()
+            continue
+        for future in done:
+            name, _ = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                log.warning(f"数据源 {name} 请求失败: {e}")
+                continue
+            rows = _row_count(result)
+            if rows >= min_rows:
+                if pending:
+                    log.info(f"数据源 {name} 最先返回完整数据（{rows}条），放弃 "
+                             f"{', '.join(other for other, _ in pending.values())}")
+                return name, result
+            errors.append(f"{name}: 数据不完整（{rows}条）")
+            log.warning(f"数据源 {name} 返回数据不完整（{rows}条，至少需要{min_rows}条）")
+            if rows and (partial is None or rows > _row_count(partial[1])):
+                partial = (name, result)
+        # 出错或数据不完整时立即请求下一个数据源
+        if remaining:
+            launch()
+
+    if partial is not None:
+        log.warning(f"没有数据源返回完整数据，使用 {partial[0]} 的 {_row_count(partial[1])} 条数据")
+        return partial
+    if pending:
+        raise TimeoutError(f"数据源 {', '.join(name for name, _ in pending.values())} 超过 {timeout} 秒未返回"
+                           + (f"（{'; '.join(errors)}）" if errors else ''))
+    raise Exception(f"所有数据源都失败了: {'; '.join(errors)}")
@@ -0,0 +1,47 @@
+"""
+增量技术指标状态推进
+指标状态的计算实现在 backend_api/stock/indicator_state.py，通过 backend_api_bridge 调用，
+使用采集程序的数据库会话在历史行情写入后把 stock_indicator_state 表推进到采集日期；
+整段回补历史数据后重新计算回补股票的状态。
+"""
+
+import logging
+from typing import Dict, Optional, Sequence
+
+from backend_core.data_collectors.backend_api_bridge import indicator_state
+
+logger = logging.getLogger(__name__)
+
+
+def advance_indicator_state(session, target_date: str, market: str = 'A',
+                            codes: Optional[Sequence[str]] = None) -> Dict[str, any]:
+    """
+    推进指定市场全部（或指定）股票的技术指标状态至目标日期
+
+    Args:
+        session: 数据库会话
+        target_date: 目标日期 (YYYY-MM-DD)
+        market: 'A' 或 'HK'
+        codes: 股票代码列表，默认全部股票
+
+    Returns:
+        Dict: 计算结果统计（同 IndicatorStateStore.advance_for_date）
+    """
+    return indicator_state.IndicatorStateStore(session, market=market).advance_for_date(target_date, codes)
+
+
+def rebuild_indicator_state(session, target_date: str, market: str = 'A',
+                            codes: Optional[Sequence[str]] = None) -> Dict[str, any]:
+    """
+    清除指定市场全部（或指定）股票的技术指标状态后重新计算至目标日期（历史数据整段回补后调用）
+
+    Args:
+        session: 数据库会话
+        target_date: 目标日期 (YYYY-MM-DD)，一般为最新交易日
+        market: 'A' 或 'HK'
+        codes: 股票代码列表，默认全部股票
+
+    Returns:
+        Dict: 计算结果统计（同 IndicatorStateStore.rebuild）
+    """
+    return indicator_state.IndicatorStateStore(session, market=market).rebuild(target_date, codes)
@@ -0,0 +1,187 @@
+"""
+盘中行情快照
+stock_realtime_quote / stock_realtime_quote_hk 每只股票每个交易日只保留一行，每次采集覆盖，无法回看盘中走势
+和全市场涨跌分布的变化。这里每次采集把整张行情表追加写入 stock_intraday_snapshot（只追加，不更新）。
+
+- PostgreSQL 按交易日范围分区（每天一个分区 stock_intraday_snapshot_YYYYMMDD），分区在写入事务之前按需创建；
+  过期数据整分区删除，不产生死元组。其他数据库（测试用 SQLite）为普通表，过期数据按日期删除
+- 只保存盘中走势需要的数值列：价格、涨跌幅、换手率为 REAL，成交量为 BIGINT，成交额为 DOUBLE PRECISION
+- 主键 (trade_date, ts, code)，同时用于按时间点查询全市场快照；(code, trade_date, ts) 索引用于查询单只股票的盘中走势
+- 写入走暂存表批量路径（见 bulk_upsert.py），与行情表写入在同一事务中；锁冲突整体重试时主键冲突的行不重复写入
+- A股（6位代码）和港股（5位代码）共用一张表
+
+使用方式:
+    ensure_snapshot_partitions(session, quotes)     # 写入事务之前（每个进程每个交易日只执行一次，同时清理过期分区）
+    append_snapshots(session, quotes)               # 在行情写入事务中调用，不提交
+"""
+
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Optional, Union
+
+import pandas as pd
+from sqlalchemy import text
+
+from backend_core.config.config import DATA_COLLECTORS
+from backend_core.data_collectors.bulk_upsert import _is_postgresql, drop_stage, stage_frame, upsert_from_stage
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TABLE = 'stock_intraday_snapshot'
+
+# 快照列 -> 列类型（暂存表与目标表一致）
+SNAPSHOT_COLUMNS = {
+    'trade_date': 'DATE',
+    'ts': 'TIMESTAMP',
+    'code': 'TEXT',
+    'current_price': 'REAL',
+    'change_percent': 'REAL',
+    'open': 'REAL',
+    'high': 'REAL',
+    'low': 'REAL',
+    'pre_close': 'REAL',
+    'volume': 'BIGINT',
+    'amount': 'DOUBLE PRECISION',
+    'turnover_rate': 'REAL',
+}
+
+# 默认保留天数（按自然日）
+DEFAULT_KEEP_DAYS = 30
+
+# 已创建的 (数据库引擎, 交易日) 分区
+_partitions_ready = set()
+_lock = threading.Lock()
+
+
+def _as_date(value: Union[str, date, datetime]) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def _partition_name(trade_date: date) -> str:
+    return f"{SNAPSHOT_TABLE}_{trade_date.strftime('%Y%m%d')}"
+
+
+def ensure_snapshot_table(session):
+    """创建快照表（PostgreSQL 为分区表）和索引"""
+    columns = ', '.join(f'{name} {kind}' for name, kind in SNAPSHOT_COLUMNS.items())
+    partition = ' PARTITION BY RANGE (trade_date)' if _is_postgresql(session) else ''
+    session.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (
+            {columns},
+            PRIMARY KEY (trade_date, ts, code)
+        ){partition}
+    """))
+    session.execute(text(
+        f"CREATE INDEX IF NOT EXISTS idx_{SNAPSHOT_TABLE}_code ON {SNAPSHOT_TABLE} (code, trade_date, ts)"
+    ))
+
+
+def ensure_snapshot_partitions(session, quotes: pd.DataFrame, keep_days: Optional[int] = None):
+    """
+    确保行情涉及的交易日分区存在（创建分区需要锁住父表，因此在行情写入事务之前单独执行并提交）
+
+    Args:
+        session: 数据库会话
+        quotes: 整理后的行情（包含 trade_date 列）
+        keep_days: 保留天数，默认读取配置
+    """
+    for trade_date in quotes['trade_date'].dropna().unique():
+        ensure_snapshot_partition(session, trade_date, keep_days)
+
+
+def ensure_snapshot_partition(session, trade_date: Union[str, date, datetime], keep_days: Optional[int] = None):
+    """确保交易日分区存在（每个进程每个交易日只执行一次），新建分区时清理过期快照"""
+    trade_date = _as_date(trade_date)
+    key = (session.get_bind(), trade_date)
+    if key in _partitions_ready:
+        return
+    with _lock:
+        if key in _partitions_ready:
+            return
+        try:
+            ensure_snapshot_table(session)
+            if _is_postgresql(session):
+                session.execute(text(f"""
+                    CREATE TABLE IF NOT EXISTS {_partition_name(trade_date)} PARTITION OF {SNAPSHOT_TABLE}
+                    FOR VALUES FROM ('{trade_date.isoformat()}') TO ('{(trade_date + timedelta(days=1)).isoformat()}')
+                """))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        _partitions_ready.add(key)
+    purge_snapshots(session, keep_days, today=trade_date)
+
+
+def purge_snapshots(session, keep_days: Optional[int] = None, today: Optional[date] = None) -> int:
+    """
+    删除超过保留天数的快照（PostgreSQL 整分区删除），失败时只记录日志
+
+    Args:
+        session: 数据库会话
+        keep_days: 保留天数，默认读取配置 intraday_snapshot_keep_days
+        today: 计算保留期的基准日期，默认今天
+
+    Returns:
+        删除的分区数（PostgreSQL）或行数（其他数据库）
+    """
+    if keep_days is None:
+        keep_days = DATA_COLLECTORS['akshare'].get('intraday_snapshot_keep_days', DEFAULT_KEEP_DAYS)
+    cutoff = (today or date.today()) - timedelta(days=keep_days)
+    try:
+        if _is_postgresql(session):
+            partitions = session.execute(text("""
+                SELECT child.relname FROM pg_inherits
+                JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+                JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+                WHERE parent.relname = :table
+            """), {'table': SNAPSHOT_TABLE}).scalars().all()
+            expired = [name for name in partitions if name < _partition_name(cutoff)]
+            for name in expired:
+                session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            removed = len(expired)
+        else:
+            removed = session.execute(text(f"DELETE FROM {SNAPSHOT_TABLE} WHERE trade_date < :cutoff"),
+                                      {'cutoff': cutoff.isoformat()}).rowcount or 0
+        session.commit()
+        if removed:
+            logger.info(f"已清理 {cutoff} 之前的盘中快照: {removed}")
+        return removed
+    except Exception as e:
+        session.rollback()
+        logger.warning(f"清理盘中快照失败: {str(e)}")
+        return 0
+
+
+def snapshot_frame(quotes: pd.DataFrame) -> pd.DataFrame:
+    """
+    行情表 -> 快照列（ts 取行情的 update_time，缺少的数值列为空）
+
+    Args:
+        quotes: 整理后的行情（包含 code、trade_date、update_time 和行情数值列）
+    """
+    frame = quotes.reindex(columns=[column for column in SNAPSHOT_COLUMNS if column != 'ts'])
+    frame.insert(1, 'ts', quotes['update_time'])
+    frame['volume'] = pd.to_numeric(frame['volume'], errors='coerce').round().astype('Int64')
+    return frame
+
+
+def append_snapshots(session, quotes: pd.DataFrame) -> int:
+    """
+    追加一次采集的全部行情快照（不提交，分区需已由 ensure_snapshot_partitions 创建）
+
+    Returns:
+        int: 写入的快照行数
+    """
+    stage = 'stage_intraday_snapshot'
+    written = 0
+    if stage_frame(session, stage, snapshot_frame(quotes), SNAPSHOT_COLUMNS, key_columns=['code']):
+        written = upsert_from_stage(session, stage, SNAPSHOT_TABLE, columns=list(SNAPSHOT_COLUMNS),
+                                    key_columns=['trade_date', 'ts', 'code'], update_columns=[])
+    drop_stage(session, stage)
+    return written
@@ -17,6 +17,8 @@ from backend_core.data_collectors.akshare.hk_index_historical_collector import H
 from apscheduler.schedulers.background import BackgroundScheduler
 from backend_core.data_collectors.akshare.watchlist_history_collector import collect_watchlist_history
 from backend_core.data_collectors.news_collector import NewsCollector
+# backend_api 的选股、分析实现只通过桥接模块引用（加入 sys.path，数据库会话由采集任务显式传入）
+from backend_core.data_collectors import backend_api_bridge  # noqa: F401
 from backend_core.data_collectors.akshare.weekly_collector import WeeklyDataGenerator
 from backend_core.data_collectors.akshare.hk_weekly_collector import HKWeeklyDataGenerator
 from backend_core.data_collectors.akshare.monthly_collector import MonthlyDataGenerator
@@ -27,10 +29,16 @@ from backend_core.data_collectors.akshare.semiannual_collector import SemiAnnual
 from backend_core.data_collectors.akshare.hk_semiannual_collector import HKSemiAnnualDataGenerator
 from backend_core.data_collectors.akshare.annual_collector import AnnualDataGenerator
 from backend_core.data_collectors.akshare.hk_annual_collector import HKAnnualDataGenerator
+from backend_core.data_collectors.screening_precompute import precompute_screening_results
+from backend_core.data_collectors.analysis_snapshots import precompute_analysis_snapshots
+from backend_core.data_collectors.upstream import install_upstream_client
 import time
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 
+# 全部采集器的上游请求经过限速和共享连接池
+install_upstream_client()
+
 # 初始化采集器
 ak_collector = AkshareRealtimeQuoteCollector(DATA_COLLECTORS.get('akshare', {}))
 ak_turnover_collector = HistoricalTurnoverRateCollector(DATA_COLLECTORS.get('akshare', {}))
@@ -292,6 +300,22 @@ def collect_hk_index_historical():
     except Exception as e:
         logging.error(f"[定时任务] 港股指数历史行情采集异常: {e}")
 
+def run_screening_precompute():
+    try:
+        logging.info("[定时任务] 选股结果预计算开始...")
+        result = precompute_screening_results()
+        logging.info(f"[定时任务] 选股结果预计算完成: {result}")
+    except Exception as e:
+        logging.error(f"[定时任务] 选股结果预计算异常: {e}")
+
+def run_analysis_snapshot_precompute():
+    try:
+        logging.info("[定时任务] 自选股智能分析快照预计算开始...")
+        result = precompute_analysis_snapshots()
+        logging.info(f"[定时任务] 自选股智能分析快照预计算完成: {result}")
+    except Exception as e:
+        logging.error(f"[定时任务] 自选股智能分析快照预计算异常: {e}")
+
 # 定时任务配置
 scheduler.add_job(collect_akshare_realtime, 'cron', day_of_week='mon-fri', hour='9-11,13-16', minute='39', id='akshare_realtime')
 scheduler.add_job(collect_tushare_historical, 'cron', hour='16', minute='2', id='tushare_historical')
@@ -317,6 +341,10 @@ scheduler.add_job(generate_annual_data, 'cron', day_of_week='mon-fri', hour=16,
 scheduler.add_job(generate_hk_annual_data, 'cron', day_of_week='mon-fri', hour=16, minute=57, id='generate_hk_annual')
 scheduler.add_job(collect_hk_index_realtime, 'cron', day_of_week='mon-fri', hour='9-12,13-16', minute='5,35', id='hk_index_realtime')
 scheduler.add_job(collect_hk_index_historical, 'cron', day_of_week='mon-fri', hour=17, minute=5, id='hk_index_historical')
+# 选股结果预计算：在A股历史行情采集（16:02）与周/月/季/半年/年线生成（16:05-16:25）完成之后执行
+scheduler.add_job(run_screening_precompute, 'cron', day_of_week='mon-fri', hour=17, minute=15, id='screening_precompute')
+# 自选股智能分析快照预计算：在A股（16:02）与港股（16:30）历史行情采集清除旧快照之后执行
+scheduler.add_job(run_analysis_snapshot_precompute, 'cron', day_of_week='mon-fri', hour=17, minute=30, id='analysis_snapshot_precompute')
 
 if __name__ == "__main__":
     logging.info("启动定时采集任务...")
@@ -12,10 +12,29 @@ import logging
 import re
 import time
 from backend_core.database.db import SessionLocal
+from backend_core.data_collectors.frame_mapping import Field, FrameMapping, to_records
 from sqlalchemy import text
 
 logger = logging.getLogger(__name__)
 
+# 市场新闻列映射（财新网-财新数据通-内容精选）
+MARKET_NEWS_MAPPING = FrameMapping([
+    Field('title', 'tag', kind='text'),
+    Field('content', 'summary', kind='text'),
+    Field('publish_time', 'pub_time', kind='datetime', default=datetime.now),
+    Field('source', (), kind='text', default='财新网'),
+    Field('url', 'url', kind='text', default=''),
+])
+
+# 个股新闻列映射（东方财富）
+STOCK_NEWS_MAPPING = FrameMapping([
+    Field('title', ('新闻标题', '标题'), kind='text'),
+    Field('content', ('新闻内容', '内容'), kind='text'),
+    Field('publish_time', ('发布时间', '时间'), kind='datetime', default=datetime.now),
+    Field('source', '文章来源', kind='text', default='东方财富'),
+    Field('url', '新闻链接', kind='text', default=''),
+])
+
 class NewsCollector:
     """资讯数据采集器"""
     
@@ -36,53 +55,7 @@ class NewsCollector:
             
             logger.info(f"akshare返回 {len(news_df)} 条原始新闻数据")
             
-            news_list = []
-            for _, row in news_df.iterrows():
-                try:
-                    # 修复字段名映射 - 使用实际的akshare字段名
-                    title = str(row.get('tag', '') or '').strip()
-                    content = str(row.get('summary', '') or '').strip()
-                    
-                    if not title or not content:
-                        continue
-                    
-                    # 处理发布时间 - 使用实际的字段名
-                    publish_time = row.get('pub_time', '')
-                    if pd.isna(publish_time) or not publish_time:
-                        publish_time = datetime.now()
-                    else:
-                        if hasattr(publish_time, 'strftime'):
-                            publish_time = publish_time
-                        else:
-                            try:
-                                # 尝试解析时间格式
-                                time_str = str(publish_time)
-                                if '.' in time_str:
-                                    publish_time = datetime.strptime(time_str, '%Y-%m-%d %H:%M:%S.%f')
-                                else:
-                                    publish_time = datetime.strptime(time_str, '%Y-%m-%d %H:%M:%S')
-                            except:
-                                publish_time = datetime.now()
-                    
-                    news_item = {
-                        'title': title,
-                        'content': content,
-                        'publish_time': publish_time,
-                        'source': '财新网',  # 财新网数据源
-                        'url': str(row.get('url', '') or '').strip(),
-                        'category_id': self._classify_news(title, content),
-                        'summary': self._extract_summary(content),
-                        'tags': self._extract_tags(title, content),
-                        'read_count': 0,
-                        'is_hot': False,
-                        'stock_code': None,  # 市场新闻不关联特定股票
-                        'image_url': None
-                    }
-                    news_list.append(news_item)
-                    
-                except Exception as e:
-                    logger.error(f"处理单条新闻失败: {e}")
-                    continue
+            news_list = self._build_news_items(MARKET_NEWS_MAPPING, news_df, stock_code=None)
             
             logger.info(f"成功处理 {len(news_list)} 条新闻")
             return news_list
@@ -105,47 +78,7 @@ class NewsCollector:
             
             logger.info(f"股票 {stock_code} 返回 {len(news_df)} 条新闻数据")
             
-            news_list = []
-            for _, row in news_df.iterrows():
-                try:
-                    title = str(row.get('新闻标题', '') or row.get('标题', '') or '').strip()
-                    content = str(row.get('新闻内容', '') or row.get('内容', '') or '').strip()
-                    
-                    if not title or not content:
-                        continue
-                    
-                    # 处理发布时间
-                    publish_time = row.get('发布时间', '') or row.get('时间', '')
-                    if pd.isna(publish_time) or not publish_time:
-                        publish_time = datetime.now()
-                    else:
-                        if hasattr(publish_time, 'strftime'):
-                            publish_time = publish_time
-                        else:
-                            try:
-                                publish_time = datetime.strptime(str(publish_time), '%Y-%m-%d %H:%M:%S')
-                            except:
-                                publish_time = datetime.now()
-                    
-                    news_item = {
-                        'title': title,
-                        'content': content,
-                        'publish_time': publish_time,
-                        'source': str(row.get('文章来源', '') or '东方财富').strip(),
-                        'url': str(row.get('新闻链接', '') or '').strip(),
-                        'category_id': self._classify_news(title, content),
-                        'summary': self._extract_summary(content),
-                        'tags': self._extract_tags(title, content),
-                        'read_count': 0,
-                        'is_hot': False,
-                        'stock_code': stock_code,
-                        'image_url': None
-                    }
-                    news_list.append(news_item)
-                    
-                except Exception as e:
-                    logger.error(f"处理股票 {stock_code} 单条新闻失败: {e}")
-                    continue
+            news_list = self._build_news_items(STOCK_NEWS_MAPPING, news_df, stock_code=stock_code)
             
             logger.info(f"股票 {stock_code} 成功处理 {len(news_list)} 条新闻")
             return news_list
@@ -154,6 +87,36 @@ class NewsCollector:
             logger.error(f"采集股票 {stock_code} 新闻失败: {e}")
             return []
     
+    def _build_news_items(self, mapping: FrameMapping, news_df: pd.DataFrame, stock_code: Optional[str]) -> List[Dict]:
+        """
+        按列映射整理新闻数据，跳过标题或内容为空的新闻；发布时间缺失或无法解析时使用当前时间
+
+        Args:
+            mapping: 新闻列映射
+            news_df: akshare 返回的新闻数据
+            stock_code: 关联的股票代码（市场新闻为None）
+        """
+        news_df = mapping.apply(news_df)
+        news_df = news_df[news_df['title'].notna() & news_df['content'].notna()]
+        news_list = []
+        for item in to_records(news_df):
+            try:
+                title, content = item['title'], item['content']
+                item.update({
+                    'category_id': self._classify_news(title, content),
+                    'summary': self._extract_summary(content),
+                    'tags': self._extract_tags(title, content),
+                    'read_count': 0,
+                    'is_hot': False,
+                    'stock_code': stock_code,
+                    'image_url': None
+                })
+                news_list.append(item)
+            except Exception as e:
+                logger.error(f"处理单条新闻失败: {e}")
+                continue
+        return news_list
+
     def _classify_news(self, title: str, content: str) -> int:
         """根据标题和内容分类新闻"""
         try:
@@ -0,0 +1,31 @@
+"""
+收盘后选股结果预计算
+选股策略实现在 backend_api/stock 下，通过 backend_api_bridge 调用，
+使用 backend_core 的数据库会话把结果写入 screening_results 表，供选股接口直接读取。
+"""
+
+import logging
+from sqlalchemy import text
+
+from backend_core.database.db import SessionLocal
+from backend_core.data_collectors.backend_api_bridge import price_panel, screening_executor, screening_results
+
+logger = logging.getLogger(__name__)
+
+
+def precompute_screening_results():
+    """按默认参数执行全部选股策略并写入 screening_results 表"""
+    session = SessionLocal()
+    try:
+        # 面板全量加载耗时较长，解除连接默认的30秒语句超时
+        session.execute(text("SET statement_timeout = 0"))
+        return screening_results.precompute_screening_results(session)
+    finally:
+        try:
+            session.execute(text("RESET statement_timeout"))
+        except Exception:
+            session.rollback()
+        session.close()
+        # 采集进程常驻，预计算结束后释放进程池和行情面板占用的内存
+        screening_executor.get_screening_executor().shutdown()
+        price_panel.get_panel_store().invalidate()
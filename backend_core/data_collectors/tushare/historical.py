@@ -10,6 +10,9 @@ from sqlalchemy import text
 from .five_day_change_calculator import FiveDayChangeCalculator
 from .extended_change_calculator import ExtendedChangeCalculator
 from .thirty_day_change_calculator import ThirtyDayChangeCalculator
+from .td_setup_counter import TDSetupCounter
+from ..analysis_cache import invalidate_analysis_cache, invalidate_analysis_snapshots
+from ..indicator_state import advance_indicator_state
 
 class HistoricalQuoteCollector(TushareCollector):
     
@@ -262,6 +265,9 @@ class HistoricalQuoteCollector(TushareCollector):
             })
             session.commit()
             self.logger.info(f"全部历史行情数据采集并入库完成，成功: {success_count}，失败: {fail_count}")
+            if success_count > 0:
+                invalidate_analysis_cache(session, 'A')
+                invalidate_analysis_snapshots(session, 'A')
             
             # 数据采集完成后，自动计算扩展涨跌幅（5日、10日、60日）
             if success_count > 0:
@@ -355,6 +361,50 @@ class HistoricalQuoteCollector(TushareCollector):
                         session.commit()
                     except Exception as log_error:
                         self.logger.error(f"记录30日涨跌幅计算失败日志时出错: {log_error}")
+
+                # 推进九转序列（低九）计数
+                try:
+                    target_date = datetime.datetime.strptime(date_str, "%Y%m%d").strftime("%Y-%m-%d")
+                    td_result = TDSetupCounter(session).advance_for_date(target_date)
+                    self.logger.info(f"九转序列计数推进完成: 股票 {td_result['total']}, K线 {td_result['bars']}")
+
+                    session.execute(text('''
+                        INSERT INTO historical_collect_operation_logs
+                        (operation_type, operation_desc, affected_rows, status, error_message, collect_source)
+                        VALUES (:operation_type, :operation_desc, :affected_rows, :status, :error_message, :collect_source)
+                    '''), {
+                        'operation_type': 'td_setup_count_calculation',
+                        'operation_desc': f'计算日期: {target_date}\n推进股票: {td_result["total"]}\n处理K线: {td_result["bars"]}',
+                        'affected_rows': td_result['success'],
+                        'status': 'success' if td_result['failed'] == 0 else 'error',
+                        'error_message': '\n'.join(td_result['details']) if td_result['failed'] > 0 else None,
+                        'collect_source': 'tushare'
+                    })
+                    session.commit()
+                except Exception as calc_error:
+                    self.logger.error(f"推进九转序列计数失败: {calc_error}")
+
+                # 推进增量技术指标状态（MACD、RSI、KDJ）
+                try:
+                    target_date = datetime.datetime.strptime(date_str, "%Y%m%d").strftime("%Y-%m-%d")
+                    state_result = advance_indicator_state(session, target_date, 'A')
+                    self.logger.info(f"技术指标状态推进完成: 股票 {state_result['total']}, K线 {state_result['bars']}")
+
+                    session.execute(text('''
+                        INSERT INTO historical_collect_operation_logs
+                        (operation_type, operation_desc, affected_rows, status, error_message, collect_source)
+                        VALUES (:operation_type, :operation_desc, :affected_rows, :status, :error_message, :collect_source)
+                    '''), {
+                        'operation_type': 'indicator_state_update',
+                        'operation_desc': f'计算日期: {target_date}\n推进股票: {state_result["total"]}\n处理K线: {state_result["bars"]}',
+                        'affected_rows': state_result['success'],
+                        'status': 'success' if state_result['failed'] == 0 else 'error',
+                        'error_message': '\n'.join(state_result['details']) if state_result['failed'] > 0 else None,
+                        'collect_source': 'tushare'
+                    })
+                    session.commit()
+                except Exception as calc_error:
+                    self.logger.error(f"推进技术指标状态失败: {calc_error}")
             
             return True
         except Exception as e:
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+九转序列（TD Setup）计数服务
+用于在历史行情数据采集后，把每只股票的下跌计数（收盘价低于4个交易日前的收盘价则计数+1，否则清零）向前推进
+
+计数状态保存在 td_setup_counts 表中（每只股票一行：最新交易日、当前计数、最近4个收盘价），
+每日只需读取各股票状态日期之后的新K线即可推进，不必重新扫描历史数据。
+计数 >= 9 即为低九（与 LowNineStrategy.check_low_nine_pattern 的判断一致）。
+
+回补的K线（日期不晚于股票的状态日期）无法增量推进：推进时发现目标日期的K线早于（或等于）状态日期的股票
+清除状态后重新计算；整段回补历史数据的采集（自选股历史、按区间批量采集）结束后调用 rebuild。
+"""
+
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import text
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+class TDSetupCounter:
+    """九转序列下跌计数器"""
+
+    # 比较的前置交易日数
+    LOOKBACK = 4
+    # 首次建立状态时读取的历史自然日数
+    BOOTSTRAP_DAYS = 120
+
+    def __init__(self, session):
+        self.session = session
+        self._init_table()
+
+    def _init_table(self):
+        try:
+            self.session.execute(text('''
+                CREATE TABLE IF NOT EXISTS td_setup_counts (
+                    code TEXT PRIMARY KEY,
+                    trade_date TEXT NOT NULL,
+                    setup_count INTEGER NOT NULL DEFAULT 0,
+                    close0 REAL, close1 REAL, close2 REAL, close3 REAL,
+                    updated_at TIMESTAMP
+                )
+            '''))
+            self.session.execute(text('''
+                CREATE INDEX IF NOT EXISTS idx_td_setup_counts_count
+                ON td_setup_counts (setup_count, trade_date)
+            '''))
+            self.session.commit()
+        except Exception as e:
+            logger.error(f"初始化 td_setup_counts 表失败: {e}")
+            self.session.rollback()
+
+    @staticmethod
+    def step(count: int, closes: List[Optional[float]], close: Optional[float]) -> Tuple[int, List[Optional[float]]]:
+        """
+        推进一根K线
+
+        Args:
+            count: 当前计数
+            closes: 最近4个收盘价（最新在前）
+            close: 新K线的收盘价
+
+        Returns:
+            (新计数, 新的最近4个收盘价)
+        """
+        base = closes[TDSetupCounter.LOOKBACK - 1] if len(closes) >= TDSetupCounter.LOOKBACK else None
+        if close and close > 0 and base and base > 0 and close < base:
+            count += 1
+        else:
+            count = 0
+        return count, ([close] + list(closes))[:TDSetupCounter.LOOKBACK]
+
+    def _code_filter(self, alias: str, codes: Optional[Sequence[str]], params: Dict) -> str:
+        if not codes:
+            return ""
+        params['codes'] = list(codes)
+        return f"AND {alias}.code = ANY(:codes)"
+
+    def _load_new_bars(self, target_date: str, codes: Optional[Sequence[str]] = None) -> List:
+        """读取每只股票状态日期之后（无状态时为最近 BOOTSTRAP_DAYS 天）到目标日期的K线"""
+        bootstrap_start = (datetime.strptime(target_date, '%Y-%m-%d') -
+                           timedelta(days=self.BOOTSTRAP_DAYS)).strftime('%Y-%m-%d')
+        params = {'target_date': target_date, 'bootstrap_start': bootstrap_start}
+        code_filter = self._code_filter('h', codes, params)
+        params['min_date'] = self._min_load_date(target_date, bootstrap_start, codes)
+        # h.date > :min_date 为常量下界，可以使用日期索引；逐只股票的下界在 COALESCE 中判断
+        return self.session.execute(text(f'''
+            SELECT h.code, h.date, h.close,
+                   t.trade_date, t.setup_count, t.close0, t.close1, t.close2, t.close3
+            FROM historical_quotes h
+            LEFT JOIN td_setup_counts t ON t.code = h.code
+            WHERE h.date > :min_date
+              AND h.date > COALESCE(t.trade_date, :bootstrap_start)
+              AND h.date <= :target_date
+              {code_filter}
+            ORDER BY h.code, h.date
+        '''), params).fetchall()
+
+    def _min_load_date(self, target_date: str, bootstrap_start: str, codes: Optional[Sequence[str]] = None) -> str:
+        """
+        读取新K线的日期下界：目标日期有K线的股票中最早的状态日期，其中有尚无状态的股票时不晚于 bootstrap_start
+
+        只统计目标日期有K线的股票，长期停牌或已退市股票的旧状态不会把下界拉回到很早的日期；
+        目标日期没有任何K线时取全部状态日期的最小值
+        """
+        params = {'target_date': target_date}
+        state_filter = self._code_filter('t', codes, params)
+        min_state = self.session.execute(text(f'''
+            SELECT MIN(t.trade_date) FROM td_setup_counts t
+            JOIN historical_quotes h ON h.code = t.code AND h.date = :target_date
+            WHERE 1 = 1 {state_filter}
+        '''), params).scalar()
+        params = {'target_date': target_date}
+        quote_filter = self._code_filter('h', codes, params)
+        stateless = self.session.execute(text(f'''
+            SELECT h.code FROM historical_quotes h
+            WHERE h.date = :target_date {quote_filter}
+              AND NOT EXISTS (SELECT 1 FROM td_setup_counts t WHERE t.code = h.code)
+            LIMIT 1
+        '''), params).fetchall()
+        if stateless:
+            return bootstrap_start if min_state is None else min(str(min_state), bootstrap_start)
+        if min_state is None:
+            params = {}
+            state_filter = self._code_filter('t', codes, params)
+            min_state = self.session.execute(text(f'''
+                SELECT MIN(t.trade_date) FROM td_setup_counts t WHERE 1 = 1 {state_filter}
+            '''), params).scalar()
+        return bootstrap_start if min_state is None else str(min_state)
+
+    def _late_codes(self, target_date: str, codes: Optional[Sequence[str]] = None) -> Dict[str, str]:
+        """目标日期有K线、但计数状态已推进到该日期或之后的股票（回补的K线） -> 状态日期"""
+        params = {'target_date': target_date}
+        code_filter = self._code_filter('t', codes, params)
+        rows = self.session.execute(text(f'''
+            SELECT t.code, t.trade_date FROM td_setup_counts t
+            JOIN historical_quotes h ON h.code = t.code AND h.date = :target_date
+            WHERE t.trade_date >= :target_date {code_filter}
+        '''), params).fetchall()
+        return {row[0]: str(row[1]) for row in rows}
+
+    def _delete_states(self, codes: Optional[Sequence[str]] = None):
+        if codes:
+            self.session.execute(text("DELETE FROM td_setup_counts WHERE code = ANY(:codes)"),
+                                 {'codes': list(codes)})
+        else:
+            self.session.execute(text("DELETE FROM td_setup_counts"))
+        self.session.commit()
+
+    def advance_for_date(self, target_date: str, codes: Optional[Sequence[str]] = None) -> Dict[str, any]:
+        """
+        将全部（或指定）股票的计数推进到目标日期
+
+        Args:
+            target_date: 目标日期 (YYYY-MM-DD)
+            codes: 股票代码列表，默认全部股票
+
+        Returns:
+            Dict: 计算结果统计
+        """
+        try:
+            late = self._late_codes(target_date, codes)
+            if late:
+                # 回补的K线早于状态日期，清除这些股票的状态后重新计算到原状态日期
+                logger.info(f"{len(late)} 只股票有 {target_date} 的回补K线，重新计算九转序列计数")
+                self._delete_states(list(late))
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"检查九转序列回补K线失败: {e}")
+            return {"total": 0, "success": 0, "failed": 1, "details": [str(e)], "bars": 0, "date": target_date}
+        result = self._advance(target_date, codes)
+        latest = max(late.values(), default=target_date)
+        if latest > target_date and not result['failed']:
+            replayed = self._advance(latest, list(late))
+            result['bars'] += replayed['bars']
+            result['failed'] += replayed['failed']
+            result['details'] += replayed['details']
+        return result
+
+    def _advance(self, target_date: str, codes: Optional[Sequence[str]] = None) -> Dict[str, any]:
+        """从各股票的状态日期推进到目标日期"""
+        try:
+            logger.info(f"开始推进九转序列计数至 {target_date}")
+            rows = self._load_new_bars(target_date, codes)
+
+            states: Dict[str, Dict] = {}
+            for row in rows:
+                code, date, close = row[0], row[1], row[2]
+                state = states.get(code)
+                if state is None:
+                    state = {
+                        'code': code,
+                        'setup_count': int(row[4]) if row[4] is not None else 0,
+                        'closes': [row[5], row[6], row[7], row[8]] if row[3] is not None else [],
+                    }
+                    states[code] = state
+                close = float(close) if close is not None else None
+                state['setup_count'], state['closes'] = self.step(state['setup_count'], state['closes'], close)
+                state['trade_date'] = str(date)
+
+            if states:
+                now = datetime.now()
+                params = []
+                for state in states.values():
+                    closes = state['closes'] + [None] * (self.LOOKBACK - len(state['closes']))
+                    params.append({
+                        'code': state['code'], 'trade_date': state['trade_date'],
+                        'setup_count': state['setup_count'],
+                        'close0': closes[0], 'close1': closes[1], 'close2': closes[2], 'close3': closes[3],
+                        'updated_at': now
+                    })
+                self.session.execute(text('''
+                    INSERT INTO td_setup_counts
+                    (code, trade_date, setup_count, close0, close1, close2, close3, updated_at)
+                    VALUES (:code, :trade_date, :setup_count, :close0, :close1, :close2, :close3, :updated_at)
+                    ON CONFLICT (code) DO UPDATE SET
+                        trade_date = EXCLUDED.trade_date,
+                        setup_count = EXCLUDED.setup_count,
+                        close0 = EXCLUDED.close0,
+                        close1 = EXCLUDED.close1,
+                        close2 = EXCLUDED.close2,
+                        close3 = EXCLUDED.close3,
+                        updated_at = EXCLUDED.updated_at
+                '''), params)
+                self.session.commit()
+
+            result = {"total": len(states), "success": len(states), "failed": 0, "details": [],
+                      "bars": len(rows), "date": target_date}
+            logger.info(f"九转序列计数推进完成: 股票 {len(states)} 只, K线 {len(rows)} 根")
+            return result
+
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"推进九转序列计数至 {target_date} 时发生异常: {e}")
+            return {"total": 0, "success": 0, "failed": 1, "details": [str(e)], "bars": 0, "date": target_date}
+
+    def rebuild(self, target_date: str, codes: Optional[Sequence[str]] = None) -> Dict[str, any]:
+        """
+        清除状态后重新计算（历史数据被整段回补或修正时使用）
+
+        Args:
+            target_date: 目标日期 (YYYY-MM-DD)，一般为最新交易日
+            codes: 股票代码列表，默认全部股票
+        """
+        try:
+            self._delete_states(codes)
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"清除九转序列计数失败: {e}")
+            return {"total": 0, "success": 0, "failed": 1, "details": [str(e)], "bars": 0, "date": target_date}
+        return self._advance(target_date, codes)
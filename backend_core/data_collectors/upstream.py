@@ -0,0 +1,278 @@
+"""
+上游行情接口客户端
+akshare 内部直接调用 requests.get/post，每次调用新建连接，没有任何节奏控制；采集器只在失败后固定等待
+retry_delay 秒。一个 akshare 函数（如全市场行情）会分页发出几十个请求，容易触发上游封禁。
+
+这里接管进程内发往 akshare 上游主机（UPSTREAM_CONFIG['hosts'] 中配置的主机后缀）的 requests 请求
+（install_upstream_client），这些请求经过：
+- 共享长连接池：同一主机复用 keep-alive 连接（每次请求仍使用独立 Session，不共享 cookie）
+- 按上游分组的令牌桶限速：主机按后缀归入上游（东方财富、新浪、同花顺…）
+- 按上游的并发上限：同一上游同时进行的请求数不超过 concurrency
+- 请求超时：未指定超时的请求使用 timeout 配置（秒），连接卡住的请求不会一直占用线程和并发名额
+- 自适应速率：请求成功且平均延迟正常时速率逐步增加（加法增加），出错（连接错误、403/429/5xx）时速率减半
+  并按连续错误次数指数退避暂停该上游，平均延迟超过 slow_latency 时小幅降速
+其他主机的请求（Tushare、内部 HTTP 接口等）仍由原始的 requests.request 发出，不限速。
+
+配置见 backend_core/config/config.py 的 UPSTREAM_CONFIG。采集进程和 API 进程启动时调用 install_upstream_client()
+（重复调用无副作用）。限速等待和并发上限会阻塞调用线程，API 的 async 路由必须通过 run_in_threadpool /
+asyncio.to_thread 调用 akshare，不能在事件循环中直接调用。
+
+使用方式:
+    install_upstream_client()               # 之后 akshare 的全部请求经过限速和共享连接池
+    get_upstream_client().stats()           # 各上游当前速率、平均延迟、错误率
+    time.sleep(retry_backoff(attempt, 5))   # 失败重试的等待时间（指数退避 + 随机抖动）
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from backend_core.config.config import UPSTREAM_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 视为上游限流或故障的响应状态码（5xx 另外判断）
+ERROR_STATUS = (403, 429)
+
+# 平均延迟、错误率的指数平滑系数
+EWMA_ALPHA = 0.2
+
+
+def retry_backoff(attempt: int, base: float, cap: float = 60.0) -> float:
+    """
+    第 attempt 次（从0开始）失败后的等待时间：base * 2^attempt，不超过 cap，乘以 0.5~1 的随机抖动
+    （多个采集器同时失败时错开重试）
+    """
+    return min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+
+class AdaptiveLimiter:
+    """单个上游的自适应令牌桶 + 并发上限"""
+
+    def __init__(self, name: str, rate: float, burst: float, min_rate: float, max_rate: float, concurrency: int,
+                 rate_step: float = 0.1, slow_latency: float = 3.0, backoff_base: float = 2.0,
+                 backoff_max: float = 60.0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            name: 上游名称
+            rate: 初始速率（次/秒）
+            burst: 令牌桶容量（允许的突发请求数）
+            min_rate: 速率下限
+            max_rate: 速率上限
+            concurrency: 同时进行的请求数上限
+            rate_step: 每次正常请求增加的速率
+            slow_latency: 平均延迟超过该值（秒）时降速
+            backoff_base: 出错后暂停的基础时间（秒），连续出错时翻倍
+            backoff_max: 暂停时间上限（秒）
+            clock: 时钟函数（测试用）
+            sleep: 等待函数（测试用）
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.concurrency = concurrency
+        self.rate_step = rate_step
+        self.slow_latency = slow_latency
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._clock = clock
+        self._sleep = sleep
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._consecutive_errors = 0
+        self.calls = 0
+        self.errors = 0
+        self.latency = 0.0
+        self.error_rate = 0.0
+
+    def _wait_time(self) -> float:
+        """取一个令牌，返回需要等待的时间（0 表示已取得）"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """占用一个并发名额并等待令牌（与 release 成对调用）"""
+        self._slots.acquire()
+        try:
+            while True:
+                wait = self._wait_time()
+                if wait <= 0:
+                    return
+                self._sleep(wait)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, latency: float, error: bool):
+        """
+        归还并发名额并按请求结果调整速率
+
+        Args:
+            latency: 请求耗时（秒）
+            error: 是否为连接错误或限流/故障响应
+        """
+        self._slots.release()
+        with self._lock:
+            self.calls += 1
+            self.latency = latency if self.calls == 1 else (1 - EWMA_ALPHA) * self.latency + EWMA_ALPHA * latency
+            self.error_rate = (1 - EWMA_ALPHA) * self.error_rate + EWMA_ALPHA * (1.0 if error else 0.0)
+            if error:
+                self.errors += 1
+                self._consecutive_errors += 1
+                self.rate = max(self.min_rate, self.rate / 2)
+                pause = min(self.backoff_max, self.backoff_base * 2 ** (self._consecutive_errors - 1))
+                self._blocked_until = self._clock() + pause
+                self._tokens = 0
+                logger.warning(f"上游 {self.name} 请求出错，速率降至 {self.rate:.2f} 次/秒，暂停 {pause:.1f} 秒")
+                return
+            self._consecutive_errors = 0
+            if self.latency > self.slow_latency:
+                self.rate = max(self.min_rate, self.rate * 0.9)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.rate_step)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'rate': round(self.rate, 3),
+                'concurrency': self.concurrency,
+                'calls': self.calls,
+                'errors': self.errors,
+                'latency': round(self.latency, 3),
+                'error_rate': round(self.error_rate, 3),
+            }
+
+
+class UpstreamClient:
+    """按上游限速、共享连接池的 HTTP 客户端"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, adapter: Optional[BaseAdapter] = None):
+        """
+        Args:
+            config: 配置，默认 UPSTREAM_CONFIG
+            adapter: 共享的传输适配器，默认为带长连接池的 HTTPAdapter
+        """
+        self.config = config or UPSTREAM_CONFIG
+        self.adapter = adapter or HTTPAdapter(pool_connections=self.config.get('pool_connections', 16),
+                                              pool_maxsize=self.config.get('pool_maxsize', 16))
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        self._lock = threading.Lock()
+
+    def upstream_of(self, url: str) -> Optional[str]:
+        """URL -> 上游名称（按主机后缀匹配），未配置的主机返回 None"""
+        host = (urlparse(url).hostname or '').lower()
+        for suffix, name in self.config.get('hosts', {}).items():
+            if host == suffix or host.endswith('.' + suffix):
+                return name
+        return None
+
+    def limiter(self, upstream: str) -> AdaptiveLimiter:
+        limiter = self._limiters.get(upstream)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(upstream)
+                if limiter is None:
+                    params = {**self.config['default'], **self.config.get('upstreams', {}).get(upstream, {})}
+                    limiter = AdaptiveLimiter(upstream, **params)
+                    self._limiters[upstream] = limiter
+        return limiter
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        与 requests.request 参数相同；每次请求使用独立 Session（不共享 cookie），连接池共享
+        （直接调用时未配置的主机以主机名作为上游单独限速）
+        """
+        limiter = self.limiter(self.upstream_of(url) or (urlparse(url).hostname or '').lower())
+        # akshare 的请求大多不带超时，连接卡住时对冲请求中落后的请求会一直占用线程
+        if kwargs.get('timeout') is None and self.config.get('timeout'):
+            kwargs['timeout'] = self.config['timeout']
+        limiter.acquire()
+        started = time.monotonic()
+        try:
+            session = requests.Session()
+            session.mount('https://', self.adapter)
+            session.mount('http://', self.adapter)
+            response = session.request(method=method, url=url, **kwargs)
+        except Exception:
+            limiter.release(time.monotonic() - started, error=True)
+            raise
+        status = response.status_code
+        limiter.release(time.monotonic() - started, error=status in ERROR_STATUS or status >= 500)
+        return response
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各上游当前状态"""
+        return {name: limiter.stats() for name, limiter in list(self._limiters.items())}
+
+
+_client: Optional[UpstreamClient] = None
+_original_request = None
+_install_lock = threading.Lock()
+
+
+def install_upstream_client(config: Optional[Dict[str, Any]] = None,
+                            adapter: Optional[BaseAdapter] = None) -> Optional[UpstreamClient]:
+    """
+    接管进程内的 requests.request / requests.get / requests.post 等调用（只执行一次）：
+    发往已配置上游主机的请求经过 UpstreamClient，其他请求使用原始的 requests.request
+
+    Returns:
+        UpstreamClient，配置未启用时返回 None
+    """
+    global _client, _original_request
+    config = config or UPSTREAM_CONFIG
+    if not config.get('enabled', True):
+        return None
+    with _install_lock:
+        if _client is not None:
+            return _client
+        client = UpstreamClient(config, adapter)
+        original = _original_request = requests.api.request
+
+        def request(method, url, **kwargs):
+            if client.upstream_of(url) is None:
+                return original(method, url, **kwargs)
+            return client.request(method, url, **kwargs)
+
+        # requests.get/post 等通过 requests.api 模块内的 request 发出请求
+        requests.api.request = request
+        requests.request = request
+        _client = client
+        logger.info(f"上游请求限速和共享连接池已启用（{', '.join(sorted(config.get('hosts', {})))}）")
+        return client
+
+
+def uninstall_upstream_client():
+    """恢复原始的 requests.request（测试用）"""
+    global _client, _original_request
+    with _install_lock:
+        if _original_request is not None:
+            requests.api.request = _original_request
+            requests.request = _original_request
+        _client = None
+        _original_request = None
+
+
+def get_upstream_client() -> Optional[UpstreamClient]:
+    """当前进程的上游客户端（未启用时为 None）"""
+    return _client
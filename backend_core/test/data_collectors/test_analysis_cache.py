@@ -0,0 +1,54 @@
+from backend_core.data_collectors.analysis_cache import invalidate_analysis_cache, invalidate_analysis_snapshots
+
+
+class FakeResult:
+    def __init__(self, value=None, rowcount=0):
+        self.value = value
+        self.rowcount = rowcount
+
+    def scalar(self):
+        return self.value
+
+
+class FakeSession:
+    """记录 DELETE 语句，按代码条件模拟 stock_analysis_cache / stock_analysis_snapshot 中的行"""
+
+    def __init__(self, codes):
+        self.rows = {'stock_analysis_cache': list(codes), 'stock_analysis_snapshot': list(codes)}
+        self.deletes = []
+        self.committed = False
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        if 'to_regclass' in sql:
+            return FakeResult('table')
+        table = sql.split('DELETE FROM ')[1].split()[0]
+        self.deletes.append((sql, params))
+        length = 6 if 'LENGTH(code) = 6' in sql else 5
+        codes = set((params or {}).get('codes', self.rows[table]))
+        removed = [code for code in self.rows[table] if len(code) == length and code in codes]
+        self.rows[table] = [code for code in self.rows[table] if code not in removed]
+        return FakeResult(rowcount=len(removed))
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+
+def test_invalidation_scoped_to_rewritten_codes():
+    session = FakeSession(['600000', '000001', '300750', '00700'])
+    assert invalidate_analysis_cache(session, 'A', ['000001']) == 1
+    assert invalidate_analysis_snapshots(session, 'A', ['000001']) == 1
+    assert session.rows['stock_analysis_cache'] == ['600000', '300750', '00700']
+    assert session.rows['stock_analysis_snapshot'] == ['600000', '300750', '00700']
+    assert all('ANY(:codes)' in sql and params == {'codes': ['000001']} for sql, params in session.deletes)
+    assert session.committed
+
+
+def test_invalidation_without_codes_clears_market():
+    session = FakeSession(['600000', '000001', '00700'])
+    assert invalidate_analysis_snapshots(session, 'A') == 2
+    assert session.rows['stock_analysis_snapshot'] == ['00700']
+    assert 'ANY(:codes)' not in session.deletes[0][0]
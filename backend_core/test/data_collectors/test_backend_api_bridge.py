@@ -0,0 +1,22 @@
+from backend_core.data_collectors import backend_api_bridge
+from backend_core.database import db as core_db
+
+
+def test_bridge_does_not_patch_backend_api_database():
+    import database
+    from stock import screening_jobs
+
+    # API 进程导入采集器（进而导入桥接）后，API 路由仍使用自己的引擎和会话工厂
+    assert database.engine is not core_db.engine
+    assert database.SessionLocal is not core_db.SessionLocal
+    assert screening_jobs.SessionLocal is database.SessionLocal
+    assert backend_api_bridge.indicator_state.__name__ == 'stock.indicator_state'
+
+
+def test_bridged_work_uses_explicit_sessions():
+    import inspect
+
+    # 采集任务使用的实现都由调用方传入会话（或会话工厂），不依赖 backend_api 的全局会话
+    assert 'session' in inspect.signature(backend_api_bridge.indicator_state.IndicatorStateStore).parameters
+    assert 'session_factory' in inspect.signature(backend_api_bridge.analysis_snapshots.build_watchlist_snapshots).parameters
+    assert 'db' in inspect.signature(backend_api_bridge.screening_results.precompute_screening_results).parameters
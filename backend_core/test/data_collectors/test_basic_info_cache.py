@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend_core.data_collectors.basic_info_cache import BasicInfoCache
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    statements = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement.strip().split()[0].upper()))
+    db = sessionmaker(bind=engine)()
+    db.execute(text("CREATE TABLE stock_basic_info (code TEXT PRIMARY KEY, name TEXT, create_date TIMESTAMP)"))
+    db.execute(text("INSERT INTO stock_basic_info VALUES ('600000', '浦发银行', '2024-01-01 00:00:00')"))
+    db.commit()
+    statements.clear()
+    db.statements = statements
+    yield db
+    db.close()
+
+
+def quotes(*rows):
+    return pd.DataFrame(rows, columns=['code', 'name'])
+
+
+def sync(cache, db, frame):
+    rows = cache.changed(db, frame)
+    cache.write(db, rows, create_date='2024-06-14 10:00:00')
+    db.commit()
+    cache.remember(rows)
+    return rows
+
+
+def test_only_new_or_renamed_codes_are_written(session):
+    cache = BasicInfoCache('stock_basic_info', ttl=3600)
+    frame = quotes(('600000', '浦发银行'), ('000001', '平安银行'))
+    assert list(sync(cache, session, frame)['code']) == ['000001']
+    assert session.statements == ['SELECT', 'INSERT']
+
+    # 第二次采集：缓存命中，无读取也无写入
+    session.statements.clear()
+    assert sync(cache, session, frame).empty
+    assert session.statements == []
+
+    renamed = quotes(('600000', '浦发银行'), ('000001', 'ST平安'), ('300750', '宁德时代'))
+    assert list(sync(cache, session, renamed)['code']) == ['000001', '300750']
+    rows = session.execute(text("SELECT code, name, create_date FROM stock_basic_info ORDER BY code")).fetchall()
+    assert [tuple(row) for row in rows] == [
+        ('000001', 'ST平安', '2024-06-14 10:00:00'),
+        ('300750', '宁德时代', '2024-06-14 10:00:00'),
+        # 名称未变化的股票不改写
+        ('600000', '浦发银行', '2024-01-01 00:00:00'),
+    ]
+
+
+def test_ttl_and_clear_reload_from_database(session):
+    cache = BasicInfoCache('stock_basic_info', ttl=0)
+    frame = quotes(('600000', '浦发银行'))
+    assert cache.changed(session, frame).empty
+    # 其他进程修改了名称，过期后重新读取
+    session.execute(text("UPDATE stock_basic_info SET name = '浦发' WHERE code = '600000'"))
+    session.commit()
+    assert list(cache.changed(session, frame)['code']) == ['600000']
+
+    cache = BasicInfoCache('stock_basic_info', ttl=3600)
+    assert cache.changed(session, quotes(('600000', '浦发'))).empty
+    session.execute(text("DELETE FROM stock_basic_info"))
+    session.commit()
+    assert cache.changed(session, quotes(('600000', '浦发'))).empty
+    cache.clear()
+    assert list(cache.changed(session, quotes(('600000', '浦发')))['code']) == ['600000']
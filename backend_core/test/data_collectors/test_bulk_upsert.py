@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend_core.data_collectors.bulk_upsert import (
+    ROW_HASH_COLUMN, changed_rows, drop_stage, ensure_row_hash_column, row_hashes, run_with_lock_retry, stage_frame,
+    upsert_from_stage,
+)
+
+STAGE_COLUMNS = {
+    'code': 'TEXT',
+    'trade_date': 'TEXT',
+    'name': 'TEXT',
+    'current_price': 'DOUBLE PRECISION',
+    'volume': 'DOUBLE PRECISION',
+    'update_time': 'TIMESTAMP',
+}
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    db = sessionmaker(bind=engine)()
+    db.execute(text("CREATE TABLE stock_basic_info (code TEXT PRIMARY KEY, name TEXT, create_date TIMESTAMP)"))
+    db.execute(text("""
+        CREATE TABLE stock_realtime_quote (
+            code TEXT, trade_date TEXT, name TEXT, current_price REAL, volume REAL, update_time TIMESTAMP,
+            PRIMARY KEY(code, trade_date)
+        )
+    """))
+    db.commit()
+    yield db
+    db.close()
+
+
+def make_frame(rows):
+    return pd.DataFrame(rows, columns=list(STAGE_COLUMNS))
+
+
+def write(db, frame):
+    def run():
+        count = stage_frame(db, 'stage_quote', frame, STAGE_COLUMNS, key_columns=['code'])
+        if count:
+            upsert_from_stage(db, 'stage_quote', 'stock_basic_info', columns=['code', 'name', 'create_date'],
+                              key_columns=['code'], select_expressions=['code', 'name', 'update_time'])
+            upsert_from_stage(db, 'stage_quote', 'stock_realtime_quote', columns=list(STAGE_COLUMNS),
+                              key_columns=['code', 'trade_date'])
+        drop_stage(db, 'stage_quote')
+        return count
+    return run_with_lock_retry(db, run)
+
+
+def test_staged_upsert_inserts_and_updates(session):
+    first = make_frame([
+        ('600000', '2024-06-14', '浦发银行', 10.5, 1e6, '2024-06-14 10:00:00'),
+        ('000001', '2024-06-14', '平安银行', np.nan, None, '2024-06-14 10:00:00'),
+    ])
+    assert write(session, first) == 2
+
+    # 同一代码出现两次时保留最后一条；已有行整体更新
+    second = make_frame([
+        ('600000', '2024-06-14', '浦发银行', 10.6, 1e6, '2024-06-14 10:01:00'),
+        ('600000', '2024-06-14', '浦发银行', 10.7, 2e6, '2024-06-14 10:01:00'),
+        ('300750', '2024-06-14', '宁德时代', 180.0, 5e5, '2024-06-14 10:01:00'),
+    ])
+    assert write(session, second) == 2
+
+    quotes = session.execute(text(
+        "SELECT code, name, current_price, volume, update_time FROM stock_realtime_quote ORDER BY code"
+    )).fetchall()
+    assert [tuple(row) for row in quotes] == [
+        ('000001', '平安银行', None, None, '2024-06-14 10:00:00'),
+        ('300750', '宁德时代', 180.0, 5e5, '2024-06-14 10:01:00'),
+        ('600000', '浦发银行', 10.7, 2e6, '2024-06-14 10:01:00'),
+    ]
+    basic = session.execute(text("SELECT code, create_date FROM stock_basic_info ORDER BY code")).fetchall()
+    assert [tuple(row) for row in basic] == [
+        ('000001', '2024-06-14 10:00:00'), ('300750', '2024-06-14 10:01:00'), ('600000', '2024-06-14 10:01:00'),
+    ]
+    # 暂存表已删除
+    assert session.execute(text("SELECT name FROM sqlite_temp_master WHERE name = 'stage_quote'")).fetchone() is None
+
+
+def test_empty_frame_writes_nothing(session):
+    assert write(session, make_frame([])) == 0
+    assert session.execute(text("SELECT COUNT(*) FROM stock_realtime_quote")).scalar() == 0
+
+
+def test_lock_conflict_retries_whole_transaction(session):
+    frame = make_frame([('600000', '2024-06-14', '浦发银行', 10.5, 1e6, '2024-06-14 10:00:00')])
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        stage_frame(session, 'stage_quote', frame, STAGE_COLUMNS)
+        upsert_from_stage(session, 'stage_quote', 'stock_realtime_quote', columns=list(STAGE_COLUMNS),
+                          key_columns=['code', 'trade_date'])
+        if len(attempts) < 3:
+            raise RuntimeError('psycopg2.errors.LockNotAvailable: canceling statement due to lock timeout')
+        return len(frame)
+
+    assert run_with_lock_retry(session, flaky) == 1
+    assert len(attempts) == 3
+    assert session.execute(text("SELECT COUNT(*) FROM stock_realtime_quote")).scalar() == 1
+
+    attempts.clear()
+
+    def broken():
+        attempts.append(1)
+        raise ValueError('bad data')
+
+    with pytest.raises(ValueError):
+        run_with_lock_retry(session, broken)
+    assert len(attempts) == 1
+
+
+def write_changed(db, frame):
+    frame = frame.copy()
+    frame[ROW_HASH_COLUMN] = row_hashes(frame, ['name', 'current_price', 'volume'])
+    columns = {**STAGE_COLUMNS, ROW_HASH_COLUMN: 'BIGINT'}
+
+    def run():
+        stage_frame(db, 'stage_quote', frame, columns)
+        changed = upsert_from_stage(db, 'stage_quote', 'stock_realtime_quote', columns=list(columns),
+                                    key_columns=['code', 'trade_date'], changed_only=True)
+        drop_stage(db, 'stage_quote')
+        return changed
+    ensure_row_hash_column(db, 'stock_realtime_quote')
+    return run_with_lock_retry(db, run)
+
+
+def test_changed_only_upsert_skips_identical_rows(session):
+    rows = [
+        ('600000', '2024-06-14', '浦发银行', 10.5, 1e6, '2024-06-14 10:00:00'),
+        ('000001', '2024-06-14', '平安银行', np.nan, None, '2024-06-14 10:00:00'),
+        ('300750', '2024-06-14', '宁德时代', 180.0, 5e5, '2024-06-14 10:00:00'),
+    ]
+    assert write_changed(session, make_frame(rows)) == 3
+
+    # 只有 600000 的价格变化，其余行（包括全为空值的行）内容相同
+    later = [(code, date, name, price, volume, '2024-06-14 11:00:00') for code, date, name, price, volume, _ in rows]
+    later[0] = ('600000', '2024-06-14', '浦发银行', 10.6, 1e6, '2024-06-14 11:00:00')
+    assert write_changed(session, make_frame(later)) == 1
+    assert write_changed(session, make_frame(later)) == 0
+
+    times = dict(session.execute(text("SELECT code, update_time FROM stock_realtime_quote")).fetchall())
+    assert times == {'600000': '2024-06-14 11:00:00', '000001': '2024-06-14 10:00:00',
+                     '300750': '2024-06-14 10:00:00'}
+
+    # 没有 row_hash 的行（其他采集器写入）视为变化
+    session.execute(text("UPDATE stock_realtime_quote SET row_hash = NULL WHERE code = '300750'"))
+    session.commit()
+    assert write_changed(session, make_frame(later)) == 1
+
+
+def test_changed_rows_against_stored_hashes(session):
+    session.execute(text("CREATE TABLE board (board_code TEXT PRIMARY KEY, price REAL)"))
+    session.commit()
+    ensure_row_hash_column(session, 'board')
+    frame = pd.DataFrame({'board_code': ['BK01', 'BK02', 'BK03'], 'price': [1.0, 2.0, 3.0]})
+    frame[ROW_HASH_COLUMN] = row_hashes(frame, ['price'])
+    session.execute(text("INSERT INTO board VALUES (:board_code, :price, :row_hash)"),
+                    [{'board_code': 'BK01', 'price': 1.0, 'row_hash': int(frame[ROW_HASH_COLUMN][0])},
+                     {'board_code': 'BK02', 'price': 2.5, 'row_hash': 12345},
+                     {'board_code': 'BK09', 'price': 9.0, 'row_hash': None}])
+    session.commit()
+
+    changed, removed = changed_rows(session, 'board', frame, 'board_code')
+    assert list(changed['board_code']) == ['BK02', 'BK03']
+    assert removed == ['BK09']
@@ -0,0 +1,81 @@
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend_core.data_collectors.frame_mapping import Field, FrameMapping, to_records
+
+
+def safe_value(val):
+    """原逐个单元格转换"""
+    return None if pd.isna(val) else float(val)
+
+
+def test_numeric_columns_match_per_cell_conversion():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'代码': [f'{i:06d}' for i in range(200)], '最新价': rng.normal(10, 2, 200),
+                       '成交量': rng.integers(0, 10 ** 6, 200).astype(float)})
+    df.loc[::7, '最新价'] = np.nan
+    mapping = FrameMapping([Field('code', '代码', kind='text'), Field('current_price', '最新价'),
+                            Field('volume', '成交量')])
+
+    records = mapping.records(df, trade_date='2024-06-14')
+    expected = [{'code': row['代码'], 'current_price': safe_value(row['最新价']), 'volume': safe_value(row['成交量']),
+                 'trade_date': '2024-06-14'} for _, row in df.iterrows()]
+    assert records == expected
+
+
+def test_candidate_columns_coalesce_per_row():
+    df = pd.DataFrame({
+        '代码': [' 00700 ', None, '', '09988'],
+        'symbol': ['x', '01810', '03690', 'y'],
+        '最新价': ['350.2', '-', None, 80],
+        '现价': [1.0, 2.0, 3.0, 4.0],
+    })
+    mapping = FrameMapping([
+        Field('code', ('代码', 'symbol'), kind='text'),
+        Field('current_price', ('最新价', '现价')),
+        Field('english_name', ('英文名称', 'engname'), kind='text'),
+        Field('volume_ratio', '量比', default=1.0),
+    ])
+    assert mapping.resolve(df.columns) == {'code': ['代码', 'symbol'], 'current_price': ['最新价', '现价'],
+                                           'english_name': [], 'volume_ratio': []}
+
+    frame = mapping.apply(df)
+    assert list(frame['code']) == ['00700', '01810', '03690', '09988']
+    assert list(frame['current_price']) == [350.2, 2.0, 3.0, 80.0]
+    assert list(frame['english_name']) == [None] * 4
+    assert list(frame['volume_ratio']) == [1.0] * 4
+
+
+def test_int_text_and_datetime_columns():
+    df = pd.DataFrame({
+        '上涨家数': [12, None, '7'],
+        '公告日期': [date(2024, 6, 14), date(2024, 6, 13), None],
+        'pub_time': ['2024-06-14 09:30:00', '2024-06-14 09:31:00.250', 'bad'],
+    }, index=[5, 9, 11])
+    now = datetime(2024, 6, 14, 15, 0)
+    mapping = FrameMapping([
+        Field('up_count', '上涨家数', kind='int'),
+        Field('publish_date', '公告日期', kind='text'),
+        Field('publish_time', 'pub_time', kind='datetime', default=lambda: now),
+        Field('source', (), kind='text', default='财新网'),
+    ])
+
+    records = mapping.records(df)
+    assert records == [
+        {'up_count': 12, 'publish_date': '2024-06-14', 'publish_time': datetime(2024, 6, 14, 9, 30),
+         'source': '财新网'},
+        {'up_count': None, 'publish_date': '2024-06-13', 'publish_time': datetime(2024, 6, 14, 9, 31, 0, 250000),
+         'source': '财新网'},
+        {'up_count': 7, 'publish_date': None, 'publish_time': now, 'source': '财新网'},
+    ]
+    assert type(records[0]['up_count']) is int and type(records[0]['publish_time']) is datetime
+
+
+def test_to_records_subset_and_unknown_kind():
+    frame = pd.DataFrame({'a': [1.5, np.nan], 'b': ['x', None]})
+    assert to_records(frame, ['a']) == [{'a': 1.5}, {'a': None}]
+    with pytest.raises(ValueError):
+        Field('a', kind='decimal')
@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from backend_core.data_collectors import hedged_fetch as hedged_module
+from backend_core.data_collectors.hedged_fetch import SourceLatency, hedged_fetch
+
+FULL = pd.DataFrame({'代码': [f'{i:06d}' for i in range(10)]})
+
+
+def source(delay=0.0, result=FULL, error=None, calls=None, name=None):
+    def fetch():
+        if calls is not None:
+            calls.append(name)
+        time.sleep(delay)
+        if error:
+            raise error
+        return result
+    return fetch
+
+
+@pytest.fixture(autouse=True)
+def drain_running():
+    yield
+    # 等待上一个测试中落后的请求结束，避免同名数据源的请求被下一个测试复用
+    for future in list(hedged_module._running.values()):
+        future.exception(timeout=10)
+
+
+def test_primary_within_budget_does_not_hedge():
+    calls, latency = [], SourceLatency()
+    name, df = hedged_fetch([('em', source(0.01, calls=calls, name='em')),
+                             ('sina', source(calls=calls, name='sina'))],
+                            budget=1.0, min_rows=10, latency=latency)
+    assert name == 'em' and df is FULL and calls == ['em']
+    assert latency.stats()['em']['count'] == 1
+
+
+def test_slow_primary_is_hedged_and_fastest_wins():
+    latency = SourceLatency()
+    release = threading.Event()
+    started = time.monotonic()
+    name, _ = hedged_fetch([('em', lambda: release.wait(5) and FULL), ('sina', source(0.05))],
+                           budget=0.1, min_rows=10, latency=latency)
+    elapsed = time.monotonic() - started
+    release.set()
+    assert name == 'sina'
+    # 主数据源仍未返回：总耗时约为预算 + 备用数据源耗时
+    assert elapsed < 1.0
+
+
+def test_failure_or_incomplete_frame_hedges_immediately():
+    calls = []
+    name, _ = hedged_fetch([('em', source(error=RuntimeError('boom'), calls=calls, name='em')),
+                            ('sina', source(calls=calls, name='sina'))],
+                           budget=30.0, min_rows=10, latency=SourceLatency())
+    assert name == 'sina' and calls == ['em', 'sina']
+
+    # 都不完整时返回行数最多的结果
+    name, df = hedged_fetch([('em', source(result=FULL.head(3))), ('sina', source(result=FULL.head(5)))],
+                            budget=30.0, min_rows=10, latency=SourceLatency())
+    assert name == 'sina' and len(df) == 5
+
+    with pytest.raises(Exception, match='所有数据源都失败了'):
+        hedged_fetch([('em', source(error=RuntimeError('a'))), ('sina', source(result=FULL.head(0)))],
+                     budget=30.0, min_rows=10, latency=SourceLatency())
+
+
+def test_total_timeout():
+    release = threading.Event()
+    with pytest.raises(TimeoutError):
+        hedged_fetch([('em', lambda: release.wait(5))], budget=0.05, timeout=0.1, latency=SourceLatency())
+    release.set()
+
+
+def test_latency_percentiles_and_adaptive_budget():
+    latency = SourceLatency(window=50)
+    assert latency.budget('em', 8.0) == 8.0
+    for i in range(1, 101):
+        latency.record('em', i / 100, ok=True)
+    latency.record('em', 9.9, ok=False)
+    stats = latency.stats()['em']
+    # 只保留最近50个样本（0.51~1.00秒）
+    assert stats['count'] == 50 and stats['failures'] == 1
+    assert stats['p50'] == pytest.approx(0.755) and stats['p99'] == pytest.approx(0.995, abs=1e-3)
+    assert latency.budget('em', 8.0) == pytest.approx(0.9755, abs=1e-3)
+    assert latency.budget('em', 0.5) == 0.5
+
+
+def test_latency_recorded_per_attempt_outside_retries():
+    latency = SourceLatency()
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        time.sleep(0.02)
+        if len(attempts) < 3:
+            raise RuntimeError('busy')
+        return FULL
+
+    def retry(attempt):
+        for i in range(3):
+            try:
+                return attempt()
+            except RuntimeError:
+                time.sleep(0.2)  # 重试等待不计入延迟
+
+    name, _ = hedged_fetch([('em', flaky)], budget=5.0, min_rows=10, latency=latency, retry=retry)
+    stats = latency.stats()['em']
+    assert name == 'em' and len(attempts) == 3
+    assert stats['failures'] == 2 and stats['count'] == 1
+    assert stats['p50'] < 0.15
+
+
+def test_running_source_is_not_resubmitted():
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append('em')
+        release.wait(5)
+        return FULL
+
+    # 第一次请求超时后仍在执行，第二次请求等待同一个请求，不再提交新的请求
+    with pytest.raises(TimeoutError):
+        hedged_fetch([('em', slow)], budget=0.05, timeout=0.1, latency=SourceLatency())
+    threading.Timer(0.05, release.set).start()
+    name, df = hedged_fetch([('em', slow)], budget=5.0, timeout=5, min_rows=10, latency=SourceLatency())
+    assert name == 'em' and df is FULL and calls == ['em']
+
+    # 请求结束后再次请求会重新提交
+    hedged_fetch([('em', slow)], budget=5.0, min_rows=10, latency=SourceLatency())
+    assert calls == ['em', 'em']
@@ -0,0 +1,69 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend_core.data_collectors.bulk_upsert import run_with_lock_retry
+from backend_core.data_collectors.intraday_snapshots import (
+    SNAPSHOT_TABLE, append_snapshots, ensure_snapshot_partitions, purge_snapshots,
+)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    db = sessionmaker(bind=engine)()
+    yield db
+    db.close()
+
+
+def quotes(update_time, prices, trade_date='2024-06-14'):
+    codes = ['600000', '000001', '00700'][:len(prices)]
+    return pd.DataFrame({
+        'code': codes, 'trade_date': trade_date, 'name': 'x', 'current_price': prices,
+        'change_percent': [1.0] * len(prices), 'volume': [1234.6, np.nan, 10.0][:len(prices)],
+        'amount': [1.5e10] * len(prices), 'high': 11.0, 'low': 9.0, 'open': 10.0, 'pre_close': 10.0,
+        'update_time': update_time,
+    })
+
+
+def append(db, frame):
+    ensure_snapshot_partitions(db, frame)
+    return run_with_lock_retry(db, lambda: append_snapshots(db, frame))
+
+
+def test_append_only_snapshots(session):
+    assert append(session, quotes('2024-06-14 10:00:00', [10.0, 20.0, 300.0])) == 3
+    assert append(session, quotes('2024-06-14 10:01:00', [10.1, np.nan])) == 2
+    # 锁冲突整体重试时同一时间点的快照不重复写入
+    assert append(session, quotes('2024-06-14 10:01:00', [10.1, np.nan])) == 0
+
+    rows = session.execute(text(f"""
+        SELECT trade_date, ts, code, current_price, volume, amount, turnover_rate FROM {SNAPSHOT_TABLE}
+        ORDER BY ts, code
+    """)).fetchall()
+    assert [tuple(row) for row in rows] == [
+        ('2024-06-14', '2024-06-14 10:00:00', '000001', 20.0, None, 1.5e10, None),
+        ('2024-06-14', '2024-06-14 10:00:00', '00700', 300.0, 10, 1.5e10, None),
+        ('2024-06-14', '2024-06-14 10:00:00', '600000', 10.0, 1235, 1.5e10, None),
+        ('2024-06-14', '2024-06-14 10:01:00', '000001', None, None, 1.5e10, None),
+        ('2024-06-14', '2024-06-14 10:01:00', '600000', 10.1, 1235, 1.5e10, None),
+    ]
+    indexes = {row[1] for row in session.execute(text(f"PRAGMA index_list({SNAPSHOT_TABLE})")).fetchall()}
+    assert f'idx_{SNAPSHOT_TABLE}_code' in indexes
+
+
+def test_retention_removes_expired_days(session):
+    append(session, quotes('2024-05-01 10:00:00', [10.0], trade_date='2024-05-01'))
+    append(session, quotes('2024-06-13 10:00:00', [10.0], trade_date='2024-06-13'))
+    # 新交易日首次写入时按保留天数清理（默认30天）
+    append(session, quotes('2024-06-14 10:00:00', [10.0]))
+    dates = session.execute(text(f"SELECT DISTINCT trade_date FROM {SNAPSHOT_TABLE} ORDER BY trade_date")).scalars()
+    assert list(dates) == ['2024-06-13', '2024-06-14']
+
+    assert purge_snapshots(session, keep_days=0, today=date(2024, 6, 14)) == 1
+    assert session.execute(text(f"SELECT COUNT(*) FROM {SNAPSHOT_TABLE}")).scalar() == 1
@@ -0,0 +1,172 @@
+import threading
+import time
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from backend_core.data_collectors.upstream import (
+    AdaptiveLimiter, get_upstream_client, install_upstream_client, retry_backoff, uninstall_upstream_client,
+)
+
+CONFIG = {
+    'enabled': True,
+    'timeout': 30,
+    'hosts': {'eastmoney.com': 'eastmoney', 'sinajs.cn': 'sina'},
+    'default': {'rate': 100.0, 'burst': 10, 'min_rate': 1.0, 'max_rate': 200.0, 'concurrency': 2},
+    'upstreams': {'sina': {'rate': 50.0}},
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_limiter(clock, **params):
+    params = {'rate': 10.0, 'burst': 2, 'min_rate': 1.0, 'max_rate': 20.0, 'concurrency': 4, 'rate_step': 0.5,
+              'slow_latency': 1.0, 'backoff_base': 2.0, 'backoff_max': 5.0, **params}
+    return AdaptiveLimiter('test', clock=clock, sleep=clock.sleep, **params)
+
+
+def test_token_bucket_paces_after_burst():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    for _ in range(5):
+        limiter.acquire()
+        limiter._slots.release()
+    # 前2个请求为突发，之后每0.1秒一个
+    assert clock.now == pytest.approx(0.3)
+
+
+def test_rate_adapts_to_errors_and_latency():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    limiter.acquire()
+    limiter.release(0.1, error=False)
+    assert limiter.rate == pytest.approx(10.5)
+
+    # 出错：速率减半并暂停，连续出错时暂停时间翻倍（不超过上限）
+    for pause in (2.0, 4.0, 5.0):
+        limiter.acquire()
+        limiter.release(0.1, error=True)
+        started = clock.now
+        limiter.acquire()
+        limiter._slots.release()
+        assert clock.now - started >= pause
+    assert limiter.rate == pytest.approx(10.5 / 8)
+    assert limiter.stats()['errors'] == 3
+
+    # 平均延迟过高时降速
+    rate = limiter.rate
+    limiter.acquire()
+    limiter.release(10.0, error=False)
+    assert limiter.rate == pytest.approx(max(1.0, rate * 0.9))
+
+
+def test_concurrency_cap():
+    limiter = AdaptiveLimiter('test', rate=1000.0, burst=1000, min_rate=1.0, max_rate=1000.0, concurrency=2)
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def call():
+        limiter.acquire()
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        limiter.release(0.02, error=False)
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+
+
+class RecordingAdapter(BaseAdapter):
+    """不发出网络请求，按主机返回状态码"""
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+        self.timeouts = []
+
+    def send(self, request, **kwargs):
+        self.urls.append(request.url)
+        self.timeouts.append(kwargs.get('timeout'))
+        response = requests.Response()
+        response.status_code = 429 if 'sinajs' in request.url else 200
+        response.url = request.url
+        response.request = request
+        response._content = b'{}'
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client():
+    uninstall_upstream_client()
+    adapter = RecordingAdapter()
+    installed = install_upstream_client(CONFIG, adapter)
+    yield installed, adapter
+    uninstall_upstream_client()
+
+
+def test_requests_calls_go_through_shared_client(client):
+    installed, adapter = client
+    assert install_upstream_client(CONFIG) is installed is get_upstream_client()
+
+    assert requests.get('https://push2.eastmoney.com/api/qt/clist/get', params={'pn': 1}).status_code == 200
+    requests.post('https://82.push2.eastmoney.com/api')
+    requests.request('GET', 'https://hq.sinajs.cn/list=sh600000')
+    assert adapter.urls[0] == 'https://push2.eastmoney.com/api/qt/clist/get?pn=1'
+
+    stats = installed.stats()
+    assert stats['eastmoney']['calls'] == 2 and stats['eastmoney']['rate'] > 100.0
+    # 429 视为限流：速率按上游单独减半
+    assert stats['sina']['errors'] == 1 and stats['sina']['rate'] == 25.0
+    # 未指定超时的请求使用配置的超时
+    requests.get('https://push2.eastmoney.com/api', timeout=5)
+    assert adapter.timeouts == [30, 30, 30, 5]
+
+
+def test_unconfigured_hosts_use_original_request(monkeypatch):
+    uninstall_upstream_client()
+    sent = []
+    # 安装前的原始 requests.request（不发出网络请求）
+    monkeypatch.setattr(requests.api, 'request', lambda method, url, **kwargs: sent.append(url) or 'original')
+    adapter = RecordingAdapter()
+    installed = install_upstream_client(CONFIG, adapter)
+    try:
+        # Tushare、内部接口等未配置的主机不经过限速
+        assert requests.post('http://api.tushare.pro', json={}) == 'original'
+        assert requests.get('http://127.0.0.1:8000/api/stock') == 'original'
+        assert sent == ['http://api.tushare.pro', 'http://127.0.0.1:8000/api/stock']
+        assert adapter.urls == [] and installed.stats() == {}
+
+        assert requests.get('https://push2.eastmoney.com/api').status_code == 200
+        assert list(installed.stats()) == ['eastmoney'] and len(sent) == 2
+    finally:
+        uninstall_upstream_client()
+
+
+def test_disabled_config_and_backoff():
+    uninstall_upstream_client()
+    assert install_upstream_client({**CONFIG, 'enabled': False}) is None
+    assert requests.api.request.__module__ == 'requests.api'
+    for attempt in range(6):
+        assert 0.5 * min(60, 5 * 2 ** attempt) <= retry_backoff(attempt, 5) <= min(60, 5 * 2 ** attempt)
@@ -0,0 +1,195 @@
+import random
+
+from backend_core.data_collectors.tushare.td_setup_counter import TDSetupCounter
+
+
+def brute_force_count(closes):
+    """按定义从头计算最新K线的下跌计数（closes 按时间正序）"""
+    count = 0
+    for i in range(len(closes) - 1, 3, -1):
+        if closes[i] and closes[i - 4] and 0 < closes[i] < closes[i - 4]:
+            count += 1
+        else:
+            break
+    return count
+
+
+class FakeSession:
+    """用内存数据模拟 historical_quotes 与 td_setup_counts"""
+
+    def __init__(self, quotes):
+        self.quotes = quotes  # {code: [(date, close), ...]}
+        self.states = {}
+        self.sql = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        params = params or {}
+        codes = set(params['codes']) if isinstance(params, dict) and 'codes' in params else None
+        self.sql.append(sql)
+        if 'SELECT MIN(t.trade_date)' in sql:
+            on_target = 'JOIN historical_quotes h' in sql
+            dates = [state['trade_date'] for code, state in self.states.items() if (codes is None or code in codes)
+                     and (not on_target or any(date == params['target_date'] for date, _ in self.quotes.get(code, [])))]
+            return FakeResult([(min(dates) if dates else None,)])
+        if 'AND NOT EXISTS' in sql:
+            return FakeResult([(code,) for code, bars in self.quotes.items()
+                               if code not in self.states and (codes is None or code in codes)
+                               and any(date == params['target_date'] for date, _ in bars)][:1])
+        if 'JOIN historical_quotes h ON' in sql:
+            return FakeResult([(code, state['trade_date']) for code, state in self.states.items()
+                               if state['trade_date'] >= params['target_date'] and (codes is None or code in codes)
+                               and any(date == params['target_date'] for date, _ in self.quotes.get(code, []))])
+        if 'DELETE FROM td_setup_counts' in sql:
+            for code in list(self.states):
+                if codes is None or code in codes:
+                    del self.states[code]
+            return FakeResult([])
+        if 'FROM historical_quotes h' in sql:
+            rows = []
+            for code in sorted(self.quotes):
+                if codes is not None and code not in codes:
+                    continue
+                state = self.states.get(code)
+                floor = max(state['trade_date'] if state else params['bootstrap_start'], params['min_date'])
+                for date, close in self.quotes[code]:
+                    if floor < date <= params['target_date']:
+                        rows.append((code, date, close,
+                                     state['trade_date'] if state else None,
+                                     state['setup_count'] if state else None,
+                                     *(state[f'close{i}'] if state else None for i in range(4))))
+            return FakeResult(rows)
+        if 'INSERT INTO td_setup_counts' in sql:
+            for item in params:
+                self.states[item['code']] = dict(item)
+        return FakeResult([])
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+    def scalar(self):
+        return self.rows[0][0] if self.rows else None
+
+
+def make_quotes(n_stocks=5, n_days=60, seed=3):
+    rng = random.Random(seed)
+    dates = [f'2024-{1 + d // 28:02d}-{1 + d % 28:02d}' for d in range(n_days)]
+    quotes = {}
+    for i in range(n_stocks):
+        price = 10.0
+        bars = []
+        for date in dates:
+            # 偏向下跌，便于出现较长的计数
+            price *= 1 + rng.uniform(-0.05, 0.02)
+            bars.append((date, round(price, 2)))
+        quotes[f'60000{i}'] = bars
+    return quotes, dates
+
+
+def test_step_matches_definition():
+    rng = random.Random(1)
+    closes = [10.0]
+    for _ in range(300):
+        closes.append(closes[-1] * (1 + rng.uniform(-0.04, 0.03)))
+    count, recent = 0, []
+    for i, close in enumerate(closes):
+        count, recent = TDSetupCounter.step(count, recent, close)
+        assert count == brute_force_count(closes[:i + 1])
+
+
+def test_daily_advance_matches_full_rebuild():
+    quotes, dates = make_quotes()
+    incremental = FakeSession(quotes)
+    counter = TDSetupCounter(incremental)
+    counter.advance_for_date(dates[40])
+    for date in dates[41:]:
+        result = counter.advance_for_date(date)
+        assert result['bars'] == len(quotes)
+
+    full = FakeSession(quotes)
+    TDSetupCounter(full).advance_for_date(dates[-1])
+    for code, bars in quotes.items():
+        expected = brute_force_count([close for _, close in bars])
+        assert incremental.states[code]['setup_count'] == expected
+        assert full.states[code]['setup_count'] == expected
+        assert incremental.states[code]['trade_date'] == dates[-1]
+
+
+def test_missed_days_are_replayed_in_order():
+    quotes, dates = make_quotes(n_stocks=2)
+    session = FakeSession(quotes)
+    counter = TDSetupCounter(session)
+    counter.advance_for_date(dates[20])
+    # 中间若干天未推进，一次推进到最新日期时按顺序补齐
+    result = counter.advance_for_date(dates[-1])
+    assert result['bars'] == 2 * (len(dates) - 21)
+    for code, bars in quotes.items():
+        assert session.states[code]['setup_count'] == brute_force_count([close for _, close in bars])
+
+
+def test_new_bars_use_constant_date_bound():
+    quotes, dates = make_quotes(n_stocks=3)
+    session = FakeSession(quotes)
+    counter = TDSetupCounter(session)
+    counter.advance_for_date(dates[30])
+    session.sql.clear()
+    counter.advance_for_date(dates[31])
+    load = next(sql for sql in session.sql if 'LEFT JOIN td_setup_counts' in sql)
+    assert 'h.date > :min_date' in load
+
+
+def test_stale_state_does_not_pin_date_bound():
+    quotes, dates = make_quotes(n_stocks=3)
+    # 600002 在 dates[10] 之后停牌（或退市），计数状态停留在 dates[10]
+    quotes['600002'] = quotes['600002'][:11]
+    session = FakeSession(quotes)
+    counter = TDSetupCounter(session)
+    counter.advance_for_date(dates[-2])
+    assert session.states['600002']['trade_date'] == dates[10]
+
+    bootstrap_start = '2000-01-01'
+    assert counter._min_load_date(dates[-1], bootstrap_start) == dates[-2]
+    result = counter.advance_for_date(dates[-1])
+    assert result['bars'] == 2
+
+
+def test_backfilled_bars_are_recomputed():
+    quotes, dates = make_quotes(n_stocks=3)
+    # 600001 缺少中间一段K线，先推进到最新日期
+    missing = quotes['600001'][30:35]
+    partial = {code: [bar for bar in bars if code != '600001' or bar not in missing] for code, bars in quotes.items()}
+    session = FakeSession(partial)
+    counter = TDSetupCounter(session)
+    counter.advance_for_date(dates[-1])
+
+    # 回补缺失的K线后按回补日期推进：早于状态日期的K线触发重新计算
+    session.quotes = quotes
+    session.sql.clear()
+    result = counter.advance_for_date(missing[-1][0])
+    assert any('DELETE FROM td_setup_counts' in sql for sql in session.sql)
+    # 该日期有K线的股票全部重新计算
+    assert result['bars'] == sum(len(bars) for bars in quotes.values())
+    for code, bars in quotes.items():
+        assert session.states[code]['trade_date'] == dates[-1]
+        assert session.states[code]['setup_count'] == brute_force_count([close for _, close in bars])
+
+
+def test_rebuild_after_history_backfill():
+    quotes, dates = make_quotes(n_stocks=2)
+    session = FakeSession({code: bars[:-10] for code, bars in quotes.items()})
+    counter = TDSetupCounter(session)
+    counter.advance_for_date(dates[-1])
+    session.quotes = quotes
+    counter.rebuild(dates[-1], ['600000'])
+    assert session.states['600000']['setup_count'] == brute_force_count([close for _, close in quotes['600000']])